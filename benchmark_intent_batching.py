@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched vs. one-request-per-message LLM intent analysis.
+
+Starts a local fake OpenAI-compatible server whose response time grows with
+the number of messages in the prompt, points LLMService at it, and classifies
+a burst of campaign replies both ways, reporting throughput and per-message
+latency.
+
+    python benchmark_intent_batching.py --messages 500 --request-ms 300 --item-ms 5
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from openai import OpenAI
+from python_sms_responder.llm_service import LLMService
+
+REPLIES = [
+    "yes please book me in", "can I come thursday instead", "how much for the deal?",
+    "not interested", "is the offer still valid next week", "my sister wants one too",
+    "what time are you open saturday", "I had a bad experience last time", "sounds good!",
+    "do you do nails as well?",
+]
+
+_NUMBERED_LINE = re.compile(r"^(\d+)\. (\".*\")$", re.MULTILINE)
+_SINGLE_MESSAGE = re.compile(r'^Message: (".*")$', re.MULTILINE)
+
+
+def fake_intent(message):
+    message = message.lower()
+    if "book" in message or "yes" in message:
+        return "booking"
+    if "instead" in message or "thursday" in message:
+        return "reschedule"
+    if "how much" in message or "valid" in message:
+        return "inquiry"
+    if "bad experience" in message:
+        return "complaint"
+    return "other"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    request_delay = 0.3
+    item_delay = 0.005
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+
+        numbered = _NUMBERED_LINE.findall(prompt)
+        if numbered:
+            items = [{"id": int(i), "intent": fake_intent(json.loads(text)), "confidence": 0.9,
+                      "entities": {}, "requires_human": False} for i, text in numbered]
+            content = json.dumps(items)
+        else:
+            match = _SINGLE_MESSAGE.search(prompt)
+            message = json.loads(match.group(1)) if match else ""
+            items = [message]
+            content = json.dumps({"intent": fake_intent(message), "confidence": 0.9,
+                                  "entities": {}, "requires_human": False})
+
+        time.sleep(self.request_delay + self.item_delay * len(items))
+        payload = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_fake_server(request_delay, item_delay):
+    handler = type("Handler", (FakeLLMHandler,), {"request_delay": request_delay, "item_delay": item_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_service(base_url, batching):
+    service = LLMService()
+    service.client = OpenAI(api_key="test-key", base_url=base_url, max_retries=0)
+    service.intent_classifier = None  # Measure the LLM path only
+    service.intent_batching = batching
+    return service
+
+
+async def run_burst(service, messages, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(message):
+        async with semaphore:
+            start = time.perf_counter()
+            if service.intent_batching:
+                result = await service.analyze_intent(message)
+            else:
+                # The unbatched call is blocking, so give it a worker thread
+                result = await asyncio.to_thread(asyncio.run, service.analyze_intent(message))
+            latencies.append((time.perf_counter() - start) * 1000)
+            return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(message) for message in messages))
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched intent analysis benchmark")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Messages in flight at once")
+    parser.add_argument("--request-ms", type=float, default=300, help="Fake LLM fixed latency per request")
+    parser.add_argument("--item-ms", type=float, default=5, help="Fake LLM extra latency per message")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--wait-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.request_ms / 1000, args.item_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    messages = [REPLIES[i % len(REPLIES)] for i in range(args.messages)]
+
+    print(f"{args.messages} messages, {args.concurrency} in flight, fake LLM "
+          f"{args.request_ms:.0f} ms + {args.item_ms:.0f} ms/message")
+    print(f"{'mode':>10} {'msgs/s':>8} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for mode, batching in (("single", False), ("batched", True)):
+        service = make_service(base_url, batching)
+        service.intent_batcher.max_batch_size = args.batch_size
+        service.intent_batcher.max_wait = args.wait_ms / 1000
+        elapsed, latencies, results = asyncio.run(run_burst(service, messages, args.concurrency))
+        assert all(result["intent"] != "unknown" for result in results)
+        requests = service.intent_batcher.get_stats()["batches"] if batching else len(messages)
+        latencies.sort()
+        print(f"{mode:>10} {len(messages) / elapsed:>8.1f} {requests:>9} "
+              f"{statistics.median(latencies):>8.0f} {latencies[int(len(latencies) * 0.95) - 1]:>8.0f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
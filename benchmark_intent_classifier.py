@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local intent classifier against LLMService.analyze_intent.
+
+Reports accuracy, coverage (messages answered locally at the confidence
+threshold), wrong local answers and per-message latency. A message is answered
+locally the way LLMService.classify_intent_locally does it: the model is
+confident, the label is not "other", and the message neither negates an action
+nor asks for two. With --with-llm the same messages are also sent to the LLM
+intent analysis for comparison; this needs OPENAI_API_KEY and costs one API
+call per message.
+
+A held-out split of the seed examples says little: they were written together
+with the training set. Evaluate on labelled messages from real traffic with
+--eval, training on all of --data. intent_messages_sample.jsonl is a small
+hand-labelled sample in that style, including negated and mixed-intent
+messages, which are labelled "other" because they must reach the LLM:
+
+    python benchmark_intent_classifier.py --eval intent_messages_sample.jsonl
+    python benchmark_intent_classifier.py --data labelled_sms.jsonl --with-llm
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.intent_classifier import IntentClassifier, load_examples, mixed_or_negated, SEED_TRAINING_DATA
+
+
+def answered_locally(classifier, message, threshold):
+    """The label LLMService.classify_intent_locally would return, or None"""
+    prediction = classifier.predict(message)
+    if prediction["intent"] == "other" or prediction["confidence"] < threshold or mixed_or_negated(message):
+        return None
+    return prediction["intent"]
+
+
+def bench_local(classifier, examples, threshold):
+    latencies, correct, answered, wrong = [], 0, 0, []
+    for message, label in examples:
+        start = time.perf_counter()
+        prediction = classifier.predict(message)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        correct += prediction["intent"] == label
+        local = answered_locally(classifier, message, threshold)
+        if local:
+            answered += 1
+            if local != label:
+                wrong.append((message, label, local))
+    return {
+        "accuracy": correct / len(examples),
+        "coverage": answered / len(examples),
+        "confident_accuracy": (answered - len(wrong)) / answered if answered else 0.0,
+        "wrong": wrong,
+        "p50_us": statistics.median(latencies),
+        "p99_us": sorted(latencies)[int(len(latencies) * 0.99) - 1] if len(latencies) > 1 else latencies[0]
+    }
+
+
+async def bench_llm(examples):
+    from python_sms_responder.llm_service import LLMService
+    service = LLMService()
+    latencies, correct = [], 0
+    for message, label in examples:
+        start = time.perf_counter()
+        result = await service._analyze_intent_with_llm(message)
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += result.get("intent") == label
+    return {"accuracy": correct / len(examples), "p50_ms": statistics.median(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local intent classifier benchmark")
+    parser.add_argument("--data", nargs="+", default=[SEED_TRAINING_DATA])
+    parser.add_argument("--model", help="Model artifact; default trains on a split of --data")
+    parser.add_argument("--eval", nargs="+", help="Labelled messages to evaluate on; trains on all of --data")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7")))
+    parser.add_argument("--with-llm", action="store_true", help="Also benchmark analyze_intent via the LLM")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    if args.eval:
+        test = load_examples(args.eval)
+        classifier = IntentClassifier.load(args.model) if args.model else IntentClassifier().fit(examples)
+    elif args.model:
+        classifier, test = IntentClassifier.load(args.model), examples
+    else:
+        random.Random(13).shuffle(examples)
+        split = int(len(examples) * 0.8)
+        classifier, test = IntentClassifier().fit(examples[:split]), examples[split:]
+
+    local = bench_local(classifier, test, args.threshold)
+    print(f"Local classifier on {len(test)} messages (threshold {args.threshold}):")
+    print(f"  accuracy {local['accuracy']:.1%}, coverage {local['coverage']:.1%}, "
+          f"accuracy when answered locally {local['confident_accuracy']:.1%}")
+    for message, label, predicted in local["wrong"]:
+        print(f"  wrong: {message!r} is {label}, answered {predicted}")
+    print(f"  latency p50 {local['p50_us']:.0f} µs, p99 {local['p99_us']:.0f} µs")
+
+    if args.with_llm:
+        llm = asyncio.run(bench_llm(test))
+        print(f"LLM analyze_intent: accuracy {llm['accuracy']:.1%}, latency p50 {llm['p50_ms']:.0f} ms")
+        print(f"Local classifier is {llm['p50_ms'] * 1000 / local['p50_us']:.0f}x faster; "
+              f"{local['coverage']:.0%} of messages skip the LLM")
+
+
+if __name__ == "__main__":
+    main()
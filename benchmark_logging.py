@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark logging throughput in events per second.
+
+Logs the conversation result event LLMService and ConversationManager write
+for every message, in the ways it can be written:
+
+- sync f-string: the old call, an f-string of the whole result dict written
+  by a StreamHandler in the calling thread, with the stdlib defaults
+- sync structured: the structured call with the JSON formatter and PII
+  redaction, still written in the calling thread
+- queued (caller): the structured call through NonBlockingQueueHandler; what
+  the request pays, since formatting and writing happen on the listener thread
+- queued (listener): how fast the listener thread formats, redacts and writes
+  those records, i.e. the sustained rate before the queue fills and drops
+- sampled 10%: the queued call with LOG_SAMPLE_RATES=<logger>=0.1
+- disabled f-string / disabled lazy: the event below the logger's level,
+  with the message built eagerly and lazily
+
+The structured scenarios skip looking up the caller's file and line, as
+configure_logging() does. Output goes to a file in a temporary directory.
+
+    python benchmark_logging.py --events 50000
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import logging.handlers
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.structured_logging import NonBlockingQueueHandler, SamplingFilter, StructuredFormatter
+
+_SRCFILE = logging._srcfile
+
+LOGGER_NAME = "benchmark.conversation_manager"
+PHONE = "+15551234567"
+MESSAGE = "Hi, can I book a balayage with Jane for Friday afternoon?"
+RESULT = {
+    "response": "Hi Maria! Jane has Friday at 2:00 PM or 4:30 PM open for a balayage. Which works best?",
+    "step": "awaiting_time",
+    "requires_booking": False,
+    "booking_data": {"service": "balayage", "stylist": "Jane", "date": "2024-06-14"},
+}
+
+
+def isolated_logger(handler, level=logging.INFO):
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def eager(logger, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        logger.info(f"Processing message for {PHONE}: '{MESSAGE}' at step 'initial'")
+        logger.info(f"Conversation result for {PHONE}: {RESULT}")
+    return (time.perf_counter() - start) / (events * 2)
+
+
+def structured(logger, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        logger.info("Processing message", extra={"phone": PHONE, "body": MESSAGE, "step": "initial"})
+        logger.info(
+            "Conversation result: %s", RESULT,
+            extra={"phone": PHONE, "step": RESULT["step"], "requires_booking": RESULT["requires_booking"]}
+        )
+    return (time.perf_counter() - start) / (events * 2)
+
+
+def disabled_eager(logger, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        logger.debug(f"Processing message for {PHONE}: '{MESSAGE}' at step 'initial'")
+        logger.debug(f"Conversation result for {PHONE}: {RESULT}")
+    return (time.perf_counter() - start) / (events * 2)
+
+
+def disabled_lazy(logger, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        logger.debug("Processing message", extra={"phone": PHONE, "body": MESSAGE, "step": "initial"})
+        logger.debug(
+            "Conversation result: %s", RESULT,
+            extra={"phone": PHONE, "step": RESULT["step"], "requires_booking": RESULT["requires_booking"]}
+        )
+    return (time.perf_counter() - start) / (events * 2)
+
+
+def file_handler(path, formatter):
+    handler = logging.StreamHandler(open(path, "w"))
+    handler.setFormatter(formatter)
+    return handler
+
+
+def close(handler):
+    handler.flush()
+    handler.stream.close()
+
+
+def run(name, directory, events):
+    """Seconds per event for one scenario"""
+    logging._srcfile = _SRCFILE if name == "sync f-string" else None
+    path = os.path.join(directory, f"{name.replace(' ', '-')}.log")
+
+    if name == "sync f-string":
+        handler = file_handler(path, logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        seconds = eager(isolated_logger(handler), events)
+        close(handler)
+        return seconds
+
+    if name == "sync structured":
+        handler = file_handler(path, StructuredFormatter("json"))
+        seconds = structured(isolated_logger(handler), events)
+        close(handler)
+        return seconds
+
+    if name in ("queued (caller)", "queued (listener)", "sampled 10%"):
+        # Large enough here that every record is timed rather than dropped
+        handler = NonBlockingQueueHandler(maxsize=events * 2)
+        if name == "sampled 10%":
+            handler.addFilter(SamplingFilter({LOGGER_NAME: 0.1}))
+        seconds = structured(isolated_logger(handler), events)
+        output = file_handler(path, StructuredFormatter("json"))
+        queued = handler.queue.qsize()
+        listener = logging.handlers.QueueListener(handler.queue, output)
+        start = time.perf_counter()
+        listener.start()
+        listener.stop()
+        drained = time.perf_counter() - start
+        close(output)
+        if name == "queued (listener)":
+            return drained / queued
+        return seconds
+
+    null = logging.NullHandler()
+    logger = isolated_logger(null, level=logging.INFO)
+    return disabled_eager(logger, events) if name == "disabled f-string" else disabled_lazy(logger, events)
+
+
+SCENARIOS = [
+    "sync f-string", "sync structured", "queued (caller)", "queued (listener)", "sampled 10%",
+    "disabled f-string", "disabled lazy",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging throughput in events per second")
+    parser.add_argument("--events", type=int, default=50000, help="Message/result pairs logged per scenario")
+    args = parser.parse_args()
+
+    print(f"{args.events * 2} events per scenario\n")
+    print(f"{'scenario':<20} {'us/event':>9} {'events/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in SCENARIOS:
+            # Warm up, then measure
+            run(name, directory, min(1000, args.events))
+            seconds = run(name, directory, args.events)
+            print(f"{name:<20} {seconds * 1e6:>9.2f} {1 / seconds:>12,.0f}")
+    logging._srcfile = _SRCFILE
+
+
+if __name__ == "__main__":
+    main()
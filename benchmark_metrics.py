@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark the overhead of the /metrics instrumentation.
+
+1. Primitive costs: Counter.inc, Histogram.observe, the @timed decorator and
+   the per-request middleware, from 1 and 8 threads.
+2. End to end: the incoming-call webhook driven in-process through the full
+   FastAPI app, with and without MetricsMiddleware. Requests alternate
+   between the two in back-to-back pairs, so both see the same machine
+   state, and the overhead is the median of the paired differences. On a
+   shared box, comparing two separate runs is noisier than 2%.
+3. The SMS webhook: the full set of observations one SMS webhook makes
+   (middleware, the stages, the client lookup, the LLM call and the Twilio
+   send), timed on its own and compared with the webhook's floor: the voice
+   webhook's request handling plus the SQLite writes the SMS webhook always
+   makes. Real SMS webhooks also wait on Postgres and the LLM, so the
+   overhead in production is far smaller than this.
+
+    python benchmark_metrics.py --requests 10000 --max-overhead 2
+"""
+
+import gc
+import os
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+import statistics
+import tempfile
+import threading
+from urllib.parse import urlencode
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("OUTBOUND_QUEUE_ENABLED", "false")
+
+from python_sms_responder.metrics import (
+    DB_QUERY_SECONDS, EXTERNAL_CALL_SECONDS, Histogram, Counter, MetricsMiddleware, Registry,
+    SMS_STAGE_SECONDS, timed,
+)
+
+VOICE_FORM = urlencode({
+    "CallSid": "CA00000000000000000000000000000000",
+    "From": "+15555550100",
+    "To": "+15555550199",
+    "AccountSid": "AC00000000000000000000000000000000",
+    "CallStatus": "ringing",
+}).encode()
+
+
+def per_call_ns(func, iterations):
+    start = time.perf_counter()
+    func(iterations)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def threaded_ns(func, iterations, threads):
+    workers = [threading.Thread(target=func, args=(iterations,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (iterations * threads) * 1e9
+
+
+def primitive_costs(iterations):
+    registry = Registry()
+    counter = Counter("bench_events", "benchmark", ["kind"], registry=registry).labels("a")
+    histogram = Histogram("bench_seconds", "benchmark", ["kind"], registry=registry).labels("a")
+
+    def incs(n):
+        for _ in range(n):
+            counter.inc()
+
+    def observes(n):
+        for _ in range(n):
+            histogram.observe(0.0123)
+
+    def plain(n):
+        for _ in range(n):
+            pass
+
+    @timed(histogram)
+    def decorated():
+        return None
+
+    def undecorated():
+        return None
+
+    def decorated_calls(n):
+        for _ in range(n):
+            decorated()
+
+    def undecorated_calls(n):
+        for _ in range(n):
+            undecorated()
+
+    loop = per_call_ns(plain, iterations)
+    rows = [
+        ("Counter.inc", per_call_ns(incs, iterations) - loop, threaded_ns(incs, iterations // 8, 8) - loop),
+        ("Histogram.observe", per_call_ns(observes, iterations) - loop,
+         threaded_ns(observes, iterations // 8, 8) - loop),
+        ("@timed call", per_call_ns(decorated_calls, iterations) - per_call_ns(undecorated_calls, iterations), None),
+    ]
+    # Nothing lost when 8 threads write one child at once
+    expected = iterations + (iterations // 8) * 8
+    assert counter.values()[0] == expected, counter.values()
+    return rows
+
+
+def middleware_cost(iterations):
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    wrapped = MetricsMiddleware(endpoint, paths=["/webhook/voice"])
+    scope = {"type": "http", "path": "/webhook/voice"}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def run(app):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await app(scope, receive, send)
+        return time.perf_counter() - start
+
+    bare = asyncio.run(run(endpoint))
+    instrumented = asyncio.run(run(wrapped))
+    return (instrumented - bare) / iterations * 1e9
+
+
+def sms_instrumentation_cost(iterations):
+    """The observations one SMS webhook makes, in the order it makes them"""
+    stages = [SMS_STAGE_SECONDS.labels(stage) for stage in ("message_store", "dedupe", "client_lookup", "llm", "enqueue")]
+    lookup = DB_QUERY_SECONDS.labels("database", "get_client_by_phone")
+    llm = EXTERNAL_CALL_SECONDS.labels("openai", "completion")
+    twilio = EXTERNAL_CALL_SECONDS.labels("twilio", "send_sms")
+    perf_counter = time.perf_counter
+
+    start = perf_counter()
+    for _ in range(iterations):
+        for child in stages:
+            began = perf_counter()
+            child.observe(perf_counter() - began)
+        for child in (lookup, llm, twilio):
+            began = perf_counter()
+            child.observe(perf_counter() - began)
+    return (perf_counter() - start) / iterations * 1e9
+
+
+def sms_local_work(iterations):
+    """Seconds per SMS webhook spent on local SQLite work: history, dedupe and the outbound queue"""
+    from python_sms_responder.message_store import INBOUND, MessageStore
+    from python_sms_responder.outbound_queue import OutboundQueue
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = MessageStore(os.path.join(directory, "messages.db"))
+        queue = OutboundQueue(os.path.join(directory, "outbound.db"))
+        start = time.perf_counter()
+        for index in range(iterations):
+            store.record("+15555550100", INBOUND, "Do you have anything Friday?", sid=f"SM{index}", status="received")
+            queue.contains(f"reply:SM{index}")
+            queue.enqueue("+15555550100", "Yes, we have 2pm or 4pm on Friday.", f"reply:SM{index}")
+        elapsed = time.perf_counter() - start
+        store.close()
+        queue.close()
+    return elapsed / iterations
+
+
+def build_apps():
+    from python_sms_responder import main
+
+    app = main.app
+    instrumented = app.build_middleware_stack()
+    saved = list(app.user_middleware)
+    app.user_middleware = [middleware for middleware in saved if middleware.cls is not MetricsMiddleware]
+    bare = app.build_middleware_stack()
+    app.user_middleware = saved
+    return bare, instrumented
+
+
+def voice_request():
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/webhook/voice", "raw_path": b"/webhook/voice", "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        "headers": [(b"content-type", b"application/x-www-form-urlencoded"),
+                    (b"content-length", str(len(VOICE_FORM)).encode())],
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": VOICE_FORM, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    async def call(app):
+        start = time.perf_counter()
+        await app(dict(scope), receive, send)
+        return time.perf_counter() - start
+
+    return call, status
+
+
+def end_to_end(requests):
+    """Median per-request time of each app, and the median paired difference"""
+    bare, instrumented = build_apps()
+    call, status = voice_request()
+    timings = {"bare": [], "instrumented": []}
+    differences = []
+
+    async def run():
+        # Warm up: build the voice service and TwiML templates
+        for _ in range(200):
+            await call(bare)
+            await call(instrumented)
+        gc.collect()
+        for index in range(requests):
+            # Back-to-back pairs see the same machine state; swap the order each time
+            if index % 2 == 0:
+                without, with_metrics = await call(bare), await call(instrumented)
+            else:
+                with_metrics, without = await call(instrumented), await call(bare)
+            timings["bare"].append(without)
+            timings["instrumented"].append(with_metrics)
+            differences.append(with_metrics - without)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(run())
+    assert set(status) == {200}, set(status)
+    return statistics.median(timings["bare"]), statistics.median(timings["instrumented"]), statistics.median(differences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("--iterations", type=int, default=400000)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--max-overhead", type=float, help="Exit non-zero if any overhead exceeds this percent")
+    args = parser.parse_args()
+
+    print("Primitive cost (ns per call, loop overhead removed)")
+    print(f"  {'':<20} {'1 thread':>10} {'8 threads':>10}")
+    for name, single, threaded in primitive_costs(args.iterations):
+        threaded_text = f"{threaded:>10.0f}" if threaded is not None else f"{'':>10}"
+        print(f"  {name:<20} {single:>10.0f} {threaded_text}")
+    middleware_ns = middleware_cost(args.iterations // 10)
+    print(f"  {'middleware':<20} {middleware_ns:>10.0f}")
+
+    bare, instrumented, difference = end_to_end(args.requests)
+    webhook_overhead = difference / bare * 100
+    print(f"\nPOST /webhook/voice in-process, {args.requests} interleaved pairs, medians")
+    print(f"  without metrics  {bare * 1e6:8.1f} us/request")
+    print(f"  with metrics     {instrumented * 1e6:8.1f} us/request")
+    print(f"  paired cost      {difference * 1e6:8.1f} us/request ({webhook_overhead:.2f} %)")
+
+    sms_ns = sms_instrumentation_cost(args.iterations // 10) + middleware_ns
+    sms_floor = bare + sms_local_work(200)
+    sms_overhead = sms_ns / 1e9 / sms_floor * 100
+    print(f"\nSMS webhook instrumentation (middleware + 8 observations): {sms_ns / 1e3:.1f} us/request")
+    print(f"  SMS webhook floor (request handling + SQLite history and queue writes, "
+          f"no database lookup or LLM call): {sms_floor * 1e6:.0f} us")
+    print(f"  overhead against that floor: {sms_overhead:.2f} %")
+
+    if args.max_overhead is not None and max(webhook_overhead, sms_overhead) > args.max_overhead:
+        print(f"\nOverhead exceeds {args.max_overhead:g}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
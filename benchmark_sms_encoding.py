@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark SMS segment usage before and after GSM-7 compaction.
+
+Runs the booking flow templates, keyword fallbacks and a set of LLM-style
+replies (bullets, curly quotes, emoji) through count_segments() and compact(),
+and reports encoding, segments per message and compaction throughput. Extra
+replies can be measured from a file with one reply per line (use \\n for line
+breaks inside a reply).
+
+    python benchmark_sms_encoding.py --replies exported_replies.txt --max-segments 2
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.sms_encoding import compact, count_segments
+from python_sms_responder.conversation_manager import ConversationManager
+from python_sms_responder.fallback_responses import get_keyword_fallback
+
+LLM_STYLE_REPLIES = [
+    "Hi there! 😊 We’d love to see you. Here’s what’s open:\n• Tuesday – 10:00 AM\n• Wednesday – 2:30 PM\n"
+    "• Friday – 4:00 PM\nJust reply with the time that works best…",
+    "You’re all set for Thursday at 3 PM ✅ See you soon! 💇‍♀️",
+    "Our most popular services:\n• Haircut – $50\n• Hair Color – $120\n• Highlights – $150\n• Blowout – $35\n"
+    "Want me to book one for you? 🙂",
+    "No problem — I’ve cancelled your appointment. Let us know whenever you’d like to rebook! 💕",
+    "We’re open Mon–Sat 9 AM–7 PM and Sun 10 AM–5 PM. Parking is free behind the salon “Studio B” entrance.",
+]
+
+
+def collect_replies(extra_path=None):
+    manager = ConversationManager()
+    replies = []
+    for message in ["hi", "I want to book an appointment", "haircut", "tomorrow", "Jane Doe", "yes"]:
+        replies.append(("template", manager.process_message("+15555550100", message)["response"]))
+    for message in ["book", "hours", "price", "cancel", "hello"]:
+        replies.append(("fallback", get_keyword_fallback(message)))
+    replies.extend(("llm", reply) for reply in LLM_STYLE_REPLIES)
+    if extra_path:
+        with open(extra_path, encoding="utf-8") as f:
+            replies.extend(("file", line.rstrip("\n").replace("\\n", "\n")) for line in f if line.strip())
+    return replies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS segment compaction benchmark")
+    parser.add_argument("--replies", help="Extra replies, one per line")
+    parser.add_argument("--max-segments", type=int, default=int(os.getenv("SMS_MAX_SEGMENTS", "3")))
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    replies = collect_replies(args.replies)
+    before_total = after_total = 0
+    print(f"{'source':<9} {'before':>12} {'after':>12}  reply")
+    for source, reply in replies:
+        before = count_segments(reply)
+        after = count_segments(compact(reply, args.max_segments))
+        before_total += before.segments
+        after_total += after.segments
+        preview = reply.replace("\n", " ")[:50]
+        print(f"{source:<9} {before.encoding:>6} x{before.segments:<4} {after.encoding:>6} x{after.segments:<4} {preview}")
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for _, reply in replies:
+            compact(reply, args.max_segments)
+    elapsed = time.perf_counter() - start
+    compactions = args.iterations * len(replies)
+
+    print()
+    print(f"messages:              {len(replies)}")
+    print(f"segments before:       {before_total} ({before_total / len(replies):.2f}/message)")
+    print(f"segments after:        {after_total} ({after_total / len(replies):.2f}/message)")
+    print(f"segments saved:        {before_total - after_total} ({(before_total - after_total) / before_total:.0%})")
+    print(f"compact() throughput:  {compactions / elapsed:,.0f} messages/s ({elapsed / compactions * 1e6:.1f} us/message)")
+
+
+if __name__ == "__main__":
+    main()
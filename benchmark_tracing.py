@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of tracing spans.
+
+Times one SMS webhook's worth of nested spans (the same names and depth the
+webhook, LLMService, DatabaseService and SMSService open) with tracing off,
+and at several sample rates. Sampled spans are exported to a JSON lines file
+in a temporary directory, so the cost of queueing them is included; the file
+write happens on the exporter thread.
+
+    python benchmark_tracing.py --requests 20000 --rates 0 0.01 0.1 1
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder import tracing
+from python_sms_responder.tracing import CLIENT, SERVER, BatchSpanProcessor, JsonFileExporter, Tracer, span
+
+
+def sms_request():
+    """The spans of one SMS webhook whose reply comes from the LLM"""
+    with span("sms.webhook", kind=SERVER):
+        with span("sms.message_store"):
+            pass
+        with span("sms.dedupe"):
+            pass
+        with span("sms.client_lookup"):
+            with span("db.get_client_by_phone", kind=CLIENT):
+                with span("db.get_upcoming_appointments", kind=CLIENT):
+                    pass
+        with span("sms.llm"):
+            with span("llm.generate_response"):
+                with span("conversation.process_message"):
+                    pass
+                with span("llm.generate_ai_reply"):
+                    with span("llm.route_model"):
+                        pass
+                    with span("llm.cache_lookup"):
+                        pass
+                    with span("llm.prompt_build"):
+                        pass
+                    with span("llm.completion", kind=CLIENT):
+                        pass
+        with span("sms.enqueue"):
+            pass
+
+
+SPANS_PER_REQUEST = 14
+
+
+def time_requests(requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        sms_request()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead per SMS webhook")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.01, 0.1, 1.0])
+    args = parser.parse_args()
+
+    print(f"{SPANS_PER_REQUEST} spans per SMS webhook, {args.requests} webhooks per run\n")
+    print(f"{'sample rate':>12} {'us/webhook':>11} {'ns/span':>9} {'spans exported':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rate in args.rates:
+            path = os.path.join(directory, f"traces-{rate}.jsonl")
+            processor = BatchSpanProcessor([JsonFileExporter(path)]) if rate > 0 else None
+            tracing._tracer = Tracer(rate, processor)
+            # Warm up, then measure
+            time_requests(min(1000, args.requests))
+            per_request = time_requests(args.requests)
+            tracing._tracer.shutdown()
+            exported = processor.exported if processor else 0
+            label = "off" if rate <= 0 else f"{rate:g}"
+            print(f"{label:>12} {per_request * 1e6:>11.1f} {per_request / SPANS_PER_REQUEST * 1e9:>9.0f} "
+                  f"{exported:>15}")
+    tracing._tracer = Tracer()
+
+
+if __name__ == "__main__":
+    main()
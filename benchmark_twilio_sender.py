@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk SMS sending against a local mock Twilio API.
+
+Compares the previous approach (the synchronous Twilio Client, one message
+after another) with AsyncTwilioSender's rate-limited concurrent pipeline.
+The mock answers the Messages API with a fixed latency and injects a
+configurable share of 429 and 503 responses.
+
+    python benchmark_twilio_sender.py --messages 500 --latency-ms 150 --mps 100 --concurrency 20
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from python_sms_responder.twilio_sender import AsyncTwilioSender, TWILIO_API_BASE
+
+ACCOUNT_SID = "AC00000000000000000000000000000000"
+
+
+class MockTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.15
+    error_rate = 0.02
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.error_rate / 2:
+            status, payload = 429, {"code": 20429, "message": "Too Many Requests", "status": 429}
+        elif roll < self.error_rate:
+            status, payload = 503, {"code": 20503, "message": "Service Unavailable", "status": 503}
+        else:
+            status, payload = 201, {"sid": f"SM{random.getrandbits(64):016x}", "status": "queued"}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalTwilioHttpClient(TwilioHttpClient):
+    """Sends the helper library's requests to the mock server"""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def request(self, method, url, *args, **kwargs):
+        return super().request(method, url.replace(TWILIO_API_BASE, self.base_url), *args, **kwargs)
+
+
+def start_mock_twilio(latency, error_rate):
+    handler = type("Handler", (MockTwilioHandler,), {"latency": latency, "error_rate": error_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def send_sequential(base_url, recipients):
+    """The previous send_bulk_sms loop: blocking Client calls one at a time"""
+    client = Client(ACCOUNT_SID, "token", http_client=LocalTwilioHttpClient(base_url))
+    sent = 0
+    for to in recipients:
+        try:
+            client.messages.create(body="Spring sale: 20% off color this week!", from_="+15555550000", to=to)
+            sent += 1
+        except Exception:
+            pass
+    return sent
+
+
+async def send_async(base_url, recipients, mps, concurrency):
+    sender = AsyncTwilioSender(
+        ACCOUNT_SID, "token", "+15555550000",
+        messages_per_second=mps, max_concurrency=concurrency, backoff_base=0.05, base_url=base_url
+    )
+    sent = 0
+    progress_every = max(1, len(recipients) // 5)
+    done = 0
+    async for result in sender.send_bulk(recipients, "Spring sale: 20% off color this week!"):
+        done += 1
+        sent += result.success
+        if done % progress_every == 0:
+            print(f"    progress {done}/{len(recipients)}")
+    await sender.aclose()
+    return sent, sender.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk SMS sending benchmark against a mock Twilio API")
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of 429/503 responses")
+    parser.add_argument("--mps", type=float, default=100, help="Sender MPS (1 long code, 3 toll-free, 100+ short code)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_twilio(args.latency_ms / 1000, args.error_rate)
+    recipients = [f"+1555{i:07d}" for i in range(args.messages)]
+    print(f"{args.messages} messages, mock latency {args.latency_ms:.0f} ms, {args.error_rate:.0%} 429/503")
+
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        sent = send_sequential(base_url, recipients)
+        elapsed = time.perf_counter() - start
+        print(f"sequential Client: {sent} sent in {elapsed:.1f}s ({sent / elapsed:.1f} msg/s)")
+
+    start = time.perf_counter()
+    sent, stats = asyncio.run(send_async(base_url, recipients, args.mps, args.concurrency))
+    elapsed = time.perf_counter() - start
+    print(f"async sender ({args.mps:g} MPS, {args.concurrency} in flight): {sent} sent in {elapsed:.1f}s "
+          f"({sent / elapsed:.1f} msg/s, {stats['retries']} retries)")
+    print(f"5,000 recipients at this rate: ~{5000 / (sent / elapsed) / 60:.1f} min")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark voice webhook TwiML rendering: per-request VoiceResponse vs precompiled templates.
+
+"before" is what the voice webhooks did on every request: read WEBHOOK_BASE_URL,
+build a twilio VoiceResponse tree and serialize it. "after" renders the same
+document from TwimlRenderer. Both produce identical XML (checked before timing).
+Times are CPU time per document.
+
+    python benchmark_twiml.py --iterations 20000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.twiml_templates import (
+    TwimlRenderer,
+    build_follow_up,
+    build_initial,
+    build_say_and_continue,
+    build_say_and_follow_up,
+)
+
+CALL_SID = "CA0123456789abcdef0123456789abcdef"
+REPLY = ("We're open Monday through Saturday from 9AM to 7PM, and Sundays from 10AM to 5PM. "
+         "Haircuts start at $45 & take about an hour.")
+
+
+def url(path):
+    # The old code re-read the environment for every URL
+    return f"{os.getenv('WEBHOOK_BASE_URL', '')}{path}?call_sid={CALL_SID}"
+
+
+def cpu_microseconds(func, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice TwiML rendering benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--webhook-base", default="https://salon.example.com")
+    args = parser.parse_args()
+
+    os.environ["WEBHOOK_BASE_URL"] = args.webhook_base
+    renderer = TwimlRenderer()
+
+    documents = {
+        "initial": (
+            lambda: str(build_initial(url("/webhook/voice/process"), url("/webhook/voice"))),
+            lambda: renderer.initial(CALL_SID),
+        ),
+        "reply + follow-up": (
+            lambda: str(build_say_and_follow_up(REPLY, url("/webhook/voice/process"))),
+            lambda: renderer.say_and_follow_up(REPLY, CALL_SID),
+        ),
+        "first sentence": (
+            lambda: str(build_say_and_continue(REPLY, url("/webhook/voice/continue"))),
+            lambda: renderer.say_and_continue(REPLY, CALL_SID),
+        ),
+        "follow-up": (
+            lambda: str(build_follow_up(url("/webhook/voice/process"))),
+            lambda: renderer.follow_up(CALL_SID),
+        ),
+    }
+
+    print(f"{'document':<18} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    total_before = total_after = 0.0
+    for name, (before, after) in documents.items():
+        assert before() == after(), f"{name}: template output differs from VoiceResponse"
+        before_us = cpu_microseconds(before, args.iterations)
+        after_us = cpu_microseconds(after, args.iterations)
+        total_before += before_us
+        total_after += after_us
+        print(f"{name:<18} {before_us:>10.1f} {after_us:>10.2f} {before_us / after_us:>7.0f}x")
+
+    start = time.process_time()
+    TwimlRenderer()
+    compile_ms = (time.process_time() - start) * 1000
+
+    print(f"\nAll four documents: {total_before:.1f} us -> {total_after:.2f} us CPU")
+    print(f"Template compilation at startup: {compile_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
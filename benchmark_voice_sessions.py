@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark voice session storage under a simulated load of concurrent calls.
+
+Each simulated call runs on its own thread and takes --turns turns. A turn
+does what VoiceService does per caller utterance: record the speech, read the
+turn count for model routing, read the recent messages for the prompt and
+record the reply. Each turn lands on a random one of --workers store
+instances (separate connections to the same backend, as separate uvicorn
+workers would have), and a caller pauses --think-ms between turns.
+
+Compared:
+    memory      CallHistoryStore, one worker only (the previous behaviour)
+    sqlite      SharedCallHistoryStore on a shared SQLite file
+    sqlite-nc   the same with the local copy revalidated on every read
+    redis       SharedCallHistoryStore on Redis (only with --redis-url)
+
+After each run every call's history is checked against what was written.
+
+    python benchmark_voice_sessions.py --calls 100 --turns 10 --workers 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.call_history import CallHistoryStore
+from python_sms_responder.session_store import RedisSessionBackend, SQLiteSessionBackend, SharedCallHistoryStore
+
+CAPACITY = 20
+CONTEXT_MESSAGES = 10
+REPLY = "We're open Monday through Saturday from 9AM to 7PM. Would you like to book?"
+
+
+def run(workers, calls, turns, think_seconds):
+    latencies = []
+    latencies_lock = threading.Lock()
+    barrier = threading.Barrier(calls)
+
+    def caller(index):
+        call_sid = f"CA{index:032d}"
+        rng = random.Random(index)
+        own = []
+        barrier.wait()
+        for turn in range(turns):
+            store = rng.choice(workers)
+            start = time.perf_counter()
+            store.append(call_sid, "user", f"question {turn} from caller {index}")
+            store.user_turns(call_sid)
+            list(store.recent(call_sid, CONTEXT_MESSAGES))
+            store.append(call_sid, "assistant", REPLY)
+            own.append(time.perf_counter() - start)
+            time.sleep(think_seconds)
+        with latencies_lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(calls)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    hit_rates = [store.get_metrics()["local_hit_rate"] for store in workers if hasattr(store, "revalidate_after")]
+
+    # Every worker must see every call's full, correctly ordered history
+    expected_turns = min(turns, CAPACITY // 2)
+    for store in workers:
+        if hasattr(store, "revalidate_after"):
+            store.revalidate_after = 0
+    for index in range(calls):
+        call_sid = f"CA{index:032d}"
+        for store in workers:
+            messages = list(store.recent(call_sid, CAPACITY))
+            assert len(messages) == 2 * expected_turns, f"{call_sid}: {len(messages)} messages"
+            assert messages[-2]["content"] == f"question {turns - 1} from caller {index}"
+            assert store.user_turns(call_sid) == turns
+
+    latencies.sort()
+    result = {
+        "turns_per_second": calls * turns / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+    if hit_rates:
+        result["local_hit_rate"] = statistics.mean(hit_rates)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice session store benchmark")
+    parser.add_argument("--calls", type=int, default=100, help="Concurrent calls")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per call")
+    parser.add_argument("--workers", type=int, default=4, help="Store instances sharing the backend")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="Pause between a caller's turns")
+    parser.add_argument("--redis-url", help="Also benchmark the Redis backend")
+    args = parser.parse_args()
+
+    think = args.think_ms / 1000
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        results["memory"] = run([CallHistoryStore(capacity=CAPACITY)], args.calls, args.turns, think)
+
+        for name, revalidate_after in (("sqlite", 1.0), ("sqlite-nc", 0.0)):
+            path = os.path.join(directory, f"{name}.db")
+            workers = [
+                SharedCallHistoryStore(SQLiteSessionBackend(path), capacity=CAPACITY, revalidate_after=revalidate_after)
+                for _ in range(args.workers)
+            ]
+            results[name] = run(workers, args.calls, args.turns, think)
+
+    if args.redis_url:
+        workers = [
+            SharedCallHistoryStore(RedisSessionBackend(args.redis_url, prefix=f"bench:{time.time()}:"), capacity=CAPACITY)
+            for _ in range(args.workers)
+        ]
+        results["redis"] = run(workers, args.calls, args.turns, think)
+
+    print(f"{args.calls} concurrent calls x {args.turns} turns, {args.workers} workers, "
+          f"{args.think_ms:g} ms think time (store operations only)\n")
+    print(f"{'store':<10} {'turns/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'local hits':>11}")
+    for name, result in results.items():
+        hit_rate = f"{result['local_hit_rate']:.0%}" if "local_hit_rate" in result else "-"
+        print(f"{name:<10} {result['turns_per_second']:>9.0f} {result['p50_ms']:>8.3f} "
+              f"{result['p99_ms']:>8.3f} {hit_rate:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark time-to-first-audio for voice replies, with and without streaming.
+
+Runs VoiceService.create_processing_response against a local fake LLM that
+streams tokens with a fixed first-token latency and per-token delay, and
+reports how long Twilio would wait for the first <Say>.
+
+    python benchmark_voice_streaming.py --turns 10 --first-token-ms 400 --token-ms 25
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.voice_service import VoiceService
+
+REPLY = (
+    "We're open Monday through Saturday from 9AM to 7PM, and Sundays from 10AM to 5PM. "
+    "Haircuts start at $45 and take about an hour. "
+    "Would you like me to check availability for a specific day?"
+)
+
+
+class FakeStreamingCompletions:
+    """Local stand-in for chat.completions with realistic token timing"""
+
+    def __init__(self, text=REPLY, first_token_delay=0.4, token_delay=0.025):
+        self.tokens = re.findall(r"\S+\s*", text)
+        self.text = text
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def _chunks(self):
+        time.sleep(self.first_token_delay)
+        for token in self.tokens:
+            time.sleep(self.token_delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    def create(self, stream=False, **kwargs):
+        if stream:
+            return self._chunks()
+        time.sleep(self.first_token_delay + self.token_delay * len(self.tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))])
+
+
+def make_voice_service(completions, streaming):
+    service = VoiceService()
+    service.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service.streaming_enabled = streaming
+    return service
+
+
+def time_to_first_audio(service, turns):
+    timings = []
+    for turn in range(turns):
+        call_sid = f"CA-bench-{turn}"
+        start = time.perf_counter()
+        service.create_processing_response(call_sid, "What are your hours and how much is a haircut?")
+        timings.append((time.perf_counter() - start) * 1000)
+        if call_sid in service.pending_replies:
+            service.create_continuation_response(call_sid)
+        service.cleanup_conversation(call_sid)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice streaming time-to-first-audio benchmark")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=25)
+    args = parser.parse_args()
+
+    completions = FakeStreamingCompletions(
+        first_token_delay=args.first_token_ms / 1000,
+        token_delay=args.token_ms / 1000
+    )
+
+    print(f"Fake LLM: {len(completions.tokens)} tokens, first token {args.first_token_ms:.0f} ms, "
+          f"{args.token_ms:.0f} ms/token")
+    print(f"{'mode':>10} {'p50 ms':>8} {'max ms':>8}")
+
+    results = {}
+    for mode, streaming in (("blocking", False), ("streaming", True)):
+        timings = time_to_first_audio(make_voice_service(completions, streaming), args.turns)
+        results[mode] = statistics.median(timings)
+        print(f"{mode:>10} {statistics.median(timings):>8.1f} {max(timings):>8.1f}")
+
+    saved = results["blocking"] - results["streaming"]
+    print(f"\nTime to first audio reduced by {saved:.0f} ms ({saved / results['blocking']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
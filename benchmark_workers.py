@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Load test serve.py with increasing worker counts to measure multi-process scaling.
+
+For each worker count, starts serve.py on a free port, waits for
+/health/live, then drives --connections keep-alive connections (spread over
+--client-processes load generator processes) at the endpoint for --seconds
+and reports throughput, latency and scaling efficiency against one worker.
+The default endpoint is the incoming-call webhook, which renders TwiML
+without calling out to Twilio or OpenAI, so the work measured is the app's
+own CPU time per request.
+
+The load generator runs on the same machine and takes CPU from the workers:
+run it on a box with spare cores (or point --url at a remote server) and use
+at most (CPUs - client processes) workers for a clean scaling curve.
+
+    python benchmark_workers.py --workers 1 2 4 --seconds 15
+    python benchmark_workers.py --workers 1 2 4 --cpu-affinity --connections 64
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import signal
+import argparse
+import threading
+import statistics
+import subprocess
+import http.client
+import multiprocessing
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+VOICE_FORM = urlencode({
+    "CallSid": "CA00000000000000000000000000000000",
+    "From": "+15555550100",
+    "To": "+15555550199",
+    "AccountSid": "AC00000000000000000000000000000000",
+    "CallStatus": "ringing",
+})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_live(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health/live")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def client_process(port, path, connections, seconds, start_at, results):
+    """Drive `connections` keep-alive connections, one per thread, until the deadline"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    def run():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            began = time.perf_counter()
+            try:
+                conn.request("POST", path, VOICE_FORM, headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[0] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            local.append(time.perf_counter() - began)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=run) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({"latencies": latencies, "errors": errors[0]})
+
+
+def run_load(port, path, connections, client_processes, seconds):
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0
+    per_process = max(1, connections // client_processes)
+    processes = [
+        multiprocessing.Process(target=client_process, args=(port, path, per_process, seconds, start_at, results))
+        for _ in range(client_processes)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for result in collected for latency in result["latencies"])
+    return {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in collected),
+        "rps": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+def serve(workers, port, cpu_affinity):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "test-key")
+    # Keep the run local: no outbound queue, no background warm-up traffic
+    env.setdefault("OUTBOUND_QUEUE_ENABLED", "false")
+    env.setdefault("SERVICE_WARMUP_ENABLED", "false")
+    command = [sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(workers),
+               "--port", str(port), "--log-level", "warning"]
+    if cpu_affinity:
+        command.append("--cpu-affinity")
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker scaling load test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--path", default="/webhook/voice")
+    parser.add_argument("--cpu-affinity", action="store_true")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    rows = []
+    for workers in args.workers:
+        port = free_port()
+        server = serve(workers, port, args.cpu_affinity)
+        try:
+            wait_until_live(port)
+            # One warm-up pass so every worker has built its services
+            run_load(port, args.path, args.connections, args.client_processes, 1.0)
+            result = run_load(port, args.path, args.connections, args.client_processes, args.seconds)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        rows.append({"workers": workers, **result})
+
+    base = rows[0]["rps"] / rows[0]["workers"] if rows and rows[0]["rps"] else 0.0
+    for row in rows:
+        row["efficiency"] = row["rps"] / (base * row["workers"]) if base else 0.0
+
+    if args.json:
+        print(json.dumps({"cpus": cpus, "results": rows}, indent=2))
+        return
+
+    print(f"{cpus} CPUs, {args.connections} connections from {args.client_processes} load processes, "
+          f"{args.seconds:g}s per run, POST {args.path}\n")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'efficiency':>11}")
+    for row in rows:
+        print(f"{row['workers']:>7} {row['rps']:>9.0f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['errors']:>7} {row['efficiency']:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
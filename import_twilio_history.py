@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Backfill the local message store from Twilio's message log.
+
+Run once after enabling the message store; after that every inbound and
+outbound message is recorded as it happens. Messages are keyed by SID, so
+re-running (or overlapping with live traffic) never creates duplicates.
+
+    python import_twilio_history.py --days 90
+    python import_twilio_history.py --number +15555550100 --db messages.db
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+from twilio.rest import Client
+
+from python_sms_responder.message_store import MessageStore, from_twilio_message
+
+
+def stream_messages(client, number, since, page_size):
+    if number:
+        # Both directions for one of our numbers
+        yield from client.messages.stream(to=number, date_sent_after=since, page_size=page_size)
+        yield from client.messages.stream(from_=number, date_sent_after=since, page_size=page_size)
+    else:
+        yield from client.messages.stream(date_sent_after=since, page_size=page_size)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import Twilio SMS history into the local message store")
+    parser.add_argument("--db", default=os.getenv("MESSAGE_STORE_PATH", "messages.db"))
+    parser.add_argument("--days", type=int, default=365, help="How far back to import")
+    parser.add_argument("--number", default=os.getenv("TWILIO_PHONE_NUMBER"),
+                        help="Only messages to/from this number (default TWILIO_PHONE_NUMBER; '' for all)")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+    if not account_sid or not auth_token:
+        print("❌ TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN are required")
+        sys.exit(1)
+
+    client = Client(account_sid, auth_token)
+    store = MessageStore(args.db)
+    since = datetime.now(timezone.utc) - timedelta(days=args.days)
+
+    print(f"Importing messages since {since:%Y-%m-%d} into {args.db}...")
+    start = time.perf_counter()
+    seen = imported = 0
+    batch = []
+    for message in stream_messages(client, args.number, since, args.page_size):
+        batch.append(from_twilio_message(message))
+        seen += 1
+        if len(batch) >= args.batch_size:
+            imported += store.record_many(batch)
+            batch = []
+            print(f"  {seen} fetched, {imported} new")
+    if batch:
+        imported += store.record_many(batch)
+
+    print(f"✅ Fetched {seen} messages, imported {imported} new in {time.perf_counter() - start:.1f}s")
+    print(store.get_stats())
+
+
+if __name__ == "__main__":
+    main()
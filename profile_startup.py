@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Report where the FastAPI app's cold start goes.
+
+Measures importing python_sms_responder.main in fresh interpreters against
+importing FastAPI alone, lists the app's direct imports and the packages with
+the most import time, and flags heavy clients (openai, twilio.rest, psycopg2,
+numpy, httpx) loaded at import instead of on first use. With --services it
+also constructs each service, as the background warm-up does, and reports
+how long each took.
+
+    python profile_startup.py
+    python profile_startup.py --services --budget-ms 400
+"""
+
+import os
+import sys
+import argparse
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.startup_profile import cold_start_report, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI cold start profile")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh-interpreter runs per measurement")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--services", action="store_true", help="Also time constructing each service")
+    parser.add_argument("--budget-ms", type=float, help="Exit non-zero if the app overhead exceeds this")
+    args = parser.parse_args()
+
+    report = cold_start_report(repeats=args.repeats, top=args.top, cwd=os.path.dirname(os.path.abspath(__file__)))
+    print(format_report(report))
+
+    if args.services:
+        from python_sms_responder import main as app_module
+        for getter in (app_module.get_sms_service, app_module.get_llm_service,
+                       app_module.get_voice_service, app_module.get_db_service):
+            getter()
+        print("\nService construction on first use (s):")
+        for label, seconds in app_module.startup_timings.items():
+            print(f"  {label:<45} {seconds:>8.3f}")
+
+    if args.budget_ms is not None and report["overhead_seconds"] * 1000 > args.budget_ms:
+        print(f"\nApp overhead {report['overhead_seconds'] * 1000:.0f} ms exceeds the {args.budget_ms:g} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Business knowledge for LLM prompts.
+
+Loads static salon information from the business knowledge JSON file and the
+``business_knowledge`` / ``business_knowledge_categories`` tables, and indexes
+every snippet so a prompt only carries the knowledge relevant to the message.
+"""
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import psycopg2.extras
+
+from .knowledge_index import KnowledgeIndex
+from .real_time_connector import RealTimeDataConnector
+
+
+class BusinessKnowledge:
+    """Static and database-backed salon knowledge with top-k retrieval"""
+
+    def __init__(
+        self,
+        knowledge_file: Optional[str] = None,
+        real_time_connector: Optional[RealTimeDataConnector] = None,
+        use_dense: Optional[bool] = None
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.knowledge_file = knowledge_file or os.getenv("BUSINESS_KNOWLEDGE_FILE", "business_knowledge.json")
+        self.real_time_connector = real_time_connector or RealTimeDataConnector()
+
+        if use_dense is None:
+            use_dense = os.getenv("BUSINESS_KNOWLEDGE_DENSE", "false").lower() in ("1", "true", "yes")
+        self.index = KnowledgeIndex(use_dense=use_dense)
+        self.refresh_interval = float(os.getenv("BUSINESS_KNOWLEDGE_REFRESH_SECONDS", "60"))
+
+        self.business_info: Dict[str, Any] = {}
+        self.services: Dict[str, List[Dict]] = {}
+        self.faqs: List[Dict] = []
+        self.promotions: List[Dict] = []
+        self.staff: List[Dict] = []
+
+        self._last_updated_at = datetime(1970, 1, 1)
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop_refresh = threading.Event()
+
+        self._load_knowledge_file()
+
+    @property
+    def version(self) -> int:
+        """Changes whenever indexed knowledge changes"""
+        return self.index.version
+
+    def _resolve_knowledge_file(self) -> Optional[str]:
+        """Find the knowledge file, falling back to the copy next to this module"""
+        candidates = [self.knowledge_file]
+        if not os.path.isabs(self.knowledge_file):
+            candidates.append(os.path.join(os.path.dirname(__file__), self.knowledge_file))
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load_knowledge_file(self):
+        """Load static business information from the JSON knowledge file"""
+        path = self._resolve_knowledge_file()
+        if not path:
+            self.logger.warning("Business knowledge file not found: %s", self.knowledge_file)
+            return
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.error("Error loading business knowledge file %s: %s", path, e)
+            return
+
+        self.business_info = data.get("business", {})
+        self.services = data.get("services", {})
+        self.faqs = data.get("faqs", [])
+        self.promotions = data.get("promotions", [])
+        self.staff = data.get("staff", [])
+
+        with self._lock:
+            for i, faq in enumerate(self.faqs):
+                self.index.upsert(f"file:faq:{i}", faq["question"], faq["answer"], category="faq")
+            for category, service_list in self.services.items():
+                for i, service in enumerate(service_list):
+                    self.index.upsert(
+                        f"file:service:{category}:{i}",
+                        service["name"],
+                        f"{service.get('price', '')} ({service.get('duration', '')} min). "
+                        f"{service.get('description', '')}",
+                        category=category
+                    )
+            for i, promo in enumerate(self.promotions):
+                content = promo.get("description", "")
+                if promo.get("code"):
+                    content += f" Use code {promo['code']}."
+                self.index.upsert(f"file:promotion:{i}", promo["title"], content, category="promotions")
+            for i, member in enumerate(self.staff):
+                self.index.upsert(
+                    f"file:staff:{i}",
+                    f"{member['name']}, {member.get('title', '')}",
+                    f"Specialties: {', '.join(member.get('specialties', []))}. {member.get('bio', '')}",
+                    category="staff"
+                )
+            if self.business_info.get("hours"):
+                hours = ", ".join(f"{day.capitalize()} {value}" for day, value in self.business_info["hours"].items())
+                self.index.upsert("file:hours", "Business hours", hours, keywords="open close hours time", category="hours")
+            if self.business_info.get("address"):
+                self.index.upsert(
+                    "file:location", "Location",
+                    f"{self.business_info['address']}. Phone: {self.business_info.get('phone', '')}",
+                    keywords="address located location directions where", category="location"
+                )
+
+    def upsert_rows(self, rows: List[Dict[str, Any]]):
+        """
+        Index rows from the business_knowledge table
+
+        Args:
+            rows: Row dicts with id, title, content, keywords, category, priority and active
+        """
+        with self._lock:
+            for row in rows:
+                doc_id = f"db:{row['id']}"
+                if row.get("active") is False:
+                    self.index.remove(doc_id)
+                    continue
+                self.index.upsert(
+                    doc_id,
+                    row["title"],
+                    row["content"],
+                    keywords=(row.get("keywords") or "").replace(",", " "),
+                    category=row.get("category_name") or row.get("category") or "",
+                    priority=row.get("priority") or 1
+                )
+                updated_at = row.get("updated_at")
+                if updated_at and updated_at > self._last_updated_at:
+                    self._last_updated_at = updated_at
+
+    def remove_missing_rows(self, active_ids: List[int]):
+        """Drop indexed database rows that no longer exist or are inactive"""
+        keep = {f"db:{row_id}" for row_id in active_ids}
+        with self._lock:
+            for doc_id in [d for d in self.index.documents if d.startswith("db:") and d not in keep]:
+                self.index.remove(doc_id)
+
+    def refresh(self) -> bool:
+        """
+        Incrementally sync the index with the business_knowledge tables
+
+        Only rows updated since the last refresh are re-indexed; deleted or
+        deactivated rows are removed.
+
+        Returns:
+            bool: True if the database was reachable
+        """
+        try:
+            conn = self.real_time_connector._get_connection()
+            cursor = self.real_time_connector._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
+
+            cursor.execute("""
+                SELECT
+                    bk.id,
+                    bk.category,
+                    bk.title,
+                    bk.content,
+                    bk.keywords,
+                    bk.priority,
+                    bk.active,
+                    GREATEST(COALESCE(bk.updated_at, bk.created_at), COALESCE(c.updated_at, c.created_at)) AS updated_at,
+                    c.name AS category_name
+                FROM business_knowledge bk
+                LEFT JOIN business_knowledge_categories c ON c.id = bk.category_id
+                WHERE COALESCE(bk.updated_at, bk.created_at) >= %s
+                   OR COALESCE(c.updated_at, c.created_at) >= %s
+                ORDER BY updated_at
+            """, (self._last_updated_at, self._last_updated_at))
+            changed_rows = cursor.fetchall()
+
+            cursor.execute("SELECT id FROM business_knowledge WHERE active = true")
+            active_ids = [row["id"] for row in cursor.fetchall()]
+
+            if changed_rows:
+                self.upsert_rows([dict(row) for row in changed_rows])
+            self.remove_missing_rows(active_ids)
+
+            if changed_rows:
+                self.logger.info("Re-indexed %s business knowledge rows", len(changed_rows))
+            return True
+
+        except Exception as e:
+            self.logger.error("Error refreshing business knowledge: %s", e)
+            return False
+        finally:
+            if 'conn' in locals():
+                conn.close()
+
+    def start_auto_refresh(self):
+        """Refresh from the database in a background thread every refresh interval"""
+        if self._refresh_thread is not None:
+            return
+
+        def refresh_loop():
+            while not self._stop_refresh.is_set():
+                self.refresh()
+                self._stop_refresh.wait(self.refresh_interval)
+
+        self._refresh_thread = threading.Thread(target=refresh_loop, name="business-knowledge-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_auto_refresh(self):
+        self._stop_refresh.set()
+        self._refresh_thread = None
+
+    def search(self, message: str, k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Get the knowledge snippets most relevant to a message
+
+        Args:
+            message: Incoming message
+            k: Maximum number of snippets
+
+        Returns:
+            list: Snippets (id, title, content, category, score), best first
+        """
+        # The refresh thread mutates the index's dicts under the same lock
+        with self._lock:
+            return self.index.search(message, k=k)
+
+    def get_relevant_knowledge(self, message: str, k: int = 3) -> str:
+        """
+        Format the most relevant snippets for inclusion in a prompt
+
+        Returns:
+            str: One line per snippet, or an empty string if nothing matched
+        """
+        return "\n".join(
+            f"- {snippet['title']}: {snippet['content']}" for snippet in self.search(message, k)
+        )
+
+    def get_static_facts(self) -> str:
+        """
+        Format the salon facts that never vary between requests
+
+        Only data from the knowledge file is used, so the text stays
+        byte-identical for the lifetime of the process.
+        """
+        if not self.business_info:
+            return ""
+
+        facts = [f"Salon facts for {self.business_info.get('name', 'the salon')}:"]
+        if self.business_info.get("address"):
+            facts.append(f"- Address: {self.business_info['address']}")
+        if self.business_info.get("phone"):
+            facts.append(f"- Phone: {self.business_info['phone']}")
+        if self.business_info.get("website"):
+            facts.append(f"- Website: {self.business_info['website']}")
+        if self.business_info.get("hours"):
+            hours = ", ".join(f"{day.capitalize()} {value}" for day, value in self.business_info["hours"].items())
+            facts.append(f"- Hours: {hours}")
+        return "\n".join(facts)
+
+    def get_knowledge_for_llm(self) -> str:
+        """Format all business knowledge and real-time data for LLM prompts"""
+        knowledge = []
+
+        if self.business_info:
+            knowledge.append(f"# {self.business_info.get('name', 'Salon')} Information")
+            knowledge.append(f"Address: {self.business_info.get('address', '')}")
+            knowledge.append(f"Phone: {self.business_info.get('phone', '')}")
+            if self.business_info.get("hours"):
+                knowledge.append("\n## Business Hours:")
+                for day, hours in self.business_info["hours"].items():
+                    knowledge.append(f"{day.capitalize()}: {hours}")
+
+        if self.services:
+            knowledge.append("\n# Services")
+            for category, service_list in self.services.items():
+                knowledge.append(f"\n## {category.capitalize()} Services:")
+                for service in service_list:
+                    knowledge.append(f"- {service['name']}: {service.get('price', '')} ({service.get('duration', '')} min)")
+
+        with self._lock:
+            db_snippets = [doc for doc_id, doc in self.index.documents.items() if doc_id.startswith("db:")]
+        if self.faqs or db_snippets:
+            knowledge.append("\n# Frequently Asked Questions")
+            for faq in self.faqs:
+                knowledge.append(f"Q: {faq['question']}")
+                knowledge.append(f"A: {faq['answer']}")
+            for snippet in db_snippets:
+                knowledge.append(f"- {snippet['title']}: {snippet['content']}")
+
+        if self.promotions:
+            knowledge.append("\n# Current Promotions")
+            for promo in self.promotions:
+                knowledge.append(f"- {promo['title']}: {promo.get('description', '')}")
+                if promo.get("code"):
+                    knowledge.append(f"  Use code: {promo['code']}")
+
+        if self.real_time_connector:
+            try:
+                available_slots = self.real_time_connector.get_available_slots()
+                if available_slots:
+                    knowledge.append("\n# Available Appointment Slots")
+                    for date_str, slots in available_slots.items():
+                        times = ", ".join(slot["formatted_time"] for slot in slots[:8])
+                        knowledge.append(f"{date_str}: {times or 'Fully booked'}")
+
+                staff_availability = self.real_time_connector.get_staff_availability()
+                if staff_availability:
+                    knowledge.append("\n# Staff Availability")
+                    for staff_name, days in staff_availability.items():
+                        open_days = [date_str for date_str, slots in days.items() if slots]
+                        knowledge.append(f"{staff_name}: {', '.join(open_days) or 'No availability'}")
+            except Exception as e:
+                self.logger.error("Error getting real-time data for LLM: %s", e)
+
+        return "\n".join(knowledge)
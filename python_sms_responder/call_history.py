@@ -0,0 +1,199 @@
+"""
+Bounded per-call conversation history for voice calls.
+
+Each call keeps its messages in a fixed-capacity ring buffer: appends are O(1)
+and overwrite the oldest message once the buffer is full, and the most recent
+messages are iterated in place instead of being sliced into new lists on
+every turn. Calls whose status callback never arrives would otherwise keep
+their history forever, so calls idle for longer than the TTL are swept
+periodically.
+"""
+import sys
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-capacity buffer that overwrites its oldest item when full"""
+
+    __slots__ = ("capacity", "_items", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._start = 0
+        self._size = 0
+
+    def append(self, item: Any):
+        end = (self._start + self._size) % self.capacity
+        self._items[end] = item
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def latest(self, count: int) -> Iterator[Any]:
+        """Iterate over the newest count items, oldest first, without copying"""
+        count = min(count, self._size)
+        first = self._start + self._size - count
+        for offset in range(count):
+            yield self._items[(first + offset) % self.capacity]
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.latest(self._size)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ring buffer index out of range")
+        return self._items[(self._start + index) % self.capacity]
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._size = 0
+
+
+class _CallEntry:
+    __slots__ = ("messages", "user_turns", "last_activity")
+
+    def __init__(self, capacity: int, now: float):
+        self.messages = RingBuffer(capacity)
+        self.user_turns = 0
+        self.last_activity = now
+
+
+class CallHistoryStore:
+    """Conversation history per call SID, bounded in size and lifetime"""
+
+    def __init__(
+        self,
+        capacity: int = 20,
+        idle_ttl: float = 900.0,
+        sweep_interval: float = 60.0,
+        on_expire: Optional[Callable[[str], None]] = None,
+        time_func: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            capacity: Messages kept per call; older ones are overwritten
+            idle_ttl: Seconds without activity after which a call is dropped
+            sweep_interval: Minimum seconds between automatic sweeps on append
+            on_expire: Called with the call SID of each call dropped by a sweep
+        """
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.on_expire = on_expire
+        self._time = time_func
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _CallEntry] = {}
+        self._last_sweep = time_func()
+        self.stats = {"appended": 0, "overwritten": 0, "expired": 0, "sweeps": 0}
+
+    def append(self, call_sid: str, role: str, content: str):
+        """Add a message to a call, starting its history if needed"""
+        now = self._time()
+        with self._lock:
+            entry = self._calls.get(call_sid)
+            if entry is None:
+                entry = self._calls[call_sid] = _CallEntry(self.capacity, now)
+            if len(entry.messages) == self.capacity:
+                self.stats["overwritten"] += 1
+            entry.messages.append({"role": role, "content": content})
+            if role == "user":
+                entry.user_turns += 1
+            entry.last_activity = now
+            self.stats["appended"] += 1
+            sweep_due = now - self._last_sweep >= self.sweep_interval
+
+        if sweep_due:
+            self.sweep()
+
+    def recent(self, call_sid: str, count: int) -> Iterator[Dict[str, str]]:
+        """Iterate over a call's newest count messages, oldest first"""
+        entry = self._calls.get(call_sid)
+        return entry.messages.latest(count) if entry else iter(())
+
+    def user_turns(self, call_sid: str) -> int:
+        """Number of caller utterances so far, including ones already overwritten"""
+        entry = self._calls.get(call_sid)
+        return entry.user_turns if entry else 0
+
+    def sweep(self) -> List[str]:
+        """
+        Drop calls idle for longer than the TTL
+
+        Returns:
+            list: Call SIDs that were dropped
+        """
+        now = self._time()
+        with self._lock:
+            self._last_sweep = now
+            self.stats["sweeps"] += 1
+            expired = [sid for sid, entry in self._calls.items() if now - entry.last_activity > self.idle_ttl]
+            for call_sid in expired:
+                del self._calls[call_sid]
+            self.stats["expired"] += len(expired)
+
+        if expired:
+            logger.info("Swept %s idle call histories", len(expired))
+        if self.on_expire:
+            for call_sid in expired:
+                try:
+                    self.on_expire(call_sid)
+                except Exception as e:
+                    logger.error("Error expiring call %s: %s", call_sid, e)
+        return expired
+
+    def get(self, call_sid: str, default=None):
+        entry = self._calls.get(call_sid)
+        return entry.messages if entry else default
+
+    def __getitem__(self, call_sid: str) -> RingBuffer:
+        return self._calls[call_sid].messages
+
+    def __contains__(self, call_sid: str) -> bool:
+        return call_sid in self._calls
+
+    def __delitem__(self, call_sid: str):
+        with self._lock:
+            del self._calls[call_sid]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Occupancy and approximate memory of the stored histories"""
+        now = self._time()
+        with self._lock:
+            entries = list(self._calls.values())
+            stats = dict(self.stats)
+
+        messages = sum(len(entry.messages) for entry in entries)
+        memory = sys.getsizeof(self._calls)
+        for entry in entries:
+            memory += sys.getsizeof(entry) + sys.getsizeof(entry.messages) + sys.getsizeof(entry.messages._items)
+            for message in entry.messages:
+                memory += sys.getsizeof(message) + sys.getsizeof(message["content"])
+
+        return {
+            "active_calls": len(entries),
+            "messages": messages,
+            "capacity_per_call": self.capacity,
+            "occupancy": round(messages / (len(entries) * self.capacity), 3) if entries else 0.0,
+            "memory_bytes": memory,
+            "oldest_idle_seconds": round(max((now - entry.last_activity for entry in entries), default=0.0), 1),
+            "idle_ttl_seconds": self.idle_ttl,
+            **stats,
+        }
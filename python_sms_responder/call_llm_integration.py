@@ -12,8 +12,8 @@ import asyncio
 from typing import Dict, Any
 import logging
 
-# Make sure we can import from the current directory
-sys.path.insert(0, os.path.dirname(__file__))
+# Make sure the python_sms_responder package is importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Configure logging to file for debugging
 logging.basicConfig(
@@ -33,7 +33,7 @@ async def main():
         webhook_data = json.loads(webhook_data_str)
         
         # Import LLM integration (import here to avoid circular imports)
-        from llm_integration import get_llm_integration
+        from python_sms_responder.llm_integration import get_llm_integration
         
         # Get LLM integration instance
         llm_integration = get_llm_integration()
@@ -0,0 +1,262 @@
+"""
+Circuit breaker and request hedging for LLM calls.
+
+When the model provider slows down or fails, waiting out each request's
+timeout ties up worker threads while callers still end up with canned text.
+The breaker tracks recent call latency against an SLO and opens after repeated
+failures or too many slow calls; while it is open, callers skip the provider
+and answer from keyword fallbacks straight away. After a cool-down a single
+trial call is let through (half-open) to decide whether to close again.
+
+Breakers are shared per provider through get_circuit_breaker(), so SMS and
+voice traffic trip the same circuit.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Optional, TypeVar
+
+from .metrics import EXTERNAL_CALL_ERRORS, EXTERNAL_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """Failure and latency-SLO circuit breaker"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        latency_slo: float = 5.0,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 50,
+        min_calls: int = 10,
+        trial_timeout: Optional[float] = None,
+        time_func: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            name: Name reported in stats
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds to stay open before a half-open trial call
+            latency_slo: Calls slower than this many seconds count as slow
+            slow_call_rate_threshold: Share of slow calls in the window that opens the circuit
+            window_size: Number of recent calls used for latency statistics
+            min_calls: Calls needed in the window before the slow-call rate is used
+            trial_timeout: Seconds before a half-open trial call that never reported
+                back is given up and another allowed; defaults to recovery_timeout
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.latency_slo = latency_slo
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.trial_timeout = trial_timeout if trial_timeout is not None else recovery_timeout
+        self._time = time_func
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.latencies: deque = deque(maxlen=window_size)
+        self._trial_in_flight = False
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "rejected": 0,
+            "trips": 0,
+        }
+        self.last_trip_reason: Optional[str] = None
+
+        # Every call through the breaker is an external API call; for streamed
+        # voice replies the latency recorded is the time to the first sentence
+        self._call_seconds = EXTERNAL_CALL_SECONDS.labels(name, "completion")
+        self._call_errors = EXTERNAL_CALL_ERRORS.labels(name, "completion")
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the provider now"""
+        with self._lock:
+            if self.state == OPEN and self._time() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                logger.info("Circuit %s half-open, allowing a trial call", self.name)
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                now = self._time()
+                if self._trial_in_flight and now - self._trial_started >= self.trial_timeout:
+                    # The trial's caller never recorded a result; don't wait on it forever
+                    logger.warning("Circuit %s trial call did not report back, allowing another", self.name)
+                    self._trial_in_flight = False
+                if not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    self._trial_started = now
+                    return True
+
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self, latency: float):
+        """Record a completed call and its latency in seconds"""
+        self._call_seconds.observe(latency)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["successes"] += 1
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            slow = latency > self.latency_slo
+            if slow:
+                self.stats["slow_calls"] += 1
+
+            if self.state == HALF_OPEN:
+                if slow:
+                    self._trip(f"trial call took {latency:.2f}s")
+                else:
+                    self.state = CLOSED
+                    self.latencies.clear()
+                    logger.info("Circuit %s closed", self.name)
+            elif self.state == CLOSED and len(self.latencies) >= self.min_calls:
+                slow_rate = sum(1 for value in self.latencies if value > self.latency_slo) / len(self.latencies)
+                if slow_rate >= self.slow_call_rate_threshold:
+                    self._trip(f"{slow_rate:.0%} of calls slower than {self.latency_slo}s")
+
+    def record_failure(self, latency: Optional[float] = None):
+        """Record a failed or timed-out call"""
+        self._call_errors.inc()
+        if latency is not None:
+            self._call_seconds.observe(latency)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            if latency is not None:
+                self.latencies.append(latency)
+
+            if self.state == HALF_OPEN:
+                self._trip("trial call failed")
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._trip(f"{self.consecutive_failures} consecutive failures")
+
+    def _trip(self, reason: str):
+        self.state = OPEN
+        self.opened_at = self._time()
+        self._trial_in_flight = False
+        self.stats["trips"] += 1
+        self.last_trip_reason = reason
+        logger.warning("Circuit %s opened: %s", self.name, reason)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Latency percentile over the recent window, in seconds"""
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * fraction))]
+
+    def call(self, func: Callable[[], T]) -> T:
+        """
+        Run func through the breaker
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            self.record_failure(time.perf_counter() - start)
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "state": self.state,
+            **self.stats,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_slo_seconds": self.latency_slo,
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "last_trip_reason": self.last_trip_reason,
+        }
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+def hedged_call(primary: Callable[[], T], hedge: Callable[[], T], hedge_after: float) -> T:
+    """
+    Run primary, and also start hedge if primary has not finished after hedge_after seconds
+
+    Returns the first successful result. The slower call is left to finish in
+    the background and its result is discarded.
+    """
+    primary_future = _hedge_executor.submit(primary)
+    done, _ = wait([primary_future], timeout=hedge_after)
+    if done and primary_future.exception() is None:
+        return primary_future.result()
+
+    logger.info("Hedging LLM call after %.2fs", hedge_after)
+    futures = {_hedge_executor.submit(hedge)}
+    if not done:
+        futures.add(primary_future)
+
+    last_error = primary_future.exception() if done else None
+    while futures:
+        finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            if future.exception() is None:
+                return future.result()
+            last_error = future.exception()
+    raise last_error
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str = "openai") -> CircuitBreaker:
+    """Get the process-wide breaker for a provider, creating it from the environment"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+                recovery_timeout=float(os.getenv("LLM_BREAKER_RECOVERY_SECONDS", "30")),
+                latency_slo=float(os.getenv("LLM_LATENCY_SLO_SECONDS", "5")),
+                slow_call_rate_threshold=float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.5")),
+                trial_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "10")),
+            )
+        return _breakers[name]
+
+
+def get_all_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every breaker created in this process"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.get_stats() for breaker in breakers}
@@ -3,6 +3,8 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from .models import ClientInfo, AppointmentInfo
+from .conversation_store import create_conversation_store
+from .tracing import traced
 
 class ConversationState:
     """Represents the state of a conversation"""
@@ -15,6 +17,7 @@ class ConversationState:
         self.selected_time = None
         self.client_info = None
         self.temp_data = {}
+        self.message_count = 0
         self.created_at = datetime.now()
         self.last_activity = datetime.now()
     
@@ -28,6 +31,7 @@ class ConversationState:
             "selected_time": self.selected_time,
             "client_info": self.client_info.dict() if self.client_info else None,
             "temp_data": self.temp_data,
+            "message_count": self.message_count,
             "created_at": self.created_at.isoformat(),
             "last_activity": self.last_activity.isoformat()
         }
@@ -41,6 +45,7 @@ class ConversationState:
         state.selected_date = data["selected_date"]
         state.selected_time = data["selected_time"]
         state.temp_data = data.get("temp_data", {})
+        state.message_count = data.get("message_count", 0)
         state.created_at = datetime.fromisoformat(data["created_at"])
         state.last_activity = datetime.fromisoformat(data["last_activity"])
         
@@ -53,7 +58,9 @@ class ConversationManager:
     """Manages conversation state and flow for appointment booking"""
     
     def __init__(self):
-        self.conversations: Dict[str, ConversationState] = {}
+        # In memory, or shared by all workers (CONVERSATION_STORE_BACKEND); shared stores
+        # return copies, so a changed state is written back with _save
+        self.conversations = create_conversation_store(ConversationState.from_dict)
         self.logger = logging.getLogger(__name__)
         
         # Available services
@@ -71,12 +78,18 @@ class ConversationManager:
     def get_conversation(self, phone_number: str) -> ConversationState:
         """Get or create conversation state for a phone number"""
         if phone_number not in self.conversations:
-            self.conversations[phone_number] = ConversationState(phone_number)
+            state = ConversationState(phone_number)
         else:
             # Update last activity
-            self.conversations[phone_number].last_activity = datetime.now()
+            state = self.conversations[phone_number]
+            state.last_activity = datetime.now()
         
-        return self.conversations[phone_number]
+        self._save(state)
+        return state
+    
+    def _save(self, state: ConversationState):
+        """Write a state back to the conversation store"""
+        self.conversations[state.phone_number] = state
     
     def update_conversation(self, phone_number: str, **kwargs) -> ConversationState:
         """Update conversation state"""
@@ -85,20 +98,24 @@ class ConversationManager:
             if hasattr(state, key):
                 setattr(state, key, value)
         state.last_activity = datetime.now()
+        self._save(state)
         return state
     
+    @traced("conversation.process_message")
     def process_message(self, phone_number: str, message: str, client_info: Optional[ClientInfo] = None) -> Dict[str, Any]:
         """
         Process incoming message and return appropriate response
         """
         state = self.get_conversation(phone_number)
         
+        state.message_count += 1
+        
         # Update client info if provided
         if client_info:
             state.client_info = client_info
         
         # Log current state for debugging
-        self.logger.info(f"Processing message for {phone_number}: '{message}' at step '{state.step}'")
+        self.logger.debug("Processing message", extra={"phone": phone_number, "body": message, "step": state.step})
         
         # Process based on current step
         if state.step == "greeting":
@@ -113,9 +130,13 @@ class ConversationManager:
             result = self._handle_confirmation(state, message)
         else:
             result = self._handle_greeting(state, message)
+        self._save(state)
         
-        # Log result for debugging
-        self.logger.info(f"Conversation result for {phone_number}: {result}")
+        # Log result for debugging; the whole result is only built into a message when DEBUG is on
+        self.logger.debug(
+            "Conversation result: %s", result,
+            extra={"phone": phone_number, "step": result.get("step"), "requires_booking": result.get("requires_booking")}
+        )
         
         return result
     
@@ -180,10 +201,10 @@ class ConversationManager:
             return {
                 "response": f"Perfect! You've selected {service_info['name']} ({service_info['price']}).\n\n" +
                            "What day would you like to book? You can say:\n" +
-                           "• Tomorrow\n" +
-                           "• Next Tuesday\n" +
-                           "• March 15th\n" +
-                           "• Or any specific date",
+                           "- Tomorrow\n" +
+                           "- Next Tuesday\n" +
+                           "- March 15th\n" +
+                           "- Or any specific date",
                 "step": "time_selection",
                 "selected_service": selected_service,
                 "requires_booking": True
@@ -279,7 +300,7 @@ class ConversationManager:
         """Format available services for display"""
         services_text = ""
         for key, service in self.services.items():
-            services_text += f"• {service['name']} - {service['price']}\n"
+            services_text += f"- {service['name']} - {service['price']}\n"
         return services_text.strip()
     
     def clear_conversation(self, phone_number: str):
@@ -299,5 +320,6 @@ class ConversationManager:
             "selected_date": state.selected_date,
             "selected_time": state.selected_time,
             "client_info": state.client_info.dict() if state.client_info else None,
-            "temp_data": state.temp_data
+            "temp_data": state.temp_data,
+            "message_count": state.message_count
         } 
\ No newline at end of file
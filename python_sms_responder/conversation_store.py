@@ -0,0 +1,191 @@
+"""
+Shared SMS booking conversation state.
+
+ConversationManager keeps one ConversationState per phone number. In a
+single process a dict is enough; with several workers, a customer's next
+text can reach a different worker than the last one, so the state has to
+live where every worker can read it:
+
+- SQLiteConversationStore: one file shared by the workers on a host
+- RedisConversationStore: shared across hosts
+
+Both stores have the dict operations ConversationManager uses (in, [], []=,
+del, len). Reads return a fresh copy, so the manager writes a state back
+after changing it. Conversations idle for longer than the TTL expire.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_conversations (
+    phone_number TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sms_conversations_expires ON sms_conversations (expires_at);
+"""
+
+
+class SQLiteConversationStore:
+    """Conversation states in a SQLite file shared by the workers on one host"""
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        decode: Callable[[Dict[str, Any]], Any],
+        path: str = "conversations.db",
+        idle_ttl: float = 86400.0,
+        time_func: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            decode: Builds a state from its to_dict() form (ConversationState.from_dict)
+            path: SQLite database file (":memory:" for tests)
+            idle_ttl: Seconds without a write after which a conversation expires
+            time_func: Wall clock shared by all workers
+        """
+        self.decode = decode
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._time = time_func
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _load(self, phone_number: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sms_conversations WHERE phone_number = ? AND expires_at > ?",
+                (phone_number, self._time())
+            ).fetchone()
+        return self.decode(json.loads(row[0])) if row else None
+
+    def __contains__(self, phone_number: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sms_conversations WHERE phone_number = ? AND expires_at > ?",
+                (phone_number, self._time())
+            ).fetchone()
+        return row is not None
+
+    def __getitem__(self, phone_number: str):
+        state = self._load(phone_number)
+        if state is None:
+            raise KeyError(phone_number)
+        return state
+
+    def __setitem__(self, phone_number: str, state):
+        now = self._time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sms_conversations (phone_number, state, expires_at) VALUES (?, ?, ?)",
+                (phone_number, json.dumps(state.to_dict(), default=str), now + self.idle_ttl)
+            )
+            # Expired rows are only invisible until something deletes them
+            self._conn.execute("DELETE FROM sms_conversations WHERE expires_at <= ?", (now,))
+
+    def __delitem__(self, phone_number: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sms_conversations WHERE phone_number = ?", (phone_number,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sms_conversations WHERE expires_at > ?", (self._time(),)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisConversationStore:
+    """Conversation states in Redis, one key per phone number with a TTL"""
+
+    name = "redis"
+
+    def __init__(
+        self,
+        decode: Callable[[Dict[str, Any]], Any],
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "sms:conversation:",
+        idle_ttl: float = 86400.0
+    ):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("redis package is required for the redis conversation store") from e
+        self.decode = decode
+        self.prefix = prefix
+        self.idle_ttl = idle_ttl
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+
+    def __contains__(self, phone_number: str) -> bool:
+        return bool(self._client.exists(self.prefix + phone_number))
+
+    def __getitem__(self, phone_number: str):
+        raw = self._client.get(self.prefix + phone_number)
+        if raw is None:
+            raise KeyError(phone_number)
+        return self.decode(json.loads(raw))
+
+    def __setitem__(self, phone_number: str, state):
+        self._client.set(
+            self.prefix + phone_number,
+            json.dumps(state.to_dict(), default=str),
+            ex=max(1, int(self.idle_ttl))
+        )
+
+    def __delitem__(self, phone_number: str):
+        self._client.delete(self.prefix + phone_number)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+    def close(self):
+        self._client.close()
+
+
+def create_conversation_store(decode: Callable[[Dict[str, Any]], Any]):
+    """
+    Create the SMS conversation store from environment configuration
+
+    Environment:
+        CONVERSATION_STORE_BACKEND: "memory" (default, this process only), "sqlite" or "redis"
+        CONVERSATION_STORE_PATH: SQLite file for the sqlite backend (default "conversations.db")
+        REDIS_URL: Redis connection URL for the redis backend
+        CONVERSATION_IDLE_TTL_SECONDS: Idle seconds before a shared conversation expires (default 86400)
+
+    Returns:
+        A dict for the memory backend, otherwise a shared store with the same operations
+    """
+    backend_name = os.getenv("CONVERSATION_STORE_BACKEND", "memory").lower()
+    idle_ttl = float(os.getenv("CONVERSATION_IDLE_TTL_SECONDS", "86400"))
+
+    try:
+        if backend_name == "sqlite":
+            store = SQLiteConversationStore(
+                decode, os.getenv("CONVERSATION_STORE_PATH", "conversations.db"), idle_ttl
+            )
+        elif backend_name == "redis":
+            store = RedisConversationStore(decode, os.getenv("REDIS_URL", "redis://localhost:6379/0"), idle_ttl=idle_ttl)
+        else:
+            return {}
+    except Exception as e:
+        logger.warning("Shared conversation store unavailable, keeping conversations in memory: %s", e)
+        return {}
+
+    logger.info("SMS conversations stored in %s", store.name)
+    return store
@@ -1,10 +1,15 @@
 import os
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 import logging
+import threading
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from .models import ClientInfo, AppointmentInfo
+from .metrics import DB_QUERY_SECONDS, timed
+from .query_stats import InstrumentedCursor
+from .tracing import CLIENT, traced
 
 class DatabaseService:
     """Service for handling database operations"""
@@ -16,6 +21,13 @@ class DatabaseService:
             self.connection_string = self._build_connection_string()
         
         self.logger = logging.getLogger(__name__)
+        
+        # Connections are reused from a pool opened at startup (warm()) instead of
+        # paying a TCP + TLS + auth handshake per query
+        self.pool_min = int(os.getenv("DB_POOL_MIN", "1"))
+        self.pool_max = int(os.getenv("DB_POOL_MAX", "10"))
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
     
     def _build_connection_string(self) -> str:
         """Build database connection string from individual environment variables"""
@@ -27,14 +39,50 @@ class DatabaseService:
         
         return f"postgresql://{user}:{password}@{host}:{port}/{database}"
     
+    def warm(self):
+        """Open the connection pool with DB_POOL_MIN connections; raises if the database is unreachable"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.pool_min, self.pool_max, self.connection_string
+                    )
+                    self.logger.info("Database pool opened (%s-%s connections)", self.pool_min, self.pool_max)
+    
+    def close(self):
+        """Close every pooled connection"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+    
     def _get_connection(self):
-        """Get database connection"""
+        """Get a pooled database connection; hand it back with _release_connection"""
         try:
-            return psycopg2.connect(self.connection_string)
+            self.warm()
+            return self._pool.getconn()
         except Exception as e:
-            self.logger.error(f"Database connection error: {str(e)}")
+            self.logger.error("Database connection error: %s", e)
             raise
     
+    def _release_connection(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        pool = self._pool
+        if pool is not None and not pool.closed:
+            try:
+                pool.putconn(conn)
+                return
+            except psycopg2.pool.PoolError:
+                # Checked out from a pool that has since been closed and reopened
+                pass
+        conn.close()
+    
+    def _cursor(self, conn, **kwargs):
+        """A cursor whose queries are timed and counted by fingerprint (see query_stats)"""
+        return InstrumentedCursor(conn.cursor(**kwargs), "database")
+    
+    @traced("db.get_client_by_phone", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("database", "get_client_by_phone"))
     async def get_client_by_phone(self, phone_number: str) -> Optional[ClientInfo]:
         """
         Get client information by phone number
@@ -47,7 +95,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Clean phone number for comparison
             clean_phone = self._clean_phone_number(phone_number)
@@ -97,12 +145,14 @@ class DatabaseService:
             return None
             
         except Exception as e:
-            self.logger.error(f"Error getting client by phone: {str(e)}")
+            self.logger.error("Error getting client by phone: %s", e)
             return None
         finally:
             if 'conn' in locals():
-                conn.close()
+                self._release_connection(conn)
     
+    @traced("db.get_upcoming_appointments", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("database", "get_upcoming_appointments"))
     async def _get_upcoming_appointments(self, client_id: int) -> List[AppointmentInfo]:
         """
         Get upcoming appointments for a client
@@ -115,7 +165,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             query = """
                 SELECT 
@@ -150,12 +200,14 @@ class DatabaseService:
             return appointments
             
         except Exception as e:
-            self.logger.error(f"Error getting upcoming appointments: {str(e)}")
+            self.logger.error("Error getting upcoming appointments: %s", e)
             return []
         finally:
             if 'conn' in locals():
-                conn.close()
+                self._release_connection(conn)
     
+    @traced("db.get_available_slots", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("database", "get_available_slots"))
     async def get_available_slots(self, date: datetime, service: str = None) -> List[Dict[str, Any]]:
         """
         Get available appointment slots for a given date
@@ -169,7 +221,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Define business hours
             start_time = datetime.combine(date.date(), datetime.min.time().replace(hour=9))
@@ -220,12 +272,14 @@ class DatabaseService:
             return available_slots
             
         except Exception as e:
-            self.logger.error(f"Error getting available slots: {str(e)}")
+            self.logger.error("Error getting available slots: %s", e)
             return []
         finally:
             if 'conn' in locals():
-                conn.close()
+                self._release_connection(conn)
     
+    @traced("db.create_appointment", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("database", "create_appointment"))
     async def create_appointment(
         self, 
         client_id: int, 
@@ -249,7 +303,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor()
+            cursor = self._cursor(conn)
             
             query = """
                 INSERT INTO appointments (client_id, date, service, duration, status, notes)
@@ -261,19 +315,21 @@ class DatabaseService:
             appointment_id = cursor.fetchone()[0]
             
             conn.commit()
-            self.logger.info(f"Created appointment {appointment_id} for client {client_id}")
+            self.logger.info("Created appointment %s for client %s", appointment_id, client_id)
             
             return appointment_id
             
         except Exception as e:
-            self.logger.error(f"Error creating appointment: {str(e)}")
+            self.logger.error("Error creating appointment: %s", e)
             if 'conn' in locals():
                 conn.rollback()
             return None
         finally:
             if 'conn' in locals():
-                conn.close()
+                self._release_connection(conn)
     
+    @traced("db.update_appointment", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("database", "update_appointment"))
     async def update_appointment(
         self, 
         appointment_id: int, 
@@ -291,7 +347,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor()
+            cursor = self._cursor(conn)
             
             # Build dynamic update query
             valid_fields = ['date', 'service', 'duration', 'status', 'notes']
@@ -316,17 +372,17 @@ class DatabaseService:
             cursor.execute(query, values)
             conn.commit()
             
-            self.logger.info(f"Updated appointment {appointment_id}")
+            self.logger.info("Updated appointment %s", appointment_id)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error updating appointment: {str(e)}")
+            self.logger.error("Error updating appointment: %s", e)
             if 'conn' in locals():
                 conn.rollback()
             return False
         finally:
             if 'conn' in locals():
-                conn.close()
+                self._release_connection(conn)
     
     def _clean_phone_number(self, phone: str) -> str:
         """Clean phone number for database comparison"""
@@ -353,7 +409,7 @@ class DatabaseService:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor()
+            cursor = self._cursor(conn)
             
             # Test simple query
             cursor.execute("SELECT 1")
@@ -372,4 +428,4 @@ class DatabaseService:
             }
         finally:
             if 'conn' in locals():
-                conn.close() 
\ No newline at end of file
+                self._release_connection(conn) 
\ No newline at end of file
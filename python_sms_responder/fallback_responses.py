@@ -0,0 +1,30 @@
+"""
+Canned replies picked from keywords in the caller's message.
+
+Used whenever the LLM is unavailable: no API key, a failed call, or an open
+circuit breaker. Shared by the SMS and voice services.
+"""
+
+
+def get_keyword_fallback(message: str) -> str:
+    """
+    Pick a canned response from keywords in the message
+    """
+    message_lower = message.lower()
+
+    if any(word in message_lower for word in ['appointment', 'book', 'schedule', 'reserve']):
+        return "I'd be happy to help you book an appointment! We're open Monday through Saturday 9AM to 7PM, and Sundays 10AM to 5PM. What day and time would work best for you?"
+
+    elif any(word in message_lower for word in ['price', 'cost', 'how much', 'fee']):
+        return "Our services range from $25 for basic cuts to $150+ for complex services. Haircuts start at $25, styling is $35, and coloring starts at $75. Would you like to know more about a specific service?"
+
+    elif any(word in message_lower for word in ['hour', 'open', 'time', 'when']):
+        return "We're open Monday through Saturday from 9AM to 7PM, and Sundays from 10AM to 5PM. We accept walk-ins but recommend appointments for the best experience."
+
+    elif any(word in message_lower for word in ['cancel', 'reschedule', 'change']):
+        return "I can help you reschedule or cancel your appointment. We require 24-hour notice for cancellations. What's your name and when is your current appointment?"
+
+    elif any(word in message_lower for word in ['service', 'what do you', 'offer']):
+        return "We offer a full range of salon services including haircuts, styling, coloring, highlights, treatments, and more. Our stylists are experienced in all types of hair and styles. What service are you interested in?"
+
+    return "Thank you for your inquiry. I'm here to help with appointments, pricing, hours, and any other questions about our salon. How can I assist you today?"
@@ -0,0 +1,114 @@
+"""
+Micro-batching for LLM intent analysis.
+
+After a campaign goes out, replies arrive in bursts of thousands. Sending one
+request per message is slow and runs into rate limits. IntentBatcher collects
+the messages awaiting classification for up to max_wait_ms, or until
+max_batch_size messages are waiting. It classifies the whole batch with a
+single multi-item request and resolves each caller's future with its own
+result.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IntentBatcher:
+    """Collects concurrent classify() calls into batched requests"""
+
+    def __init__(
+        self,
+        classify_batch: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        max_batch_size: int = 20,
+        max_wait_ms: float = 50
+    ):
+        """
+        Args:
+            classify_batch: Coroutine function returning one result per message, in order
+            max_batch_size: Flush as soon as this many messages are waiting
+            max_wait_ms: Flush at most this long after the first message arrived
+        """
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.stats = {
+            "messages": 0,
+            "batches": 0,
+            "size_flushes": 0,
+            "timer_flushes": 0,
+            "errors": 0,
+            "batch_seconds": 0.0,
+        }
+
+    async def classify(self, message: str) -> Dict[str, Any]:
+        """Queue a message and wait for its intent"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, future))
+        self.stats["messages"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self.stats["size_flushes"] += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._on_timer)
+
+        return await future
+
+    async def classify_many(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Classify several messages, batched with any other waiting callers"""
+        return list(await asyncio.gather(*(self.classify(message) for message in messages)))
+
+    def _on_timer(self):
+        self._timer = None
+        if self._pending:
+            self.stats["timer_flushes"] += 1
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.stats["batches"] += 1
+        start = time.perf_counter()
+        try:
+            results = await self.classify_batch([message for message, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} intent results, got {len(results)}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Intent batch of %s failed: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.stats["batch_seconds"] += time.perf_counter() - start
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "batch_seconds": round(self.stats["batch_seconds"], 3),
+            "avg_batch_size": round(self.stats["messages"] / batches, 2) if batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,268 @@
+"""
+Local intent classifier for inbound messages.
+
+A multinomial logistic regression over hashed character n-grams and words.
+It labels routine messages (booking, cancellation, reschedule, hours, pricing,
+confirmation, opt-out) in microseconds on CPU, so only low-confidence messages
+need to go to the LLM. Messages that negate an action ("do not cancel") or
+ask for two ("cancel the cut and book a color") are left to the LLM whatever
+the model says; see mixed_or_negated().
+
+Models are stored as versioned ``.npz`` artifacts holding the weight matrix
+and a JSON metadata blob (labels, feature settings, training stats).
+"""
+import os
+import re
+import csv
+import json
+import time
+import zlib
+import logging
+from typing import Dict, List, Optional, Tuple, Any, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 1
+
+INTENT_LABELS = [
+    "booking", "cancellation", "reschedule", "hours", "pricing",
+    "confirmation", "opt_out", "other",
+]
+
+SEED_TRAINING_DATA = os.path.join(os.path.dirname(__file__), "intent_training_data.jsonl")
+
+_NORMALIZE_PATTERN = re.compile(r"[^a-z0-9$' ]+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Words that ask for an action the automations take, by intent
+ACTION_CUES = {
+    "booking": re.compile(r"\b(book|schedule|fit me in)\b"),
+    "cancellation": re.compile(r"\bcancel(l?ing|l?ed)?\b"),
+    "reschedule": re.compile(r"\b(reschedul\w*|rebook|move|change|switch|swap|push)\b"),
+    "confirmation": re.compile(r"\bconfirm(ed|ing)?\b"),
+    "opt_out": re.compile(r"\b(stop|unsubscribe|opt out)\b"),
+}
+# A negation up to three words before an action word
+_NEGATED_ACTION_PATTERN = re.compile(
+    r"\b(not|don'?t|do not|never|no need to|no longer)\b(\s+\S+){0,3}?\s+("
+    + "|".join(cue.pattern for cue in ACTION_CUES.values()) + ")"
+)
+
+# Model trained from the seed examples, shared by every service in the process
+_seed_classifier: Optional["IntentClassifier"] = None
+
+
+class IntentClassifier:
+    """Linear intent model over hashed character n-gram features"""
+
+    def __init__(
+        self,
+        labels: Optional[List[str]] = None,
+        n_features: int = 2 ** 14,
+        char_ngrams: Tuple[int, int] = (2, 4)
+    ):
+        self.labels = list(labels or INTENT_LABELS)
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+        self.weights = np.zeros((n_features, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        self.metadata: Dict[str, Any] = {}
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.metadata.get("model_version")
+
+    def featurize(self, message: str) -> np.ndarray:
+        """Map a message to the indices of its hashed features"""
+        text = _WHITESPACE_PATTERN.sub(" ", _NORMALIZE_PATTERN.sub(" ", message.lower())).strip()
+        features = [f"w:{word}" for word in text.split()]
+        padded = f" {text} "
+        low, high = self.char_ngrams
+        for n in range(low, high + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        if not features:
+            features = ["<empty>"]
+        return np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) % self.n_features for feature in features),
+            dtype=np.int64,
+            count=len(features)
+        )
+
+    def _scores(self, indices: np.ndarray) -> np.ndarray:
+        logits = self.weights[indices].sum(axis=0) / np.sqrt(len(indices)) + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def predict(self, message: str) -> Dict[str, Any]:
+        """
+        Classify a message
+
+        Returns:
+            dict: intent, confidence and the probability of every label
+        """
+        probabilities = self._scores(self.featurize(message))
+        best = int(np.argmax(probabilities))
+        return {
+            "intent": self.labels[best],
+            "confidence": float(probabilities[best]),
+            "probabilities": {label: float(p) for label, p in zip(self.labels, probabilities)}
+        }
+
+    def fit(
+        self,
+        examples: List[Tuple[str, str]],
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        seed: int = 13
+    ) -> "IntentClassifier":
+        """
+        Train with stochastic gradient descent on (message, label) pairs
+
+        Labels not already known to the classifier are added.
+        """
+        for _, label in examples:
+            if label not in self.labels:
+                self.labels.append(label)
+        self.weights = np.zeros((self.n_features, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        rows = [(self.featurize(message), label_index[label]) for message, label in examples]
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch * 0.1)
+            for i in rng.permutation(len(rows)):
+                indices, target = rows[i]
+                gradient = self._scores(indices)
+                gradient[target] -= 1.0
+                scale = rate / np.sqrt(len(indices))
+                np.add.at(self.weights, indices, -scale * gradient)
+                self.bias -= rate * gradient
+                if l2:
+                    self.weights[indices] *= (1 - rate * l2)
+
+        self.metadata.update({
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "training_examples": len(examples),
+            "epochs": epochs
+        })
+        return self
+
+    def evaluate(self, examples: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Accuracy and mean latency over labelled examples"""
+        if not examples:
+            return {"accuracy": 0.0, "examples": 0, "mean_latency_us": 0.0}
+        correct = 0
+        start = time.perf_counter()
+        for message, label in examples:
+            if self.predict(message)["intent"] == label:
+                correct += 1
+        elapsed = time.perf_counter() - start
+        return {
+            "accuracy": correct / len(examples),
+            "examples": len(examples),
+            "mean_latency_us": elapsed / len(examples) * 1e6
+        }
+
+    def save(self, path: str, model_version: Optional[str] = None):
+        """Write a versioned model artifact"""
+        self.metadata.update({
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "model_version": model_version or time.strftime("%Y%m%d%H%M%S", time.gmtime()),
+            "labels": self.labels,
+            "n_features": self.n_features,
+            "char_ngrams": list(self.char_ngrams)
+        })
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights,
+                bias=self.bias,
+                metadata=np.array(json.dumps(self.metadata))
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """Load a model artifact written by save()"""
+        with np.load(path) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            if metadata.get("format_version") != ARTIFACT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported intent model format: {metadata.get('format_version')}")
+            classifier = cls(
+                labels=metadata["labels"],
+                n_features=metadata["n_features"],
+                char_ngrams=tuple(metadata["char_ngrams"])
+            )
+            classifier.weights = artifact["weights"]
+            classifier.bias = artifact["bias"]
+        classifier.metadata = metadata
+        return classifier
+
+
+def mixed_or_negated(message: str) -> bool:
+    """
+    Whether a message negates an action or asks for more than one
+
+    A bag-of-n-grams model scores "do not cancel my appointment" much like
+    "cancel my appointment", so such messages must not be acted on locally.
+    """
+    text = _WHITESPACE_PATTERN.sub(" ", _NORMALIZE_PATTERN.sub(" ", message.lower())).strip()
+    if _NEGATED_ACTION_PATTERN.search(text):
+        return True
+    return sum(1 for cue in ACTION_CUES.values() if cue.search(text)) > 1
+
+
+def load_examples(paths: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    Load (message, intent) pairs from JSONL or CSV files
+
+    Rows need "message" and "intent" fields; rows without an intent are skipped.
+    """
+    examples = []
+    for path in paths:
+        if path.endswith(".csv"):
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            with open(path) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            if row.get("message") and row.get("intent"):
+                examples.append((row["message"], row["intent"]))
+    return examples
+
+
+def create_intent_classifier() -> Optional[IntentClassifier]:
+    """
+    Load the intent model named by INTENT_MODEL_PATH
+
+    Falls back to a model trained on the bundled seed examples when no artifact
+    is configured or it cannot be loaded.
+    """
+    model_path = os.getenv("INTENT_MODEL_PATH")
+    if model_path and os.path.exists(model_path):
+        try:
+            classifier = IntentClassifier.load(model_path)
+            logger.info("Loaded intent model %s from %s", classifier.version, model_path)
+            return classifier
+        except Exception as e:
+            logger.error("Failed to load intent model %s: %s", model_path, e)
+
+    global _seed_classifier
+    if _seed_classifier is not None:
+        return _seed_classifier
+    try:
+        classifier = IntentClassifier().fit(load_examples([SEED_TRAINING_DATA]))
+        classifier.metadata["model_version"] = "seed"
+        _seed_classifier = classifier
+        return classifier
+    except Exception as e:
+        logger.error("Failed to train seed intent model: %s", e)
+        return None
@@ -0,0 +1,247 @@
+"""
+In-memory retrieval index for business knowledge snippets.
+
+Combines a BM25 inverted index with an optional dense index of hashed n-gram
+embeddings. Documents can be added, replaced and removed one at a time, so the
+index is kept current without rebuilding it from scratch.
+"""
+import re
+import math
+import logging
+from typing import Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9$]+")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "have", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on",
+    "or", "our", "so", "that", "the", "there", "this", "to", "we", "what", "when",
+    "where", "which", "who", "will", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split into words, drop stop words and strip plural endings"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an incrementally maintained inverted index"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, tokens: List[str]):
+        """Add or replace a document"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        term_counts: Dict[str, int] = {}
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.doc_terms[doc_id] = term_counts
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: str):
+        """Remove a document if present"""
+        term_counts = self.doc_terms.pop(doc_id, None)
+        if term_counts is None:
+            return
+        for term in term_counts:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, tokens: List[str], k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Score documents against query tokens
+
+        Returns:
+            list: (doc_id, score) pairs, best first
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs or not tokens:
+            return []
+
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokens):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+class DenseIndex:
+    """Cosine-similarity index over hashed n-gram embeddings"""
+
+    def __init__(self, embedder=None):
+        import numpy as np
+        from .semantic_cache import HashedNgramEmbedder
+
+        self._np = np
+        self.embedder = embedder or HashedNgramEmbedder(n_features=2048)
+        self.vectors = np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        self.doc_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def add(self, doc_id: str, text: str):
+        vector = self.embedder.embed(text)
+        if doc_id in self.rows:
+            self.vectors[self.rows[doc_id]] = vector
+            return
+        self.rows[doc_id] = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.vectors = self._np.vstack([self.vectors, vector[self._np.newaxis, :]])
+
+    def remove(self, doc_id: str):
+        """Remove a document by moving the last row into its slot"""
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        last = len(self.doc_ids) - 1
+        if row != last:
+            moved_id = self.doc_ids[last]
+            self.vectors[row] = self.vectors[last]
+            self.doc_ids[row] = moved_id
+            self.rows[moved_id] = row
+        self.doc_ids.pop()
+        self.vectors = self.vectors[:last]
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[str, float]]:
+        if not self.doc_ids:
+            return []
+        scores = self.vectors @ self.embedder.embed(text)
+        k = min(k, len(self.doc_ids))
+        top = self._np.argpartition(-scores, k - 1)[:k]
+        return sorted(((self.doc_ids[i], float(scores[i])) for i in top), key=lambda item: -item[1])
+
+
+class KnowledgeIndex:
+    """Hybrid BM25 + optional dense retrieval over knowledge snippets"""
+
+    def __init__(self, use_dense: bool = False, dense_weight: float = 0.3):
+        self.bm25 = BM25Index()
+        self.dense = None
+        self.dense_weight = dense_weight
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+
+        if use_dense:
+            try:
+                self.dense = DenseIndex()
+            except ImportError as e:
+                logger.warning("Dense knowledge index disabled: %s", e)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def upsert(self, doc_id: str, title: str, content: str, keywords: str = "",
+               category: str = "", priority: int = 1, **extra):
+        """
+        Add or replace a knowledge snippet
+
+        Re-upserting an unchanged snippet is a no-op and leaves the version
+        alone, so a periodic refresh that re-reads rows does not invalidate
+        caches keyed on it.
+        """
+        document = {
+            "id": doc_id,
+            "title": title,
+            "content": content,
+            "keywords": keywords,
+            "category": category,
+            "priority": priority or 1,
+            **extra
+        }
+        if self.documents.get(doc_id) == document:
+            return
+
+        text = f"{title} {content}"
+        # Titles and keywords are weighted twice as heavily as body text
+        tokens = tokenize(f"{title} {title} {keywords} {keywords} {category} {content}")
+
+        self.bm25.add(doc_id, tokens)
+        if self.dense is not None:
+            self.dense.add(doc_id, text)
+
+        self.documents[doc_id] = document
+        self.version += 1
+
+    def remove(self, doc_id: str):
+        """Remove a knowledge snippet if present"""
+        if doc_id not in self.documents:
+            return
+        self.bm25.remove(doc_id)
+        if self.dense is not None:
+            self.dense.remove(doc_id)
+        del self.documents[doc_id]
+        self.version += 1
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Retrieve the snippets most relevant to a query
+
+        Args:
+            query: Incoming message
+            k: Maximum number of snippets
+            min_score: Drop snippets scoring below this value
+
+        Returns:
+            list: Snippet dicts with a "score" field, best first
+        """
+        candidates = k * 3
+        lexical = self.bm25.search(tokenize(query), candidates)
+
+        if self.dense is None:
+            combined = dict(lexical)
+        else:
+            combined: Dict[str, float] = {}
+            top_lexical = lexical[0][1] if lexical else 0.0
+            for doc_id, score in lexical:
+                combined[doc_id] = (1 - self.dense_weight) * score / top_lexical
+            for doc_id, score in self.dense.search(query, candidates):
+                combined[doc_id] = combined.get(doc_id, 0.0) + self.dense_weight * max(score, 0.0)
+
+        results = []
+        for doc_id, score in combined.items():
+            document = self.documents[doc_id]
+            # Higher priority rows win ties and near-ties
+            score *= 1 + 0.05 * (document["priority"] - 1)
+            if score > min_score:
+                results.append({**document, "score": score})
+
+        results.sort(key=lambda item: -item["score"])
+        return results[:k]
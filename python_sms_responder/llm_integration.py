@@ -10,16 +10,20 @@ import logging
 from typing import Dict, Any, Optional, Tuple
 
 # Import required components
-from business_knowledge import BusinessKnowledge
-from llm_service import LLMService
-from models import ClientInfo
-from sms_service import SMSService
-from real_time_connector import RealTimeDataConnector
+from .business_knowledge import BusinessKnowledge
+from .intent_classifier import create_intent_classifier, mixed_or_negated
+from .llm_service import LLMService
+from .models import ClientInfo
+from .sms_service import SMSService
+from .real_time_connector import RealTimeDataConnector
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("llm_integration")
 
+# Intents owned by the existing confirmation/cancellation automations
+AUTOMATION_INTENTS = {"confirmation", "cancellation", "reschedule", "opt_out"}
+
 class LLMIntegration:
     """Integration class for adding LLM capabilities to existing webhook handler"""
     
@@ -47,6 +51,9 @@ class LLMIntegration:
             logger.info("SMS service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize SMS service: {e}")
+        
+        self.intent_classifier = self.llm_service.intent_classifier if self.llm_service else create_intent_classifier()
+        self.intent_confidence_threshold = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
     
     def is_automation_message(self, message: str) -> bool:
         """
@@ -71,18 +78,30 @@ class LLMIntegration:
         # Check if it's a single-word automation command
         if message_lower in automation_keywords:
             return True
-            
+        
+        # "No, don't cancel" or "cancel the cut and book a color" need a person or the LLM
+        if mixed_or_negated(message):
+            return False
+        
         # Check for confirmation/cancellation responses
-        if any(message_lower.startswith(kw) for kw in ["confirm", "cancel", "yes", "no"]):
-            return True
+        keyword_match = any(message_lower.startswith(kw) for kw in ["confirm", "cancel", "yes", "no"])
         
         # More complex automation pattern matching
         if (len(message_lower.split()) <= 2 and  # Short messages
             any(kw in message_lower for kw in automation_keywords)):
-            return True
-            
-        # Message doesn't match automation patterns
-        return False
+            keyword_match = True
+        
+        if not keyword_match:
+            # Message doesn't match automation patterns
+            return False
+        
+        # The local intent model can only veto: a confident label outside the
+        # automations (e.g. "no, I'd like to book") sends the message to the LLM
+        if self.intent_classifier:
+            prediction = self.intent_classifier.predict(message)
+            if prediction["confidence"] >= self.intent_confidence_threshold:
+                return prediction["intent"] in AUTOMATION_INTENTS
+        return True
 
     async def get_client_info(self, phone_number: str) -> Optional[ClientInfo]:
         """
@@ -1,9 +1,24 @@
 import os
+import json
+import time
+import asyncio
 from openai import OpenAI
 import logging
-from typing import Optional, Dict, Any
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Dict, Any, List
 from .models import ClientInfo, LLMRequest, LLMResponse
 from .conversation_manager import ConversationManager
+from .response_cache import create_response_cache
+from .semantic_cache import create_semantic_cache
+from .business_knowledge import BusinessKnowledge
+from .circuit_breaker import get_circuit_breaker, hedged_call
+from .fallback_responses import get_keyword_fallback
+from .intent_classifier import create_intent_classifier, mixed_or_negated
+from .intent_batcher import IntentBatcher
+from .model_router import get_model_router
+from .message_store import INBOUND, get_message_store
+from .prompt_builder import PromptBuilder, PromptSection, StaticPrefix, TokenCounter, format_context_value
+from .tracing import CLIENT, current_span, span, traced
 
 class LLMService:
     """Service for handling LLM operations via OpenAI"""
@@ -21,11 +36,65 @@ class LLMService:
         self.max_tokens = 150
         self.temperature = 0.7
         
+        # Small model for routine messages, large model for complex ones
+        self.model_router = get_model_router()
+        self.routing_enabled = os.getenv("LLM_ROUTING_ENABLED", "true").lower() not in ("0", "false", "no")
+        
+        # Fail fast to keyword replies while the provider is failing or too slow
+        self.llm_breaker = get_circuit_breaker("openai")
+        self.request_timeout = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "10"))
+        self.hedge_model = os.getenv("LLM_HEDGE_MODEL", "")
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.5"))
+        
         # Initialize conversation manager
         self.conversation_manager = ConversationManager()
         
+        # Cache for replies to general, non-personalized questions
+        self.response_cache = create_response_cache()
+        
+        # Approved answers for paraphrased FAQs
+        self.semantic_cache = create_semantic_cache()
+        
+        # Salon knowledge retrieved per message for the prompt
+        self.knowledge_top_k = int(os.getenv("BUSINESS_KNOWLEDGE_TOP_K", "3"))
+        self.business_knowledge = BusinessKnowledge()
+        if os.getenv("DATABASE_URL") or os.getenv("DB_HOST"):
+            self.business_knowledge.start_auto_refresh()
+        
+        # Prompt assembly within a token budget
+        self.token_counter = TokenCounter(self.model)
+        self.prompt_builder = PromptBuilder(
+            token_budget=int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1200")),
+            counter=self.token_counter
+        )
+        self.last_prompt_usage: Dict[str, Any] = {}
+        
+        # Recent SMS exchange from the local message store, added as prompt context
+        self.history_context_messages = int(os.getenv("SMS_HISTORY_CONTEXT_MESSAGES", "6"))
+        
+        # Local intent model; only low-confidence messages go to the LLM
+        self.intent_classifier = create_intent_classifier()
+        self.intent_confidence_threshold = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
+        
+        # Concurrent LLM intent requests are sent as one multi-item request
+        self.intent_batching = os.getenv("INTENT_BATCHING_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.intent_batcher = IntentBatcher(
+            self._analyze_intents_with_llm,
+            max_batch_size=int(os.getenv("INTENT_BATCH_MAX_SIZE", "20")),
+            max_wait_ms=float(os.getenv("INTENT_BATCH_MAX_WAIT_MS", "50"))
+        )
+        
         # System prompt for salon context
         self.system_prompt = self._get_system_prompt()
+        self.static_prefix = self._build_static_prefix()
+    
+    def _build_static_prefix(self) -> StaticPrefix:
+        """Render the system prompt and static salon facts once, for reuse on every request"""
+        return StaticPrefix(
+            self.system_prompt,
+            self.business_knowledge.get_static_facts(),
+            self.token_counter
+        )
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for salon SMS responses"""
@@ -37,6 +106,7 @@ Key responsibilities:
 - Answer questions about salon policies and hours
 - Be friendly, professional, and concise
 - Keep responses under 160 characters when possible
+- Use plain text: no emoji, bullet symbols or curly quotes (they double SMS cost)
 - If you can't handle a request, offer to have someone call them
 
 Important guidelines:
@@ -51,6 +121,7 @@ Current salon hours: Monday-Saturday 9AM-7PM, Sunday 10AM-5PM
 Address: [Salon Address]
 Phone: [Salon Phone]"""
     
+    @traced("llm.generate_response")
     async def generate_response(
         self, 
         user_message: str, 
@@ -70,47 +141,43 @@ Phone: [Salon Phone]"""
         Returns:
             str: Generated response message
         """
+        # The conversation manager, the OpenAI client and the hedged call all
+        # block; run them off the event loop
+        return await run_in_threadpool(
+            self.generate_response_sync, user_message, client_info, phone_number, context
+        )
+    
+    def generate_response_sync(
+        self, 
+        user_message: str, 
+        client_info: Optional[ClientInfo] = None,
+        phone_number: str = "",
+        context: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Synchronous version of generate_response, which runs it in the threadpool
+        """
         try:
-            # Check if this is a booking-related conversation (synchronous call)
+            # Check if this is a booking-related conversation
             conversation_result = self.conversation_manager.process_message(
                 phone_number, user_message, client_info
             )
             
-            # Log conversation result for debugging
-            self.logger.info(f"Conversation result for {phone_number}: {conversation_result}")
-            
             # If conversation manager handled it, use that response
             if conversation_result.get("requires_booking", False):
-                self.logger.info(f"Using conversation manager response for {phone_number}")
+                self.logger.debug("Using conversation manager response", extra={"phone": phone_number})
                 return conversation_result["response"]
             
             # Otherwise, use AI for general responses
-            self.logger.info(f"Using AI response for {phone_number}")
-            prompt = self._build_prompt(user_message, client_info, phone_number, context)
-            
-            # Generate response using OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Log the interaction
-            self.logger.info(f"Generated AI response for {phone_number}: {ai_response}")
-            
-            return ai_response
+            self.logger.debug("Using AI response", extra={"phone": phone_number})
+            return self._generate_ai_reply(user_message, client_info, phone_number, context)
             
         except Exception as e:
-            self.logger.error(f"Error generating LLM response: {str(e)}")
+            self.logger.error("Error generating LLM response: %s", e)
             return "I'm sorry, I'm having trouble processing your request. Please call us directly for assistance."
     
-    def generate_response_sync(
+    @traced("llm.generate_ai_reply")
+    def _generate_ai_reply(
         self, 
         user_message: str, 
         client_info: Optional[ClientInfo] = None,
@@ -118,109 +185,281 @@ Phone: [Salon Phone]"""
         context: Optional[Dict[str, Any]] = None
     ) -> str:
         """
-        Synchronous version of generate_response for testing
+        Generate a reply with OpenAI, serving general questions from the response cache
+        
+        Args:
+            user_message: User's message
+            client_info: Client information
+            phone_number: User's phone number
+            context: Additional context
+            
+        Returns:
+            str: Generated response message
         """
+        reply_span = current_span()
+        conversation_summary = self.conversation_manager.get_conversation_summary(phone_number)
+        # Read once: it is part of the cache key and goes into the prompt
+        history_lines = self._recent_history_lines(phone_number, user_message)
+        bypass_reason = self.response_cache.bypass_reason(
+            user_message, client_info, conversation_summary, context
+        )
+        
+        with span("llm.route_model"):
+            model, route = self._route_model(user_message, conversation_summary)
+        reply_span.set_attribute("llm.model", model)
+        reply_span.set_attribute("llm.route", route)
+        
+        cache_key = None
+        if bypass_reason:
+            self.response_cache.record_bypass()
+            reply_span.set_attribute("llm.cache", "bypass")
+        else:
+            with span("llm.cache_lookup") as lookup_span:
+                cache_key = self.response_cache.make_key(
+                    user_message,
+                    model,
+                    self.static_prefix.text,
+                    context,
+                    history_lines,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    knowledge_version=self.business_knowledge.version
+                )
+                cached_response = self.response_cache.get(cache_key)
+                faq_match = None
+                # FAQ answers ignore the conversation, so they only serve messages without history
+                if cached_response is None and self.semantic_cache.enabled and not history_lines:
+                    faq_match = self.semantic_cache.lookup(user_message)
+                lookup_span.set_attribute("llm.cache", "hit" if cached_response is not None else
+                                          "semantic_hit" if faq_match else "miss")
+            if cached_response is not None:
+                self.logger.info("Response cache hit", extra={"phone": phone_number})
+                return cached_response
+            if faq_match:
+                self.logger.info(
+                    "Semantic cache hit",
+                    extra={"phone": phone_number, "faq_id": faq_match["id"], "score": round(faq_match["score"], 2)}
+                )
+                return faq_match["answer"]
+        
+        if not self.llm_breaker.allow_request():
+            self.logger.warning("LLM circuit open, using keyword fallback", extra={"phone": phone_number})
+            reply_span.set_attribute("llm.fallback", "circuit_open")
+            return get_keyword_fallback(user_message)
+        
+        # Generate response using OpenAI. The prompt is built inside the try so
+        # that a failure there still settles a half-open trial call
+        start = time.perf_counter()
         try:
-            # Check if this is a booking-related conversation
-            conversation_result = self.conversation_manager.process_message(
-                phone_number, user_message, client_info
-            )
-            
-            # Log conversation result for debugging
-            self.logger.info(f"Conversation result for {phone_number}: {conversation_result}")
-            
-            # If conversation manager handled it, use that response
-            if conversation_result.get("requires_booking", False):
-                self.logger.info(f"Using conversation manager response for {phone_number}")
-                return conversation_result["response"]
-            
-            # Otherwise, use AI for general responses
-            self.logger.info(f"Using AI response for {phone_number}")
-            prompt = self._build_prompt(user_message, client_info, phone_number, context)
-            
-            # Generate response using OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
+            with span("llm.prompt_build"):
+                prompt = self._build_prompt(user_message, client_info, phone_number, context, history_lines)
+            with span("llm.completion", {"llm.model": model}, kind=CLIENT) as completion_span:
+                response = self._create_completion([
+                    {"role": "system", "content": self.static_prefix.text},
                     {"role": "user", "content": prompt}
-                ],
+                ], model)
+                usage = getattr(response, "usage", None)
+                completion_span.set_attribute("llm.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+                completion_span.set_attribute("llm.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+        except Exception as e:
+            self.llm_breaker.record_failure(time.perf_counter() - start)
+            self.logger.error("LLM call failed, using keyword fallback: %s", e, extra={"phone": phone_number})
+            reply_span.set_attribute("llm.fallback", "error")
+            return get_keyword_fallback(user_message)
+        latency = time.perf_counter() - start
+        self.llm_breaker.record_success(latency)
+        
+        self.model_router.record(
+            getattr(response, "model", None) or model,
+            latency,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0
+        )
+        
+        ai_response = response.choices[0].message.content.strip()
+        
+        if cache_key:
+            self.response_cache.set(cache_key, ai_response, getattr(usage, "total_tokens", 0) or 0)
+        
+        # Log the interaction
+        self.logger.info(
+            "Generated AI response",
+            extra={"phone": phone_number, "model": model, "route": route, "latency": round(latency, 3),
+                   "reply": ai_response}
+        )
+        
+        return ai_response
+    
+    def _route_model(self, user_message: str, conversation_summary: Optional[Dict[str, Any]]):
+        """
+        Pick the model for a reply from the routing rules
+        
+        Returns:
+            tuple: (model, name of the rule that chose it)
+        """
+        if not self.routing_enabled:
+            return self.model, "fixed"
+        
+        intent = None
+        if self.intent_classifier:
+            prediction = self.intent_classifier.predict(user_message)
+            if prediction["confidence"] >= self.intent_confidence_threshold:
+                intent = prediction["intent"]
+        summary = conversation_summary or {}
+        return self.model_router.route(
+            user_message,
+            intent=intent,
+            step=summary.get("step"),
+            turns=summary.get("message_count", 0)
+        )
+    
+    def _create_completion(self, messages: list, model: Optional[str] = None):
+        """
+        Call the chat completions API with a request timeout
+        
+        When LLM_HEDGE_MODEL is set and the primary model has not answered by
+        its recent p95 latency, the same request is also sent to the hedge
+        model and whichever answers first is used.
+        """
+        model = model or self.model
+        def request(model: str):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
                 max_tokens=self.max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                timeout=self.request_timeout
             )
-            
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Log the interaction
-            self.logger.info(f"Generated AI response for {phone_number}: {ai_response}")
-            
-            return ai_response
-            
-        except Exception as e:
-            self.logger.error(f"Error generating LLM response: {str(e)}")
-            return "I'm sorry, I'm having trouble processing your request. Please call us directly for assistance."
+        
+        if not self.hedge_model or self.hedge_model == model:
+            return request(model)
+        
+        p95 = self.llm_breaker.percentile(0.95)
+        hedge_after = max(self.hedge_min_delay, p95 if p95 is not None else self.llm_breaker.latency_slo)
+        return hedged_call(
+            lambda: request(model),
+            lambda: request(self.hedge_model),
+            hedge_after
+        )
     
     def _build_prompt(
         self, 
         user_message: str, 
         client_info: Optional[ClientInfo] = None,
         phone_number: str = "",
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        history_lines: Optional[List[str]] = None
     ) -> str:
         """
         Build context-aware prompt for LLM
         
+        Sections are filled by priority within the prompt token budget: the
+        user message first, then conversation state, client information,
+        relevant business knowledge and finally additional context.
+        
         Args:
             user_message: User's message
             client_info: Client information
             phone_number: User's phone number
             context: Additional context
+            history_lines: Recent messages with phone_number; read from the message store if None
             
         Returns:
             str: Formatted prompt
         """
-        prompt_parts = []
+        sections = []
         
         # Add client context if available
         if client_info:
-            prompt_parts.append(f"Client Information:")
-            prompt_parts.append(f"- Name: {client_info.name or 'Unknown'}")
-            prompt_parts.append(f"- Phone: {client_info.phone}")
+            client_lines = ["Client Information:"]
+            client_lines.append(f"- Name: {client_info.name or 'Unknown'}")
+            client_lines.append(f"- Phone: {client_info.phone}")
             if client_info.total_appointments:
-                prompt_parts.append(f"- Total appointments: {client_info.total_appointments}")
+                client_lines.append(f"- Total appointments: {client_info.total_appointments}")
             if client_info.last_appointment:
-                prompt_parts.append(f"- Last appointment: {client_info.last_appointment}")
+                client_lines.append(f"- Last appointment: {client_info.last_appointment}")
             if client_info.upcoming_appointments:
-                prompt_parts.append(f"- Upcoming appointments: {len(client_info.upcoming_appointments)}")
-            prompt_parts.append("")
+                client_lines.append(f"- Upcoming appointments: {len(client_info.upcoming_appointments)}")
+            sections.append(PromptSection("client", "\n".join(client_lines), priority=2))
         
         # Add conversation context
         conversation_summary = self.conversation_manager.get_conversation_summary(phone_number)
         if conversation_summary:
-            prompt_parts.append(f"Conversation Context:")
-            prompt_parts.append(f"- Current step: {conversation_summary['step']}")
+            conversation_lines = ["Conversation Context:"]
+            conversation_lines.append(f"- Current step: {conversation_summary['step']}")
             if conversation_summary['selected_service']:
-                prompt_parts.append(f"- Selected service: {conversation_summary['selected_service']}")
+                conversation_lines.append(f"- Selected service: {conversation_summary['selected_service']}")
             if conversation_summary['selected_date']:
-                prompt_parts.append(f"- Selected date: {conversation_summary['selected_date']}")
+                conversation_lines.append(f"- Selected date: {conversation_summary['selected_date']}")
             if conversation_summary['selected_time']:
-                prompt_parts.append(f"- Selected time: {conversation_summary['selected_time']}")
-            prompt_parts.append("")
+                conversation_lines.append(f"- Selected time: {conversation_summary['selected_time']}")
+            sections.append(PromptSection("conversation", "\n".join(conversation_lines), priority=1))
+        
+        # Add the recent SMS exchange with this number
+        if history_lines is None:
+            history_lines = self._recent_history_lines(phone_number, user_message)
+        if history_lines:
+            sections.append(PromptSection("history", "Recent Messages:\n" + "\n".join(history_lines), priority=5))
+        
+        # Add only the business knowledge relevant to this message
+        relevant_knowledge = self.business_knowledge.get_relevant_knowledge(user_message, self.knowledge_top_k)
+        if relevant_knowledge:
+            sections.append(PromptSection(
+                "knowledge", f"Relevant Business Knowledge:\n{relevant_knowledge}", priority=3
+            ))
         
         # Add context information
         if context:
-            prompt_parts.append("Additional Context:")
+            context_lines = ["Additional Context:"]
             for key, value in context.items():
-                prompt_parts.append(f"- {key}: {value}")
-            prompt_parts.append("")
+                context_lines.append(f"- {key}: {format_context_value(value)}")
+            sections.append(PromptSection("context", "\n".join(context_lines), priority=4))
         
         # Add user message
-        prompt_parts.append(f"User Message: {user_message}")
-        prompt_parts.append("")
-        prompt_parts.append("Please provide a helpful, professional response:")
+        sections.append(PromptSection(
+            "message",
+            f"User Message: {user_message}\n\nPlease provide a helpful, professional response:",
+            priority=0,
+            required=True
+        ))
+        
+        prompt, usage = self.prompt_builder.build(sections)
+        usage["static_prefix"] = self.static_prefix.tokens
+        self.last_prompt_usage = usage
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Prompt tokens: prefix=%s dynamic=%s/%s %s",
+                self.static_prefix.tokens, usage["total"], usage["budget"],
+                " ".join(f"{name}={info['tokens']}({info['status']})" for name, info in usage["sections"].items()),
+                extra={"phone": phone_number}
+            )
         
-        return "\n".join(prompt_parts)
+        return prompt
     
+    def _recent_history_lines(self, phone_number: str, user_message: str) -> List[str]:
+        """Format the last few messages with phone_number, oldest first, excluding the current one"""
+        if not phone_number or self.history_context_messages <= 0:
+            return []
+        message_store = get_message_store()
+        if not message_store:
+            return []
+        
+        try:
+            messages = message_store.history(phone_number, self.history_context_messages + 1)
+        except Exception as e:
+            self.logger.error("Error reading message history: %s", e, extra={"phone": phone_number})
+            return []
+        
+        # The webhook records the inbound message before the reply is generated
+        if messages and messages[0]["direction"] == INBOUND and messages[0]["body"] == user_message:
+            messages = messages[1:]
+        
+        return [
+            f"- {'Client' if message['direction'] == INBOUND else 'Salon'}: {message['body']}"
+            for message in reversed(messages[:self.history_context_messages])
+        ]
+    
+    @traced("llm.analyze_intent")
     async def analyze_intent(self, message: str) -> Dict[str, Any]:
         """
         Analyze user intent from message
@@ -231,6 +470,66 @@ Phone: [Salon Phone]"""
         Returns:
             dict: Intent analysis results
         """
+        local = self.classify_intent_locally(message)
+        if local:
+            return local
+        if self.intent_batching:
+            return await self.intent_batcher.classify(message)
+        return await self._analyze_intent_with_llm(message)
+    
+    async def analyze_intents(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze the intent of many messages, e.g. replies to a campaign
+        
+        Messages the local model is confident about are answered locally; the
+        rest are classified by the LLM in batches.
+        
+        Args:
+            messages: User messages
+            
+        Returns:
+            list: Intent analysis results, in the same order as messages
+        """
+        return list(await asyncio.gather(*(self.analyze_intent(message) for message in messages)))
+    
+    def classify_intent_locally(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Classify intent with the local model
+        
+        Args:
+            message: User's message
+            
+        Returns:
+            dict: Intent analysis results, or None if the model is not confident
+                or the message negates an action or asks for more than one
+        """
+        if not self.intent_classifier or mixed_or_negated(message):
+            return None
+        prediction = self.intent_classifier.predict(message)
+        if prediction["intent"] == "other" or prediction["confidence"] < self.intent_confidence_threshold:
+            return None
+        return {
+            "intent": prediction["intent"],
+            "confidence": prediction["confidence"],
+            "entities": {},
+            "requires_human": False,
+            "source": "local",
+            "model_version": self.intent_classifier.version
+        }
+    
+    async def _analyze_intent_with_llm(self, message: str) -> Dict[str, Any]:
+        """Ask the LLM for an intent analysis"""
+        if not self.llm_breaker.allow_request():
+            return {
+                "intent": "unknown",
+                "confidence": 0.0,
+                "entities": {},
+                "requires_human": True,
+                "source": "circuit_open"
+            }
+        
+        start = time.perf_counter()
+        response = None
         try:
             prompt = f"""Analyze the following SMS message and determine the user's intent:
 
@@ -250,22 +549,27 @@ Response format:
     "requires_human": false
 }}"""
 
-            response = self.client.chat.completions.create(
+            response = await asyncio.to_thread(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an intent analysis system. Respond only with valid JSON."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=200,
-                temperature=0.1
+                temperature=0.1,
+                timeout=self.request_timeout
             )
+            self.llm_breaker.record_success(time.perf_counter() - start)
             
-            import json
             result = json.loads(response.choices[0].message.content.strip())
+            result["source"] = "llm"
             return result
             
         except Exception as e:
-            self.logger.error(f"Error analyzing intent: {str(e)}")
+            if response is None:
+                self.llm_breaker.record_failure(time.perf_counter() - start)
+            self.logger.error("Error analyzing intent: %s", e)
             return {
                 "intent": "unknown",
                 "confidence": 0.0,
@@ -273,6 +577,81 @@ Response format:
                 "requires_human": True
             }
     
+    async def _analyze_intents_with_llm(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Classify several messages with a single LLM request
+        
+        Args:
+            messages: User messages
+            
+        Returns:
+            list: Intent analysis results, in the same order as messages
+        """
+        unknown = {"intent": "unknown", "confidence": 0.0, "entities": {}, "requires_human": True}
+        if not self.llm_breaker.allow_request():
+            return [dict(unknown, source="circuit_open") for _ in messages]
+        
+        numbered = "\n".join(f"{i}. {json.dumps(message)}" for i, message in enumerate(messages, 1))
+        prompt = f"""Analyze the following SMS messages and determine each user's intent:
+
+{numbered}
+
+Respond with a JSON array containing one object per message, in order, each with:
+- id: The message number
+- intent: The primary intent (booking, cancellation, reschedule, inquiry, complaint, etc.)
+- confidence: Confidence score (0-1)
+- entities: Any relevant entities (dates, times, services, etc.)
+- requires_human: Whether this requires human intervention (true/false)
+
+Response format:
+[
+    {{"id": 1, "intent": "booking", "confidence": 0.9, "entities": {{"service": "haircut", "date": "tomorrow"}}, "requires_human": false}}
+]"""
+        
+        start = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(
+                self.client.chat.completions.create,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are an intent analysis system. Respond only with valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=60 * len(messages) + 50,
+                temperature=0.1,
+                timeout=self.request_timeout
+            )
+        except Exception as e:
+            self.llm_breaker.record_failure(time.perf_counter() - start)
+            self.logger.error("Error analyzing intent batch of %d: %s", len(messages), e)
+            return [dict(unknown) for _ in messages]
+        self.llm_breaker.record_success(time.perf_counter() - start)
+        
+        try:
+            parsed = json.loads(response.choices[0].message.content.strip())
+            if isinstance(parsed, dict):
+                parsed = parsed.get("results", [])
+            by_id = {int(item["id"]): item for item in parsed if isinstance(item, dict) and "id" in item}
+        except Exception as e:
+            self.logger.error("Unparseable intent batch response: %s", e)
+            by_id = {}
+        
+        results = []
+        for i in range(1, len(messages) + 1):
+            item = by_id.get(i)
+            if item is None:
+                results.append(dict(unknown))
+                continue
+            result = {key: value for key, value in item.items() if key != "id"}
+            result["source"] = "llm_batch"
+            results.append(result)
+        return results
+    
+    def close(self):
+        """Stop the knowledge refresh and close the OpenAI client's connections"""
+        self.business_knowledge.stop_auto_refresh()
+        self.client.close()
+    
     async def check_health(self) -> dict:
         """
         Check LLM service health
@@ -285,18 +664,24 @@ Response format:
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=5
+                max_tokens=5,
+                timeout=self.request_timeout
             )
             
             return {
                 "status": "healthy",
                 "model": self.model,
-                "api_key_configured": bool(self.api_key)
+                "api_key_configured": bool(self.api_key),
+                "response_cache": self.response_cache.get_stats(),
+                "semantic_cache": self.semantic_cache.get_stats(),
+                "circuit_breaker": self.llm_breaker.get_stats(),
+                "model_routing": self.model_router.get_stats()
             }
         except Exception as e:
             return {
                 "status": "unhealthy",
-                "error": str(e)
+                "error": str(e),
+                "circuit_breaker": self.llm_breaker.get_stats()
             }
     
     def update_system_prompt(self, new_prompt: str):
@@ -307,19 +692,54 @@ Response format:
             new_prompt: New system prompt
         """
         self.system_prompt = new_prompt
+        self.static_prefix = self._build_static_prefix()
         self.logger.info("System prompt updated")
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get response cache statistics
+        
+        Returns:
+            dict: Hit rates, saved tokens and entry counts per cache
+        """
+        return {
+            "response_cache": self.response_cache.get_stats(),
+            "semantic_cache": self.semantic_cache.get_stats()
+        }
+    
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """
+        Get model routing statistics
+        
+        Returns:
+            dict: Rule hit counts and per-model calls, tokens, cost and latency
+        """
+        return self.model_router.get_stats()
+    
+    def approve_faq_answer(self, question: str, answer: str, faq_id: Optional[str] = None):
+        """
+        Add an approved answer to the semantic FAQ cache
+        
+        Args:
+            question: Representative question the answer responds to
+            answer: Approved reply text
+            faq_id: Optional identifier of the FAQ entry
+        """
+        self.semantic_cache.approve(question, answer, faq_id)
+        self.logger.info("Approved FAQ answer", extra={"question": question})
+    
     def set_model_parameters(self, model: str = None, max_tokens: int = None, temperature: float = None):
         """
         Update model parameters
         
         Args:
-            model: Model name
+            model: Model name; pinning a model turns off per-request routing
             max_tokens: Maximum tokens for response
             temperature: Temperature for response generation
         """
         if model:
             self.model = model
+            self.routing_enabled = False
         if max_tokens:
             self.max_tokens = max_tokens
         if temperature is not None:
@@ -1,82 +1,193 @@
-from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+import time
+
+_import_started = time.perf_counter()
+
 import os
-from dotenv import load_dotenv
+import hmac
+import asyncio
+import logging
+import importlib
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request, Form
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from .sms_service import SMSService
-from .llm_service import LLMService
-from .database_service import DatabaseService
-from .voice_service import VoiceService
+# Services are imported on first use: twilio, openai, numpy and psycopg2
+# would otherwise add most of the app's cold start to every process start
+from .circuit_breaker import get_all_breaker_stats
+from .metrics import CONTENT_TYPE, SMS_STAGE_SECONDS, MetricsMiddleware, render_metrics, start_snapshot_writer
+from .model_router import get_model_router
+from .outbound_queue import OutboundWorker, create_outbound_queue
+from .message_store import INBOUND, get_message_store
+from .prompt_audio import AUDIO_ROUTE, MEDIA_TYPES
+from .query_stats import ORDERS as QUERY_ORDERS, get_query_stats
+from .service_container import ServiceContainer, ServiceSpec, required_services
+from .structured_logging import configure_logging, shutdown_logging
+from .tracing import SERVER, configure_tracing, current_span, shutdown_tracing, span, traced
+from .twiml_templates import PARTIAL_RESULT_ROUTE
 from .models import SMSRequest, SMSResponse, VoiceRequest, VoiceResponse
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Salon SMS Responder",
-    description="AI-powered SMS responder for salon appointment management",
-    version="1.0.0"
-)
+# Per-stage latency of the SMS webhook, label sets created once
+SMS_STAGES = {
+    stage: SMS_STAGE_SECONDS.labels(stage)
+    for stage in ("message_store", "dedupe", "client_lookup", "llm", "enqueue", "send")
+}
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Services are owned by the container: built on first use or at startup,
+# retried in the background after a failure, and closed on shutdown
+_outbound_queue = None
+_outbound_worker = None
+_environment_loaded = False
 
-# Initialize services lazily
-_sms_service = None
-_llm_service = None
-_db_service = None
-_voice_service = None
+# Seconds spent importing this module and constructing each service, for /health
+startup_timings = {}
 
+def load_environment():
+    """Load .env once, before the first service reads its configuration"""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+def _service_factory(module: str, class_name: str):
+    """Factory importing a service module only when the service is first built"""
+    def create():
+        return getattr(importlib.import_module(module, __package__), class_name)()
+    return create
+
+def _create_container() -> ServiceContainer:
+    specs = [
+        ServiceSpec(name, label, _service_factory(module, class_name))
+        for name, label, module, class_name in (
+            ("sms", "SMS Service", ".sms_service", "SMSService"),
+            ("llm", "LLM Service", ".llm_service", "LLMService"),
+            ("voice", "Voice Service", ".voice_service", "VoiceService"),
+            ("db", "Database Service", ".database_service", "DatabaseService"),
+        )
+    ]
+    return ServiceContainer(
+        specs,
+        retry_initial=float(os.getenv("SERVICE_RETRY_INITIAL_SECONDS", "1")),
+        retry_max=float(os.getenv("SERVICE_RETRY_MAX_SECONDS", "60")),
+        timings=startup_timings,
+        before_create=load_environment
+    )
+
+services = _create_container()
+
+# Sync accessors, for threads and tools; async handlers use services.get_async()
+# so a service being built never blocks the event loop
 def get_sms_service():
     """Get SMS service instance"""
-    global _sms_service
-    if _sms_service is None:
-        try:
-            _sms_service = SMSService()
-        except Exception as e:
-            print(f"Warning: SMS Service initialization failed: {e}")
-            _sms_service = None
-    return _sms_service
+    return services.get("sms")
 
 def get_llm_service():
     """Get LLM service instance"""
-    global _llm_service
-    if _llm_service is None:
-        try:
-            _llm_service = LLMService()
-        except Exception as e:
-            print(f"Warning: LLM Service initialization failed: {e}")
-            _llm_service = None
-    return _llm_service
+    return services.get("llm")
 
 def get_db_service():
     """Get database service instance"""
-    global _db_service
-    if _db_service is None:
-        try:
-            _db_service = DatabaseService()
-        except Exception as e:
-            print(f"Warning: Database Service initialization failed: {e}")
-            _db_service = None
-    return _db_service
+    return services.get("db")
 
 def get_voice_service():
     """Get voice service instance"""
-    global _voice_service
-    if _voice_service is None:
+    return services.get("voice")
+
+def get_outbound_queue():
+    """Get outbound SMS queue instance"""
+    global _outbound_queue
+    if _outbound_queue is None:
         try:
-            _voice_service = VoiceService()
+            _outbound_queue = create_outbound_queue()
         except Exception as e:
-            print(f"Warning: Voice Service initialization failed: {e}")
-            _voice_service = None
-    return _voice_service
+            logger.warning("Outbound queue initialization failed: %s", e)
+            _outbound_queue = None
+    return _outbound_queue
+
+def start_outbound_worker(sms_service):
+    """Start draining the outbound SMS queue; called once the SMS service is ready"""
+    global _outbound_worker
+    outbound_queue = get_outbound_queue()
+    if outbound_queue and _outbound_worker is None:
+        _outbound_worker = OutboundWorker(
+            outbound_queue,
+            sms_service.send_queued_sms,
+            concurrency=int(os.getenv("OUTBOUND_QUEUE_WORKERS", "10"))
+        )
+        _outbound_worker.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown, in order
+    
+    Services (database pool, Twilio HTTP connections) are built and prewarmed
+    in the background once the server is up, retrying any that fail;
+    /health/ready reports 503 until the required ones are ready. The outbound
+    SMS worker starts when the SMS service becomes ready, however late.
+    """
+    global _outbound_worker
+    # Load .env before anything reads its configuration
+    load_environment()
+    configure_logging()
+    # Trace a sample of requests when TRACE_EXPORTERS is set
+    configure_tracing()
+    
+    services.on_ready("sms", start_outbound_worker)
+    # Render fixed voice prompt audio before the first call when a TTS backend is configured
+    if os.getenv("VOICE_TTS_BACKEND"):
+        await run_in_threadpool(get_voice_service)
+    
+    services.set_required(required_services())
+    prewarm = os.getenv("SERVICE_WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+    app.state.warmup_task = asyncio.create_task(services.start(prewarm=prewarm))
+    if not prewarm and get_outbound_queue():
+        # Messages left queued by the previous process need the SMS service
+        app.state.sms_task = asyncio.create_task(run_in_threadpool(get_sms_service))
+    
+    # With several workers, share this worker's metrics with the others through METRICS_DIR
+    metrics_writer = None
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        metrics_writer = start_snapshot_writer(
+            directory,
+            os.getenv("WORKER_INDEX", "0"),
+            float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+        )
+    
+    yield
+    
+    # Finish in-flight sends, then close pools and HTTP clients
+    if _outbound_worker:
+        await _outbound_worker.stop()
+        _outbound_worker = None
+    if not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
+    await services.shutdown()
+    if metrics_writer:
+        metrics_writer.set()
+    await run_in_threadpool(shutdown_tracing)
+    shutdown_logging()
+
+app = FastAPI(
+    title="Salon SMS Responder",
+    description="AI-powered SMS responder for salon appointment management",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 @app.get("/")
 async def root():
@@ -84,6 +195,7 @@ async def root():
     return {"message": "Salon SMS Responder is running", "status": "healthy"}
 
 @app.post("/webhook/sms", response_model=SMSResponse)
+@traced("sms.webhook", kind=SERVER)
 async def handle_sms_webhook(
     From: str = Form(...),
     To: str = Form(...),
@@ -107,41 +219,88 @@ async def handle_sms_webhook(
         )
         
         # Log the incoming message
-        print(f"Received SMS from {request.From}: {request.Body}")
+        logger.info("Received SMS", extra={"phone": request.From, "body": request.Body, "message_sid": request.MessageSid})
+        current_span().set_attribute("messaging.message_id", request.MessageSid)
+        
+        # Keep local history; the SID makes webhook retries a no-op.
+        # SQLite calls run in the threadpool so a busy database never stalls the event loop
+        stored = True
+        with span("sms.message_store", histogram=SMS_STAGES["message_store"]):
+            message_store = await run_in_threadpool(get_message_store)
+            if message_store:
+                try:
+                    stored = await run_in_threadpool(
+                        message_store.record, request.From, INBOUND, request.Body,
+                        sid=request.MessageSid, status="received"
+                    )
+                except Exception as e:
+                    logger.error("Message store error: %s", e)
+        
+        # Twilio retries webhooks; answer each inbound message only once
+        with span("sms.dedupe", histogram=SMS_STAGES["dedupe"]):
+            outbound_queue = await run_in_threadpool(get_outbound_queue)
+            reply_key = f"reply:{request.MessageSid}"
+            if outbound_queue:
+                duplicate = await run_in_threadpool(outbound_queue.contains, reply_key)
+            else:
+                # Without the queue the reply is sent directly; a retry is an inbound SID already stored
+                duplicate = not stored
+        if duplicate:
+            logger.info("Reply to %s already queued, skipping duplicate webhook", request.MessageSid)
+            return SMSResponse(
+                success=True,
+                message="Duplicate webhook; response already queued"
+            )
         
         # Get services
-        db_service = get_db_service()
-        llm_service = get_llm_service()
-        sms_service = get_sms_service()
+        db_service = await services.get_async("db")
+        llm_service = await services.get_async("llm")
+        sms_service = await services.get_async("sms")
         
         # Get client information from database
         client_info = None
         if db_service:
-            client_info = await db_service.get_client_by_phone(request.From)
+            with span("sms.client_lookup", histogram=SMS_STAGES["client_lookup"]):
+                client_info = await db_service.get_client_by_phone(request.From)
         
         # Generate AI response using LLM
         ai_response = "Thank you for your message. Please call us directly for assistance."
         if llm_service:
-            try:
-                ai_response = await llm_service.generate_response(
-                    user_message=request.Body,
-                    client_info=client_info,
-                    phone_number=request.From
-                )
-            except Exception as e:
-                print(f"LLM service error: {e}")
-                ai_response = "I'm sorry, I'm having trouble processing your request. Please call us directly."
+            with span("sms.llm", histogram=SMS_STAGES["llm"]):
+                try:
+                    ai_response = await llm_service.generate_response(
+                        user_message=request.Body,
+                        client_info=client_info,
+                        phone_number=request.From
+                    )
+                except Exception as e:
+                    logger.error("LLM service error: %s", e)
+                    ai_response = "I'm sorry, I'm having trouble processing your request. Please call us directly."
+        
+        # Queue the response durably under its reply key; the outbound worker
+        # sends and retries it, starting once the SMS service is ready
+        if outbound_queue:
+            with span("sms.enqueue", histogram=SMS_STAGES["enqueue"]):
+                await run_in_threadpool(outbound_queue.enqueue, request.From, ai_response, reply_key)
+                if _outbound_worker:
+                    _outbound_worker.notify()
+            return SMSResponse(
+                success=True,
+                message="SMS processed and response queued",
+                ai_response=ai_response
+            )
         
         # Send response via Twilio
         response_sent = False
         if sms_service:
-            try:
-                response_sent = await sms_service.send_sms(
-                    to=request.From,
-                    message=ai_response
-                )
-            except Exception as e:
-                print(f"SMS service error: {e}")
+            with span("sms.send", histogram=SMS_STAGES["send"]):
+                try:
+                    response_sent = await sms_service.send_sms(
+                        to=request.From,
+                        message=ai_response
+                    )
+                except Exception as e:
+                    logger.error("SMS service error: %s", e)
         
         if response_sent:
             return SMSResponse(
@@ -157,10 +316,11 @@ async def handle_sms_webhook(
             )
             
     except Exception as e:
-        print(f"Error processing SMS: {str(e)}")
+        logger.exception("Error processing SMS: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing SMS: {str(e)}")
 
 @app.post("/webhook/voice")
+@traced("voice.incoming", kind=SERVER)
 async def handle_voice_webhook(
     CallSid: str = Form(...),
     From: str = Form(...),
@@ -191,13 +351,13 @@ async def handle_voice_webhook(
         )
         
         # Log the incoming call
-        print(f"Received voice call from {request.From} (CallSid: {request.CallSid})")
+        logger.info("Received voice call", extra={"phone": request.From, "call_sid": request.CallSid})
         
         # Get voice service
-        voice_service = get_voice_service()
+        voice_service = await services.get_async("voice")
         
         if not voice_service:
-            print("ERROR: Voice service not available - creating fallback response")
+            logger.error("Voice service not available - creating fallback response")
             # Create fallback TwiML response
             response = VoiceResponse()
             response.say(
@@ -215,9 +375,7 @@ async def handle_voice_webhook(
         return Response(content=twiml_response, media_type="application/xml")
         
     except Exception as e:
-        import traceback
-        print(f"ERROR processing voice call: {str(e)}")
-        print(f"TRACEBACK: {traceback.format_exc()}")
+        logger.exception("Error processing voice call: %s", e)
         
         # Create error TwiML response
         response = VoiceResponse()
@@ -230,6 +388,7 @@ async def handle_voice_webhook(
         return Response(content=str(response), media_type="application/xml")
 
 @app.post("/webhook/voice/process")
+@traced("voice.process", kind=SERVER)
 async def handle_voice_processing(
     CallSid: str = Form(...),
     From: str = Form(...),
@@ -260,13 +419,16 @@ async def handle_voice_processing(
         )
         
         # Log the speech input
-        print(f"Processing speech from {request.From}: {request.SpeechResult}")
+        logger.info(
+            "Processing speech",
+            extra={"phone": request.From, "call_sid": request.CallSid, "speech": request.SpeechResult}
+        )
         
         # Get voice service
-        voice_service = get_voice_service()
+        voice_service = await services.get_async("voice")
         
         if not voice_service:
-            print("ERROR: Voice service not available - creating fallback response")
+            logger.error("Voice service not available - creating fallback response")
             # Create fallback TwiML response
             response = VoiceResponse()
             response.say(
@@ -277,9 +439,10 @@ async def handle_voice_processing(
             response.hangup()
             return Response(content=str(response), media_type="application/xml")
         
-        # Process speech and generate response
+        # Process speech and generate response (off the event loop while the LLM streams)
         if request.SpeechResult:
-            twiml_response = voice_service.create_processing_response(
+            twiml_response = await run_in_threadpool(
+                voice_service.create_processing_response,
                 request.CallSid, 
                 request.SpeechResult
             )
@@ -291,9 +454,7 @@ async def handle_voice_processing(
         return Response(content=twiml_response, media_type="application/xml")
         
     except Exception as e:
-        import traceback
-        print(f"ERROR processing voice input: {str(e)}")
-        print(f"TRACEBACK: {traceback.format_exc()}")
+        logger.exception("Error processing voice input: %s", e)
         
         # Create error TwiML response
         response = VoiceResponse()
@@ -305,7 +466,82 @@ async def handle_voice_processing(
         response.hangup()
         return Response(content=str(response), media_type="application/xml")
 
+@app.post("/webhook/voice/continue")
+@traced("voice.continue", kind=SERVER)
+async def handle_voice_continuation(
+    CallSid: str = Form(...),
+    From: str = Form(None),
+    To: str = Form(None),
+    AccountSid: str = Form(None),
+    CallStatus: str = Form(None)
+):
+    """
+    Speak the remainder of a streamed AI response
+    """
+    from fastapi.responses import Response
+    from twilio.twiml.voice_response import VoiceResponse
+    
+    try:
+        voice_service = await services.get_async("voice")
+        
+        if not voice_service:
+            response = VoiceResponse()
+            response.say(
+                "I'm sorry, our system is temporarily unavailable. Please try again later.",
+                voice='alice',
+                language='en-US'
+            )
+            response.hangup()
+            return Response(content=str(response), media_type="application/xml")
+        
+        twiml_response = await run_in_threadpool(voice_service.create_continuation_response, CallSid)
+        return Response(content=twiml_response, media_type="application/xml")
+        
+    except Exception as e:
+        logger.error("Error continuing voice response: %s", e)
+        
+        response = VoiceResponse()
+        response.say(
+            "I'm sorry, an error occurred while processing your request. Please try again later.",
+            voice='alice',
+            language='en-US'
+        )
+        response.hangup()
+        return Response(content=str(response), media_type="application/xml")
+
+@app.post(PARTIAL_RESULT_ROUTE)
+@traced("voice.partial_result", kind=SERVER)
+async def handle_voice_partial_result(
+    CallSid: str = Form(...),
+    UnstableSpeechResult: str = Form(None),
+    StableSpeechResult: str = Form(None),
+    SequenceNumber: str = Form(None)
+):
+    """
+    Receive partial speech results while the caller is talking, and start
+    generating a reply early once the transcript is stable
+    """
+    try:
+        voice_service = await services.get_async("voice")
+        if not voice_service:
+            return {"success": False, "speculating": False}
+        
+        started = await run_in_threadpool(
+            voice_service.handle_partial_result,
+            CallSid,
+            UnstableSpeechResult,
+            StableSpeechResult,
+            SequenceNumber
+        )
+        return {"success": True, "speculating": started}
+        
+    except Exception as e:
+        # Partial results are only a hint; never fail Twilio's callback over one
+        logger.warning("Error handling partial speech result: %s", e)
+        return {"success": False, "speculating": False}
+
 @app.post("/webhook/voice/status")
+@traced("voice.status", kind=SERVER)
 async def handle_call_status_update(
     CallSid: str = Form(...),
     CallStatus: str = Form(...),
@@ -315,10 +551,10 @@ async def handle_call_status_update(
     Handle call status updates (call ended, etc.)
     """
     try:
-        print(f"Call status update: {CallSid} - {CallStatus}")
+        logger.info("Call status update", extra={"call_sid": CallSid, "call_status": CallStatus})
         
         # Get voice service
-        voice_service = get_voice_service()
+        voice_service = await services.get_async("voice")
         
         if voice_service and CallStatus in ['completed', 'failed', 'busy', 'no-answer']:
             # Clean up conversation history when call ends
@@ -327,7 +563,7 @@ async def handle_call_status_update(
         return {"success": True, "message": "Call status processed"}
         
     except Exception as e:
-        print(f"Error processing call status: {str(e)}")
+        logger.error("Error processing call status: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing call status: {str(e)}")
 
 @app.get("/voice/status/{call_sid}")
@@ -336,7 +572,7 @@ async def get_call_status(call_sid: str):
     Get status information about a specific call
     """
     try:
-        voice_service = get_voice_service()
+        voice_service = await services.get_async("voice")
         
         if not voice_service:
             raise HTTPException(status_code=500, detail="Voice service not available")
@@ -349,16 +585,66 @@ async def get_call_status(call_sid: str):
         return status
         
     except Exception as e:
-        print(f"Error getting call status: {str(e)}")
+        logger.error("Error getting call status: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting call status: {str(e)}")
 
+@app.get(AUDIO_ROUTE + "/{filename}")
+async def get_voice_audio(filename: str):
+    """
+    Serve pre-rendered prompt audio for <Play>
+    """
+    from fastapi.responses import FileResponse
+    
+    voice_service = await services.get_async("voice")
+    prompt_audio = voice_service.prompt_audio if voice_service else None
+    # Only names shaped like the cache's content hashes are served, so the name can't escape its directory
+    path = prompt_audio.path_for(filename) if prompt_audio else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    extension = filename.rsplit(".", 1)[-1]
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        # Names are content hashes, so a file never changes
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+def require_admin(request: Request):
+    """
+    Guard for endpoints that expose customer messages or service internals
+    
+    They answer 404 unless ADMIN_API_TOKEN is set, and then only to requests
+    with "Authorization: Bearer <ADMIN_API_TOKEN>".
+    """
+    token = os.getenv("ADMIN_API_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/sms/history/{phone_number}", dependencies=[Depends(require_admin)])
+async def get_sms_history(phone_number: str, limit: int = 20):
+    """
+    Get recent SMS messages exchanged with a phone number, newest first (admin only)
+    """
+    message_store = get_message_store()
+    if not message_store:
+        raise HTTPException(status_code=503, detail="Message store not enabled")
+    
+    return {
+        "phone_number": phone_number,
+        "messages": message_store.history(phone_number, max(1, min(limit, 200)))
+    }
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    sms_service = get_sms_service()
-    llm_service = get_llm_service()
-    db_service = get_db_service()
-    voice_service = get_voice_service()
+    sms_service = await services.get_async("sms")
+    llm_service = await services.get_async("llm")
+    db_service = await services.get_async("db")
+    voice_service = await services.get_async("voice")
     
     health_status = {
         "status": "healthy",
@@ -385,9 +671,67 @@ async def health_check():
     else:
         health_status["services"]["voice_service"] = {"status": "unavailable", "error": "Not configured"}
     
+    # LLM circuit breakers; an open circuit means replies are coming from keyword fallbacks
+    health_status["circuit_breakers"] = get_all_breaker_stats()
+    if any(breaker["state"] != "closed" for breaker in health_status["circuit_breakers"].values()):
+        health_status["status"] = "degraded"
+    
+    # Per-model calls, tokens, cost and latency for tuning the routing rules
+    health_status["model_routing"] = get_model_router().get_stats()
+    
+    # Outbound SMS queue depth and age
+    outbound_queue = get_outbound_queue()
+    if outbound_queue:
+        health_status["outbound_queue"] = outbound_queue.get_metrics()
+    
+    message_store = get_message_store()
+    if message_store:
+        health_status["message_store"] = message_store.get_stats()
+    
+    health_status["startup"] = startup_timings
+    health_status["readiness"] = services.readiness()
+    
     return health_status
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving, whatever its dependencies are doing"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until every required service is constructed and warmed"""
+    from fastapi.responses import JSONResponse
+    readiness = services.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: webhook, SMS stage, database and external API latency"""
+    from fastapi.responses import Response
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/debug/queries", dependencies=[Depends(require_admin)])
+async def debug_queries(limit: int = 20, order: str = "total"):
+    """This worker's top SQL fingerprints by total (or count, max, mean) time, with the last slow-query plan"""
+    if order not in QUERY_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of: {', '.join(QUERY_ORDERS)}")
+    stats = get_query_stats()
+    return {
+        "pid": os.getpid(),
+        "slow_query_ms": stats.slow_ms,
+        "order": order,
+        "queries": stats.top(max(1, min(limit, 200)), order),
+    }
+
+# Time every request by route; routes with path parameters are counted as "other"
+app.add_middleware(MetricsMiddleware, paths=[route.path for route in app.routes if "{" not in route.path])
+
+startup_timings["Module import"] = round(time.perf_counter() - _import_started, 3)
+
 if __name__ == "__main__":
+    import uvicorn
+    load_environment()
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
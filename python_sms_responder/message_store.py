@@ -0,0 +1,217 @@
+"""
+Local message history.
+
+Every inbound and outbound SMS is appended to a SQLite table indexed by phone
+number and time, so history lookups and conversation context are answered
+locally instead of paging through Twilio's rate-limited REST API. Rows are
+keyed by the Twilio message SID when there is one, which makes recording
+idempotent and lets import_twilio_history.py backfill safely more than once.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INBOUND = "inbound"
+OUTBOUND = "outbound"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sid TEXT UNIQUE,
+    phone_number TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_phone_time ON messages (phone_number, created_at);
+"""
+
+
+class MessageStore:
+    """Append-only SQLite store of SMS messages"""
+
+    def __init__(self, path: str = "messages.db", time_func=time.time):
+        """
+        Args:
+            path: SQLite database file (":memory:" for tests)
+        """
+        self.path = path
+        self._time = time_func
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(
+        self,
+        phone_number: str,
+        direction: str,
+        body: str,
+        sid: Optional[str] = None,
+        status: Optional[str] = None,
+        created_at: Optional[float] = None
+    ) -> bool:
+        """
+        Append a message
+
+        Args:
+            phone_number: The customer's number (sender for inbound, recipient for outbound)
+            direction: INBOUND or OUTBOUND
+            body: Message text
+            sid: Twilio message SID; a message with a known SID is stored once
+            status: Twilio status, if known
+            created_at: Unix timestamp; defaults to now
+
+        Returns:
+            bool: True if the message was stored, False if its SID was already present
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO messages (sid, phone_number, direction, body, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sid, phone_number, direction, body, status, created_at if created_at is not None else self._time())
+            )
+            return bool(cursor.rowcount)
+
+    def record_many(self, messages: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append many messages in one transaction
+
+        Args:
+            messages: Dicts with the arguments of record()
+
+        Returns:
+            int: Number of messages stored
+        """
+        now = self._time()
+        rows = [
+            (
+                message.get("sid"),
+                message["phone_number"],
+                message["direction"],
+                message["body"],
+                message.get("status"),
+                message.get("created_at") if message.get("created_at") is not None else now
+            )
+            for message in messages
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO messages (sid, phone_number, direction, body, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def history(
+        self,
+        phone_number: str,
+        limit: int = 10,
+        before: Optional[float] = None,
+        direction: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Most recent messages for a number, newest first
+
+        Args:
+            phone_number: Customer's number
+            limit: Maximum number of messages
+            before: Only messages older than this Unix timestamp (for paging)
+            direction: Only INBOUND or OUTBOUND messages
+
+        Returns:
+            list: Message dicts with sid, body, direction, date_sent, status
+        """
+        query = "SELECT sid, body, direction, status, created_at FROM messages WHERE phone_number = ?"
+        params: List[Any] = [phone_number]
+        if before is not None:
+            query += " AND created_at < ?"
+            params.append(before)
+        if direction:
+            query += " AND direction = ?"
+            params.append(direction)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                "sid": row["sid"],
+                "body": row["body"],
+                "direction": row["direction"],
+                "date_sent": datetime.fromtimestamp(row["created_at"], tz=timezone.utc),
+                "status": row["status"],
+            }
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS messages, COUNT(DISTINCT phone_number) AS numbers, "
+                "MAX(created_at) AS latest FROM messages"
+            ).fetchone()
+        return {
+            "path": self.path,
+            "messages": row["messages"],
+            "phone_numbers": row["numbers"],
+            "latest_message_age_seconds": round(self._time() - row["latest"], 1) if row["latest"] else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def from_twilio_message(message) -> Dict[str, Any]:
+    """
+    Convert a Twilio MessageInstance to record() arguments
+
+    The customer's number is the sender of inbound messages and the
+    recipient of outbound ones ("outbound-api", "outbound-reply", ...).
+    """
+    inbound = (message.direction or "").startswith("inbound")
+    sent_at = message.date_sent or message.date_created
+    return {
+        "sid": message.sid,
+        "phone_number": message.from_ if inbound else message.to,
+        "direction": INBOUND if inbound else OUTBOUND,
+        "body": message.body or "",
+        "status": message.status,
+        "created_at": sent_at.timestamp() if sent_at else None,
+    }
+
+
+_store: Optional[MessageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_message_store() -> Optional[MessageStore]:
+    """Get the process-wide store at MESSAGE_STORE_PATH, or None if MESSAGE_STORE_ENABLED is false"""
+    global _store
+    if os.getenv("MESSAGE_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = MessageStore(os.getenv("MESSAGE_STORE_PATH", "messages.db"))
+            logger.info("Message history store at %s", _store.path)
+        return _store
@@ -0,0 +1,434 @@
+"""
+Prometheus-style metrics without a client library.
+
+Counters and histograms are kept per label set ("children"). Callers create
+the children they need once, at import, and keep a reference, so the hot path
+never looks up or formats labels. Each child keeps one row of values per
+thread that writes to it: a thread only ever adds to its own row, so updates
+need no lock and none are lost, and the rows are summed when /metrics is
+rendered.
+
+With several worker processes (serve.py), each worker periodically writes a
+snapshot of its registry to METRICS_DIR. /metrics writes a fresh snapshot of
+the worker it reaches and then sums every worker's snapshot file, so a scrape
+that reaches any worker sees the totals for all of them. Rendering only from
+the files means every worker sums the same inputs: mixing one worker's live
+counts with the others' older snapshots would make totals go backwards when
+consecutive scrapes reach different workers, which Prometheus reads as a
+counter reset.
+"""
+import os
+import json
+import time
+import logging
+import functools
+import inspect
+import threading
+from bisect import bisect_left as _bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a fast SQLite lookup up to a slow LLM completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _ThreadRows:
+    """
+    Per-thread rows of floats, summed column-wise on read
+
+    Writers read their row straight from `local.row` and only call new_row()
+    the first time a thread writes, which keeps the hot path to one attribute
+    lookup.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.local = threading.local()
+        self._rows: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def new_row(self) -> List[float]:
+        row = [0.0] * self.width
+        with self._lock:
+            self._rows.append(row)
+        self.local.row = row
+        return row
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            rows = list(self._rows)
+        totals = [0.0] * self.width
+        for row in rows:
+            for index, value in enumerate(row):
+                totals[index] += value
+        return totals
+
+
+class CounterChild:
+    """One label set of a counter"""
+
+    def __init__(self):
+        self._rows = _ThreadRows(1)
+        self._local = self._rows.local
+
+    def inc(self, amount: float = 1.0):
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._rows.new_row()
+        row[0] += amount
+
+    def values(self) -> List[float]:
+        return self._rows.totals()
+
+
+class HistogramChild:
+    """One label set of a histogram: a count per bucket, then +Inf, then the sum"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self._bounds = list(buckets)
+        self._rows = _ThreadRows(len(buckets) + 2)
+        self._local = self._rows.local
+
+    def observe(self, value: float):
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._rows.new_row()
+        row[_bisect_left(self._bounds, value)] += 1
+        row[-1] += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self)
+
+    def values(self) -> List[float]:
+        return self._rows.totals()
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values; create children once and keep them"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), child.values()] for key, child in list(self._children.items())],
+        }
+
+
+class Counter(_Metric):
+    """Monotonic counter, exposed as <name>_total"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Histogram(_Metric):
+    """Latency histogram with cumulative buckets, _sum and _count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    """The set of metrics rendered by /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render(self, others: Iterable[Dict[str, Dict[str, Any]]] = ()) -> str:
+        """Prometheus text exposition of this registry, plus other workers' snapshots"""
+        return render_snapshot(merge_snapshots([self.snapshot(), *others]))
+
+
+REGISTRY = Registry()
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum snapshots from several workers, label set by label set"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    sums: Dict[str, Dict[Tuple[str, ...], List[float]]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged:
+                merged[name] = {key: value for key, value in metric.items() if key != "samples"}
+                sums[name] = {}
+            for labels, values in metric["samples"]:
+                total = sums[name].setdefault(tuple(labels), [0.0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+    for name, metric in merged.items():
+        metric["samples"] = [[list(labels), values] for labels, values in sums[name].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_snapshot(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        names = metric["labelnames"]
+        samples = sorted(metric["samples"], key=lambda sample: sample[0])
+        if metric["type"] == "counter":
+            lines.append(f"# HELP {name}_total {metric['help']}")
+            lines.append(f"# TYPE {name}_total counter")
+            for labels, values in samples:
+                lines.append(f"{name}_total{_label_text(names, labels)} {_number(values[0])}")
+        else:
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} histogram")
+            bounds = [_number(bound) for bound in metric["buckets"]] + ["+Inf"]
+            for labels, values in samples:
+                cumulative = 0.0
+                for bound, count in zip(bounds, values[:-1]):
+                    cumulative += count
+                    le = 'le="' + bound + '"'
+                    lines.append(f"{name}_bucket{_label_text(names, labels, le)} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_label_text(names, labels)} {_number(values[-1])}")
+                lines.append(f"{name}_count{_label_text(names, labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def timed(child: HistogramChild):
+    """Decorator observing the duration of each call, for sync and async functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Shared metric families; modules create the label sets they use at import
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, by route", ["route"]
+)
+HTTP_SERVER_ERRORS = Counter(
+    "http_server_errors", "HTTP responses with a 5xx status, by route", ["route"]
+)
+SMS_STAGE_SECONDS = Histogram(
+    "sms_webhook_stage_duration_seconds", "Time spent in each stage of the SMS webhook", ["stage"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time per data layer query, by component and operation", ["component", "operation"]
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+    "external_call_duration_seconds", "Latency of calls to external APIs", ["service", "operation"]
+)
+EXTERNAL_CALL_ERRORS = Counter(
+    "external_call_errors", "Failed calls to external APIs (errors, timeouts, non-2xx)", ["service", "operation"]
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route
+
+    Only the exact paths given get their own label; everything else (paths
+    with IDs in them, scanners) is counted as "other" so label cardinality
+    stays fixed.
+    """
+
+    def __init__(self, app, paths: Iterable[str] = ()):
+        self.app = app
+        self._seconds = {path: HTTP_REQUEST_SECONDS.labels(path) for path in paths}
+        self._errors = {path: HTTP_SERVER_ERRORS.labels(path) for path in paths}
+        self._other_seconds = HTTP_REQUEST_SECONDS.labels("other")
+        self._other_errors = HTTP_SERVER_ERRORS.labels("other")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        status = [500]
+
+        # A plain function returning send's awaitable: one less coroutine per message
+        def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            return send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self._seconds.get(path, self._other_seconds).observe(time.perf_counter() - start)
+            if status[0] >= 500:
+                self._errors.get(path, self._other_errors).inc()
+
+
+def snapshot_path(directory: str, worker_index: str) -> str:
+    return os.path.join(directory, f"worker-{worker_index}.json")
+
+
+# The writer thread and /metrics both write this worker's file; serialized so
+# a snapshot taken earlier never replaces a newer one
+_snapshot_lock = threading.Lock()
+
+
+def write_snapshot(directory: str, worker_index: str, registry: Registry = REGISTRY):
+    """Atomically replace this worker's snapshot file"""
+    path = snapshot_path(directory, worker_index)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with _snapshot_lock:
+        with open(temporary, "w") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(temporary, path)
+
+
+def read_snapshots(directory: str, exclude: Optional[str] = None) -> List[Dict[str, Dict[str, Any]]]:
+    """Latest snapshot of every worker, except worker `exclude` if given"""
+    excluded = os.path.basename(snapshot_path(directory, exclude)) if exclude is not None else None
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshots
+    for name in names:
+        if name == excluded or not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # Replaced while being read; the next scrape picks it up
+            continue
+    return snapshots
+
+
+def start_snapshot_writer(directory: str, worker_index: str, interval: float = 5.0,
+                          registry: Registry = REGISTRY) -> threading.Event:
+    """
+    Write this worker's snapshot every interval seconds in a daemon thread
+
+    Returns:
+        threading.Event: Set it to stop the writer (a final snapshot is written)
+    """
+    os.makedirs(directory, exist_ok=True)
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            stopped = stop.wait(interval)
+            try:
+                write_snapshot(directory, worker_index, registry)
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+            if stopped:
+                return
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+    return stop
+
+
+def render_metrics(registry: Registry = REGISTRY) -> str:
+    """/metrics body: this worker's metrics, or every worker's snapshot summed when METRICS_DIR is set"""
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        return registry.render()
+    worker_index = os.getenv("WORKER_INDEX", "0")
+    try:
+        write_snapshot(directory, worker_index, registry)
+    except OSError as e:
+        logger.warning("Could not write metrics snapshot: %s", e)
+        return registry.render(read_snapshots(directory, exclude=worker_index))
+    return render_snapshot(merge_snapshots(read_snapshots(directory)))
@@ -0,0 +1,170 @@
+"""
+Per-request model routing.
+
+Most messages are routine FAQs that a small, fast model answers well; only
+multi-turn reschedules, complaints and long, complex messages need the large
+model. ModelRouter picks a model from ordered rules matched against the
+classified intent, message length, conversation step and turn count, and
+keeps per-model latency, token and cost counters so the rules can be tuned.
+
+Rules and prices are loaded from JSON (LLM_ROUTING_CONFIG, defaulting to the
+model_routing.json shipped next to this module).
+"""
+import os
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTING_CONFIG = os.path.join(os.path.dirname(__file__), "model_routing.json")
+
+
+@dataclass
+class RoutingRule:
+    """A routing rule; every condition that is set must match"""
+    name: str
+    model: str
+    intents: List[str] = field(default_factory=list)
+    keywords: List[str] = field(default_factory=list)
+    steps: List[str] = field(default_factory=list)
+    min_length: int = 0
+    min_turns: int = 0
+
+    def matches(self, intent: Optional[str], message: str, step: Optional[str], turns: int) -> bool:
+        if self.intents and intent not in self.intents:
+            return False
+        if self.keywords:
+            message_lower = message.lower()
+            if not any(keyword in message_lower for keyword in self.keywords):
+                return False
+        if self.steps and step not in self.steps:
+            return False
+        if len(message) < self.min_length:
+            return False
+        if turns < self.min_turns:
+            return False
+        return True
+
+
+class ModelRouter:
+    """Chooses a model per request and tracks per-model usage"""
+
+    def __init__(
+        self,
+        default_model: str = "gpt-3.5-turbo",
+        rules: Optional[List[RoutingRule]] = None,
+        prices: Optional[Dict[str, Dict[str, float]]] = None
+    ):
+        """
+        Args:
+            default_model: Model used when no rule matches
+            rules: Rules checked in order; the first match wins
+            prices: USD per 1K tokens per model, as {"prompt": ..., "completion": ...}
+        """
+        self.default_model = default_model
+        self.rules = rules or []
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, Any]] = {}
+        self._routes: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelRouter":
+        return cls(
+            default_model=config.get("default_model", "gpt-3.5-turbo"),
+            rules=[RoutingRule(**rule) for rule in config.get("rules", [])],
+            prices=config.get("prices", {})
+        )
+
+    def route(
+        self,
+        message: str,
+        intent: Optional[str] = None,
+        step: Optional[str] = None,
+        turns: int = 0
+    ) -> Tuple[str, str]:
+        """
+        Pick the model for a request
+
+        Args:
+            message: User's message
+            intent: Classified intent, if known
+            step: Current conversation step
+            turns: Number of user messages so far in the conversation
+
+        Returns:
+            tuple: (model, name of the matching rule or "default")
+        """
+        for rule in self.rules:
+            if rule.matches(intent, message, step, turns):
+                chosen = (rule.model, rule.name)
+                break
+        else:
+            chosen = (self.default_model, "default")
+
+        with self._lock:
+            self._routes[chosen[1]] = self._routes.get(chosen[1], 0) + 1
+        return chosen
+
+    def record(self, model: str, latency: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """Record a completed call to model"""
+        price = self.prices.get(model, {})
+        cost = (prompt_tokens * price.get("prompt", 0.0) + completion_tokens * price.get("completion", 0.0)) / 1000
+        with self._lock:
+            usage = self._usage.setdefault(model, {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost_usd": 0.0,
+                "latency_total": 0.0,
+                "latencies": deque(maxlen=200),
+            })
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["cost_usd"] += cost
+            usage["latency_total"] += latency
+            usage["latencies"].append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {}
+            for model, usage in self._usage.items():
+                latencies = sorted(usage["latencies"])
+                models[model] = {
+                    "calls": usage["calls"],
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "cost_usd": round(usage["cost_usd"], 6),
+                    "avg_latency_seconds": round(usage["latency_total"] / usage["calls"], 3),
+                    "p95_latency_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                }
+            return {
+                "default_model": self.default_model,
+                "routes": dict(self._routes),
+                "models": models,
+            }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Get the process-wide router, loading rules from LLM_ROUTING_CONFIG"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            config_path = os.getenv("LLM_ROUTING_CONFIG") or DEFAULT_ROUTING_CONFIG
+            try:
+                with open(config_path) as f:
+                    _router = ModelRouter.from_config(json.load(f))
+                logger.info("Loaded %s model routing rules from %s", len(_router.rules), config_path)
+            except Exception as e:
+                logger.error("Failed to load model routing config %s: %s", config_path, e)
+                _router = ModelRouter()
+        return _router
@@ -0,0 +1,455 @@
+"""
+Durable outbound SMS queue.
+
+Replies are written to a SQLite queue before they are sent, so a failed send
+is retried instead of lost:
+
+- enqueue() is idempotent per key (e.g. the inbound MessageSid), so a webhook
+  retried by Twilio produces exactly one reply
+- failed sends are rescheduled with jittered exponential backoff
+- messages that exhaust their attempts move to a dead-letter table
+- OutboundWorker drains the queue with a pool of concurrent senders while
+  keeping messages to the same number in order
+- claims are leases held by one queue instance and renewed while the send is
+  in flight, so another worker process sharing the file only takes a message
+  back once its owner has stopped renewing it (e.g. crashed)
+- get_metrics() reports depth, in-flight count and the age of the oldest
+  pending message
+"""
+import os
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    to_number TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    claimed_at REAL,
+    claimed_by TEXT,
+    lease_until REAL,
+    sid TEXT,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbound_due ON outbound_messages (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbound_destination ON outbound_messages (to_number, status, id);
+CREATE TABLE IF NOT EXISTS outbound_dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id INTEGER NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    to_number TEXT NOT NULL,
+    body TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    dead_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first release; added to existing queue files on open
+MIGRATED_COLUMNS = {"claimed_by": "TEXT", "lease_until": "REAL"}
+
+
+class OutboundQueue:
+    """SQLite-backed outbound message queue"""
+
+    def __init__(
+        self,
+        path: str = "outbound_queue.db",
+        max_attempts: int = 6,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        lease: float = 60.0,
+        time_func: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            path: SQLite database file (":memory:" for tests)
+            max_attempts: Send attempts before a message is dead-lettered
+            backoff_base: Delay before the first retry in seconds, doubled per attempt
+            backoff_max: Longest delay between attempts
+            lease: Seconds a claim is held without being renewed before another
+                process may take the message back
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        # Identifies this instance's claims among the processes sharing the file
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._time = time_func
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(outbound_messages)")}
+        for column, column_type in MIGRATED_COLUMNS.items():
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE outbound_messages ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError as e:
+                    # Another worker opening the same file added it first
+                    if "duplicate column" not in str(e):
+                        raise
+
+    def enqueue(self, to_number: str, body: str, idempotency_key: str) -> Tuple[int, bool]:
+        """
+        Add a message unless one with the same key was already enqueued
+
+        Returns:
+            tuple: (message id, True if this call created it)
+        """
+        now = self._time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbound_messages "
+                "(idempotency_key, to_number, body, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (idempotency_key, to_number, body, PENDING, now, now, now)
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid, True
+            row = self._conn.execute(
+                "SELECT id FROM outbound_messages WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+            return row["id"], False
+
+    def contains(self, idempotency_key: str) -> bool:
+        """Whether a message with this key was ever enqueued"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM outbound_messages WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone() is not None
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Claim up to limit due messages for sending
+
+        Only the oldest unsent message per destination is eligible, and none
+        while another message to that destination is in flight, so each
+        number receives its messages in enqueue order. Each claim is a lease
+        for this instance; renew it with extend_leases() while sending.
+        """
+        if limit <= 0:
+            return []
+        now = self._time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    """
+                    SELECT m.* FROM outbound_messages m
+                    WHERE m.status = ? AND m.next_attempt_at <= ?
+                      AND m.id = (
+                          SELECT MIN(h.id) FROM outbound_messages h
+                          WHERE h.to_number = m.to_number AND h.status IN (?, ?)
+                      )
+                    ORDER BY m.next_attempt_at, m.id
+                    LIMIT ?
+                    """,
+                    (PENDING, now, PENDING, SENDING, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbound_messages SET status = ?, claimed_at = ?, claimed_by = ?, lease_until = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    [(SENDING, now, self.owner, now + self.lease, now, row["id"]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def extend_leases(self, message_ids: List[int]) -> int:
+        """
+        Renew this instance's claims on messages it is still sending
+
+        Returns:
+            int: Claims renewed; fewer than given if a lease was lost
+        """
+        if not message_ids:
+            return 0
+        now = self._time()
+        placeholders = ", ".join("?" * len(message_ids))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE outbound_messages SET lease_until = ? "
+                f"WHERE status = ? AND claimed_by = ? AND id IN ({placeholders})",
+                (now + self.lease, SENDING, self.owner, *message_ids)
+            )
+            return cursor.rowcount
+
+    def mark_sent(self, message_id: int, sid: Optional[str] = None):
+        now = self._time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbound_messages SET status = ?, sid = ?, attempts = attempts + 1, "
+                "updated_at = ?, last_error = NULL WHERE id = ?",
+                (SENT, sid, now, message_id)
+            )
+
+    def mark_failed(self, message_id: int, error: str, retry: bool = True) -> str:
+        """
+        Record a failed attempt and reschedule or dead-letter the message
+
+        Args:
+            retry: False to dead-letter now, e.g. when the message may have
+                been sent and another attempt could deliver it twice
+
+        Returns:
+            str: The message's new status
+        """
+        now = self._time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM outbound_messages WHERE id = ?", (message_id,)
+                ).fetchone()
+                if row["status"] != SENDING or row["claimed_by"] != self.owner:
+                    # The lease expired and the message was taken back; its
+                    # new owner decides what happens to it
+                    self._conn.execute("ROLLBACK")
+                    logger.warning("Outbound message %s failed after its claim was lost: %s", message_id, error)
+                    return row["status"]
+                attempts = row["attempts"] + 1
+                if attempts >= self.max_attempts or not retry:
+                    status = DEAD
+                    self._conn.execute(
+                        "INSERT INTO outbound_dead_letters "
+                        "(message_id, idempotency_key, to_number, body, attempts, last_error, created_at, dead_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (message_id, row["idempotency_key"], row["to_number"], row["body"],
+                         attempts, error, row["created_at"], now)
+                    )
+                    next_attempt_at = row["next_attempt_at"]
+                else:
+                    status = PENDING
+                    next_attempt_at = now + self._backoff(attempts)
+                self._conn.execute(
+                    "UPDATE outbound_messages SET status = ?, attempts = ?, next_attempt_at = ?, "
+                    "updated_at = ?, last_error = ? WHERE id = ?",
+                    (status, attempts, next_attempt_at, now, error, message_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if status == DEAD:
+            logger.error("Outbound message %s dead-lettered after %s attempts: %s", message_id, attempts, error,
+                         extra={"to_number": row["to_number"]})
+        return status
+
+    def _backoff(self, attempts: int) -> float:
+        # Jitter between half and the full exponential delay
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def recover_stale(self) -> int:
+        """Return messages whose claim was not renewed (e.g. after a crash) to the queue"""
+        now = self._time()
+        with self._lock:
+            # Claims made before leases existed have no lease_until
+            cursor = self._conn.execute(
+                "UPDATE outbound_messages SET status = ?, claimed_by = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = ? AND COALESCE(lease_until, claimed_at + ?) < ?",
+                (PENDING, now, SENDING, self.lease, now)
+            )
+            return cursor.rowcount
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbound_dead_letters ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_dead_letter(self, dead_letter_id: int) -> bool:
+        """Give a dead-lettered message a fresh set of attempts"""
+        now = self._time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_id FROM outbound_dead_letters WHERE id = ?", (dead_letter_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._conn.execute(
+                "UPDATE outbound_messages SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (PENDING, now, now, row["message_id"])
+            )
+            self._conn.execute("DELETE FROM outbound_dead_letters WHERE id = ?", (dead_letter_id,))
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count, oldest pending age and totals"""
+        now = self._time()
+        with self._lock:
+            counts = {
+                row["status"]: row["count"]
+                for row in self._conn.execute(
+                    "SELECT status, COUNT(*) AS count FROM outbound_messages GROUP BY status"
+                )
+            }
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) AS oldest FROM outbound_messages WHERE status IN (?, ?)",
+                (PENDING, SENDING)
+            ).fetchone()["oldest"]
+            dead_letters = self._conn.execute("SELECT COUNT(*) AS count FROM outbound_dead_letters").fetchone()["count"]
+        return {
+            "depth": counts.get(PENDING, 0),
+            "in_flight": counts.get(SENDING, 0),
+            "oldest_pending_age_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            "sent": counts.get(SENT, 0),
+            "dead_letters": dead_letters,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboundWorker:
+    """Pool of async senders draining an OutboundQueue"""
+
+    def __init__(
+        self,
+        queue: OutboundQueue,
+        send: Callable[[str, str], Awaitable[Any]],
+        concurrency: int = 10,
+        poll_interval: float = 0.5,
+        renew_interval: Optional[float] = None
+    ):
+        """
+        Args:
+            queue: Queue to drain
+            send: Coroutine function (to, body) returning an object with
+                success, sid and error attributes (e.g. twilio_sender.SendResult)
+            concurrency: Messages sent at once
+            poll_interval: Seconds between polls when the queue is idle
+            renew_interval: Seconds between renewals of the claims being sent;
+                a third of the queue's lease by default
+        """
+        self.queue = queue
+        self.send = send
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.renew_interval = renew_interval if renew_interval is not None else queue.lease / 3
+        self._in_flight = set()
+        self._sending: Set[int] = set()
+        self._renewed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def notify(self):
+        """Wake the worker after an enqueue instead of waiting for the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Stop claiming new messages and wait for in-flight sends"""
+        self._stopping = True
+        self.notify()
+        if self._task:
+            await self._task
+        if self._in_flight:
+            await asyncio.wait(self._in_flight, timeout=drain_timeout)
+
+    async def drain(self):
+        """Send until nothing is due and nothing is in flight (used by tools and tests)"""
+        while True:
+            self._dispatch()
+            if not self._in_flight:
+                return
+            await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                self._renew_leases()
+                recovered = self.queue.recover_stale()
+                if recovered:
+                    logger.warning("Returned %s stale in-flight outbound messages to the queue", recovered)
+                self._dispatch()
+            except Exception as e:
+                logger.error("Outbound worker error: %s", e)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _renew_leases(self):
+        now = time.monotonic()
+        if self._sending and now - self._renewed_at >= self.renew_interval:
+            self._renewed_at = now
+            self.queue.extend_leases(list(self._sending))
+
+    def _dispatch(self):
+        for message in self.queue.claim(self.concurrency - len(self._in_flight)):
+            self._sending.add(message["id"])
+            task = asyncio.get_running_loop().create_task(self._deliver(message))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _deliver(self, message: Dict[str, Any]):
+        try:
+            result = await self.send(message["to_number"], message["body"])
+            success, error = result.success, result.error
+            sid = getattr(result, "sid", None)
+            retry = not getattr(result, "delivery_unknown", False)
+        except Exception as e:
+            success, error, sid, retry = False, f"{type(e).__name__}: {e}", None, True
+
+        try:
+            if success:
+                self.queue.mark_sent(message["id"], sid)
+            else:
+                self.queue.mark_failed(message["id"], error or "unknown error", retry)
+        finally:
+            self._sending.discard(message["id"])
+        # A send finishing may unblock the next message to the same number
+        self.notify()
+
+
+def create_outbound_queue() -> Optional[OutboundQueue]:
+    """Create the queue at OUTBOUND_QUEUE_PATH, or None if OUTBOUND_QUEUE_ENABLED is false"""
+    if os.getenv("OUTBOUND_QUEUE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return OutboundQueue(
+        os.getenv("OUTBOUND_QUEUE_PATH", "outbound_queue.db"),
+        max_attempts=int(os.getenv("OUTBOUND_QUEUE_MAX_ATTEMPTS", "6")),
+        backoff_base=float(os.getenv("OUTBOUND_QUEUE_BACKOFF_SECONDS", "2")),
+        backoff_max=float(os.getenv("OUTBOUND_QUEUE_BACKOFF_MAX_SECONDS", "300")),
+        lease=float(os.getenv("OUTBOUND_QUEUE_LEASE_SECONDS", "60"))
+    )
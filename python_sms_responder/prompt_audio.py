@@ -0,0 +1,302 @@
+"""
+Pre-synthesized audio for repeated voice prompts.
+
+Every call speaks the same fixed phrases (greeting, "anything else?",
+reprompts, goodbye), and Twilio synthesizes a <Say> afresh each time. The
+PromptAudioCache renders phrases to audio files once through a pluggable TTS
+backend, so the TwiML can <Play> them from our static endpoint instead:
+
+- fixed prompts are rendered at startup and pinned
+- AI answers are counted, and one that recurs min_hits times is rendered in
+  the background, so later calls play it
+- files are named by a content hash of backend, voice and text, and unpinned
+  files are evicted least-recently-used once the cache exceeds max_bytes
+
+With several worker processes sharing the directory (shared=True), only the
+fixed prompts are rendered and nothing is evicted: one process can't know
+which files the others have handed to Twilio, and a <Play> may be fetched
+from any worker, so every file must stay on disk.
+
+Backends: OpenAITTSBackend for production, OfflineTTSBackend (a deterministic
+WAV tone, no network) for tests and local development.
+"""
+import io
+import os
+import re
+import math
+import wave
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set
+
+from .metrics import EXTERNAL_CALL_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+AUDIO_ROUTE = "/voice/audio"
+
+MEDIA_TYPES = {"wav": "audio/wav", "mp3": "audio/mpeg"}
+
+# Names produced by PromptAudioCache.key
+FILENAME_PATTERN = re.compile(r"[0-9a-f]{32}\.[a-z0-9]+")
+
+
+class OfflineTTSBackend:
+    """Renders a short tone whose length follows the text; no network needed"""
+
+    name = "offline"
+    extension = "wav"
+
+    def __init__(self, sample_rate: int = 8000):
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        self.calls += 1
+        # Roughly speaking pace: 15 characters per second
+        frames = int(self.sample_rate * max(0.2, len(text) / 15))
+        frequency = 220 + int(hashlib.sha256(f"{voice}|{text}".encode()).hexdigest()[:2], 16)
+        samples = b"".join(
+            struct.pack("<h", int(3000 * math.sin(2 * math.pi * frequency * i / self.sample_rate)))
+            for i in range(frames)
+        )
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(samples)
+        return buffer.getvalue()
+
+
+class OpenAITTSBackend:
+    """Synthesizes speech with OpenAI's text-to-speech API"""
+
+    name = "openai"
+    extension = "mp3"
+
+    def __init__(self, client, model: str = "tts-1", timeout: float = 15.0):
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+
+    @timed(EXTERNAL_CALL_SECONDS.labels("openai", "tts"))
+    def synthesize(self, text: str, voice: str) -> bytes:
+        response = self.client.audio.speech.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            response_format="mp3",
+            timeout=self.timeout
+        )
+        return response.content
+
+
+class PromptAudioCache:
+    """Content-addressed, size-bounded cache of synthesized prompts on disk"""
+
+    def __init__(
+        self,
+        directory: str,
+        backend,
+        voice: str = "nova",
+        max_bytes: int = 50 * 1024 * 1024,
+        min_hits: int = 3,
+        max_text_length: int = 400,
+        background: bool = True,
+        shared: bool = False
+    ):
+        """
+        Args:
+            directory: Where audio files are written
+            backend: Object with name, extension and synthesize(text, voice) -> bytes
+            voice: Backend voice name
+            max_bytes: Disk budget; unpinned files are evicted least-recently-used beyond it
+            min_hits: Times an AI answer must be seen before it is rendered
+            max_text_length: Longer answers are never rendered
+            background: Render observed answers on a worker thread (False renders inline)
+            shared: Other processes use the directory too; render only pinned prompts and never evict
+        """
+        self.directory = directory
+        self.backend = backend
+        self.voice = voice
+        self.max_bytes = max_bytes
+        self.min_hits = min_hits
+        self.max_text_length = max_text_length
+        self.shared = shared
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self._seen: Dict[str, int] = {}
+        self._rendering: Set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prompt-audio") if background else None
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "render_errors": 0, "evictions": 0}
+
+        # Resume the LRU order from file modification times
+        suffix = f".{backend.extension}"
+        existing = []
+        for filename in os.listdir(directory):
+            if filename.endswith(suffix):
+                path = os.path.join(directory, filename)
+                existing.append((os.path.getmtime(path), filename, os.path.getsize(path)))
+        for _, filename, size in sorted(existing):
+            self._files[filename] = size
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.backend.name}|{self.voice}|{text}".encode("utf-8")).hexdigest()
+        return f"{digest[:32]}.{self.backend.extension}"
+
+    def path_for(self, filename: str) -> Optional[str]:
+        """Path of a cached file, or None if it is not in the cache"""
+        if not FILENAME_PATTERN.fullmatch(filename) or not filename.endswith(f".{self.backend.extension}"):
+            return None
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            if filename in self._files:
+                return path
+        # Another worker may have rendered it
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._files.setdefault(filename, size)
+        return path
+
+    def lookup(self, text: str) -> Optional[str]:
+        """
+        Filename of the rendered audio for text, if cached
+
+        Returns:
+            str: Filename to serve from AUDIO_ROUTE, or None
+        """
+        filename = self.key(text)
+        with self._lock:
+            if filename in self._files:
+                self._files.move_to_end(filename)
+                self.stats["hits"] += 1
+                return filename
+            self.stats["misses"] += 1
+        return None
+
+    def render(self, text: str, pin: bool = False) -> Optional[str]:
+        """Synthesize text unless already cached, and return its filename"""
+        filename = self.key(text)
+        with self._lock:
+            if pin:
+                self._pinned.add(filename)
+            if filename in self._files:
+                self._files.move_to_end(filename)
+                return filename
+
+        try:
+            audio = self.backend.synthesize(text, self.voice)
+        except Exception as e:
+            self.stats["render_errors"] += 1
+            logger.error("Failed to synthesize prompt audio: %s", e)
+            return None
+
+        path = os.path.join(self.directory, filename)
+        # Workers render the same fixed prompts at startup, so each writes its own temporary file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(audio)
+        os.replace(temporary, path)
+
+        with self._lock:
+            self._files[filename] = len(audio)
+            self.stats["renders"] += 1
+            if not self.shared:
+                self._evict()
+        return filename
+
+    def precompute(self, texts: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Render fixed prompts and pin them so they are never evicted"""
+        return {text: self.render(text, pin=True) for text in texts}
+
+    def observe(self, text: str):
+        """Count an AI answer, rendering it once it has recurred min_hits times"""
+        if self.shared or not text or len(text) > self.max_text_length:
+            return
+        filename = self.key(text)
+        with self._lock:
+            if filename in self._files or filename in self._rendering:
+                return
+            count = self._seen.get(filename, 0) + 1
+            if count < self.min_hits:
+                # Forget one-off answers rather than counting every answer forever
+                if len(self._seen) >= 10000:
+                    self._seen.clear()
+                self._seen[filename] = count
+                return
+            self._seen.pop(filename, None)
+            self._rendering.add(filename)
+
+        if self._executor:
+            self._executor.submit(self._render_observed, text, filename)
+        else:
+            self._render_observed(text, filename)
+
+    def _render_observed(self, text: str, filename: str):
+        try:
+            self.render(text)
+        finally:
+            with self._lock:
+                self._rendering.discard(filename)
+
+    def _evict(self):
+        total = sum(self._files.values())
+        for filename in list(self._files):
+            if total <= self.max_bytes:
+                break
+            if filename in self._pinned:
+                continue
+            total -= self._files.pop(filename)
+            self.stats["evictions"] += 1
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError as e:
+                logger.warning("Failed to remove evicted prompt audio %s: %s", filename, e)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "backend": self.backend.name,
+                "files": len(self._files),
+                "pinned": len(self._pinned),
+                "bytes": sum(self._files.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+def create_prompt_audio_cache(openai_client=None) -> Optional[PromptAudioCache]:
+    """Create the cache configured by VOICE_TTS_BACKEND ("openai" or "offline"); None when unset"""
+    backend_name = os.getenv("VOICE_TTS_BACKEND", "").lower()
+    if not backend_name:
+        return None
+    if backend_name == "offline":
+        backend = OfflineTTSBackend()
+    elif backend_name == "openai":
+        if openai_client is None:
+            logger.warning("VOICE_TTS_BACKEND=openai but OpenAI is not configured; prompt audio disabled")
+            return None
+        backend = OpenAITTSBackend(openai_client, model=os.getenv("VOICE_TTS_MODEL", "tts-1"))
+    else:
+        logger.warning("Unknown VOICE_TTS_BACKEND %r; prompt audio disabled", backend_name)
+        return None
+
+    return PromptAudioCache(
+        os.getenv("VOICE_AUDIO_CACHE_DIR", "voice_audio_cache"),
+        backend,
+        voice=os.getenv("VOICE_TTS_VOICE", "nova"),
+        max_bytes=int(os.getenv("VOICE_AUDIO_CACHE_MAX_MB", "50")) * 1024 * 1024,
+        min_hits=int(os.getenv("VOICE_AUDIO_MIN_HITS", "3")),
+        shared=int(os.getenv("WORKER_COUNT", "1")) > 1
+    )
@@ -0,0 +1,155 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompts are split into a static prefix (system prompt plus static salon facts)
+and a dynamic user message. The prefix is built once and reused byte-for-byte
+so the provider's prompt caching can reuse it across requests; the dynamic
+sections are filled in priority order until the token budget is used up.
+"""
+import re
+import json
+import math
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+_APPROX_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Counts tokens locally
+
+    Uses tiktoken when it is installed and its encoding is available offline;
+    otherwise falls back to a word/punctuation approximation that assumes
+    roughly four characters per token for long words.
+    """
+
+    def __init__(self, model: str = "gpt-4"):
+        self.model = model
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.encoding_for_model(model)
+        except Exception:
+            self._encoding = None
+
+    @property
+    def name(self) -> str:
+        return "tiktoken" if self._encoding is not None else "approximate"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return sum(max(1, math.ceil(len(piece) / 4)) for piece in _APPROX_TOKEN_PATTERN.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens, preferring whole lines"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        kept = []
+        used = 0
+        for line in text.split("\n"):
+            line_tokens = self.count(line) + 1
+            if used + line_tokens > max_tokens:
+                break
+            kept.append(line)
+            used += line_tokens
+        if kept:
+            return "\n".join(kept)
+
+        # The first line alone is over budget: keep as many words as fit
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count(" ".join(words[:mid])) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return " ".join(words[:low])
+
+
+@dataclass
+class PromptSection:
+    """One block of the dynamic prompt"""
+    name: str
+    text: str
+    priority: int
+    required: bool = False
+
+
+class PromptBuilder:
+    """Fills prompt sections by priority within a token budget"""
+
+    def __init__(self, token_budget: int = 1200, counter: Optional[TokenCounter] = None):
+        self.token_budget = token_budget
+        self.counter = counter or TokenCounter()
+
+    def build(self, sections: List[PromptSection]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Assemble sections into a prompt
+
+        Sections are admitted in priority order (lower number first). A section
+        that does not fit is truncated to the remaining budget; required
+        sections are always kept. The output keeps the sections' original order.
+
+        Returns:
+            tuple: (prompt text, per-section token usage)
+        """
+        remaining = self.token_budget
+        admitted: Dict[str, str] = {}
+        usage: Dict[str, Any] = {"budget": self.token_budget, "sections": {}}
+
+        for section in sorted(sections, key=lambda s: s.priority):
+            if not section.text:
+                continue
+            tokens = self.counter.count(section.text)
+            if tokens <= remaining:
+                text, used, status = section.text, tokens, "included"
+            else:
+                limit = max(remaining, self.token_budget // 4) if section.required else remaining
+                text = self.counter.truncate(section.text, limit)
+                used = self.counter.count(text)
+                status = "truncated" if text else "dropped"
+
+            remaining -= used
+            usage["sections"][section.name] = {"tokens": used, "requested": tokens, "status": status}
+            if text:
+                admitted[section.name] = text
+
+        prompt = "\n\n".join(admitted[s.name] for s in sections if s.name in admitted)
+        usage["total"] = self.token_budget - remaining
+        return prompt, usage
+
+
+class StaticPrefix:
+    """
+    System prompt plus static salon facts, rendered once
+
+    Keeping this string byte-identical between requests lets the provider
+    reuse its cached prefix; nothing time- or client-dependent belongs here.
+    """
+
+    def __init__(self, system_prompt: str, static_facts: str = "", counter: Optional[TokenCounter] = None):
+        self.text = system_prompt.strip()
+        if static_facts:
+            self.text += "\n\n" + static_facts.strip()
+        self.tokens = (counter or TokenCounter()).count(self.text)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+def format_context_value(value: Any) -> str:
+    """Render a context value compactly (nested data as dense JSON)"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    return str(value)
@@ -0,0 +1,308 @@
+"""
+Per-query statistics and a slow-query log for the database services.
+
+Every cursor DatabaseService and RealTimeDataConnector open is wrapped in an
+InstrumentedCursor, which times each execute() and files it under the
+query's fingerprint: the SQL with literals and parameters replaced by "?"
+and whitespace collapsed, so the same statement with different values is
+counted once. For each fingerprint the stats keep the count, total and
+maximum duration, rows returned or affected, and errors.
+
+A query slower than SLOW_QUERY_MS is logged with the shape of its
+parameters (their types, never their values) and, at most once per
+fingerprint per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS, its EXPLAIN plan. The
+EXPLAIN runs on the same connection inside a savepoint, so a failure cannot
+abort the caller's transaction.
+
+Stats are per process; GET /debug/queries (an admin endpoint) returns this
+worker's top queries by total time.
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements EXPLAIN accepts; without ANALYZE it plans them without running them
+EXPLAINABLE = frozenset({"select", "insert", "update", "delete", "with", "values"})
+
+ORDERS = {
+    "total": lambda stat: stat.total,
+    "count": lambda stat: stat.count,
+    "max": lambda stat: stat.max,
+    "mean": lambda stat: stat.total / stat.count if stat.count else 0.0,
+}
+
+# Raw SQL -> (fingerprint, normalized SQL). Queries are mostly constants in
+# the code, so after the first call each one is a dict lookup
+_fingerprints: Dict[str, tuple] = {}
+_FINGERPRINT_CACHE_SIZE = 1024
+
+
+def normalize_sql(query: str) -> str:
+    """SQL with comments, literals and parameters removed, for grouping"""
+    sql = _COMMENT.sub(" ", query)
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _VALUE_LIST.sub("(?+)", sql)
+    return _WHITESPACE.sub(" ", sql).strip().lower()
+
+
+def fingerprint(query: str) -> tuple:
+    """(fingerprint ID, normalized SQL) for a query"""
+    cached = _fingerprints.get(query)
+    if cached is None:
+        sql = normalize_sql(query)
+        cached = (hashlib.blake2b(sql.encode(), digest_size=8).hexdigest(), sql)
+        if len(_fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+            # Only reached if queries are built with values inlined
+            _fingerprints.clear()
+        _fingerprints[query] = cached
+    return cached
+
+
+def params_shape(params) -> Any:
+    """Parameter types without their values, which may be phone numbers or names"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+def explain(connection, query: str, params) -> Optional[str]:
+    """
+    EXPLAIN plan for a query, or None if it could not be produced
+
+    Literals in the plan (parameter values substituted into filters) are
+    replaced by "?".
+    """
+    savepoint = not getattr(connection, "autocommit", False)
+    cursor = connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT query_stats_explain")
+        try:
+            cursor.execute("EXPLAIN " + query, params)
+            plan = "\n".join(str(row[0]) for row in cursor.fetchall())
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+            logger.debug("EXPLAIN failed: %s", e)
+            return None
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT query_stats_explain")
+        return _STRING_LITERAL.sub("?", plan)
+    except Exception as e:
+        logger.debug("EXPLAIN savepoint failed: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+
+class QueryStat:
+    """Totals for one query fingerprint"""
+
+    __slots__ = ("fingerprint", "sql", "source", "count", "total", "max", "rows", "errors", "slow",
+                 "last_plan", "last_explained")
+
+    def __init__(self, fingerprint_id: str, sql: str, source: str):
+        self.fingerprint = fingerprint_id
+        self.sql = sql
+        self.source = source
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.slow = 0
+        self.last_plan: Optional[str] = None
+        self.last_explained: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "source": self.source,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "errors": self.errors,
+            "slow": self.slow,
+            "last_plan": self.last_plan,
+        }
+
+
+class QueryStats:
+    """
+    Query statistics by fingerprint, with a slow-query log
+
+    Args:
+        slow_ms: Queries at least this slow are logged; 0 turns the log off
+        explain: Include the EXPLAIN plan in slow-query logs
+        explain_interval: Seconds before the same fingerprint is explained again
+        clock: Monotonic clock, for tests
+    """
+
+    def __init__(self, slow_ms: float = 200.0, explain: bool = True, explain_interval: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._slow_seconds = slow_ms / 1000 if slow_ms > 0 else float("inf")
+        self._clock = clock
+        self._stats: Dict[str, QueryStat] = {}
+        self._lock = threading.Lock()
+
+    def record(self, query: str, source: str, seconds: float, rows: int = 0, error: bool = False) -> QueryStat:
+        """Add one execution to its fingerprint's totals"""
+        fingerprint_id, sql = fingerprint(query)
+        with self._lock:
+            stat = self._stats.get(fingerprint_id)
+            if stat is None:
+                stat = self._stats[fingerprint_id] = QueryStat(fingerprint_id, sql, source)
+            stat.count += 1
+            stat.total += seconds
+            if seconds > stat.max:
+                stat.max = seconds
+            stat.rows += rows
+            if error:
+                stat.errors += 1
+        return stat
+
+    def is_slow(self, seconds: float) -> bool:
+        return seconds >= self._slow_seconds
+
+    def _claim_explain(self, stat: QueryStat) -> bool:
+        """Whether this slow execution should be explained; at most one per interval per fingerprint"""
+        if not self.explain or stat.sql.split(" ", 1)[0] not in EXPLAINABLE:
+            return False
+        now = self._clock()
+        with self._lock:
+            if stat.last_explained is not None and now - stat.last_explained < self.explain_interval:
+                return False
+            stat.last_explained = now
+        return True
+
+    def log_slow(self, stat: QueryStat, connection, query: str, params, seconds: float, rows: int):
+        """Log a slow execution with its parameter shape and, when due, its plan"""
+        with self._lock:
+            stat.slow += 1
+        plan = None
+        if connection is not None and self._claim_explain(stat):
+            plan = explain(connection, query, params)
+            stat.last_plan = plan
+        logger.warning(
+            "Slow query: %.1f ms", seconds * 1000,
+            extra={
+                "fingerprint": stat.fingerprint,
+                "source": stat.source,
+                "sql": stat.sql,
+                "params_shape": params_shape(params),
+                "rows": rows,
+                "plan": plan,
+            }
+        )
+
+    def top(self, limit: int = 20, order: str = "total") -> List[Dict[str, Any]]:
+        """The first `limit` fingerprints by total, count, max or mean time"""
+        key = ORDERS[order]
+        with self._lock:
+            stats = sorted(self._stats.values(), key=key, reverse=True)[:limit]
+            return [stat.to_dict() for stat in stats]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class InstrumentedCursor:
+    """
+    A DB-API cursor whose execute() and executemany() are recorded in the query stats
+
+    Everything else (fetchone, fetchall, rowcount, iteration, close, use as a
+    context manager) goes straight to the wrapped cursor.
+
+    Args:
+        cursor: The psycopg2 cursor
+        source: Which service ran the query ("database", "real_time")
+        stats: Stats to record into; the process-wide ones by default
+    """
+
+    def __init__(self, cursor, source: str, stats: Optional[QueryStats] = None):
+        self._cursor = cursor
+        self._source = source
+        self._stats = stats or get_query_stats()
+
+    def execute(self, query, params=None):
+        return self._run(self._cursor.execute, query, params, explainable=True)
+
+    def executemany(self, query, params_seq):
+        params_seq = list(params_seq)
+        return self._run(self._cursor.executemany, query, params_seq, explainable=False)
+
+    def _run(self, method, query, params, explainable: bool):
+        start = time.perf_counter()
+        try:
+            result = method(query, params)
+        except Exception:
+            self._stats.record(query, self._source, time.perf_counter() - start, error=True)
+            raise
+        seconds = time.perf_counter() - start
+        rows = max(getattr(self._cursor, "rowcount", 0) or 0, 0)
+        stat = self._stats.record(query, self._source, seconds, rows)
+        if self._stats.is_slow(seconds):
+            try:
+                connection = getattr(self._cursor, "connection", None) if explainable else None
+                self._stats.log_slow(stat, connection, query, params, seconds, rows)
+            except Exception as e:
+                # Never fail the caller's query over its slow-query log
+                logger.debug("Slow query log failed: %s", e)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+
+_query_stats: Optional[QueryStats] = None
+_query_stats_lock = threading.Lock()
+
+
+def get_query_stats() -> QueryStats:
+    """Get the process-wide query stats, configured from the environment"""
+    global _query_stats
+    if _query_stats is None:
+        with _query_stats_lock:
+            if _query_stats is None:
+                _query_stats = QueryStats(
+                    slow_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+                    explain=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() not in ("0", "false", "no"),
+                    explain_interval=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300")),
+                )
+    return _query_stats
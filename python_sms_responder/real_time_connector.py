@@ -5,6 +5,10 @@ from typing import Dict, List, Any, Optional
 import psycopg2
 import psycopg2.extras
 
+from .metrics import DB_QUERY_SECONDS, timed
+from .query_stats import InstrumentedCursor
+from .tracing import CLIENT, traced
+
 class RealTimeDataConnector:
     """Connects to the salon database to fetch real-time data for the LLM"""
     
@@ -31,9 +35,15 @@ class RealTimeDataConnector:
         try:
             return psycopg2.connect(self.connection_string)
         except Exception as e:
-            self.logger.error(f"Database connection error: {str(e)}")
+            self.logger.error("Database connection error: %s", e)
             raise
     
+    def _cursor(self, conn, **kwargs):
+        """A cursor whose queries are timed and counted by fingerprint (see query_stats)"""
+        return InstrumentedCursor(conn.cursor(**kwargs), "real_time")
+    
+    @traced("real_time.get_available_slots", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("real_time", "get_available_slots"))
     def get_available_slots(self, date_range_days: int = 7) -> Dict[str, List[Dict]]:
         """
         Get available appointment slots for the next X days
@@ -46,7 +56,7 @@ class RealTimeDataConnector:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             result = {}
             today = datetime.now().date()
@@ -107,12 +117,14 @@ class RealTimeDataConnector:
             return result
             
         except Exception as e:
-            self.logger.error(f"Error getting available slots: {str(e)}")
+            self.logger.error("Error getting available slots: %s", e)
             return {}
         finally:
             if 'conn' in locals():
                 conn.close()
     
+    @traced("real_time.get_staff_availability", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("real_time", "get_staff_availability"))
     def get_staff_availability(self, date_range_days: int = 7) -> Dict[str, Dict[str, List[Dict]]]:
         """
         Get staff availability for the next X days
@@ -125,7 +137,7 @@ class RealTimeDataConnector:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Get all staff members
             cursor.execute("SELECT id, name FROM staff WHERE active = true ORDER BY name")
@@ -211,12 +223,14 @@ class RealTimeDataConnector:
             return result
             
         except Exception as e:
-            self.logger.error(f"Error getting staff availability: {str(e)}")
+            self.logger.error("Error getting staff availability: %s", e)
             return {}
         finally:
             if 'conn' in locals():
                 conn.close()
     
+    @traced("real_time.get_services_with_details", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("real_time", "get_services_with_details"))
     def get_services_with_details(self) -> Dict[str, List[Dict]]:
         """
         Get all services with detailed information
@@ -226,7 +240,7 @@ class RealTimeDataConnector:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Query for service categories
             cursor.execute("""
@@ -262,12 +276,14 @@ class RealTimeDataConnector:
             return result
             
         except Exception as e:
-            self.logger.error(f"Error getting services: {str(e)}")
+            self.logger.error("Error getting services: %s", e)
             return {}
         finally:
             if 'conn' in locals():
                 conn.close()
     
+    @traced("real_time.get_staff_by_service", {"db.system": "postgresql"}, kind=CLIENT)
+    @timed(DB_QUERY_SECONDS.labels("real_time", "get_staff_by_service"))
     def get_staff_by_service(self, service_id: int = None, service_name: str = None) -> List[Dict]:
         """
         Get staff members who can perform a specific service
@@ -281,7 +297,7 @@ class RealTimeDataConnector:
         """
         try:
             conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = self._cursor(conn, cursor_factory=psycopg2.extras.RealDictCursor)
             
             if not service_id and not service_name:
                 return []
@@ -311,7 +327,7 @@ class RealTimeDataConnector:
             return [dict(row) for row in cursor.fetchall()]
             
         except Exception as e:
-            self.logger.error(f"Error getting staff by service: {str(e)}")
+            self.logger.error("Error getting staff by service: %s", e)
             return []
         finally:
             if 'conn' in locals():
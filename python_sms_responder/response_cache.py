@@ -0,0 +1,306 @@
+"""
+Response cache for LLM completions.
+
+Many inbound texts are the same general question ("what are your hours",
+"how much is a haircut"). This module caches the generated reply for those
+questions, keyed on the normalized message plus every prompt input that can
+change the answer, so repeats are served without another model call.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Context keys that identify a specific client; prompts carrying them are never cached
+PERSONAL_CONTEXT_KEYS = {
+    "name", "client", "client_name", "client_id", "phone", "phone_number",
+    "email", "address", "appointment", "appointments", "upcoming_appointments",
+}
+
+# Phone numbers and email addresses in the message itself make the reply personal
+PERSONAL_MESSAGE_PATTERN = re.compile(
+    r"(\+?\d[\d\-\s().]{6,}\d)|([\w.+-]+@[\w-]+\.[\w.]+)"
+)
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s$']")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class InMemoryCacheBackend:
+    """Process-local LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1000, time_func: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self._time = time_func
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= self._time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        """Store value under key, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (self._time() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Redis-backed cache shared by all workers.
+
+    Entries expire through Redis TTLs. LRU eviction is enforced by the cache
+    itself with a sorted set of last-access times, so it does not depend on the
+    server's maxmemory policy.
+    """
+
+    def __init__(self, url: str, max_entries: int = 1000, prefix: str = "llm_cache:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for the Redis cache backend") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.lru_key = f"{prefix}__lru__"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.client.zrem(self.lru_key, key)
+            return None
+        self.client.zadd(self.lru_key, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value), ex=ttl_seconds)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.execute()
+
+        overflow = self.client.zcard(self.lru_key) - self.max_entries
+        if overflow > 0:
+            evicted = [k.decode() if isinstance(k, bytes) else k
+                       for k, _ in self.client.zpopmin(self.lru_key, overflow)]
+            if evicted:
+                self.client.delete(*[self.prefix + k for k in evicted])
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+        self.client.zrem(self.lru_key, key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self) -> int:
+        return int(self.client.zcard(self.lru_key))
+
+
+class ResponseCache:
+    """Exact-match cache for generated LLM replies with hit-rate and token accounting"""
+
+    def __init__(self, backend=None, ttl_seconds: int = 3600, enabled: bool = True):
+        self.backend = backend if backend is not None else InMemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.saved_tokens = 0
+
+    @staticmethod
+    def normalize_message(message: str) -> str:
+        """
+        Normalize a message for exact matching
+
+        Lowercases, drops punctuation (other than $ and apostrophes) and
+        collapses whitespace, so "What are your hours?" and "what are your hours"
+        share a key.
+        """
+        text = _PUNCTUATION_PATTERN.sub(" ", message.lower())
+        return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def bypass_reason(
+        self,
+        message: str,
+        client_info=None,
+        conversation_summary: Optional[Dict[str, Any]] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Decide whether a prompt is personalized and must not be cached
+
+        Returns:
+            str: Reason for bypassing the cache, or None if the prompt is cacheable
+        """
+        if not self.enabled:
+            return "disabled"
+        if client_info is not None:
+            return "client_info"
+        if conversation_summary:
+            if conversation_summary.get("step") not in (None, "greeting"):
+                return "conversation_state"
+            if any(conversation_summary.get(field) for field in
+                   ("selected_service", "selected_date", "selected_time")):
+                return "conversation_state"
+        if context and any(str(key).lower() in PERSONAL_CONTEXT_KEYS for key in context):
+            return "personal_context"
+        if PERSONAL_MESSAGE_PATTERN.search(message):
+            return "personal_message"
+        return None
+
+    def make_key(
+        self,
+        message: str,
+        model: str,
+        system_prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[str]] = None,
+        **params
+    ) -> str:
+        """
+        Build the cache key for a prompt
+
+        Args:
+            message: Raw user message (normalized here)
+            model: Model name
+            system_prompt: System prompt (only its hash is part of the key)
+            context: Non-personal context items included in the prompt
+            history: Earlier messages included in the prompt; the same text
+                means something else in another conversation, so their hash is
+                part of the key
+            **params: Other generation parameters such as max_tokens and temperature
+
+        Returns:
+            str: Hex digest identifying the prompt
+        """
+        key_material = {
+            "message": self.normalize_message(message),
+            "model": model,
+            "system_prompt": self.hash_text(system_prompt),
+            "context": context or {},
+            "params": params,
+        }
+        if history:
+            key_material["history"] = self.hash_text("\n".join(history))
+        return self.hash_text(json.dumps(key_material, sort_keys=True, default=str))
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached reply, recording a hit or miss"""
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Response cache lookup failed: %s", e)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_tokens += int(entry.get("tokens", 0))
+        return entry["response"]
+
+    def set(self, key: str, response: str, tokens: int = 0):
+        """Store a generated reply along with the tokens it cost to produce"""
+        try:
+            self.backend.set(key, {"response": response, "tokens": tokens}, self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Hits, misses, bypasses, hit rate and tokens saved since startup
+        """
+        lookups = self.hits + self.misses
+        try:
+            entries = len(self.backend)
+        except Exception:
+            entries = None
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Create a response cache from environment configuration
+
+    Environment:
+        LLM_CACHE_ENABLED: "false" disables caching (default "true")
+        LLM_CACHE_BACKEND: "memory" (default) or "redis"
+        LLM_CACHE_TTL_SECONDS: Entry lifetime in seconds (default 3600)
+        LLM_CACHE_MAX_ENTRIES: LRU capacity (default 1000)
+        REDIS_URL: Redis connection URL for the redis backend
+    """
+    enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+    ttl_seconds = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+
+    backend = None
+    if backend_name == "redis":
+        try:
+            backend = RedisCacheBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"), max_entries)
+        except Exception as e:
+            logger.warning("Redis response cache unavailable, using in-memory cache: %s", e)
+    if backend is None:
+        backend = InMemoryCacheBackend(max_entries)
+
+    return ResponseCache(backend=backend, ttl_seconds=ttl_seconds, enabled=enabled)
@@ -0,0 +1,401 @@
+"""
+Semantic FAQ cache for LLM replies.
+
+Most general questions are paraphrases of a small set of FAQs. This module
+embeds incoming messages locally, searches a NumPy nearest-neighbour index of
+approved answers and returns the stored answer when the best match clears a
+similarity threshold and asks about the same slots: the same weekday, the
+same service, no extra "and ..." request. Similarity alone cannot tell
+"hours on Sunday" from "hours on Saturday", and a wrong hit skips the LLM.
+
+The index lives on disk as two files: ``<path>.<digest>.npy`` holds the
+L2-normalized float32 embedding matrix and is opened with ``mmap_mode="r"``
+so every worker shares the same pages, and ``<path>.json`` holds the
+questions, answers, embedder settings and the name and row count of the
+vector file it belongs to. Each save writes a new vector file before
+replacing the metadata, so a reader never pairs new vectors with old entries.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import glob
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9$']+")
+
+# Words that change which answer is right even when the rest of the question
+# matches, mapped to a canonical slot. "and"/"plus" mark a second request.
+SLOT_WORDS = {
+    **{day: day for day in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")},
+    **{abbr: day for abbr, day in (("mon", "monday"), ("tue", "tuesday"), ("tues", "tuesday"),
+                                   ("wed", "wednesday"), ("thu", "thursday"), ("thurs", "thursday"),
+                                   ("fri", "friday"), ("sat", "saturday"), ("sun", "sunday"))},
+    "today": "today", "tonight": "today", "tomorrow": "tomorrow", "weekend": "weekend", "weekends": "weekend",
+    "holiday": "holiday", "holidays": "holiday",
+    "haircut": "haircut", "haircuts": "haircut", "cut": "haircut", "cuts": "haircut", "trim": "haircut",
+    "kid": "child", "kids": "child", "kid's": "child", "kids'": "child", "child": "child", "children": "child",
+    "children's": "child", "toddler": "child",
+    "men": "men", "men's": "men", "mens": "men", "man's": "men", "women": "women", "women's": "women",
+    "womens": "women", "ladies": "women",
+    "color": "color", "colour": "color", "dye": "color", "highlight": "highlights", "highlights": "highlights",
+    "balayage": "balayage", "blowout": "blowout", "blow": "blowout", "updo": "updo",
+    "facial": "facial", "facials": "facial", "manicure": "manicure", "mani": "manicure",
+    "pedicure": "pedicure", "pedi": "pedicure", "gel": "gel", "massage": "massage", "massages": "massage",
+    "wax": "wax", "waxing": "wax", "brow": "brow", "brows": "brow", "eyebrow": "brow", "eyebrows": "brow",
+    "and": "+", "plus": "+", "also": "+",
+}
+
+
+def slot_words(text: str) -> frozenset:
+    """Canonical slot words in a message, e.g. {"sunday"} or {"haircut", "color", "+"}"""
+    return frozenset(SLOT_WORDS[word] for word in _TOKEN_PATTERN.findall(text.lower()) if word in SLOT_WORDS)
+
+
+class HashedNgramEmbedder:
+    """
+    Embeds text as hashed character and word n-gram counts
+
+    Uses CRC32 for hashing (Python's built-in hash is randomized per process)
+    and a sign bit to reduce the bias of collisions. Vectors are L2-normalized
+    so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, n_features: int = 4096, char_ngrams: Tuple[int, int] = (3, 5)):
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+
+    @property
+    def name(self) -> str:
+        return f"hashed-ngram-{self.n_features}-{self.char_ngrams[0]}-{self.char_ngrams[1]}"
+
+    @property
+    def dimension(self) -> int:
+        return self.n_features
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+
+        padded = f" {' '.join(words)} "
+        low, high = self.char_ngrams
+        for n in range(low, high + 1):
+            features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a single text as a normalized float32 vector"""
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.n_features] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.n_features), dtype=np.float32)
+        return np.vstack([self.embed(text) for text in texts])
+
+
+class SentenceTransformerEmbedder:
+    """Embeds text with a small local sentence-transformers model on CPU"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    @property
+    def name(self) -> str:
+        return f"sentence-transformers-{self.model_name}"
+
+    @property
+    def dimension(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_embedder():
+    """
+    Create the message embedder from environment configuration
+
+    SEMANTIC_CACHE_MODEL selects a sentence-transformers model; when unset (or
+    the package is not installed) the hashed n-gram embedder is used.
+    """
+    model_name = os.getenv("SEMANTIC_CACHE_MODEL")
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            logger.warning("Could not load embedding model %s, using hashed n-grams: %s", model_name, e)
+    return HashedNgramEmbedder()
+
+
+class SemanticFAQIndex:
+    """Nearest-neighbour index of approved question/answer pairs"""
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.vectors = np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, question: str, answer: str, faq_id: Optional[str] = None):
+        """Add an approved answer, keyed by the question it answers"""
+        vector = self.embedder.embed(question)[np.newaxis, :]
+        self.vectors = np.vstack([np.asarray(self.vectors), vector])
+        self.entries.append({
+            "id": faq_id if faq_id is not None else str(len(self.entries)),
+            "question": question,
+            "answer": answer
+        })
+
+    def search(self, message: str, k: int = 1) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Find the approved entries most similar to a message
+
+        Args:
+            message: Incoming message
+            k: Number of neighbours to return
+
+        Returns:
+            list: (entry, cosine similarity) pairs, best first
+        """
+        if not self.entries:
+            return []
+        scores = self.vectors @ self.embedder.embed(message)
+        k = min(k, len(self.entries))
+        if k == 1:
+            top = [int(np.argmax(scores))]
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = sorted(top, key=lambda i: -scores[i])
+        return [(self.entries[i], float(scores[i])) for i in top]
+
+    def best_match(self, message: str, k: int = 3) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        The most similar entry that asks about the same slots as the message
+
+        Returns:
+            tuple: (entry, cosine similarity), or None if no close entry agrees
+        """
+        slots = slot_words(message)
+        for entry, score in self.search(message, k):
+            if slot_words(entry["question"]) == slots:
+                return entry, score
+        return None
+
+    def save(self, path: str):
+        """
+        Write the index to a new ``<path>.<digest>.npy`` and then ``<path>.json``
+
+        The metadata names the vector file, so replacing it switches readers
+        to the new vectors and entries at once. The previous vector file is
+        kept for readers still loading it; older ones are removed.
+        """
+        vectors = np.ascontiguousarray(self.vectors, dtype=np.float32)
+        vectors_file = f"{os.path.basename(path)}.{hashlib.blake2b(vectors.tobytes(), digest_size=8).hexdigest()}.npy"
+        metadata = {
+            "version": INDEX_FORMAT_VERSION,
+            "embedder": self.embedder.name,
+            "dimension": self.embedder.dimension,
+            "created_at": time.time(),
+            "vectors": vectors_file,
+            "rows": len(self.entries),
+            "entries": self.entries
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(f"{path}.json") as f:
+                previous_file = json.load(f).get("vectors")
+        except (OSError, ValueError):
+            previous_file = None
+
+        tmp_vectors = os.path.join(directory, f"{vectors_file}.tmp")
+        tmp_metadata = f"{path}.json.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp_vectors, os.path.join(directory, vectors_file))
+        with open(tmp_metadata, "w") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_metadata, f"{path}.json")
+
+        for stale in glob.glob(f"{glob.escape(os.path.join(directory, os.path.basename(path)))}.*.npy"):
+            if os.path.basename(stale) not in (vectors_file, previous_file):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, path: str, embedder=None) -> "SemanticFAQIndex":
+        """
+        Load an index, memory-mapping the embedding matrix
+
+        Raises:
+            ValueError: If the index was built with another embedder, or its
+                vector file does not match its entries
+        """
+        with open(f"{path}.json") as f:
+            metadata = json.load(f)
+
+        index = cls(embedder)
+        if metadata.get("embedder") != index.embedder.name:
+            raise ValueError(
+                f"Index at {path} was built with {metadata.get('embedder')}, "
+                f"not {index.embedder.name}"
+            )
+        # Version 1 indexes kept their vectors at <path>.npy
+        vectors_file = metadata.get("vectors")
+        vectors_path = os.path.join(os.path.dirname(os.path.abspath(path)), vectors_file) if vectors_file \
+            else f"{path}.npy"
+        vectors = np.load(vectors_path, mmap_mode="r")
+        entries = metadata["entries"]
+        rows = metadata.get("rows", len(entries))
+        if not (rows == len(entries) == vectors.shape[0]) or vectors.shape[1:] != (index.embedder.dimension,):
+            raise ValueError(
+                f"Index at {path} has {len(entries)} entries but {vectors_path} holds "
+                f"{vectors.shape[0]} vectors of shape {vectors.shape[1:]}"
+            )
+        index.vectors = vectors
+        index.entries = entries
+        return index
+
+
+class SemanticCache:
+    """Serves approved answers for paraphrased FAQ messages"""
+
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        threshold: float = 0.65,
+        embedder=None,
+        reload_interval: float = 30.0
+    ):
+        self.index_path = index_path
+        self.threshold = threshold
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.reload_interval = reload_interval
+
+        self.index = SemanticFAQIndex(self.embedder)
+        self._index_mtime = None
+        self._last_reload_check = 0.0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if index_path:
+            self._reload_if_changed(force=True)
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.index) > 0
+
+    def _reload_if_changed(self, force: bool = False):
+        """Pick up an index rewritten by another process"""
+        if not self.index_path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+
+        try:
+            mtime = os.path.getmtime(f"{self.index_path}.json")
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+
+        try:
+            index = SemanticFAQIndex.load(self.index_path, self.embedder)
+        except Exception as e:
+            logger.error("Failed to load semantic cache index %s: %s", self.index_path, e)
+            return
+        with self._lock:
+            self.index = index
+            self._index_mtime = mtime
+        logger.info("Loaded semantic cache index with %s answers", len(index))
+
+    def lookup(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an approved answer for a message
+
+        Returns:
+            dict: Matched entry with its similarity score, or None below the
+                threshold or when the entry asks about different slots
+        """
+        self._reload_if_changed()
+        match = self.index.best_match(message)
+        if match and match[1] >= self.threshold:
+            entry, score = match
+            self.hits += 1
+            return {**entry, "score": score}
+        self.misses += 1
+        return None
+
+    def approve(self, question: str, answer: str, faq_id: Optional[str] = None):
+        """Add an approved answer and persist the index for other workers"""
+        with self._lock:
+            index = SemanticFAQIndex(self.embedder)
+            index.vectors = np.array(self.index.vectors, dtype=np.float32)
+            index.entries = list(self.index.entries)
+            index.add(question, answer, faq_id)
+            if self.index_path:
+                index.save(self.index_path)
+                self._index_mtime = os.path.getmtime(f"{self.index_path}.json")
+            self.index = index
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "embedder": self.embedder.name,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_semantic_cache() -> SemanticCache:
+    """
+    Create the semantic cache from environment configuration
+
+    Environment:
+        SEMANTIC_CACHE_INDEX: Index path prefix (without extension); unset disables lookups
+        SEMANTIC_CACHE_THRESHOLD: Minimum cosine similarity for a hit (default 0.65, the
+            hashed embedder's calibration on semantic_cache_messages_sample.jsonl)
+        SEMANTIC_CACHE_MODEL: Optional sentence-transformers model name
+    """
+    return SemanticCache(
+        index_path=os.getenv("SEMANTIC_CACHE_INDEX"),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.65")),
+        embedder=create_embedder()
+    )
@@ -0,0 +1,303 @@
+"""
+Lifespan-managed service container.
+
+Services are constructed once, prewarmed (connection pools opened, HTTP
+clients connected) and closed on shutdown. A service whose construction fails
+is marked failed and retried in the background with exponential backoff,
+instead of on every request that asks for it. Per-service state backs the
+readiness probe, which is kept separate from liveness: a process waiting for
+its database is alive but not ready. Work that needs a service (e.g. the
+outbound SMS sender) registers with on_ready() and starts once it is up,
+however many attempts that takes.
+
+This module must stay cheap to import; service modules are only imported by
+the factories passed in.
+"""
+import os
+import time
+import asyncio
+import inspect
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+@dataclass
+class ServiceSpec:
+    """How to build one service"""
+    name: str
+    label: str
+    factory: Callable[[], Any]
+    required: bool = True
+
+
+class _ServiceState:
+    def __init__(self, spec: ServiceSpec):
+        self.spec = spec
+        self.lock = threading.Lock()
+        self.status = PENDING
+        self.service: Any = None
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        self.next_retry_at = 0.0
+
+
+def _warm_sync(service):
+    """Run the service's warm() if it is a plain method, e.g. opening a connection pool"""
+    warm = getattr(service, "warm", None)
+    if warm is not None and not inspect.iscoroutinefunction(warm):
+        warm()
+
+
+class ServiceContainer:
+    """Owns the app's services from startup to shutdown"""
+
+    def __init__(
+        self,
+        specs: List[ServiceSpec],
+        retry_initial: float = 1.0,
+        retry_max: float = 60.0,
+        timings: Optional[Dict[str, float]] = None,
+        before_create: Optional[Callable[[], None]] = None,
+        time_func: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            specs: Services in the order they are built
+            retry_initial: Seconds before the first retry of a failed service, doubled per failure
+            retry_max: Longest delay between retries
+            timings: Dict to record construction seconds in, keyed by label
+            before_create: Called before each construction (e.g. loading .env)
+            time_func: Monotonic clock for retry scheduling
+        """
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.timings = timings if timings is not None else {}
+        self.before_create = before_create
+        self._time = time_func
+        self._states: Dict[str, _ServiceState] = {spec.name: _ServiceState(spec) for spec in specs}
+        self._ready_callbacks: Dict[str, List[Callable[[Any], None]]] = {}
+        self._retry_task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    def set_required(self, names: List[str]):
+        """Mark which services must be ready before the app reports ready"""
+        for name, state in self._states.items():
+            state.spec.required = name in names
+
+    def on_ready(self, name: str, callback: Callable[[Any], None]):
+        """
+        Call callback(service) on the event loop once the service is ready
+
+        Called once, as soon as the container is started if the service is
+        already up, otherwise after the attempt that succeeds.
+        """
+        self._ready_callbacks.setdefault(name, []).append(callback)
+        self._notify_ready(self._states[name])
+
+    def _notify_ready(self, state: _ServiceState):
+        """Schedule the service's ready callbacks; kept until the container has an event loop"""
+        loop = self._loop
+        if state.status != READY or loop is None:
+            return
+        for callback in self._ready_callbacks.pop(state.spec.name, []):
+            loop.call_soon_threadsafe(callback, state.service)
+
+    def _create(self, state: _ServiceState):
+        """Construct and prewarm one service; callers hold state.lock"""
+        if self.before_create:
+            self.before_create()
+        state.attempts += 1
+        start = time.perf_counter()
+        try:
+            # Shows up in a request's trace when the request had to build the service
+            with span("service.create", {"service.name": state.spec.name}):
+                service = state.spec.factory()
+                _warm_sync(service)
+        except Exception as e:
+            state.status = FAILED
+            state.last_error = str(e)
+            delay = min(self.retry_max, self.retry_initial * 2 ** (state.attempts - 1))
+            state.next_retry_at = self._time() + delay
+            logger.warning("%s initialization failed (attempt %s), retrying in %.0fs: %s",
+                           state.spec.label, state.attempts, delay, e)
+            # Let the retry loop reschedule around a failure seen on the request path
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wake.set)
+        else:
+            state.service = service
+            state.status = READY
+            state.last_error = None
+            state.ready_at = self._time()
+            if state.attempts > 1:
+                logger.info("%s initialized after %s attempts", state.spec.label, state.attempts)
+        self.timings[state.spec.label] = round(time.perf_counter() - start, 3)
+
+    def get(self, name: str):
+        """
+        Get a service, constructing it on first use
+
+        Blocks while the service is built, or while another thread builds it;
+        async code uses get_async() instead.
+
+        A failed service returns None until its retry is due, so requests do not
+        each pay for (and pile onto) a dependency that is down. With the
+        background retry loop running, retries happen there instead.
+
+        Returns:
+            The service instance, or None if it is not available
+        """
+        state = self._states[name]
+        if state.status == READY:
+            return state.service
+        if self._closed:
+            return None
+        if state.status == FAILED and (self._retry_task is not None or self._time() < state.next_retry_at):
+            return None
+        with state.lock:
+            if state.status != READY and not (state.status == FAILED and self._retry_task is not None):
+                self._create(state)
+        self._notify_ready(state)
+        return state.service
+
+    async def get_async(self, name: str):
+        """
+        Get a service from async code without blocking the event loop
+
+        Same rules as get(), but construction, and waiting for a construction
+        already running in another thread, happen in the threadpool.
+
+        Returns:
+            The service instance, or None if it is not available
+        """
+        state = self._states[name]
+        if state.status == READY:
+            return state.service
+        if self._closed:
+            return None
+        if state.status == FAILED and (self._retry_task is not None or self._time() < state.next_retry_at):
+            return None
+        await self._ensure(state)
+        return state.service if state.status == READY else None
+
+    async def _ensure(self, state: _ServiceState):
+        """Construct the service off the event loop, then run any async warm-up on it"""
+        from starlette.concurrency import run_in_threadpool
+
+        def create():
+            with state.lock:
+                if state.status != READY:
+                    self._create(state)
+
+        await run_in_threadpool(create)
+        warm = getattr(state.service, "warm", None)
+        if state.status == READY and inspect.iscoroutinefunction(warm):
+            try:
+                await warm()
+            except Exception as e:
+                # Warming a client is an optimisation; the first request connects anyway
+                logger.warning("%s warm-up failed: %s", state.spec.label, e)
+        self._notify_ready(state)
+
+    async def start(self, prewarm: bool = True):
+        """
+        Start the background retry loop and, with prewarm, build every service now
+
+        Must be called from the serving event loop, since async clients are
+        bound to the loop they were opened on.
+        """
+        self._closed = False
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._retry_task = asyncio.create_task(self._retry_loop())
+        for state in self._states.values():
+            self._notify_ready(state)
+        if prewarm:
+            for state in self._states.values():
+                await self._ensure(state)
+            logger.info("Services started: %s", self.readiness()['services'])
+
+    async def _retry_loop(self):
+        while True:
+            failed = [state for state in self._states.values() if state.status == FAILED]
+            now = self._time()
+            for state in failed:
+                if state.next_retry_at <= now:
+                    await self._ensure(state)
+
+            failed = [state for state in self._states.values() if state.status == FAILED]
+            delay = min([state.next_retry_at for state in failed], default=now + self.retry_max) - self._time()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    async def shutdown(self):
+        """Stop retrying and close every constructed service, in reverse build order"""
+        self._closed = True
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            try:
+                await self._retry_task
+            except asyncio.CancelledError:
+                pass
+            self._retry_task = None
+            self._loop = None
+
+        from starlette.concurrency import run_in_threadpool
+        for state in reversed(list(self._states.values())):
+            service, state.service = state.service, None
+            state.status = PENDING
+            close = getattr(service, "close", None)
+            if close is None:
+                continue
+            try:
+                if inspect.iscoroutinefunction(close):
+                    await close()
+                else:
+                    await run_in_threadpool(close)
+            except Exception as e:
+                logger.warning("Error closing %s: %s", state.spec.label, e)
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Per-service readiness
+
+        Returns:
+            dict: ready (all required services ready) and, per service, its
+                status, whether it is required, attempts and last error
+        """
+        services = {}
+        for name, state in self._states.items():
+            services[name] = {
+                "status": state.status,
+                "required": state.spec.required,
+                "attempts": state.attempts,
+            }
+            if state.last_error:
+                services[name]["error"] = state.last_error
+            if state.status == FAILED:
+                services[name]["retry_in_seconds"] = round(max(0.0, state.next_retry_at - self._time()), 1)
+        ready = not self._closed and all(
+            state.status == READY for state in self._states.values() if state.spec.required
+        )
+        return {"ready": ready, "services": services}
+
+
+def required_services(default: str = "sms,llm,voice") -> List[str]:
+    """Service names that must be up before the app reports ready, from READINESS_REQUIRED_SERVICES"""
+    value = os.getenv("READINESS_REQUIRED_SERVICES", default)
+    return [name.strip() for name in value.split(",") if name.strip()]
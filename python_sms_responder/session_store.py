@@ -0,0 +1,473 @@
+"""
+Shared voice call sessions.
+
+Twilio's callbacks for one call can reach any uvicorn worker, and a deploy
+restarts them all mid-call, so per-call history kept only in process memory
+loses the conversation. SharedCallHistoryStore offers the CallHistoryStore
+API on top of a backend every worker can reach:
+
+- SQLiteSessionBackend: one file shared by the workers on a host
+- RedisSessionBackend: shared across hosts
+
+Each stored call carries a version token that changes on every write. Workers
+keep a local read-through copy of the calls they serve: reads within one
+webhook turn are answered from memory, and the copy is revalidated with a
+version lookup (not a full load) once it is older than revalidate_after. A
+write whose previous version matches the local copy is applied to it in
+place, so a call served by a single worker never reloads its history.
+
+Streamed replies still waiting to be spoken (VoiceService.pending_replies)
+hold a live generator and stay in the worker that started them.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .call_history import CallHistoryStore, RingBuffer
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS voice_sessions (
+    call_sid TEXT PRIMARY KEY,
+    messages TEXT NOT NULL,
+    user_turns INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_voice_sessions_expiry ON voice_sessions (expires_at);
+"""
+
+# (version, messages, user_turns) of a stored call
+SessionState = Tuple[str, List[Dict[str, str]], int]
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+class SQLiteSessionBackend:
+    """Call sessions in a SQLite file shared by the workers on one host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "voice_sessions.db"):
+        """
+        Args:
+            path: SQLite database file (":memory:" for tests)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def append(
+        self, call_sid: str, message: Dict[str, str], capacity: int, ttl: float, now: float
+    ) -> Tuple[Optional[str], str]:
+        """
+        Append a message to a call, keeping at most capacity messages
+
+        Returns:
+            tuple: (version before the write or None for a new call, version after it)
+        """
+        version = _new_version()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so concurrent workers cannot interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT messages, user_turns, version FROM voice_sessions "
+                    "WHERE call_sid = ? AND expires_at > ?",
+                    (call_sid, now)
+                ).fetchone()
+                if row:
+                    messages, user_turns, previous = json.loads(row[0]), row[1], row[2]
+                else:
+                    messages, user_turns, previous = [], 0, None
+                messages.append(message)
+                if message["role"] == "user":
+                    user_turns += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO voice_sessions (call_sid, messages, user_turns, version, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (call_sid, json.dumps(messages[-capacity:]), user_turns, version, now + ttl)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return previous, version
+
+    def load(self, call_sid: str, now: float) -> Optional[SessionState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, messages, user_turns FROM voice_sessions WHERE call_sid = ? AND expires_at > ?",
+                (call_sid, now)
+            ).fetchone()
+        return (row[0], json.loads(row[1]), row[2]) if row else None
+
+    def version(self, call_sid: str, now: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM voice_sessions WHERE call_sid = ? AND expires_at > ?",
+                (call_sid, now)
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, call_sid: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM voice_sessions WHERE call_sid = ?", (call_sid,))
+
+    def sweep(self, now: float) -> List[str]:
+        """Delete expired calls and return their SIDs"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [
+                    row[0] for row in self._conn.execute(
+                        "SELECT call_sid FROM voice_sessions WHERE expires_at <= ?", (now,)
+                    )
+                ]
+                self._conn.execute("DELETE FROM voice_sessions WHERE expires_at <= ?", (now,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return expired
+
+    def count(self, now: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM voice_sessions WHERE expires_at > ?", (now,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Atomically append, trim, bump the version and refresh the TTL; returns the previous version
+_REDIS_APPEND = """
+local previous = redis.call('HGET', KEYS[2], 'version')
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+redis.call('HSET', KEYS[2], 'version', ARGV[4])
+if ARGV[5] == '1' then
+    redis.call('HINCRBY', KEYS[2], 'user_turns', 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[6], ARGV[7])
+return previous
+"""
+
+
+class RedisSessionBackend:
+    """
+    Call sessions in Redis, shared across hosts.
+
+    Each call is a list of JSON messages plus a hash with its version and
+    user turn count; both expire through Redis TTLs. A sorted set of expiry
+    times per call answers count() and sweep() without scanning keys.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "voice_session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for the Redis session backend") from e
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.expiry_key = f"{prefix}__expiry__"
+        self._append = self.client.register_script(_REDIS_APPEND)
+
+    def _keys(self, call_sid: str) -> Tuple[str, str]:
+        return f"{self.prefix}{call_sid}:messages", f"{self.prefix}{call_sid}:meta"
+
+    def append(
+        self, call_sid: str, message: Dict[str, str], capacity: int, ttl: float, now: float
+    ) -> Tuple[Optional[str], str]:
+        version = _new_version()
+        previous = self._append(
+            keys=[*self._keys(call_sid), self.expiry_key],
+            args=[
+                json.dumps(message), capacity, max(1, int(ttl)), version,
+                "1" if message["role"] == "user" else "0", now + ttl, call_sid,
+            ]
+        )
+        return previous or None, version
+
+    def load(self, call_sid: str, now: float) -> Optional[SessionState]:
+        messages_key, meta_key = self._keys(call_sid)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(messages_key, 0, -1)
+        pipe.hgetall(meta_key)
+        messages, meta = pipe.execute()
+        if not meta:
+            return None
+        return meta["version"], [json.loads(message) for message in messages], int(meta.get("user_turns", 0))
+
+    def version(self, call_sid: str, now: float) -> Optional[str]:
+        return self.client.hget(self._keys(call_sid)[1], "version")
+
+    def delete(self, call_sid: str):
+        pipe = self.client.pipeline()
+        pipe.delete(*self._keys(call_sid))
+        pipe.zrem(self.expiry_key, call_sid)
+        pipe.execute()
+
+    def sweep(self, now: float) -> List[str]:
+        """Forget expired calls (their keys have already expired) and return their SIDs"""
+        expired = self.client.zrangebyscore(self.expiry_key, "-inf", now)
+        if expired:
+            self.client.zrem(self.expiry_key, *expired)
+        return expired
+
+    def count(self, now: float) -> int:
+        return self.client.zcount(self.expiry_key, f"({now}", "+inf")
+
+    def close(self):
+        self.client.close()
+
+
+class _CachedCall:
+    __slots__ = ("messages", "user_turns", "version", "validated_at", "last_activity")
+
+    def __init__(self, capacity: int, version: str, now: float):
+        self.messages = RingBuffer(capacity)
+        self.user_turns = 0
+        self.version = version
+        self.validated_at = now
+        self.last_activity = now
+
+
+class SharedCallHistoryStore:
+    """Conversation history per call SID in a shared backend, with a local read-through copy"""
+
+    def __init__(
+        self,
+        backend,
+        capacity: int = 20,
+        idle_ttl: float = 900.0,
+        sweep_interval: float = 60.0,
+        revalidate_after: float = 1.0,
+        on_expire: Optional[Callable[[str], None]] = None,
+        time_func: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            backend: SQLiteSessionBackend or RedisSessionBackend
+            capacity: Messages kept per call; older ones are dropped
+            idle_ttl: Seconds without activity after which a call expires
+            sweep_interval: Minimum seconds between automatic sweeps on append
+            revalidate_after: Seconds a local copy is trusted before its version is checked
+            on_expire: Called with the call SID of each call dropped by a sweep
+            time_func: Wall clock shared by all workers
+        """
+        self.backend = backend
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.revalidate_after = revalidate_after
+        self.on_expire = on_expire
+        self._time = time_func
+        self._lock = threading.Lock()
+        self._local: Dict[str, _CachedCall] = {}
+        self._last_sweep = time_func()
+        self.stats = {
+            "appended": 0, "local_hits": 0, "revalidations": 0, "loads": 0,
+            "expired": 0, "sweeps": 0, "backend_errors": 0,
+        }
+
+    def _entry(self, call_sid: str) -> Optional[_CachedCall]:
+        """The call's local copy, revalidated or reloaded from the backend when stale"""
+        now = self._time()
+        cached = self._local.get(call_sid)
+        if cached and now - cached.validated_at < self.revalidate_after:
+            self.stats["local_hits"] += 1
+            return cached
+
+        if cached and self.backend.version(call_sid, now) == cached.version:
+            self.stats["revalidations"] += 1
+            cached.validated_at = now
+            return cached
+
+        self.stats["loads"] += 1
+        state = self.backend.load(call_sid, now)
+        with self._lock:
+            if state is None:
+                self._local.pop(call_sid, None)
+                return None
+            version, messages, user_turns = state
+            entry = _CachedCall(self.capacity, version, now)
+            for message in messages:
+                entry.messages.append(message)
+            entry.user_turns = user_turns
+            self._local[call_sid] = entry
+            return entry
+
+    def append(self, call_sid: str, role: str, content: str):
+        """Add a message to a call, starting its history if needed"""
+        now = self._time()
+        message = {"role": role, "content": content}
+        previous, version = self.backend.append(call_sid, message, self.capacity, self.idle_ttl, now)
+
+        with self._lock:
+            self.stats["appended"] += 1
+            cached = self._local.get(call_sid)
+            if previous is None:
+                # A new call, or one that had expired: nothing else can be in it yet
+                cached = self._local[call_sid] = _CachedCall(self.capacity, version, now)
+            elif cached is None or cached.version != previous:
+                # Another worker wrote in between; reload on the next read
+                self._local.pop(call_sid, None)
+                cached = None
+            if cached:
+                cached.messages.append(message)
+                if role == "user":
+                    cached.user_turns += 1
+                cached.version = version
+                cached.validated_at = now
+                cached.last_activity = now
+            sweep_due = now - self._last_sweep >= self.sweep_interval
+
+        if sweep_due:
+            self.sweep()
+
+    def recent(self, call_sid: str, count: int) -> Iterator[Dict[str, str]]:
+        """Iterate over a call's newest count messages, oldest first"""
+        entry = self._entry(call_sid)
+        return entry.messages.latest(count) if entry else iter(())
+
+    def user_turns(self, call_sid: str) -> int:
+        """Number of caller utterances so far, including ones already dropped"""
+        entry = self._entry(call_sid)
+        return entry.user_turns if entry else 0
+
+    def sweep(self) -> List[str]:
+        """
+        Drop expired calls from the backend and idle calls from the local copy
+
+        Returns:
+            list: Call SIDs that were dropped
+        """
+        now = self._time()
+        with self._lock:
+            self._last_sweep = now
+            self.stats["sweeps"] += 1
+        try:
+            expired = set(self.backend.sweep(now))
+        except Exception as e:
+            self.stats["backend_errors"] += 1
+            logger.error("Failed to sweep voice sessions: %s", e)
+            expired = set()
+
+        with self._lock:
+            # Calls this worker has not touched for the TTL may live on elsewhere; drop the copy
+            expired.update(sid for sid, entry in self._local.items() if now - entry.last_activity > self.idle_ttl)
+            for call_sid in expired:
+                self._local.pop(call_sid, None)
+            self.stats["expired"] += len(expired)
+
+        expired = sorted(expired)
+        if expired:
+            logger.info("Swept %s idle voice sessions", len(expired))
+        if self.on_expire:
+            for call_sid in expired:
+                try:
+                    self.on_expire(call_sid)
+                except Exception as e:
+                    logger.error("Error expiring call %s: %s", call_sid, e)
+        return expired
+
+    def get(self, call_sid: str, default=None):
+        entry = self._entry(call_sid)
+        return entry.messages if entry else default
+
+    def __getitem__(self, call_sid: str) -> RingBuffer:
+        entry = self._entry(call_sid)
+        if entry is None:
+            raise KeyError(call_sid)
+        return entry.messages
+
+    def __contains__(self, call_sid: str) -> bool:
+        return self._entry(call_sid) is not None
+
+    def __delitem__(self, call_sid: str):
+        self.backend.delete(call_sid)
+        with self._lock:
+            self._local.pop(call_sid, None)
+
+    def __len__(self) -> int:
+        return self.backend.count(self._time())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Session counts and local cache effectiveness"""
+        with self._lock:
+            stats = dict(self.stats)
+            cached_calls = len(self._local)
+        reads = stats["local_hits"] + stats["revalidations"] + stats["loads"]
+        try:
+            active_calls = len(self)
+        except Exception as e:
+            logger.error("Failed to count voice sessions: %s", e)
+            active_calls = None
+
+        return {
+            "backend": self.backend.name,
+            "active_calls": active_calls,
+            "cached_calls": cached_calls,
+            "capacity_per_call": self.capacity,
+            "idle_ttl_seconds": self.idle_ttl,
+            "local_hit_rate": round((stats["local_hits"] + stats["revalidations"]) / reads, 4) if reads else 0.0,
+            **stats,
+        }
+
+
+def create_call_history_store(on_expire: Optional[Callable[[str], None]] = None):
+    """
+    Create the voice call history store from environment configuration
+
+    Environment:
+        VOICE_SESSION_BACKEND: "memory" (default, this process only), "sqlite" or "redis"
+        VOICE_SESSION_STORE_PATH: SQLite file for the sqlite backend (default "voice_sessions.db")
+        REDIS_URL: Redis connection URL for the redis backend
+        VOICE_HISTORY_CAPACITY: Messages kept per call (default 20)
+        VOICE_CALL_IDLE_TTL_SECONDS: Idle seconds before a call expires (default 900)
+        VOICE_SESSION_REVALIDATE_SECONDS: Seconds a local copy is trusted (default 1)
+    """
+    capacity = int(os.getenv("VOICE_HISTORY_CAPACITY", "20"))
+    idle_ttl = float(os.getenv("VOICE_CALL_IDLE_TTL_SECONDS", "900"))
+    backend_name = os.getenv("VOICE_SESSION_BACKEND", "memory").lower()
+
+    backend = None
+    try:
+        if backend_name == "sqlite":
+            backend = SQLiteSessionBackend(os.getenv("VOICE_SESSION_STORE_PATH", "voice_sessions.db"))
+        elif backend_name == "redis":
+            backend = RedisSessionBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    except Exception as e:
+        logger.warning("Shared voice session store unavailable, keeping sessions in memory: %s", e)
+
+    if backend is None:
+        return CallHistoryStore(capacity=capacity, idle_ttl=idle_ttl, on_expire=on_expire)
+
+    logger.info("Voice sessions stored in %s", backend.name)
+    return SharedCallHistoryStore(
+        backend,
+        capacity=capacity,
+        idle_ttl=idle_ttl,
+        revalidate_after=float(os.getenv("VOICE_SESSION_REVALIDATE_SECONDS", "1")),
+        on_expire=on_expire
+    )
@@ -0,0 +1,157 @@
+"""
+SMS encoding and segment counting.
+
+A message is sent as GSM-7 only if every character is in the GSM 03.38
+alphabet. A single bullet, curly quote or emoji switches the whole message
+to UCS-2, which cuts a segment from 160 characters to 70 (153 and 67 per part
+once a message is split), and carriers bill per segment.
+
+count_segments() computes segments the way the network splits them:
+- extension characters cost two septets and are never split across parts
+- surrogate pairs are never split across parts
+
+compact() transliterates a reply to GSM-7 and can trim it to a target
+number of segments.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = set("^{}\\[~]|€\f")
+
+GSM7_SINGLE_SEGMENT = 160
+GSM7_MULTI_SEGMENT = 153
+UCS2_SINGLE_SEGMENT = 70
+UCS2_MULTI_SEGMENT = 67
+
+# Common non-GSM characters in our replies and their GSM-7 stand-ins
+TRANSLITERATIONS = {
+    "•": "-", "·": "-", "◦": "-", "▪": "-", "●": "-", "‣": "-",
+    "–": "-", "—": "-", "‐": "-", "‑": "-", "−": "-",
+    "‘": "'", "’": "'", "‚": "'", "′": "'", "`": "'", "´": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"',
+    "…": "...",
+    " ": " ", " ": " ", " ": " ", "​": "", "﻿": "",
+    "\t": " ",
+    "✓": "", "✔": "", "✅": "", "❌": "",
+    "→": "->", "←": "<-",
+    "×": "x", "½": "1/2", "¼": "1/4", "¾": "3/4",
+    "™": "", "®": "", "©": "(c)",
+    "¢": "c",
+}
+
+_MULTI_SPACE = re.compile(r"[ ]{2,}")
+_SPACE_BEFORE_NEWLINE = re.compile(r"[ ]+\n")
+_EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+@dataclass
+class SegmentInfo:
+    """How a message will be encoded and billed"""
+    encoding: str
+    characters: int
+    units: int
+    segments: int
+
+    @property
+    def is_gsm7(self) -> bool:
+        return self.encoding == "GSM-7"
+
+
+def is_gsm7(text: str) -> bool:
+    return all(char in GSM7_BASIC or char in GSM7_EXTENSION for char in text)
+
+
+def _pack(unit_sizes, single_limit: int, multi_limit: int) -> int:
+    total = sum(unit_sizes)
+    if total <= single_limit:
+        return 1 if total else 0
+    segments, used = 1, 0
+    for size in unit_sizes:
+        if used + size > multi_limit:
+            segments += 1
+            used = 0
+        used += size
+    return segments
+
+
+def count_segments(text: str) -> SegmentInfo:
+    """Count the segments text will be sent as"""
+    if is_gsm7(text):
+        sizes = [2 if char in GSM7_EXTENSION else 1 for char in text]
+        return SegmentInfo("GSM-7", len(text), sum(sizes),
+                           _pack(sizes, GSM7_SINGLE_SEGMENT, GSM7_MULTI_SEGMENT))
+
+    sizes = [2 if ord(char) > 0xFFFF else 1 for char in text]
+    return SegmentInfo("UCS-2", len(text), sum(sizes),
+                       _pack(sizes, UCS2_SINGLE_SEGMENT, UCS2_MULTI_SEGMENT))
+
+
+def transliterate(text: str) -> str:
+    """Replace or drop every character outside the GSM-7 alphabet"""
+    output = []
+    for char in text:
+        if char in GSM7_BASIC or char in GSM7_EXTENSION:
+            output.append(char)
+        elif char in TRANSLITERATIONS:
+            output.append(TRANSLITERATIONS[char])
+        else:
+            # Strip accents the GSM alphabet lacks (e.g. "á" -> "a"); drop emoji and symbols
+            decomposed = unicodedata.normalize("NFKD", char)
+            output.append("".join(c for c in decomposed if c in GSM7_BASIC or c in GSM7_EXTENSION))
+    return "".join(output)
+
+
+def _tidy(text: str) -> str:
+    text = _MULTI_SPACE.sub(" ", text)
+    text = _SPACE_BEFORE_NEWLINE.sub("\n", text)
+    text = _EXTRA_BLANK_LINES.sub("\n\n", text)
+    return "\n".join(line.strip(" ") for line in text.split("\n")).strip()
+
+
+def _trim_to_segments(text: str, max_segments: int) -> str:
+    if count_segments(text).segments <= max_segments:
+        return text
+
+    # Longest prefix that fits with room for an ellipsis
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_segments(text[:middle].rstrip() + "...").segments <= max_segments:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = text[:low]
+
+    # Prefer ending on a full sentence if that keeps most of the text
+    sentence_ends = [match.end() for match in _SENTENCE_END.finditer(prefix)]
+    if sentence_ends and sentence_ends[-1] >= len(prefix) * 0.6:
+        return prefix[:sentence_ends[-1]].rstrip()
+
+    cut = prefix.rfind(" ")
+    if cut > len(prefix) * 0.6:
+        prefix = prefix[:cut]
+    return prefix.rstrip(" ,;:-\n") + "..."
+
+
+def compact(text: str, max_segments: Optional[int] = None) -> str:
+    """
+    Make a reply GSM-7 and optionally trim it to max_segments
+
+    Args:
+        text: Reply text
+        max_segments: Segment budget; None keeps the full text
+
+    Returns:
+        str: GSM-7 text
+    """
+    compacted = _tidy(transliterate(text))
+    if max_segments:
+        compacted = _trim_to_segments(compacted, max_segments)
+    return compacted
@@ -1,8 +1,12 @@
 import os
 from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
 import logging
-from typing import Optional
+from typing import AsyncIterator, Callable, Optional
+
+from .twilio_sender import SendResult, create_twilio_sender
+from .sms_encoding import compact, count_segments
+from .message_store import OUTBOUND, get_message_store
+from .tracing import traced
 
 class SMSService:
     """Service for handling SMS operations via Twilio"""
@@ -17,7 +21,62 @@ class SMSService:
         
         self.client = Client(self.account_sid, self.auth_token)
         self.logger = logging.getLogger(__name__)
+        
+        # Non-blocking sender over a pooled HTTP client, rate limited to the number's MPS
+        self.sender = create_twilio_sender(self.account_sid, self.auth_token, self.from_number)
+        
+        # Transliterate replies to GSM-7 (160 chars/segment instead of 70) and cap their length
+        self.compaction_enabled = os.getenv("SMS_COMPACTION_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.max_segments = int(os.getenv("SMS_MAX_SEGMENTS", "3")) or None
+        self.segment_stats = {"messages": 0, "segments": 0, "ucs2_messages": 0, "segments_saved": 0}
+        
+        # Local copy of sent messages so history is read without calling Twilio
+        self.message_store = get_message_store()
     
+    def _prepare_body(self, message: str) -> str:
+        """
+        Compact a message body and record its segment count
+        
+        Args:
+            message: Message content
+            
+        Returns:
+            str: Body to send
+        """
+        original = count_segments(message)
+        body = compact(message, self.max_segments) if self.compaction_enabled else message
+        info = count_segments(body) if body != message else original
+        
+        self.segment_stats["messages"] += 1
+        self.segment_stats["segments"] += info.segments
+        self.segment_stats["segments_saved"] += original.segments - info.segments
+        if not info.is_gsm7:
+            self.segment_stats["ucs2_messages"] += 1
+        self.logger.debug(
+            "SMS body prepared",
+            extra={"characters": info.characters, "encoding": info.encoding, "segments": info.segments}
+        )
+        return body
+    
+    def _record_sent(self, result: SendResult, body: str):
+        """Append a successfully sent message to the local history"""
+        if not (self.message_store and result.success):
+            return
+        try:
+            self.message_store.record(result.to, OUTBOUND, body, sid=result.sid, status="sent")
+        except Exception as e:
+            self.logger.error("Failed to record sent SMS: %s", e, extra={"to_number": result.to})
+    
+    def get_segment_stats(self) -> dict:
+        messages = self.segment_stats["messages"]
+        return {
+            **self.segment_stats,
+            "avg_segments": round(self.segment_stats["segments"] / messages, 2) if messages else 0.0,
+            "compaction_enabled": self.compaction_enabled,
+            "max_segments": self.max_segments,
+        }
+    
+    @traced("sms_service.send_sms")
     async def send_sms(self, to: str, message: str) -> bool:
         """
         Send SMS message via Twilio
@@ -34,29 +93,52 @@ class SMSService:
             to = self._format_phone_number(to)
             
             # Send message
-            message_obj = self.client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=to
-            )
+            body = self._prepare_body(message)
+            result = await self.sender.send(to, body)
+            self._record_sent(result, body)
+            if not result.success:
+                self.logger.error("Twilio error sending SMS: %s", result.error)
+                return False
             
-            self.logger.info(f"SMS sent successfully. SID: {message_obj.sid}")
+            self.logger.info("SMS sent successfully. SID: %s", result.sid)
             return True
             
-        except TwilioException as e:
-            self.logger.error(f"Twilio error sending SMS: {str(e)}")
-            return False
         except Exception as e:
-            self.logger.error(f"Unexpected error sending SMS: {str(e)}")
+            self.logger.error("Unexpected error sending SMS: %s", e)
             return False
     
-    async def send_bulk_sms(self, recipients: list, message: str) -> dict:
+    @traced("sms_service.send_queued_sms")
+    async def send_queued_sms(self, to: str, message: str) -> SendResult:
+        """
+        Send a message for the outbound queue worker
+        
+        Args:
+            to: Recipient phone number
+            message: Message content
+            
+        Returns:
+            SendResult: Outcome, so the queue can record the SID or error
+        """
+        body = self._prepare_body(message)
+        result = await self.sender.send(self._format_phone_number(to), body)
+        self._record_sent(result, body)
+        return result
+    
+    async def send_bulk_sms(
+        self,
+        recipients: list,
+        message: str,
+        on_progress: Optional[Callable[[SendResult, int, int], None]] = None
+    ) -> dict:
         """
         Send SMS to multiple recipients
         
+        Messages are sent concurrently within the number's rate limit.
+        
         Args:
             recipients: List of phone numbers
             message: Message content
+            on_progress: Called with (result, completed, total) after each message
             
         Returns:
             dict: Results of bulk send operation
@@ -67,15 +149,43 @@ class SMSService:
             "total": len(recipients)
         }
         
-        for phone in recipients:
-            success = await self.send_sms(phone, message)
-            if success:
-                results["successful"].append(phone)
+        completed = 0
+        async for result in self.stream_bulk_sms(recipients, message):
+            completed += 1
+            if result.success:
+                results["successful"].append(result.to)
             else:
-                results["failed"].append(phone)
+                results["failed"].append(result.to)
+            if on_progress:
+                on_progress(result, completed, len(recipients))
         
         return results
     
+    async def stream_bulk_sms(self, recipients: list, message: str) -> AsyncIterator[SendResult]:
+        """
+        Send SMS to multiple recipients, yielding each result as it completes
+        
+        Args:
+            recipients: List of phone numbers
+            message: Message content
+            
+        Yields:
+            SendResult: Outcome per recipient, in completion order
+        """
+        formatted = (self._format_phone_number(phone) for phone in recipients)
+        body = self._prepare_body(message)
+        async for result in self.sender.send_bulk(formatted, body):
+            self._record_sent(result, body)
+            yield result
+    
+    async def warm(self):
+        """Connect the sender's HTTP pool to Twilio before the first reply is sent"""
+        await self.sender.warm()
+    
+    async def close(self):
+        """Close the sender's pooled HTTP connections"""
+        await self.sender.aclose()
+    
     def _format_phone_number(self, phone: str) -> str:
         """
         Format phone number for Twilio
@@ -115,7 +225,8 @@ class SMSService:
                 "status": "healthy",
                 "account_sid": self.account_sid,
                 "from_number": self.from_number,
-                "account_status": account.status
+                "account_status": account.status,
+                "segments": self.get_segment_stats()
             }
         except Exception as e:
             return {
@@ -127,6 +238,9 @@ class SMSService:
         """
         Get message history for a phone number
         
+        Reads the local message store (both directions, newest first). Twilio's
+        API is only queried when the store is disabled.
+        
         Args:
             phone_number: Phone number to get history for
             limit: Maximum number of messages to retrieve
@@ -134,6 +248,13 @@ class SMSService:
         Returns:
             list: List of message objects
         """
+        if self.message_store:
+            try:
+                return self.message_store.history(self._format_phone_number(phone_number), limit)
+            except Exception as e:
+                self.logger.error("Error reading local message history: %s", e)
+                return []
+        
         try:
             messages = self.client.messages.list(
                 to=phone_number,
@@ -151,5 +272,5 @@ class SMSService:
                 for msg in messages
             ]
         except Exception as e:
-            self.logger.error(f"Error getting message history: {str(e)}")
+            self.logger.error("Error getting message history: %s", e)
             return [] 
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Speculative LLM prefetch on partial speech results.
+
+With partialResultCallback on <Gather>, Twilio posts the caller's transcript
+while they are still speaking, and the final SpeechResult only arrives after
+the end-of-speech timeout. Once a partial transcript is stable (unchanged
+across consecutive callbacks, or entirely marked stable by Twilio) the
+prefetcher starts generating a reply for it. When the final transcript
+arrives and asks the same thing as the speculated one, the in-flight reply is
+reused, so the LLM's head start is taken off the caller's wait; otherwise the
+speculation is abandoned, which closes its stream.
+
+"The same thing" is strict: the two transcripts must have the same words in
+the same order once case, punctuation and filler (disfluencies, articles,
+"please") are ignored. A fuzzy match would reuse the reply for "a haircut at
+three" when the caller said "at four"; a final transcript that extends the
+speculated one has added something the reply does not cover.
+"""
+import re
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .streaming import StreamingReply
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s']")
+
+# Words that never change what the caller is asking. Numbers, times, names
+# and negations must never be added here.
+FILLER_WORDS = frozenset({
+    "um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "hmm", "mm", "oh",
+    "okay", "ok", "yeah", "please", "a", "an", "the",
+})
+
+
+def transcript_words(text: str) -> List[str]:
+    """Lowercased words of a transcript, without punctuation"""
+    return _NON_WORD.sub(" ", (text or "").lower()).split()
+
+
+def content_words(words: List[str]) -> Tuple[str, ...]:
+    """Transcript words without filler"""
+    return tuple(word for word in words if word not in FILLER_WORDS)
+
+
+def same_request(a: List[str], b: List[str]) -> bool:
+    """Whether two transcripts say the same thing, differing at most in filler words"""
+    return content_words(a) == content_words(b)
+
+
+class Speculation:
+    """A reply being generated for a partial transcript"""
+
+    __slots__ = ("transcript", "words", "reply", "on_complete", "started_at")
+
+    def __init__(self, transcript: str, words: List[str], reply: StreamingReply,
+                 on_complete: Optional[Callable[[str], None]], started_at: float):
+        self.transcript = transcript
+        self.words = words
+        self.reply = reply
+        self.on_complete = on_complete
+        self.started_at = started_at
+
+
+class _Utterance:
+    __slots__ = ("last_words", "last_sequence", "repeats", "speculation", "started")
+
+    def __init__(self):
+        self.last_words: List[str] = []
+        self.last_sequence = -1
+        self.repeats = 0
+        self.speculation: Optional[Speculation] = None
+        self.started = 0
+
+
+class SpeculativePrefetcher:
+    """Starts replies on stable partial transcripts and hands them over to the final one"""
+
+    def __init__(
+        self,
+        start_reply: Callable[[str, str], Tuple[StreamingReply, Optional[Callable[[str], None]]]],
+        min_words: int = 3,
+        stable_repeats: int = 2,
+        max_per_utterance: int = 2,
+        time_func: Callable[[], float] = time.perf_counter
+    ):
+        """
+        Args:
+            start_reply: Called with (call_sid, transcript); starts a reply without touching
+                the call's history and returns it with the callback to run once it is claimed
+            min_words: Partial transcripts shorter than this are never speculated on
+            stable_repeats: Consecutive identical partials that make a transcript stable
+            max_per_utterance: Replies started at most per caller utterance, to bound wasted tokens
+        """
+        self.start_reply = start_reply
+        self.min_words = min_words
+        self.stable_repeats = stable_repeats
+        self.max_per_utterance = max_per_utterance
+        self._time = time_func
+        self._lock = threading.Lock()
+        self._utterances: Dict[str, _Utterance] = {}
+        self.stats = {
+            "partials": 0, "started": 0, "reused": 0, "discarded": 0,
+            "superseded": 0, "cancelled": 0, "head_start_seconds": 0.0,
+        }
+
+    def observe_partial(
+        self, call_sid: str, unstable: Optional[str], stable: Optional[str] = None, sequence: Optional[int] = None
+    ) -> bool:
+        """
+        Record a partial result for a call, speculating once it is stable
+
+        Args:
+            call_sid: Twilio call SID
+            unstable: UnstableSpeechResult, the current hypothesis for the whole utterance
+            stable: StableSpeechResult, the part Twilio no longer expects to change
+            sequence: SequenceNumber; partials older than one already seen are ignored
+
+        Returns:
+            bool: True if a reply was started for this partial
+        """
+        transcript = (unstable or stable or "").strip()
+        words = transcript_words(transcript)
+        superseded = None
+        with self._lock:
+            self.stats["partials"] += 1
+            utterance = self._utterances.setdefault(call_sid, _Utterance())
+            if sequence is not None:
+                if sequence <= utterance.last_sequence:
+                    return False
+                utterance.last_sequence = sequence
+            utterance.repeats = utterance.repeats + 1 if words == utterance.last_words else 1
+            utterance.last_words = words
+
+            is_stable = utterance.repeats >= self.stable_repeats or (stable and transcript_words(stable) == words)
+            if not is_stable or len(words) < self.min_words:
+                return False
+
+            current = utterance.speculation
+            if current and same_request(current.words, words):
+                return False
+            if utterance.started >= self.max_per_utterance:
+                return False
+
+            utterance.started += 1
+            self.stats["started"] += 1
+            if current:
+                superseded = current
+                self.stats["superseded"] += 1
+            utterance.speculation = None
+
+        if superseded:
+            superseded.reply.abandon()
+
+        try:
+            reply, on_complete = self.start_reply(call_sid, transcript)
+        except Exception as e:
+            logger.error("Failed to start speculative reply for call %s: %s", call_sid, e)
+            return False
+
+        speculation = Speculation(transcript, words, reply, on_complete, self._time())
+        with self._lock:
+            utterance = self._utterances.get(call_sid)
+            if utterance is None or utterance.speculation is not None:
+                # The final transcript or a newer partial got there first
+                reply.abandon()
+                return False
+            utterance.speculation = speculation
+        logger.info("Speculating on partial transcript", extra={"call_sid": call_sid, "transcript": transcript})
+        return True
+
+    def claim(self, call_sid: str, final_transcript: str) -> Optional[Speculation]:
+        """
+        Take the speculation for a call's final transcript, ending the utterance
+
+        Returns:
+            Speculation: The in-flight reply if the final transcript asks the same thing,
+                otherwise None (and any speculation is abandoned)
+        """
+        with self._lock:
+            utterance = self._utterances.pop(call_sid, None)
+            speculation = utterance.speculation if utterance else None
+            if speculation is None:
+                return None
+            if same_request(speculation.words, transcript_words(final_transcript)) and not speculation.reply.abandoned:
+                self.stats["reused"] += 1
+                self.stats["head_start_seconds"] += self._time() - speculation.started_at
+                return speculation
+            self.stats["discarded"] += 1
+
+        speculation.reply.abandon()
+        logger.info("Discarded speculative reply: final transcript differs", extra={"call_sid": call_sid})
+        return None
+
+    def cancel(self, call_sid: str):
+        """Abandon any speculation for a call that has ended"""
+        with self._lock:
+            utterance = self._utterances.pop(call_sid, None)
+            speculation = utterance.speculation if utterance else None
+            if speculation:
+                self.stats["cancelled"] += 1
+        if speculation:
+            speculation.reply.abandon()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            active = len(self._utterances)
+        finished = stats["reused"] + stats["discarded"] + stats["cancelled"] + stats["superseded"]
+        return {
+            **stats,
+            "head_start_seconds": round(stats["head_start_seconds"], 3),
+            "active_utterances": active,
+            "reuse_rate": round(stats["reused"] / finished, 4) if finished else 0.0,
+        }
@@ -0,0 +1,144 @@
+"""
+Cold-start profiling for the FastAPI app.
+
+Imports are measured in fresh interpreters, since a module imported once is
+cached for the rest of the process. Wall-clock import time is taken from
+plain runs (best of several), and the per-package breakdown comes from one
+more run with "python -X importtime". The app's own cost is reported
+relative to importing FastAPI alone, which no amount of deferral avoids.
+
+App and baseline runs alternate, and the overhead is the smallest difference
+between a run and the baseline run right after it, so a burst of load on a
+shared machine slows both sides of a pair instead of only one side.
+"""
+import sys
+import json
+import subprocess
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+APP_MODULE = "python_sms_responder.main"
+BASELINE_MODULE = "fastapi"
+
+# Packages that should only load when a service is first used or warmed
+HEAVY_MODULES = ("openai", "twilio.rest", "psycopg2", "numpy", "httpx")
+
+_TIMING_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}}))
+"""
+
+
+@dataclass
+class ImportRecord:
+    """One line of -X importtime output"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse the stderr of python -X importtime into records, in import order"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip(" ")
+        records.append(ImportRecord(
+            module=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2
+        ))
+    return records
+
+
+def _run(module: str, importtime: bool = False, python: str = sys.executable, cwd: Optional[str] = None):
+    command = [python] + (["-X", "importtime"] if importtime else []) + ["-c", _TIMING_SCRIPT.format(module=module)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=cwd, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def measure_import(module: str, repeats: int = 3, cwd: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Time importing a module in fresh interpreters
+
+    Returns:
+        dict: Best wall-clock seconds over the repeats and the modules loaded afterwards
+    """
+    runs = [_run(module, cwd=cwd)[0] for _ in range(repeats)]
+    return {"seconds": min(run["seconds"] for run in runs), "modules": runs[-1]["modules"]}
+
+
+def cold_start_report(
+    module: str = APP_MODULE, baseline: str = BASELINE_MODULE, repeats: int = 3, top: int = 15,
+    cwd: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Measure the cold start of the app module against the baseline import
+
+    Returns:
+        dict: seconds, baseline_seconds, overhead_seconds, heavy_modules_loaded,
+            top_packages (by self time) and top_imports (the module's own direct imports)
+    """
+    pairs = [(_run(module, cwd=cwd)[0], _run(baseline, cwd=cwd)[0]) for _ in range(repeats)]
+    app_seconds = min(app["seconds"] for app, _ in pairs)
+    base_seconds = min(base["seconds"] for _, base in pairs)
+    # Noise can make a pair's difference negative; the app never imports faster than FastAPI
+    overhead = max(0.0, min(app["seconds"] - base["seconds"] for app, base in pairs))
+    _, stderr = _run(module, importtime=True, cwd=cwd)
+    records = parse_importtime(stderr)
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record.module.split(".")[0]] += record.self_us
+
+    # A module's direct imports are the depth-1 records listed before it
+    direct = []
+    for record in records:
+        if record.depth == 0:
+            if record.module == module:
+                break
+            direct = []
+        elif record.depth == 1:
+            direct.append(record)
+
+    loaded = set(pairs[-1][0]["modules"])
+    return {
+        "module": module,
+        "seconds": round(app_seconds, 4),
+        "baseline": baseline,
+        "baseline_seconds": round(base_seconds, 4),
+        "overhead_seconds": round(overhead, 4),
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in loaded],
+        "top_packages": sorted(by_package.items(), key=lambda item: -item[1])[:top],
+        "top_imports": [
+            (record.module, record.cumulative_us)
+            for record in sorted(direct, key=lambda record: -record.cumulative_us)[:top]
+        ],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Cold import of {report['module']}: {report['seconds'] * 1000:.0f} ms",
+        f"  {report['baseline']} alone:            {report['baseline_seconds'] * 1000:.0f} ms",
+        f"  app overhead:            {report['overhead_seconds'] * 1000:.0f} ms",
+        f"  heavy modules at import: {', '.join(report['heavy_modules_loaded']) or 'none'}",
+        "",
+        "Direct imports (cumulative ms):",
+    ]
+    lines += [f"  {name:<45} {us / 1000:>8.1f}" for name, us in report["top_imports"]]
+    lines += ["", "Packages by self time (ms):"]
+    lines += [f"  {name:<45} {us / 1000:>8.1f}" for name, us in report["top_packages"]]
+    return "\n".join(lines)
@@ -0,0 +1,199 @@
+"""
+Streaming LLM completions split into speakable sentences.
+
+Voice calls only need the first sentence of a reply to start talking. A
+StreamingReply consumes a streamed chat completion in a background thread and
+publishes sentences as soon as they are complete, so the webhook can answer
+Twilio with the first sentence while the rest is still being generated.
+"""
+import re
+import time
+import logging
+import threading
+from typing import List, Optional, Iterable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "jr", "sr", "vs", "etc", "e.g", "i.e", "a.m", "p.m", "approx"}
+
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s")
+
+
+class SentenceSplitter:
+    """Incrementally splits streamed text into sentences"""
+
+    def __init__(self, min_length: int = 2):
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add streamed text
+
+        Returns:
+            list: Sentences completed by this chunk
+        """
+        self._buffer += text
+        sentences = []
+        search_from = 0
+        while True:
+            match = _SENTENCE_END.search(self._buffer, search_from)
+            if not match:
+                break
+            candidate = self._buffer[:match.end()].strip()
+            last_word = candidate.rstrip(".!?\"')]").rsplit(" ", 1)[-1].lower()
+            if (candidate.endswith(".") and last_word in ABBREVIATIONS) or len(candidate) < self.min_length:
+                search_from = match.end()
+                continue
+            sentences.append(candidate)
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return any trailing text that did not end with punctuation"""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder or None
+
+
+def iter_completion_text(stream: Iterable) -> Iterable[str]:
+    """Yield the text deltas of a streamed OpenAI chat completion"""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = getattr(chunk.choices[0].delta, "content", None)
+        if content:
+            yield content
+
+
+def _close_stream(stream):
+    """Close a streamed completion early so the provider stops generating"""
+    close = getattr(stream, "close", None) or getattr(getattr(stream, "response", None), "close", None)
+    if close:
+        try:
+            close()
+        except Exception as e:
+            logger.warning("Error closing abandoned LLM stream: %s", e)
+
+
+class StreamingReply:
+    """A chat completion being streamed in a background thread"""
+
+    def __init__(self, stream_factory: Callable[[], Iterable], on_complete: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            stream_factory: Callable that starts the streamed completion
+            on_complete: Called with the full reply text once streaming finishes
+        """
+        self.stream_factory = stream_factory
+        self.on_complete = on_complete
+
+        self.sentences: List[str] = []
+        self.consumed = 0
+        self.done = False
+        self.abandoned = False
+        self.error: Optional[Exception] = None
+
+        self.started_at = None
+        self.first_sentence_at = None
+        self.completed_at = None
+
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self) -> "StreamingReply":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="llm-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def _publish(self, sentence: str):
+        with self._condition:
+            if self.first_sentence_at is None:
+                self.first_sentence_at = time.perf_counter()
+            self.sentences.append(sentence)
+            self._condition.notify_all()
+
+    def _run(self):
+        splitter = SentenceSplitter()
+        stream = None
+        try:
+            stream = self.stream_factory()
+            for text in iter_completion_text(stream):
+                if self.abandoned:
+                    # Nobody will hear the rest; stop paying for its tokens
+                    break
+                for sentence in splitter.feed(text):
+                    self._publish(sentence)
+            remainder = splitter.flush()
+            if remainder and not self.abandoned:
+                self._publish(remainder)
+        except Exception as e:
+            logger.error("Error streaming LLM response: %s", e)
+            self.error = e
+        finally:
+            if self.abandoned and stream is not None:
+                _close_stream(stream)
+            with self._condition:
+                self.done = True
+                self.completed_at = time.perf_counter()
+                on_complete = self.on_complete
+                self._condition.notify_all()
+
+        if on_complete:
+            self._report_complete(on_complete)
+
+    def _report_complete(self, on_complete: Callable[[str], None]):
+        if self.abandoned or self.error is not None or not self.sentences:
+            return
+        try:
+            on_complete(self.full_text)
+        except Exception as e:
+            logger.error("Error in streaming completion callback: %s", e)
+
+    def set_on_complete(self, on_complete: Callable[[str], None]):
+        """Attach the completion callback later; it runs now if streaming has already finished"""
+        with self._condition:
+            if not self.done:
+                self.on_complete = on_complete
+                return
+        self._report_complete(on_complete)
+
+    def abandon(self):
+        """Stop caring about this reply; the stream is closed and it will not be reported as complete"""
+        self.abandoned = True
+
+    @property
+    def full_text(self) -> str:
+        return " ".join(self.sentences)
+
+    def next_sentence(self, timeout: float) -> Optional[str]:
+        """
+        Wait for the next unconsumed sentence
+
+        Returns:
+            str: The sentence, or None if the stream ended or timed out first
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.sentences) > self.consumed or self.done, timeout)
+            if len(self.sentences) > self.consumed:
+                sentence = self.sentences[self.consumed]
+                self.consumed += 1
+                return sentence
+            return None
+
+    def remaining_text(self, timeout: float) -> str:
+        """Wait for the stream to finish and return everything not yet consumed"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.done, timeout)
+            remaining = self.sentences[self.consumed:]
+            self.consumed = len(self.sentences)
+            return " ".join(remaining)
+
+    @property
+    def time_to_first_sentence(self) -> Optional[float]:
+        if self.first_sentence_at is None or self.started_at is None:
+            return None
+        return self.first_sentence_at - self.started_at
@@ -0,0 +1,291 @@
+"""
+Structured, non-blocking logging.
+
+configure_logging() puts a queue between the loggers and the output stream:
+
+- Callers only filter and enqueue. The message is formatted, redacted,
+  serialized and written by a listener thread, so a log call on the event loop
+  never waits on stdout. When the queue is full, records are dropped and
+  counted rather than blocking the request.
+- Formatting is lazy: pass values as logging arguments ("%s") or as
+  structured fields (extra={...}), never pre-formatted f-strings, and nothing
+  is formatted for records that are filtered out.
+- PII is redacted at formatting time. Structured fields named like phone
+  numbers keep only their last four digits, message bodies and speech are
+  replaced by their length, and names by a placeholder. Phone numbers and
+  email addresses that end up in message text are masked as a fallback.
+- High-frequency INFO/DEBUG events can be sampled per module
+  (LOG_SAMPLE_RATES). Warnings and errors are never sampled.
+
+Output is one JSON object per line (LOG_FORMAT=json), or a readable line
+with key=value fields (LOG_FORMAT=text). Records carry the trace and span IDs
+of the span that was current when they were logged.
+"""
+import os
+import re
+import sys
+import json
+import queue
+import random
+import logging
+import logging.handlers
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, TextIO
+
+from .metrics import Counter
+from .tracing import current_span
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# Structured fields holding PII, by how they are redacted
+PHONE_FIELDS = frozenset({"phone", "phone_number", "from_number", "to_number", "caller"})
+TEXT_FIELDS = frozenset({"body", "sms_body", "speech", "transcript", "reply", "user_message", "ai_response", "question"})
+NAME_FIELDS = frozenset({"name", "client_name", "first_name", "last_name"})
+
+# E.164 numbers and US numbers with or without separators; not digits inside SIDs or IDs.
+# The leading lookahead lets the scan skip letters without trying each alternative.
+_PHONE_PATTERN = re.compile(
+    r"(?=[+(\d])(?<![\w+])(?:\+\d{8,15}|(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4})(?!\w)"
+)
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped", "Log records not written: sampled out or queue full", ["reason"]
+)
+_SAMPLED_OUT = LOG_RECORDS_DROPPED.labels("sampled")
+_QUEUE_FULL = LOG_RECORDS_DROPPED.labels("queue_full")
+
+
+def mask_phone(value: str) -> str:
+    """Keep the last four digits, enough to tell callers apart in a log"""
+    digits = re.sub(r"\D", "", value)
+    return f"***{digits[-4:]}" if len(digits) >= 4 else "***"
+
+
+def redact_text(text: str) -> str:
+    """Mask phone numbers and email addresses in free text"""
+    text = _PHONE_PATTERN.sub(lambda match: mask_phone(match.group()), text)
+    if "@" in text:
+        text = _EMAIL_PATTERN.sub("<email>", text)
+    return text
+
+
+def redact_field(key: str, value):
+    if value is None:
+        return None
+    if key in PHONE_FIELDS:
+        return mask_phone(str(value))
+    if key in TEXT_FIELDS:
+        return f"<{len(str(value))} chars>"
+    if key in NAME_FIELDS:
+        return "<name>"
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines or text, with their structured fields
+
+    Args:
+        output: "json" or "text"
+        redact: Redact PII in fields and message text
+    """
+
+    def __init__(self, output: str = "json", redact: bool = True):
+        super().__init__()
+        self.output = output
+        self.redact = redact
+
+    def fields(self, record: logging.LogRecord) -> Dict:
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if self.redact:
+            fields = {key: redact_field(key, value) for key, value in fields.items()}
+        return fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        # Also covers messages built before logging (f-strings, libraries), not just %s arguments
+        if self.redact:
+            message = redact_text(message)
+        fields = self.fields(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if self.output == "text":
+            line = f"{self.formatTime(record)} {record.levelname} {record.name}: {message}"
+            if fields:
+                line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            if record.exc_text:
+                line += "\n" + record.exc_text
+            return line
+
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+            **fields,
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of INFO and DEBUG records per logger
+
+    Args:
+        rates: Logger name prefix -> fraction kept; the longest matching prefix applies
+    """
+
+    def __init__(self, rates: Dict[str, float], random_func=random.random):
+        super().__init__()
+        self.rates = rates
+        self._random = random_func
+        self._by_logger: Dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            rate = self.rates[max(matches, key=len)] if matches else 1.0
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or self._random() < rate:
+            return True
+        _SAMPLED_OUT.inc()
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them
+
+    The stdlib QueueHandler formats the message in the calling thread; this
+    one leaves that to the listener. Only the trace context and an exception
+    traceback, which must be captured where they happen, are recorded here.
+
+    The queue is a lock-free SimpleQueue. Its size limit is checked before
+    each put rather than enforced by the queue, so it can be overshot by one
+    record per thread logging at the same moment.
+
+    Args:
+        maxsize: Records waiting for the listener before new ones are dropped
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        super().__init__(queue.SimpleQueue())
+        self.maxsize = maxsize
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        span = current_span()
+        if span.trace_id:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.maxsize:
+            _QUEUE_FULL.inc()
+            return
+        self.queue.put_nowait(record)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, as print() does"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """LOG_SAMPLE_RATES format: logger=rate,logger=rate"""
+    rates = {}
+    for pair in value.split(","):
+        name, _, rate = pair.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to a listener thread, from the environment
+
+    Replaces the root logger's handlers, so calling it again reconfigures
+    rather than duplicating output. Uvicorn's own loggers are left alone.
+
+    Args:
+        stream: Where to write; stdout by default
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream) if stream else _StdoutHandler()
+        output.setFormatter(StructuredFormatter(
+            os.getenv("LOG_FORMAT", "json").lower(),
+            redact=os.getenv("LOG_REDACT_PII", "true").lower() not in ("0", "false", "no")
+        ))
+
+        handler = NonBlockingQueueHandler(int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+        if rates:
+            handler.addFilter(SamplingFilter(rates))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
+        # Neither output includes the caller's file and line; skip walking the
+        # stack for them on every call (the logging HOWTO's optimization)
+        logging._srcfile = None
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging():
+    """
+    Write out everything still queued, then log synchronously
+
+    Records logged after shutdown (later in the shutdown, or at exit) go
+    straight to the stream instead of into a queue nobody drains.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, NonBlockingQueueHandler):
+                root.removeHandler(handler)
+        for output in _listener.handlers:
+            root.addHandler(output)
+        _listener = None
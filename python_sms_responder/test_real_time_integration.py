@@ -208,7 +208,9 @@ class MockRealTimeDataConnector:
         return result
 
 # Import and modify BusinessKnowledge to use the mock connector
-from business_knowledge import BusinessKnowledge
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python_sms_responder.business_knowledge import BusinessKnowledge
 
 # Test the integration
 if __name__ == "__main__":
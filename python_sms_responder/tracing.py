@@ -0,0 +1,458 @@
+"""
+Lightweight request tracing without an OpenTelemetry SDK.
+
+Spans are opened with `span()` or the `@traced` decorator. The current span
+is kept in a context variable, so a span opened in an async route, in a
+threadpool function it calls, or in a service method picks up its parent on
+its own, and one request's spans form one trace.
+
+Sampling is decided once per trace, at the root span (TRACE_SAMPLE_RATE).
+Spans of an unsampled trace, and every span while tracing is off, cost a
+context variable lookup and nothing else. Finished spans of sampled traces
+are queued and exported from a background thread:
+
+- "json": one JSON object per span per line, to TRACE_FILE_PATH
+- "otlp": OTLP/HTTP with the JSON encoding, to OTEL_EXPORTER_OTLP_ENDPOINT
+  (an OpenTelemetry Collector, Jaeger or Tempo)
+
+trace_report.py prints the slowest traces from the JSON file as span trees.
+"""
+import os
+import json
+import time
+import random
+import logging
+import functools
+import inspect
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation in a trace"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind", "attributes",
+        "start_ns", "end_ns", "status", "status_message",
+    )
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans that are not recorded"""
+
+    __slots__ = ()
+
+    recording = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# The span new spans are children of. NOOP_SPAN marks an unsampled trace, so
+# its spans skip the sampling decision as well.
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    """The innermost open span, or NOOP_SPAN when nothing is being recorded"""
+    return _current_span.get() or NOOP_SPAN
+
+
+class _NoopScope:
+    """Context manager for spans that will not be recorded and time nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class _SpanScope:
+    """Context manager returned by Tracer.span()"""
+
+    __slots__ = ("tracer", "name", "attributes", "kind", "histogram", "span", "token", "started")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Optional[Dict[str, Any]], kind: int, histogram):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.kind = kind
+        self.histogram = histogram
+
+    def __enter__(self):
+        if self.histogram is not None:
+            self.started = time.perf_counter()
+        self.span, self.token = self.tracer._start(self.name, self.attributes, self.kind)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.histogram is not None:
+            self.histogram.observe(time.perf_counter() - self.started)
+        if self.token is not None:
+            _current_span.reset(self.token)
+        span = self.span
+        if span.recording:
+            if exc is not None:
+                span.set_error(f"{exc_type.__name__}: {exc}")
+            self.tracer._finish(span)
+        return False
+
+
+class Tracer:
+    """
+    Creates spans and hands finished, sampled ones to the processor
+
+    Args:
+        sample_rate: Fraction of traces recorded, decided at each root span
+        processor: BatchSpanProcessor for finished spans; None records nothing
+    """
+
+    def __init__(self, sample_rate: float = 0.0, processor: Optional["BatchSpanProcessor"] = None):
+        self.processor = processor
+        self.sample_rate = sample_rate if processor else 0.0
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = INTERNAL,
+             histogram=None) -> _SpanScope:
+        """
+        Context manager for a span, a child of the current one
+
+        Args:
+            name: Span name, e.g. "llm.completion"
+            attributes: Attributes recorded on the span
+            kind: INTERNAL, SERVER (a webhook) or CLIENT (a call out)
+            histogram: Metrics histogram child observing the block's duration,
+                whether or not the trace is sampled
+        """
+        if histogram is None and (self.sample_rate <= 0.0 or _current_span.get() is NOOP_SPAN):
+            return _NOOP_SCOPE
+        return _SpanScope(self, name, attributes, kind, histogram)
+
+    def _start(self, name: str, attributes, kind: int):
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate <= 0.0:
+                return NOOP_SPAN, None
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return NOOP_SPAN, _current_span.set(NOOP_SPAN)
+            span = Span(name, f"{random.getrandbits(128):032x}", None, kind, attributes)
+        elif not parent.recording:
+            return NOOP_SPAN, None
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        return span, _current_span.set(span)
+
+    def _finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        if span.status == STATUS_UNSET:
+            span.status = STATUS_OK
+        self.processor.submit(span)
+
+    def shutdown(self):
+        if self.processor:
+            self.processor.shutdown()
+
+
+class JsonFileExporter:
+    """Appends spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str = "traces.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+    def shutdown(self):
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_payload(spans: Iterable[Span], resource: Dict[str, Any]) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest for the spans"""
+    otlp_spans = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": span.status},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        if span.status_message:
+            item["status"]["message"] = span.status_message
+        otlp_spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(resource)},
+            "scopeSpans": [{"scope": {"name": __package__ or "python_sms_responder"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+class OTLPHttpExporter:
+    """
+    Posts spans to an OTLP/HTTP endpoint using the JSON encoding
+
+    Args:
+        endpoint: Collector base URL; spans go to <endpoint>/v1/traces
+        resource: Resource attributes, e.g. {"service.name": "sms-responder"}
+        headers: Extra request headers, e.g. for authentication
+        timeout: Seconds per export request
+    """
+
+    def __init__(self, endpoint: str, resource: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.resource = resource
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        import urllib.request
+
+        body = json.dumps(otlp_payload(spans, self.resource), default=str).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def shutdown(self):
+        pass
+
+
+class BatchSpanProcessor:
+    """
+    Queues finished spans and exports them in batches from a daemon thread
+
+    The queue is bounded: when exporters fall behind, new spans are dropped
+    and counted rather than growing memory or slowing requests.
+    """
+
+    def __init__(self, exporters: List[Any], max_queue: int = 4096, batch_size: int = 512,
+                 interval: float = 2.0):
+        self.exporters = exporters
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span):
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Export everything queued so far"""
+        while True:
+            with self._lock:
+                batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            if not batch:
+                return
+            for exporter in self.exporters:
+                try:
+                    exporter.export(batch)
+                except Exception as e:
+                    logger.warning("Trace export to %s failed, dropped %s spans: %s", type(exporter).__name__, len(batch), e)
+            self.exported += len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def _parse_headers(value: str) -> Dict[str, str]:
+    """OTEL_EXPORTER_OTLP_HEADERS format: key1=value1,key2=value2"""
+    headers = {}
+    for pair in value.split(","):
+        key, _, header_value = pair.partition("=")
+        if key.strip() and header_value:
+            headers[key.strip()] = header_value.strip()
+    return headers
+
+
+def create_tracer() -> Tracer:
+    """
+    Tracer configured from the environment
+
+    TRACE_EXPORTERS lists the exporters ("json", "otlp"); with none, tracing
+    is off. TRACE_SAMPLE_RATE is the fraction of requests traced.
+    """
+    names = [name.strip().lower() for name in os.getenv("TRACE_EXPORTERS", "").split(",") if name.strip()]
+    sample_rate = min(1.0, max(0.0, float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))))
+    if not names or sample_rate <= 0.0:
+        return Tracer()
+
+    resource = {"service.name": os.getenv("OTEL_SERVICE_NAME", "sms-responder")}
+    if os.getenv("WORKER_INDEX"):
+        import socket
+        resource["service.instance.id"] = f"{socket.gethostname()}-{os.getenv('WORKER_INDEX')}"
+
+    exporters = []
+    for name in names:
+        if name == "json":
+            exporters.append(JsonFileExporter(os.getenv("TRACE_FILE_PATH", "traces.jsonl")))
+        elif name == "otlp":
+            exporters.append(OTLPHttpExporter(
+                os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"),
+                resource,
+                _parse_headers(os.getenv("OTEL_EXPORTER_OTLP_HEADERS", ""))
+            ))
+        else:
+            logger.warning("Unknown trace exporter '%s', ignoring it", name)
+    if not exporters:
+        return Tracer()
+
+    logger.info("Tracing %.0f%% of requests to %s", sample_rate * 100, ", ".join(names))
+    return Tracer(sample_rate, BatchSpanProcessor(exporters))
+
+
+# Off until configure_tracing() runs at startup, after .env is loaded
+_tracer = Tracer()
+
+
+def configure_tracing() -> Tracer:
+    """Replace the global tracer with one built from the environment"""
+    global _tracer
+    _tracer.shutdown()
+    _tracer = create_tracer()
+    return _tracer
+
+
+def shutdown_tracing():
+    """Export the spans still queued"""
+    _tracer.shutdown()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = INTERNAL, histogram=None) -> _SpanScope:
+    """Context manager for a span on the global tracer; see Tracer.span"""
+    return _tracer.span(name, attributes, kind, histogram)
+
+
+def traced(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = INTERNAL):
+    """Decorator wrapping each call in a span, for sync and async functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.span(name, attributes, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name, attributes, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,312 @@
+"""
+Non-blocking Twilio message sender.
+
+The Twilio helper library's Client is synchronous, so calling it from an
+async handler blocks the event loop for the whole HTTP round trip, and bulk
+sends end up strictly sequential. AsyncTwilioSender talks to the Messages
+API over a pooled httpx.AsyncClient instead:
+
+- a token bucket keeps sends within the sending number's messages-per-second
+  allowance (1 MPS for a long code, more for toll-free and short codes)
+- a semaphore bounds the number of requests in flight
+- 429 and 5xx responses and connection failures are retried with jittered
+  exponential backoff, honouring Retry-After. Transport errors after the
+  request may have reached Twilio (read timeouts, dropped connections) are
+  not retried, since the message may already be on its way
+- send_bulk() yields each result as soon as it completes, so callers can
+  report progress on large campaigns
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+import httpx
+
+from .metrics import EXTERNAL_CALL_ERRORS, EXTERNAL_CALL_SECONDS
+from .tracing import CLIENT, current_span, traced
+
+logger = logging.getLogger(__name__)
+
+# Per HTTP attempt, so retries and 429s show up as their own latency samples
+SEND_SECONDS = EXTERNAL_CALL_SECONDS.labels("twilio", "send_sms")
+SEND_ERRORS = EXTERNAL_CALL_ERRORS.labels("twilio", "send_sms")
+
+TWILIO_API_BASE = "https://api.twilio.com"
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Failures before the request was sent; retrying them cannot send a message twice
+RETRYABLE_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_WORKER_DONE = object()
+
+
+class TokenBucket:
+    """Async token bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, time_func: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Largest burst allowed (defaults to one second's worth, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._time = time_func
+        self._tokens = self.capacity
+        self._updated = time_func()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._time()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class SendResult:
+    """Outcome of sending one message"""
+    to: str
+    success: bool
+    sid: Optional[str] = None
+    status_code: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    latency: float = 0.0
+    # The request may have reached Twilio before failing, so the message may have been sent
+    delivery_unknown: bool = False
+
+
+class AsyncTwilioSender:
+    """Sends SMS through the Twilio REST API without blocking the event loop"""
+
+    def __init__(
+        self,
+        account_sid: str,
+        auth_token: str,
+        from_number: str,
+        messages_per_second: float = 1.0,
+        max_concurrency: int = 10,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 16.0,
+        timeout: float = 10.0,
+        base_url: str = TWILIO_API_BASE,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            account_sid: Twilio account SID
+            auth_token: Twilio auth token
+            from_number: Sending phone number
+            messages_per_second: Sending number's MPS allowance
+            max_concurrency: Requests in flight at once
+            max_retries: Retries after the first attempt for 429/5xx/connection errors
+            backoff_base: First retry delay in seconds, doubled per attempt
+            backoff_max: Longest delay between attempts
+            timeout: Per-request timeout in seconds
+            base_url: API base URL (overridable for tests and mock servers)
+            transport: Optional httpx transport (e.g. httpx.MockTransport)
+        """
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.messages_per_second = messages_per_second
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+        self._bucket: Optional[TokenBucket] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+
+    @property
+    def messages_url(self) -> str:
+        return f"/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # The connection pool, limiter and semaphore belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.account_sid, self.auth_token),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                transport=self.transport
+            )
+            self._client_loop = loop
+            self._bucket = TokenBucket(self.messages_per_second)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(self.backoff_max, float(retry_after))
+                except ValueError:
+                    pass
+        # Full jitter keeps many retrying senders from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @traced("twilio.send_sms", kind=CLIENT)
+    async def send(self, to: str, body: str) -> SendResult:
+        """
+        Send one message, waiting for rate limit and concurrency capacity
+
+        Returns:
+            SendResult: Never raises for API or transport errors
+        """
+        client = self._ensure_client()
+        start = time.perf_counter()
+        result = SendResult(to=to, success=False)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._bucket.acquire()
+                result.attempts = attempt + 1
+                response = None
+                attempt_start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        self.messages_url,
+                        data={"To": to, "From": self.from_number, "Body": body}
+                    )
+                    SEND_SECONDS.observe(time.perf_counter() - attempt_start)
+                    result.status_code = response.status_code
+                    if response.status_code < 300:
+                        payload = response.json()
+                        result.success = True
+                        result.sid = payload.get("sid")
+                        result.error = None
+                        break
+                    SEND_ERRORS.inc()
+                    result.error = self._error_message(response)
+                    if response.status_code not in RETRYABLE_STATUS:
+                        break
+                    if response.status_code == 429:
+                        self.stats["rate_limited"] += 1
+                except RETRYABLE_TRANSPORT_ERRORS as e:
+                    SEND_SECONDS.observe(time.perf_counter() - attempt_start)
+                    SEND_ERRORS.inc()
+                    result.error = f"{type(e).__name__}: {e}"
+                except httpx.TransportError as e:
+                    SEND_SECONDS.observe(time.perf_counter() - attempt_start)
+                    SEND_ERRORS.inc()
+                    result.error = f"{type(e).__name__}: {e}"
+                    result.delivery_unknown = True
+                    break
+                except Exception as e:
+                    SEND_ERRORS.inc()
+                    result.error = f"{type(e).__name__}: {e}"
+                    break
+
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+
+        result.latency = time.perf_counter() - start
+        self.stats["sent" if result.success else "failed"] += 1
+        send_span = current_span()
+        send_span.set_attribute("twilio.attempts", result.attempts)
+        send_span.set_attribute("http.status_code", result.status_code or 0)
+        if not result.success:
+            send_span.set_error(result.error or "not sent")
+            logger.error("Failed to send SMS after %s attempts: %s", result.attempts, result.error,
+                         extra={"to_number": to})
+        return result
+
+    @staticmethod
+    def _error_message(response: httpx.Response) -> str:
+        try:
+            payload = response.json()
+            return f"{response.status_code} {payload.get('code', '')}: {payload.get('message', '')}".strip()
+        except ValueError:
+            return f"{response.status_code}: {response.text[:200]}"
+
+    async def send_bulk(self, recipients: Iterable[str], body: str) -> AsyncIterator[SendResult]:
+        """
+        Send the same message to many recipients
+
+        Yields:
+            SendResult: One per recipient, in completion order
+        """
+        self._ensure_client()
+        queue: asyncio.Queue = asyncio.Queue()
+        recipients = iter(recipients)
+
+        async def worker():
+            try:
+                for to in recipients:
+                    queue.put_nowait(await self.send(to, body))
+            finally:
+                queue.put_nowait(_WORKER_DONE)
+
+        # Workers pull recipients lazily so huge lists don't become huge task lists
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        finished = 0
+        try:
+            while finished < len(workers):
+                item = await queue.get()
+                if item is _WORKER_DONE:
+                    finished += 1
+                    continue
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "messages_per_second": self.messages_per_second,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    async def warm(self):
+        """Open a pooled connection (TCP, TLS and auth) now instead of on the first send"""
+        client = self._ensure_client()
+        await client.get(f"/2010-04-01/Accounts/{self.account_sid}.json")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_twilio_sender(account_sid: str, auth_token: str, from_number: str) -> AsyncTwilioSender:
+    """Create a sender configured from TWILIO_MPS, TWILIO_SEND_CONCURRENCY and TWILIO_SEND_MAX_RETRIES"""
+    return AsyncTwilioSender(
+        account_sid,
+        auth_token,
+        from_number,
+        messages_per_second=float(os.getenv("TWILIO_MPS", "1")),
+        max_concurrency=int(os.getenv("TWILIO_SEND_CONCURRENCY", "10")),
+        max_retries=int(os.getenv("TWILIO_SEND_MAX_RETRIES", "4")),
+        base_url=os.getenv("TWILIO_API_BASE_URL") or TWILIO_API_BASE
+    )
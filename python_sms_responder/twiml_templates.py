@@ -0,0 +1,304 @@
+"""
+Precompiled TwiML for voice webhooks.
+
+Building a twilio VoiceResponse tree and serializing it on every webhook costs
+far more than the reply needs: apart from the call SID and the spoken text,
+every document is the same. Each template here is built once with the twilio
+library, using placeholder markers for the dynamic parts. It is serialized and
+split into static chunks. Rendering joins the chunks with the XML-escaped
+values (text or attribute escaping, depending on where each placeholder sits),
+and the result is byte-for-byte what the library would have produced.
+
+The build_* functions are the single definition of each document's structure.
+They are also used to check templates against the library in tests and
+benchmarks. With a PromptAudioCache, fixed phrases and recurring AI answers
+are played from pre-rendered audio instead of being spoken with <Say>.
+"""
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from .prompt_audio import AUDIO_ROUTE, PromptAudioCache
+
+VOICE = {"voice": "alice", "language": "en-US"}
+GATHER = {
+    "input": "speech",
+    "method": "POST",
+    "speech_timeout": "auto",
+    "speech_model": "phone_call",
+    "enhanced": "true",
+    "language": "en-US",
+}
+
+PARTIAL_RESULT_ROUTE = "/webhook/voice/partial"
+
+GREETING = "Hello! Welcome to our salon. I'm your AI assistant. How can I help you today?"
+GREETING_REPROMPT = "I didn't catch that. Could you please repeat your request?"
+STILL_HERE = "I'm still here to help. Please let me know what you need."
+FOLLOW_UP = "Is there anything else I can help you with?"
+FOLLOW_UP_REPROMPT = "I didn't hear anything. Please let me know if you need further assistance."
+GOODBYE = "Thank you for calling our salon. Have a wonderful day!"
+CONNECTING_MESSAGE = "Thank you for calling our salon. Please hold while I connect you to our staff."
+PROCESSING_ERROR_MESSAGE = "I'm sorry, I'm having trouble processing your request. Let me connect you to our staff."
+
+FIXED_PROMPTS = [
+    GREETING,
+    GREETING_REPROMPT,
+    STILL_HERE,
+    FOLLOW_UP,
+    FOLLOW_UP_REPROMPT,
+    GOODBYE,
+    CONNECTING_MESSAGE,
+    PROCESSING_ERROR_MESSAGE,
+]
+
+# Maps a phrase to the URL of its pre-rendered audio, or None to <Say> it
+AudioLookup = Optional[Callable[[str], Optional[str]]]
+
+_SLOT = re.compile("\ue000(\\w+)\ue000")
+_CLOSING_TAG = re.compile(r"</\w+>")
+
+
+def _marker(name: str) -> str:
+    # Private-use characters pass through XML serialization unescaped and never occur in TwiML
+    return f"\ue000{name}\ue000"
+
+
+def _escape_text(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attribute(value: str) -> str:
+    return (
+        _escape_text(value)
+        .replace('"', "&quot;")
+        .replace("\r", "&#13;")
+        .replace("\n", "&#10;")
+        .replace("\t", "&#09;")
+    )
+
+
+def _speak(parent, text: str, audio: AudioLookup = None):
+    """<Play> pre-rendered audio for text when there is some, otherwise <Say> it"""
+    url = audio(text) if audio else None
+    if url:
+        parent.play(url)
+    else:
+        parent.say(text, **VOICE)
+
+
+def build_say(text: str, audio: AudioLookup = None) -> VoiceResponse:
+    response = VoiceResponse()
+    _speak(response, text, audio)
+    return response
+
+
+def _gather(response: VoiceResponse, process_url: str, partial_url: Optional[str] = None):
+    """Listen for speech, posting partial results to partial_url while the caller talks"""
+    if partial_url:
+        return response.gather(action=process_url, partial_result_callback=partial_url, **GATHER)
+    return response.gather(action=process_url, **GATHER)
+
+
+def build_initial(
+    process_url: str, redirect_url: str, audio: AudioLookup = None, partial_url: Optional[str] = None
+) -> VoiceResponse:
+    """Greeting, then listen for the caller's request"""
+    response = build_say(GREETING, audio)
+    gather = _gather(response, process_url, partial_url)
+    _speak(gather, GREETING_REPROMPT, audio)
+    _speak(response, STILL_HERE, audio)
+    response.redirect(redirect_url)
+    return response
+
+
+def _append_follow_up(
+    response: VoiceResponse, process_url: str, audio: AudioLookup = None, partial_url: Optional[str] = None
+) -> VoiceResponse:
+    """Ask if the caller needs anything else, listen, and hang up if they don't answer"""
+    _speak(response, FOLLOW_UP, audio)
+    gather = _gather(response, process_url, partial_url)
+    _speak(gather, FOLLOW_UP_REPROMPT, audio)
+    _speak(response, GOODBYE, audio)
+    response.hangup()
+    return response
+
+
+def build_follow_up(process_url: str, audio: AudioLookup = None, partial_url: Optional[str] = None) -> VoiceResponse:
+    return _append_follow_up(VoiceResponse(), process_url, audio, partial_url)
+
+
+def build_say_and_follow_up(
+    text: str, process_url: str, audio: AudioLookup = None, partial_url: Optional[str] = None
+) -> VoiceResponse:
+    return _append_follow_up(build_say(text, audio), process_url, audio, partial_url)
+
+
+def build_say_and_continue(text: str, continue_url: str, audio: AudioLookup = None) -> VoiceResponse:
+    """Speak the first sentence of a streamed reply, then fetch the rest"""
+    response = build_say(text, audio)
+    response.redirect(continue_url, method="POST")
+    return response
+
+
+def build_play_and_follow_up(
+    audio_url: str, process_url: str, audio: AudioLookup = None, partial_url: Optional[str] = None
+) -> VoiceResponse:
+    response = VoiceResponse()
+    response.play(audio_url)
+    return _append_follow_up(response, process_url, audio, partial_url)
+
+
+def build_play_and_continue(audio_url: str, continue_url: str) -> VoiceResponse:
+    response = VoiceResponse()
+    response.play(audio_url)
+    response.redirect(continue_url, method="POST")
+    return response
+
+
+class TwimlTemplate:
+    """A TwiML document compiled into static chunks and escaped slots"""
+
+    def __init__(self, document: str):
+        """
+        Args:
+            document: Serialized TwiML containing slot markers
+        """
+        self._chunks: List[str] = []
+        self._slots: List[Tuple[str, Callable[[str], str], int]] = []
+
+        position = 0
+        for match in _SLOT.finditer(document):
+            self._chunks.append(document[position:match.start()])
+            # Inside a tag the marker is part of an attribute value, otherwise element text
+            prefix = document[:match.start()]
+            in_attribute = prefix.rfind("<") > prefix.rfind(">")
+            # Element text that is the whole element: serialized as <Tag /> when empty
+            closing = _CLOSING_TAG.match(document, match.end())
+            collapsible = 0 if in_attribute or not prefix.endswith(">") or not closing else len(closing.group(0))
+            self._slots.append((match.group(1), _escape_attribute if in_attribute else _escape_text, collapsible))
+            position = match.end()
+        self._chunks.append(document[position:])
+
+    @classmethod
+    def compile(cls, builder: Callable[..., VoiceResponse], *args) -> "TwimlTemplate":
+        """Build a document once, with slot markers in place of the dynamic values"""
+        return cls(str(builder(*args)))
+
+    @property
+    def slots(self) -> List[str]:
+        return [name for name, _, _ in self._slots]
+
+    def render(self, **values: str) -> str:
+        parts = [self._chunks[0]]
+        for (name, escape, collapsible), chunk in zip(self._slots, self._chunks[1:]):
+            value = values[name]
+            if not value and collapsible:
+                parts[-1] = parts[-1][:-1] + " />"
+                parts.append(chunk[collapsible:])
+                continue
+            parts.append(escape(value))
+            parts.append(chunk)
+        return "".join(parts)
+
+
+class TwimlRenderer:
+    """Renders the voice webhook responses from precompiled templates"""
+
+    def __init__(
+        self,
+        webhook_base: str = None,
+        prompt_audio: Optional[PromptAudioCache] = None,
+        partial_results: bool = False
+    ):
+        """
+        Args:
+            webhook_base: Absolute base for webhook URLs; defaults to WEBHOOK_BASE_URL,
+                read once. Empty means relative URLs on the same domain.
+            prompt_audio: Cache of pre-rendered audio; fixed prompts are rendered
+                into it now and played instead of spoken
+            partial_results: Have Twilio post partial speech results to PARTIAL_RESULT_ROUTE
+        """
+        self.webhook_base = os.getenv("WEBHOOK_BASE_URL", "") if webhook_base is None else webhook_base
+        self.prompt_audio = prompt_audio
+
+        audio = None
+        if prompt_audio:
+            fixed = prompt_audio.precompute(FIXED_PROMPTS)
+
+            def audio(text: str) -> Optional[str]:
+                return self.audio_url(fixed[text]) if fixed.get(text) else None
+
+        call_sid = _marker("call_sid")
+        text = _marker("text")
+        audio_url = _marker("audio_url")
+        process_url = self.webhook_url("/webhook/voice/process", call_sid)
+        continue_url = self.webhook_url("/webhook/voice/continue", call_sid)
+        # Twilio sends the CallSid with every partial result, so this URL is the same for all calls
+        partial_url = f"{self.webhook_base}{PARTIAL_RESULT_ROUTE}" if partial_results else None
+
+        self._initial = TwimlTemplate.compile(
+            build_initial, process_url, self.webhook_url("/webhook/voice", call_sid), audio, partial_url
+        )
+        self._follow_up = TwimlTemplate.compile(build_follow_up, process_url, audio, partial_url)
+        self._say_and_follow_up = TwimlTemplate.compile(build_say_and_follow_up, text, process_url, audio, partial_url)
+        self._say_and_continue = TwimlTemplate.compile(build_say_and_continue, text, continue_url)
+        self._play_and_follow_up = TwimlTemplate.compile(
+            build_play_and_follow_up, audio_url, process_url, audio, partial_url
+        )
+        self._play_and_continue = TwimlTemplate.compile(build_play_and_continue, audio_url, continue_url)
+        self._say = TwimlTemplate.compile(build_say, text)
+
+        self.connecting = str(build_say(CONNECTING_MESSAGE, audio))
+        self.processing_error = str(build_say(PROCESSING_ERROR_MESSAGE, audio))
+
+    def webhook_url(self, path: str, call_sid: str) -> str:
+        """Build a webhook URL for a call, absolute if a webhook base is configured"""
+        return f"{self.webhook_base}{path}?call_sid={call_sid}"
+
+    def audio_url(self, filename: str) -> str:
+        return f"{self.webhook_base}{AUDIO_ROUTE}/{filename}"
+
+    def _cached_audio(self, text: str) -> Optional[str]:
+        """URL of pre-rendered audio for an AI answer; counts the answer towards rendering if missing"""
+        if not self.prompt_audio:
+            return None
+        filename = self.prompt_audio.lookup(text)
+        if filename:
+            return self.audio_url(filename)
+        self.prompt_audio.observe(text)
+        return None
+
+    def initial(self, call_sid: str) -> str:
+        return self._initial.render(call_sid=call_sid)
+
+    def follow_up(self, call_sid: str) -> str:
+        return self._follow_up.render(call_sid=call_sid)
+
+    def say_and_follow_up(self, text: str, call_sid: str) -> str:
+        audio_url = self._cached_audio(text)
+        if audio_url:
+            return self._play_and_follow_up.render(audio_url=audio_url, call_sid=call_sid)
+        return self._say_and_follow_up.render(text=text, call_sid=call_sid)
+
+    def say_and_continue(self, text: str, call_sid: str) -> str:
+        audio_url = self._cached_audio(text)
+        if audio_url:
+            return self._play_and_continue.render(audio_url=audio_url, call_sid=call_sid)
+        return self._say_and_continue.render(text=text, call_sid=call_sid)
+
+    def say(self, text: str) -> str:
+        return self._say.render(text=text)
+
+    def get_templates(self) -> Dict[str, TwimlTemplate]:
+        return {
+            "initial": self._initial,
+            "follow_up": self._follow_up,
+            "say_and_follow_up": self._say_and_follow_up,
+            "say_and_continue": self._say_and_continue,
+            "play_and_follow_up": self._play_and_follow_up,
+            "play_and_continue": self._play_and_continue,
+            "say": self._say,
+        }
@@ -2,13 +2,25 @@
 Voice Service for handling Twilio voice calls with AI integration
 """
 import os
+import time
 import logging
 from typing import Dict, Optional, List
-from twilio.twiml.voice_response import VoiceResponse
 from twilio.rest import Client
 import openai
 from dotenv import load_dotenv
 
+from .streaming import StreamingReply
+from .circuit_breaker import CLOSED, get_circuit_breaker
+from .fallback_responses import get_keyword_fallback
+from .intent_classifier import create_intent_classifier
+from .model_router import get_model_router
+from .prompt_builder import TokenCounter
+from .twiml_templates import TwimlRenderer
+from .prompt_audio import create_prompt_audio_cache
+from .session_store import create_call_history_store
+from .speculation import SpeculativePrefetcher
+from .tracing import CLIENT, span, traced
+
 # Load environment variables
 load_dotenv()
 
@@ -42,8 +54,39 @@ class VoiceService:
             self.openai_client = None
             logger.warning("OpenAI API key not configured - using fallback responses")
         
-        # Conversation history storage (in production, use Redis or database)
-        self.conversation_history: Dict[str, List[Dict]] = {}
+        # Bounded per-call history, in memory or shared by all workers (VOICE_SESSION_BACKEND);
+        # calls whose status callback never arrives are swept when idle
+        self.history_context_messages = int(os.getenv('VOICE_HISTORY_CONTEXT_MESSAGES', '10'))
+        self.conversation_history = create_call_history_store(on_expire=self._abandon_pending_reply)
+        
+        # Streamed replies whose remaining sentences are still to be spoken
+        self.pending_replies: Dict[str, StreamingReply] = {}
+        self.streaming_enabled = os.getenv('VOICE_STREAMING_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.first_sentence_timeout = float(os.getenv('VOICE_FIRST_SENTENCE_TIMEOUT', '8'))
+        self.stream_completion_timeout = float(os.getenv('VOICE_STREAM_COMPLETION_TIMEOUT', '15'))
+        
+        # Skip OpenAI while the provider is failing or too slow
+        self.llm_breaker = get_circuit_breaker("openai")
+        self.request_timeout = float(os.getenv('LLM_REQUEST_TIMEOUT_SECONDS', '10'))
+        
+        # Per-request model choice from the shared routing rules
+        self.model_router = get_model_router()
+        self.intent_classifier = create_intent_classifier()
+        self.intent_confidence_threshold = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '0.7'))
+        self.token_counter = TokenCounter()
+        
+        # TwiML documents compiled once; WEBHOOK_BASE_URL is read here, not per webhook.
+        # With a TTS backend configured, fixed prompts and recurring answers are <Play>ed
+        self.prompt_audio = create_prompt_audio_cache(self.openai_client)
+        
+        # Start streamed replies on stable partial transcripts, before the final SpeechResult
+        self.speculation = None
+        if os.getenv('VOICE_SPECULATION_ENABLED', 'true').lower() not in ('0', 'false', 'no'):
+            self.speculation = SpeculativePrefetcher(
+                self._start_speculative_reply,
+                max_per_utterance=int(os.getenv('VOICE_SPECULATION_MAX_PER_UTTERANCE', '2'))
+            )
+        self.twiml = TwimlRenderer(prompt_audio=self.prompt_audio, partial_results=self.speculation is not None)
         
         # Salon context for the AI
         self.salon_context = """
@@ -72,7 +115,12 @@ class VoiceService:
                 "status": "healthy",
                 "twilio_configured": self.twilio_client is not None,
                 "openai_configured": self.openai_client is not None,
-                "conversation_sessions": len(self.conversation_history)
+                "conversation_sessions": len(self.conversation_history),
+                "call_history": self.conversation_history.get_metrics(),
+                "prompt_audio": self.prompt_audio.get_stats() if self.prompt_audio else None,
+                "speculation": self.speculation.get_stats() if self.speculation else None,
+                "circuit_breaker": self.llm_breaker.get_stats(),
+                "model_routing": self.model_router.get_stats()
             }
             
             # Test OpenAI connection if configured
@@ -95,242 +143,284 @@ class VoiceService:
                 "error": str(e)
             }
     
+    @traced("voice_service.create_initial_response")
     def create_initial_response(self, call_sid: str) -> str:
         """
         Create the initial TwiML response for incoming calls
         """
         try:
-            response = VoiceResponse()
-            
-            # Add a friendly greeting
-            response.say(
-                "Hello! Welcome to our salon. I'm your AI assistant. How can I help you today?",
-                voice='alice',
-                language='en-US'
-            )
-            
-            # Get webhook base URL from environment or use relative paths
-            webhook_base = os.getenv('WEBHOOK_BASE_URL', '')
-            if webhook_base:
-                process_url = f"{webhook_base}/webhook/voice/process?call_sid={call_sid}"
-                redirect_url = f"{webhook_base}/webhook/voice?call_sid={call_sid}"
-            else:
-                # Use relative paths - Twilio will use the same domain
-                process_url = f"/webhook/voice/process?call_sid={call_sid}"
-                redirect_url = f"/webhook/voice?call_sid={call_sid}"
-            
-            # Configure speech recognition
-            gather = response.gather(
-                input='speech',
-                action=process_url,
-                method='POST',
-                speech_timeout='auto',
-                speech_model='phone_call',
-                enhanced='true',
-                language='en-US'
-            )
-            
-            # Fallback if no speech detected
-            gather.say(
-                "I didn't catch that. Could you please repeat your request?",
-                voice='alice',
-                language='en-US'
-            )
-            
-            # If no input after gather, repeat the greeting
-            response.say(
-                "I'm still here to help. Please let me know what you need.",
-                voice='alice',
-                language='en-US'
-            )
-            response.redirect(redirect_url)
-            
-            return str(response)
+            # The caller said nothing recognizable; drop anything started on their partial speech
+            if self.speculation:
+                self.speculation.cancel(call_sid)
+            return self.twiml.initial(call_sid)
             
         except Exception as e:
-            logger.error(f"Error creating initial response: {e}")
-            import traceback
-            logger.error(f"TRACEBACK: {traceback.format_exc()}")
+            logger.exception("Error creating initial response: %s", e)
             # Fallback response
-            response = VoiceResponse()
-            response.say(
-                "Thank you for calling our salon. Please hold while I connect you to our staff.",
-                voice='alice',
-                language='en-US'
-            )
-            return str(response)
+            return self.twiml.connecting
     
+    @traced("voice_service.create_processing_response")
     def create_processing_response(self, call_sid: str, user_speech: str) -> str:
         """
         Process user speech and create AI response
+        
+        When streaming is enabled, the first sentence of the reply is spoken as
+        soon as it has been generated and the rest is delivered by a redirect to
+        the continuation webhook.
         """
         try:
-            response = VoiceResponse()
-            
-            # Generate AI response
-            ai_response = self._generate_ai_response(call_sid, user_speech)
-            
-            # Speak the AI response
-            response.say(
-                ai_response,
-                voice='alice',
-                language='en-US'
-            )
-            
-            # Ask if they need anything else
-            response.say(
-                "Is there anything else I can help you with?",
-                voice='alice',
-                language='en-US'
-            )
-            
-            # Continue listening for more input
-            # Get webhook base URL from environment or use relative paths
-            webhook_base = os.getenv('WEBHOOK_BASE_URL', '')
-            if webhook_base:
-                process_url = f"{webhook_base}/webhook/voice/process?call_sid={call_sid}"
+            streaming = self.openai_client and self.streaming_enabled
+            if streaming and not self.llm_breaker.allow_request():
+                # Circuit open; answer from keywords straight away
+                self._add_to_history(call_sid, "user", user_speech)
+                ai_response = self._get_fallback_response(user_speech)
+                self._add_to_history(call_sid, "assistant", ai_response)
+            elif streaming:
+                with span("voice_service.first_sentence", kind=CLIENT) as sentence_span:
+                    reply = self._claim_speculative_reply(call_sid, user_speech)
+                    sentence_span.set_attribute("voice.speculative", reply is not None)
+                    reply = reply or self._start_streaming_reply(call_sid, user_speech)
+                    first_sentence = reply.next_sentence(self.first_sentence_timeout)
+                
+                if first_sentence:
+                    self.llm_breaker.record_success(reply.time_to_first_sentence)
+                    
+                    if reply.done and reply.consumed == len(reply.sentences):
+                        # The whole reply was a single sentence
+                        return self.twiml.say_and_follow_up(first_sentence, call_sid)
+                    
+                    self.pending_replies[call_sid] = reply
+                    return self.twiml.say_and_continue(first_sentence, call_sid)
+                
+                # Nothing streamed in time; answer with a fallback instead
+                self.llm_breaker.record_failure(self.first_sentence_timeout)
+                reply.abandon()
+                ai_response = self._get_fallback_response(user_speech)
+                self._add_to_history(call_sid, "assistant", ai_response)
             else:
-                # Use relative paths - Twilio will use the same domain
-                process_url = f"/webhook/voice/process?call_sid={call_sid}"
-            
-            gather = response.gather(
-                input='speech',
-                action=process_url,
-                method='POST',
-                speech_timeout='auto',
-                speech_model='phone_call',
-                enhanced='true',
-                language='en-US'
-            )
+                # Generate AI response
+                ai_response = self._generate_ai_response(call_sid, user_speech)
             
-            # Fallback if no speech detected
-            gather.say(
-                "I didn't hear anything. Please let me know if you need further assistance.",
-                voice='alice',
-                language='en-US'
-            )
+            # Speak the AI response, then keep listening
+            return self.twiml.say_and_follow_up(ai_response, call_sid)
             
-            # If no input, end the call gracefully
-            response.say(
-                "Thank you for calling our salon. Have a wonderful day!",
-                voice='alice',
-                language='en-US'
-            )
-            response.hangup()
+        except Exception as e:
+            logger.error("Error creating processing response: %s", e)
+            # Fallback response
+            return self.twiml.processing_error
+    
+    @traced("voice_service.create_continuation_response")
+    def create_continuation_response(self, call_sid: str) -> str:
+        """
+        Speak the rest of a streamed reply, then keep listening
+        """
+        try:
+            reply = self.pending_replies.pop(call_sid, None)
+            if reply:
+                remaining = reply.remaining_text(self.stream_completion_timeout)
+                if remaining:
+                    return self.twiml.say_and_follow_up(remaining, call_sid)
             
-            return str(response)
+            return self.twiml.follow_up(call_sid)
             
         except Exception as e:
-            logger.error(f"Error creating processing response: {e}")
-            # Fallback response
-            response = VoiceResponse()
-            response.say(
-                "I'm sorry, I'm having trouble processing your request. Let me connect you to our staff.",
-                voice='alice',
-                language='en-US'
+            logger.error("Error creating continuation response: %s", e)
+            return self.twiml.processing_error
+    
+    @traced("voice_service.handle_partial_result")
+    def handle_partial_result(
+        self, call_sid: str, unstable: Optional[str], stable: Optional[str] = None, sequence: Optional[str] = None
+    ) -> bool:
+        """
+        Speculatively start a reply from a partial speech result
+        
+        Returns:
+            bool: True if a reply was started
+        """
+        if not (self.speculation and self.openai_client and self.streaming_enabled):
+            return False
+        # Never spend speculative tokens while the provider is failing or probing recovery
+        if self.llm_breaker.state != CLOSED:
+            return False
+        sequence_number = int(sequence) if sequence and sequence.isdigit() else None
+        return self.speculation.observe_partial(call_sid, unstable, stable, sequence_number)
+    
+    def _add_to_history(self, call_sid: str, role: str, content: str):
+        """Append a message to the call's conversation history"""
+        self.conversation_history.append(call_sid, role, content)
+    
+    def _build_messages(self, call_sid: str) -> List[Dict]:
+        """Prepare the chat messages for OpenAI from the call's history"""
+        messages = [
+            {"role": "system", "content": self.salon_context}
+        ]
+        
+        # Add recent conversation history (bounded to avoid token limits)
+        messages.extend(self.conversation_history.recent(call_sid, self.history_context_messages))
+        return messages
+    
+    def _route_model(self, call_sid: str, user_speech: str, pending_turns: int = 0) -> str:
+        """Pick the model for this turn of the call from the routing rules"""
+        intent = None
+        if self.intent_classifier:
+            prediction = self.intent_classifier.predict(user_speech)
+            if prediction["confidence"] >= self.intent_confidence_threshold:
+                intent = prediction["intent"]
+        turns = self.conversation_history.user_turns(call_sid) + pending_turns
+        model, route = self.model_router.route(user_speech, intent=intent, turns=turns)
+        logger.info("Routed call %s to %s (rule %s)", call_sid, model, route)
+        return model
+    
+    def _record_model_usage(self, model: str, latency: float, messages: List[Dict], reply: str, usage=None):
+        """Report a completed call to the router, estimating tokens when the API does not return usage"""
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        else:
+            prompt_tokens = sum(self.token_counter.count(message["content"]) for message in messages)
+            completion_tokens = self.token_counter.count(reply)
+        self.model_router.record(model, latency, prompt_tokens, completion_tokens)
+    
+    def _start_streaming_reply(self, call_sid: str, user_speech: str) -> StreamingReply:
+        """
+        Start streaming an AI reply for the caller's speech
+        """
+        self._add_to_history(call_sid, "user", user_speech)
+        messages = self._build_messages(call_sid)
+        model = self._route_model(call_sid, user_speech)
+        reply, on_complete = self._stream_reply(call_sid, model, messages)
+        reply.set_on_complete(on_complete)
+        return reply
+    
+    def _start_speculative_reply(self, call_sid: str, transcript: str):
+        """
+        Start streaming a reply to a partial transcript without recording it in the history
+        
+        Returns:
+            tuple: The reply, and the callback that records it once the final transcript claims it
+        """
+        messages = self._build_messages(call_sid)
+        messages.append({"role": "user", "content": transcript})
+        model = self._route_model(call_sid, transcript, pending_turns=1)
+        return self._stream_reply(call_sid, model, messages)
+    
+    def _claim_speculative_reply(self, call_sid: str, user_speech: str) -> Optional[StreamingReply]:
+        """The reply speculatively started for this speech, if the final transcript matches it"""
+        speculation = self.speculation.claim(call_sid, user_speech) if self.speculation else None
+        if not speculation:
+            return None
+        logger.info("Reusing speculative reply for call %s", call_sid)
+        self._add_to_history(call_sid, "user", user_speech)
+        speculation.reply.set_on_complete(speculation.on_complete)
+        return speculation.reply
+    
+    def _stream_reply(self, call_sid: str, model: str, messages: List[Dict]):
+        """Start streaming a completion; returns the reply and the callback that records it"""
+        start = time.perf_counter()
+        
+        def stream_factory():
+            return self.openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7,
+                stream=True,
+                timeout=self.request_timeout
             )
-            return str(response)
+        
+        def on_complete(text: str):
+            self._record_model_usage(model, time.perf_counter() - start, messages, text)
+            self._add_to_history(call_sid, "assistant", text)
+        
+        return StreamingReply(stream_factory).start(), on_complete
     
+    @traced("voice_service.generate_ai_response")
     def _generate_ai_response(self, call_sid: str, user_speech: str) -> str:
         """
         Generate AI response using OpenAI or fallback responses
         """
         try:
-            # Get conversation history for this call
-            if call_sid not in self.conversation_history:
-                self.conversation_history[call_sid] = []
-            
             # Add user message to history
-            self.conversation_history[call_sid].append({
-                "role": "user",
-                "content": user_speech
-            })
+            self._add_to_history(call_sid, "user", user_speech)
             
-            # Try OpenAI first
-            if self.openai_client:
+            # Try OpenAI first, unless the circuit breaker is open
+            if self.openai_client and self.llm_breaker.allow_request():
+                model = self._route_model(call_sid, user_speech)
+                messages = self._build_messages(call_sid)
+                start = time.perf_counter()
                 try:
-                    # Prepare messages for OpenAI
-                    messages = [
-                        {"role": "system", "content": self.salon_context}
-                    ]
-                    
-                    # Add conversation history (keep last 10 messages to avoid token limits)
-                    history = self.conversation_history[call_sid][-10:]
-                    messages.extend(history)
-                    
                     # Generate response
-                    completion = self.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=messages,
-                        max_tokens=150,
-                        temperature=0.7
-                    )
+                    with span("llm.completion", {"llm.model": model}, kind=CLIENT):
+                        completion = self.openai_client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=150,
+                            temperature=0.7,
+                            timeout=self.request_timeout
+                        )
+                    latency = time.perf_counter() - start
+                    self.llm_breaker.record_success(latency)
                     
                     ai_response = completion.choices[0].message.content.strip()
+                    self._record_model_usage(model, latency, messages, ai_response, getattr(completion, "usage", None))
                     
                     # Add AI response to history
-                    self.conversation_history[call_sid].append({
-                        "role": "assistant",
-                        "content": ai_response
-                    })
-                    
-                    # Clean up old conversations (keep only last 20 messages)
-                    if len(self.conversation_history[call_sid]) > 20:
-                        self.conversation_history[call_sid] = self.conversation_history[call_sid][-20:]
+                    self._add_to_history(call_sid, "assistant", ai_response)
                     
                     return ai_response
                     
                 except Exception as e:
-                    logger.error(f"OpenAI error: {e}")
-                    import traceback
-                    logger.error(f"OpenAI TRACEBACK: {traceback.format_exc()}")
+                    self.llm_breaker.record_failure(time.perf_counter() - start)
+                    logger.exception("OpenAI error: %s", e)
                     # Fall through to fallback responses
             
             # Fallback responses when OpenAI is not available
-            user_speech_lower = user_speech.lower()
-            
-            if any(word in user_speech_lower for word in ['appointment', 'book', 'schedule', 'reserve']):
-                response = "I'd be happy to help you book an appointment! We're open Monday through Saturday 9AM to 7PM, and Sundays 10AM to 5PM. What day and time would work best for you?"
-            
-            elif any(word in user_speech_lower for word in ['price', 'cost', 'how much', 'fee']):
-                response = "Our services range from $25 for basic cuts to $150+ for complex services. Haircuts start at $25, styling is $35, and coloring starts at $75. Would you like to know more about a specific service?"
-            
-            elif any(word in user_speech_lower for word in ['hour', 'open', 'time', 'when']):
-                response = "We're open Monday through Saturday from 9AM to 7PM, and Sundays from 10AM to 5PM. We accept walk-ins but recommend appointments for the best experience."
-            
-            elif any(word in user_speech_lower for word in ['cancel', 'reschedule', 'change']):
-                response = "I can help you reschedule or cancel your appointment. We require 24-hour notice for cancellations. What's your name and when is your current appointment?"
-            
-            elif any(word in user_speech_lower for word in ['service', 'what do you', 'offer']):
-                response = "We offer a full range of salon services including haircuts, styling, coloring, highlights, treatments, and more. Our stylists are experienced in all types of hair and styles. What service are you interested in?"
-            
-            else:
-                response = "Thank you for your inquiry. I'm here to help with appointments, pricing, hours, and any other questions about our salon. How can I assist you today?"
+            response = self._get_fallback_response(user_speech)
             
             # Add fallback response to history
-            self.conversation_history[call_sid].append({
-                "role": "assistant",
-                "content": response
-            })
+            self._add_to_history(call_sid, "assistant", response)
             
             return response
             
         except Exception as e:
-            logger.error(f"Error generating AI response: {e}")
-            import traceback
-            logger.error(f"AI Response TRACEBACK: {traceback.format_exc()}")
+            logger.exception("Error generating AI response: %s", e)
             return "I'm sorry, I'm having trouble processing your request. Please try again or speak to our staff."
     
+    def _get_fallback_response(self, user_speech: str) -> str:
+        """
+        Pick a canned response from keywords in the caller's speech
+        """
+        return get_keyword_fallback(user_speech)
+    
+    def _abandon_pending_reply(self, call_sid: str):
+        """Stop waiting on a streamed reply for a call that has ended or gone idle"""
+        reply = self.pending_replies.pop(call_sid, None)
+        if reply:
+            reply.abandon()
+        if self.speculation:
+            self.speculation.cancel(call_sid)
+    
+    def close(self):
+        """Abandon in-flight streamed replies and close the OpenAI client and session store"""
+        for call_sid in list(self.pending_replies):
+            self._abandon_pending_reply(call_sid)
+        if self.openai_client:
+            self.openai_client.close()
+        backend = getattr(self.conversation_history, "backend", None)
+        if backend:
+            backend.close()
+    
     def cleanup_conversation(self, call_sid: str):
         """
         Clean up conversation history after call ends
         """
         try:
+            self._abandon_pending_reply(call_sid)
             if call_sid in self.conversation_history:
                 del self.conversation_history[call_sid]
-                logger.info(f"Cleaned up conversation for call {call_sid}")
+                logger.info("Cleaned up conversation for call %s", call_sid)
         except Exception as e:
-            logger.error(f"Error cleaning up conversation: {e}")
+            logger.error("Error cleaning up conversation: %s", e)
     
     def get_call_status(self, call_sid: str) -> Dict:
         """
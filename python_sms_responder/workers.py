@@ -0,0 +1,252 @@
+"""
+Multi-process serving with shared-nothing workers.
+
+One supervisor process binds the listening socket and starts N uvicorn
+worker processes on it; the kernel hands each accepted connection to one
+worker. Workers share no memory, so everything that must survive a request
+landing on a different worker lives in a shared store (SMS conversations,
+voice call sessions, the outbound queue, the message store), and anything
+sized for "the process" is divided between workers: the database pool and
+the Twilio number's messages-per-second allowance.
+
+On SIGTERM (or SIGINT) the supervisor closes its copy of the socket and
+forwards SIGTERM to every worker. Each worker stops accepting, finishes the
+requests it has in flight (up to the drain timeout) and runs the app's
+lifespan shutdown, which drains the outbound SMS sender and close pools. Workers
+still running after the timeout are killed. Workers that exit on their own
+are restarted.
+
+With cpu_affinity each worker is pinned to one CPU, round robin over the
+CPUs this process may run on. Workers share their metrics through snapshot
+files in METRICS_DIR (a temporary directory unless set), so /metrics on any
+worker reports the totals for all of them.
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import threading
+import multiprocessing
+from typing import Dict, List, Mapping, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker slot waits before restarting a worker that exited, so a
+# worker failing at startup does not spin
+RESTART_DELAY = 1.0
+
+
+def default_worker_count() -> int:
+    """WEB_CONCURRENCY if set, otherwise the number of CPUs this process may use"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def cpu_assignment(workers: int, available: Optional[List[int]] = None) -> List[Set[int]]:
+    """
+    Pin workers to CPUs round robin
+
+    Args:
+        workers: Number of worker processes
+        available: CPUs to use (default: the CPUs this process may run on)
+
+    Returns:
+        list: One single-CPU set per worker
+    """
+    if available is None:
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if not available:
+        return [set() for _ in range(workers)]
+    return [{available[index % len(available)]} for index in range(workers)]
+
+
+def worker_environment(workers: int, index: int, env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """
+    Environment overrides for one worker
+
+    Per-process budgets are divided by the worker count: DB_POOL_MAX_TOTAL (if
+    set) becomes each worker's DB_POOL_MAX, and TWILIO_MPS, the sending
+    number's allowance, is split so the workers together stay within it.
+    With more than one worker, conversation and voice session stores kept in
+    memory are switched to the shared SQLite backend, and voice streaming and
+    speculation are turned off: both keep a live LLM stream in the worker that
+    started it, which a follow-up webhook on another worker cannot reach.
+
+    Returns:
+        dict: Variables to set in the worker before the app is imported
+    """
+    env = os.environ if env is None else env
+    overrides = {"WORKER_INDEX": str(index), "WORKER_COUNT": str(workers)}
+
+    if env.get("DB_POOL_MAX_TOTAL"):
+        pool_max = max(1, int(env["DB_POOL_MAX_TOTAL"]) // workers)
+        overrides["DB_POOL_MAX"] = str(pool_max)
+        overrides["DB_POOL_MIN"] = str(min(int(env.get("DB_POOL_MIN", "1")), pool_max))
+
+    overrides["TWILIO_MPS"] = f"{float(env.get('TWILIO_MPS', '1')) / workers:g}"
+
+    if workers > 1:
+        for name in ("CONVERSATION_STORE_BACKEND", "VOICE_SESSION_BACKEND"):
+            if env.get(name, "memory").lower() == "memory":
+                overrides[name] = "sqlite"
+        overrides["VOICE_STREAMING_ENABLED"] = "false"
+        overrides["VOICE_SPECULATION_ENABLED"] = "false"
+    return overrides
+
+
+def _run_worker(
+    config_kwargs: dict, sock: socket.socket, env: Dict[str, str], cpus: Set[int], app_dir: Optional[str]
+):
+    """Worker process entry point: apply the worker's environment and CPU pinning, then serve"""
+    os.environ.update(env)
+    if app_dir:
+        sys.path.insert(0, app_dir)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    import uvicorn
+    config = uvicorn.Config(**config_kwargs)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class WorkerSupervisor:
+    """Starts, restarts and drains uvicorn worker processes sharing one socket"""
+
+    def __init__(
+        self,
+        app: str,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        cpu_affinity: bool = False,
+        drain_timeout: float = 30.0,
+        app_dir: Optional[str] = None,
+        log_level: str = "info"
+    ):
+        """
+        Args:
+            app: Import string of the ASGI app, e.g. "python_sms_responder.main:app"
+            host: Interface to bind
+            port: Port to bind (0 picks a free port, see bound_port)
+            workers: Number of worker processes (default: default_worker_count())
+            cpu_affinity: Pin each worker to one CPU
+            drain_timeout: Seconds workers get to finish in-flight requests on shutdown
+            app_dir: Directory added to sys.path in the workers to import the app
+            log_level: uvicorn log level
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or default_worker_count()
+        self.cpu_affinity = cpu_affinity
+        self.drain_timeout = drain_timeout
+        self.app_dir = app_dir
+        self.log_level = log_level
+        self.bound_port: Optional[int] = None
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context("spawn")
+        self._socket: Optional[socket.socket] = None
+        self._processes: List[Optional[multiprocessing.Process]] = []
+        self._stop = threading.Event()
+        self._cpus = cpu_assignment(self.workers) if cpu_affinity else [set() for _ in range(self.workers)]
+        self._metrics_dir = os.getenv("METRICS_DIR")
+        self._owns_metrics_dir = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.bound_port = sock.getsockname()[1]
+        return sock
+
+    def _config_kwargs(self) -> dict:
+        return {
+            "app": self.app,
+            "log_level": self.log_level,
+            "timeout_graceful_shutdown": self.drain_timeout,
+        }
+
+    def _start_worker(self, index: int) -> multiprocessing.Process:
+        env = worker_environment(self.workers, index)
+        if self._metrics_dir:
+            env["METRICS_DIR"] = self._metrics_dir
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._config_kwargs(), self._socket, env, self._cpus[index], self.app_dir),
+            name=f"worker-{index}",
+        )
+        process.start()
+        cpus = f" on CPU {sorted(self._cpus[index])[0]}" if self._cpus[index] else ""
+        logger.info("Started worker %s (pid %s)%s", index, process.pid, cpus)
+        return process
+
+    def _handle_signal(self, signum, frame):
+        self._stop.set()
+
+    def start(self):
+        """Bind the socket and start every worker"""
+        self._socket = self._bind()
+        if self.workers > 1 and not self._metrics_dir:
+            self._metrics_dir = tempfile.mkdtemp(prefix="sms-responder-metrics-")
+            self._owns_metrics_dir = True
+        self._processes = [self._start_worker(index) for index in range(self.workers)]
+        logger.info("Serving %s on %s:%s with %s workers", self.app, self.host, self.bound_port, self.workers)
+
+    def run(self):
+        """Start the workers and supervise them until SIGTERM or SIGINT, then drain"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+        self.start()
+        exited_at: Dict[int, float] = {}
+        while not self._stop.wait(0.25):
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                # Restart a worker that died, after a short delay
+                now = time.monotonic()
+                if index not in exited_at:
+                    logger.warning("Worker %s (pid %s) exited with code %s", index, process.pid, process.exitcode)
+                    exited_at[index] = now
+                elif now - exited_at[index] >= RESTART_DELAY:
+                    del exited_at[index]
+                    self.restarts += 1
+                    self._processes[index] = self._start_worker(index)
+        self.shutdown()
+
+    def stop(self):
+        """Ask run() to drain and return"""
+        self._stop.set()
+
+    def shutdown(self):
+        """Stop accepting, let workers finish in-flight requests, then kill stragglers"""
+        if self._socket is not None:
+            # Workers hold their own copies; the socket closes once the last one stops listening
+            self._socket.close()
+            self._socket = None
+
+        processes = [process for process in self._processes if process.is_alive()]
+        logger.info("Draining %s workers (up to %gs)", len(processes), self.drain_timeout)
+        for process in processes:
+            os.kill(process.pid, signal.SIGTERM)
+
+        # uvicorn's graceful timeout covers requests; allow a little more for the lifespan shutdown
+        deadline = time.monotonic() + self.drain_timeout + 5.0
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker pid %s did not drain in time, killing it", process.pid)
+                process.kill()
+                process.join()
+        if self._owns_metrics_dir:
+            shutil.rmtree(self._metrics_dir, ignore_errors=True)
+        logger.info("All workers stopped")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Replay recorded call transcripts to measure speculative prefetch on partial speech.
+
+Each line of the transcripts file is one call:
+
+    {"call_sid": "CA...", "turns": [{"partials": [[ms, "UnstableSpeechResult"], ...],
+                                     "final": "SpeechResult", "final_ms": ms}]}
+
+Offsets are milliseconds from the start of the caller's utterance. Every call
+is replayed twice against a local fake LLM with realistic token timing: once
+answering only the final transcript (the previous behaviour) and once with
+partial results fed to /webhook/voice/partial's handler as they would have
+arrived. The wait measured is from the final SpeechResult to the first <Say>.
+
+    python replay_voice_transcripts.py --transcripts voice_transcripts_sample.jsonl --first-token-ms 600
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from benchmark_voice_streaming import FakeStreamingCompletions, make_voice_service
+
+
+class CountingCompletions(FakeStreamingCompletions):
+    """Fake completions that count the streams started and the tokens actually generated"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.streams = 0
+        self.tokens_generated = 0
+
+    def _chunks(self):
+        self.streams += 1
+        for chunk in super()._chunks():
+            self.tokens_generated += 1
+            yield chunk
+
+
+def replay(calls, speculate, first_token_delay, token_delay, speed):
+    completions = CountingCompletions(first_token_delay=first_token_delay / speed, token_delay=token_delay / speed)
+    service = make_voice_service(completions, streaming=True)
+    if not speculate:
+        service.speculation = None
+
+    waits = []
+    for call in calls:
+        call_sid = call["call_sid"]
+        for sequence, turn in enumerate(call["turns"]):
+            start = time.perf_counter()
+            for number, (offset_ms, text) in enumerate(turn["partials"]):
+                time.sleep(max(0.0, start + offset_ms / 1000 / speed - time.perf_counter()))
+                service.handle_partial_result(call_sid, text, None, str(number))
+            time.sleep(max(0.0, start + turn["final_ms"] / 1000 / speed - time.perf_counter()))
+
+            final_at = time.perf_counter()
+            service.create_processing_response(call_sid, turn["final"])
+            waits.append((time.perf_counter() - final_at) * speed)
+
+            # Let the rest of the reply finish so the history matches a real call
+            service.create_continuation_response(call_sid)
+        service.cleanup_conversation(call_sid)
+
+    # Abandoned streams stop at their next token
+    time.sleep(2 * token_delay / speed)
+    return {
+        "waits": waits,
+        "streams": completions.streams,
+        "tokens": completions.tokens_generated,
+        "speculation": service.speculation.get_stats() if service.speculation else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay call transcripts with and without speculative prefetch")
+    parser.add_argument("--transcripts", default="voice_transcripts_sample.jsonl")
+    parser.add_argument("--first-token-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=25)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay faster than real time")
+    args = parser.parse_args()
+
+    with open(args.transcripts) as f:
+        calls = [json.loads(line) for line in f if line.strip()]
+    turns = sum(len(call["turns"]) for call in calls)
+
+    timing = (args.first_token_ms / 1000, args.token_ms / 1000, args.speed)
+    baseline = replay(calls, False, *timing)
+    speculative = replay(calls, True, *timing)
+
+    print(f"{len(calls)} calls, {turns} turns; fake LLM first token {args.first_token_ms:g} ms, "
+          f"{args.token_ms:g} ms/token\n")
+    print(f"{'wait for first <Say>':<22} {'final only':>11} {'speculative':>12}")
+    for label, func in (("mean ms", statistics.mean), ("median ms", statistics.median), ("max ms", max)):
+        print(f"{label:<22} {func(baseline['waits']) * 1000:>11.0f} {func(speculative['waits']) * 1000:>12.0f}")
+
+    saved = [before - after for before, after in zip(baseline["waits"], speculative["waits"])]
+    stats = speculative["speculation"]
+    print(f"\nSaved per turn: mean {statistics.mean(saved) * 1000:.0f} ms, "
+          f"total {sum(saved):.2f} s over {turns} turns")
+    print(f"Speculations: {stats['started']} started, {stats['reused']} reused, "
+          f"{stats['superseded']} superseded, {stats['discarded']} discarded, {stats['cancelled']} cancelled")
+    print(f"LLM streams: {baseline['streams']} -> {speculative['streams']}; "
+          f"tokens generated: {baseline['tokens']} -> {speculative['tokens']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Build and evaluate the semantic FAQ cache index.
+
+Build an index from approved FAQ answers:
+
+    python semantic_cache_tool.py build faqs.json --index data/semantic_faq
+
+where faqs.json is a JSON list (or JSONL file) of
+{"id": "...", "question": "...", "answer": "..."} objects.
+
+Evaluate precision versus threshold on labelled message logs:
+
+    python semantic_cache_tool.py evaluate messages.jsonl --index data/semantic_faq
+
+where each log line is {"message": "...", "faq_id": "..."} and faq_id is
+null/empty for messages that should not be answered from the cache. CSV files
+with message and faq_id columns are accepted too. Pick the lowest threshold
+with a precision of 1.000, plus a step of margin: a wrong hit sends the wrong
+answer without asking the LLM, while a miss only costs an LLM call.
+
+semantic_faq_sample.json and semantic_cache_messages_sample.jsonl are the
+hand-labelled sample the default SEMANTIC_CACHE_THRESHOLD was calibrated on
+with the hashed n-gram embedder; near misses (other weekdays and services,
+"... and color") are labelled null:
+
+    python semantic_cache_tool.py build semantic_faq_sample.json --index /tmp/faq
+    python semantic_cache_tool.py evaluate semantic_cache_messages_sample.jsonl --index /tmp/faq
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.semantic_cache import SemanticFAQIndex, create_embedder
+
+
+def load_records(path):
+    """Load a list of dicts from a JSON, JSONL or CSV file"""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def build_index(args):
+    faqs = load_records(args.faqs)
+    index = SemanticFAQIndex(create_embedder())
+    for i, faq in enumerate(faqs):
+        index.add(faq["question"], faq["answer"], str(faq.get("id", i)))
+        for paraphrase in faq.get("paraphrases", []):
+            index.add(paraphrase, faq["answer"], str(faq.get("id", i)))
+    index.save(args.index)
+    print(f"✅ Indexed {len(index)} questions from {len(faqs)} FAQs into {args.index}.json")
+
+
+def evaluate_index(args):
+    index = SemanticFAQIndex.load(args.index, create_embedder())
+    records = load_records(args.log)
+
+    scored = []
+    for record in records:
+        label = record.get("faq_id")
+        label = str(label) if label not in (None, "") else None
+        # The same match SemanticCache.lookup makes, slot check included
+        match = index.best_match(record["message"])
+        if match:
+            entry, score = match
+            scored.append((label, entry["id"], score))
+        else:
+            scored.append((label, None, 0.0))
+
+    total = len(scored)
+    labelled = sum(1 for label, _, _ in scored if label is not None)
+    print(f"Messages: {total} ({labelled} labelled with an FAQ)")
+    print(f"{'threshold':>9} {'hits':>6} {'precision':>9} {'recall':>7} {'coverage':>8}")
+
+    threshold = args.min_threshold
+    while threshold <= args.max_threshold + 1e-9:
+        hits = [(label, predicted) for label, predicted, score in scored if score >= threshold]
+        correct = sum(1 for label, predicted in hits if label is not None and label == predicted)
+        precision = correct / len(hits) if hits else 1.0
+        recall = correct / labelled if labelled else 0.0
+        coverage = len(hits) / total if total else 0.0
+        print(f"{threshold:>9.2f} {len(hits):>6} {precision:>9.3f} {recall:>7.3f} {coverage:>8.3f}")
+        threshold += args.step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic FAQ cache tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from approved FAQs")
+    build_parser.add_argument("faqs", help="JSON/JSONL/CSV file of approved FAQ answers")
+    build_parser.add_argument("--index", default=os.getenv("SEMANTIC_CACHE_INDEX", "semantic_faq"))
+    build_parser.set_defaults(func=build_index)
+
+    eval_parser = subparsers.add_parser("evaluate", help="Report precision versus threshold")
+    eval_parser.add_argument("log", help="JSONL/CSV file of labelled messages")
+    eval_parser.add_argument("--index", default=os.getenv("SEMANTIC_CACHE_INDEX", "semantic_faq"))
+    eval_parser.add_argument("--min-threshold", type=float, default=0.5)
+    eval_parser.add_argument("--max-threshold", type=float, default=0.95)
+    eval_parser.add_argument("--step", type=float, default=0.05)
+    eval_parser.set_defaults(func=evaluate_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
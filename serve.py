@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Production entry point: serve the app with N shared-nothing worker processes.
+
+Workers share one listening socket and no memory. SMS conversations and
+voice sessions kept in memory are moved to the shared SQLite stores when more
+than one worker runs, DB_POOL_MAX_TOTAL and TWILIO_MPS are divided between
+the workers, and SIGTERM drains in-flight requests before the workers exit.
+See MULTI_WORKER_DEPLOYMENT.md.
+
+    python serve.py --workers 4 --cpu-affinity
+    WEB_CONCURRENCY=4 python serve.py --port 8000 --drain-timeout 20
+
+For development with auto-reload, run python_sms_responder/main.py instead.
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.workers import WorkerSupervisor, default_worker_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the SMS responder with multiple worker processes")
+    parser.add_argument("--app", default="python_sms_responder.main:app", help="ASGI app import string")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--cpu-affinity", action="store_true",
+                        default=os.getenv("WORKER_CPU_AFFINITY", "false").lower() in ("1", "true", "yes"),
+                        help="Pin each worker to one CPU")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", "30")),
+                        help="Seconds in-flight requests get to finish on SIGTERM")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format="%(asctime)s supervisor %(levelname)s %(message)s")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    WorkerSupervisor(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        cpu_affinity=args.cpu_affinity,
+        drain_timeout=args.drain_timeout,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        log_level=args.log_level
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
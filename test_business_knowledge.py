@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for business knowledge retrieval
+"""
+
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.business_knowledge import BusinessKnowledge
+from python_sms_responder.knowledge_index import BM25Index, KnowledgeIndex, tokenize
+
+ROWS = [
+    {"id": 1, "title": "Parking", "content": "Free parking is available behind the building.",
+     "keywords": "parking,car,park", "category": "location", "priority": 1, "active": True,
+     "updated_at": datetime(2025, 1, 1)},
+    {"id": 2, "title": "Late arrivals", "content": "If you are more than 15 minutes late we may need to reschedule.",
+     "keywords": "late,arrival", "category": "policies", "priority": 2, "active": True,
+     "updated_at": datetime(2025, 1, 2)},
+]
+
+
+def make_knowledge(use_dense=False):
+    knowledge = BusinessKnowledge(use_dense=use_dense)
+    knowledge.upsert_rows(ROWS)
+    return knowledge
+
+
+def test_bm25_incremental_updates():
+    index = BM25Index()
+    index.add("a", tokenize("haircut prices start at $45"))
+    index.add("b", tokenize("parking behind the building"))
+    assert index.search(tokenize("where is parking"))[0][0] == "b"
+
+    index.remove("b")
+    assert index.search(tokenize("where is parking")) == []
+    assert index.total_length == index.doc_lengths["a"]
+
+
+def test_search_returns_relevant_snippets():
+    knowledge = make_knowledge()
+
+    assert knowledge.search("is there parking?", k=1)[0]["title"] == "Parking"
+    assert knowledge.search("what is your cancellation policy", k=1)[0]["id"] == "file:faq:1"
+    assert "Balayage" in knowledge.get_relevant_knowledge("how much is balayage")
+
+
+def test_rows_update_incrementally():
+    knowledge = make_knowledge()
+    version = knowledge.version
+
+    knowledge.upsert_rows([{**ROWS[0], "content": "Street parking only.", "updated_at": datetime(2025, 2, 1)}])
+    assert knowledge.search("parking", k=1)[0]["content"] == "Street parking only."
+    assert knowledge.version > version
+
+    # The inclusive refresh watermark re-reads the newest row; unchanged rows keep the version
+    version = knowledge.version
+    knowledge.upsert_rows([{**ROWS[0], "content": "Street parking only.", "updated_at": datetime(2025, 2, 1)}])
+    assert knowledge.version == version
+
+    knowledge.upsert_rows([{**ROWS[1], "active": False}])
+    assert all(s["id"] != "db:2" for s in knowledge.search("late arrival", k=5))
+
+    knowledge.remove_missing_rows([])
+    assert all(not doc_id.startswith("db:") for doc_id in knowledge.index.documents)
+
+
+def test_dense_index_hybrid_search():
+    index = KnowledgeIndex(use_dense=True)
+    index.upsert("1", "Parking", "Free parking behind the building")
+    index.upsert("2", "Gift cards", "Gift certificates in any amount")
+    index.remove("1")
+    index.upsert("3", "Walk-ins", "We accept walk-ins based on availability")
+
+    assert index.search("gift certificate", k=1)[0]["id"] == "2"
+    assert len(index.dense.doc_ids) == 2
+
+
+def test_search_latency_under_a_millisecond():
+    knowledge = make_knowledge()
+    messages = ["how much is a haircut", "is there parking", "do you take walk ins", "when are you open"]
+    iterations = 500
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        knowledge.search(messages[i % len(messages)], k=3)
+    per_query_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    assert per_query_ms < 1.0, f"search took {per_query_ms:.3f} ms"
+
+
+def test_search_is_safe_during_refresh():
+    knowledge = make_knowledge()
+    errors = []
+    stop = threading.Event()
+
+    def refresh():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            knowledge.upsert_rows([{**ROWS[0], "id": 100 + i % 50, "content": f"Parking lot {i}"}])
+            knowledge.remove_missing_rows([1, 2])
+
+    # Switch threads often so searches overlap refreshes
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=refresh)
+    thread.start()
+    try:
+        for _ in range(2000):
+            try:
+                knowledge.search("parking lot", k=3)
+            except RuntimeError as e:
+                errors.append(e)
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded per-call voice history
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.call_history import CallHistoryStore, RingBuffer
+from benchmark_voice_streaming import FakeStreamingCompletions, make_voice_service
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_buffer_overwrites_oldest():
+    buffer = RingBuffer(3)
+    for item in range(5):
+        buffer.append(item)
+
+    assert len(buffer) == 3
+    assert list(buffer) == [2, 3, 4]
+    assert buffer[0] == 2
+    assert buffer[-1] == 4
+    assert list(buffer.latest(2)) == [3, 4]
+    assert list(buffer.latest(10)) == [2, 3, 4]
+
+
+def test_ring_buffer_index_errors():
+    buffer = RingBuffer(2)
+    try:
+        buffer[0]
+        assert False, "expected IndexError"
+    except IndexError:
+        pass
+    buffer.append("a")
+    assert buffer[-1] == "a"
+
+
+def test_recent_returns_newest_messages_in_order():
+    store = CallHistoryStore(capacity=4)
+    for turn in range(3):
+        store.append("CA1", "user", f"question {turn}")
+        store.append("CA1", "assistant", f"answer {turn}")
+
+    recent = [message["content"] for message in store.recent("CA1", 3)]
+    assert recent == ["answer 1", "question 2", "answer 2"]
+    assert len(store["CA1"]) == 4
+    assert store.user_turns("CA1") == 3
+    assert store.stats["overwritten"] == 2
+    assert list(store.recent("CA-unknown", 3)) == []
+
+
+def test_idle_calls_are_swept_and_reported():
+    clock = FakeClock()
+    expired = []
+    store = CallHistoryStore(capacity=4, idle_ttl=60, sweep_interval=30, on_expire=expired.append, time_func=clock)
+    store.append("CA-orphan", "user", "hello")
+    clock.now += 45
+    store.append("CA-active", "user", "hi")
+    assert expired == []
+
+    # The next append after the sweep interval drops the call idle for over a minute
+    clock.now += 35
+    store.append("CA-active", "assistant", "how can I help?")
+    assert expired == ["CA-orphan"]
+    assert "CA-orphan" not in store
+    assert "CA-active" in store
+
+    metrics = store.get_metrics()
+    assert metrics["active_calls"] == 1
+    assert metrics["messages"] == 2
+    assert metrics["occupancy"] == 0.5
+    assert metrics["expired"] == 1
+    assert metrics["memory_bytes"] > 0
+
+
+def test_voice_service_uses_bounded_history():
+    completions = FakeStreamingCompletions(first_token_delay=0, token_delay=0)
+    service = make_voice_service(completions, streaming=False)
+    service.conversation_history = CallHistoryStore(capacity=4, on_expire=service._abandon_pending_reply)
+    service.history_context_messages = 3
+
+    for _ in range(5):
+        service.create_processing_response("CA1", "what are your hours?")
+
+    assert len(service.conversation_history["CA1"]) == 4
+    assert len(service._build_messages("CA1")) == 1 + 3
+    assert service.check_health()["call_history"]["active_calls"] == 1
+
+    service.cleanup_conversation("CA1")
+    assert "CA1" not in service.conversation_history
+
+
+def test_sweep_abandons_pending_streamed_reply():
+    clock = FakeClock()
+    completions = FakeStreamingCompletions(first_token_delay=0.01, token_delay=0.002)
+    service = make_voice_service(completions, streaming=True)
+    service.conversation_history = CallHistoryStore(
+        idle_ttl=60, on_expire=service._abandon_pending_reply, time_func=clock
+    )
+
+    service.create_processing_response("CA-dropped", "what are your hours?")
+    assert "CA-dropped" in service.pending_replies
+
+    clock.now += 120
+    assert service.conversation_history.sweep() == ["CA-dropped"]
+    assert "CA-dropped" not in service.pending_replies
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ring_buffer_overwrites_oldest,
+        test_ring_buffer_index_errors,
+        test_recent_returns_newest_messages_in_order,
+        test_idle_calls_are_swept_and_reported,
+        test_voice_service_uses_bounded_history,
+        test_sweep_abandons_pending_streamed_reply,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM circuit breaker and hedged calls
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.circuit_breaker import CircuitBreaker, hedged_call, CLOSED, OPEN, HALF_OPEN
+from python_sms_responder.llm_service import LLMService
+from python_sms_responder.fallback_responses import get_keyword_fallback
+from benchmark_voice_streaming import FakeStreamingCompletions, make_voice_service
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_failures_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=30, time_func=clock)
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 31
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # Only one trial call at a time
+
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+    stats = breaker.get_stats()
+    assert stats["trips"] == 1
+    assert stats["rejected"] == 2
+
+
+def test_unreported_trial_call_expires():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=30, trial_timeout=10, time_func=clock)
+    breaker.record_failure()
+
+    clock.now = 31
+    assert breaker.allow_request()  # A trial whose caller never records a result
+    clock.now = 40
+    assert not breaker.allow_request()
+    clock.now = 41
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_opens_when_latency_slo_is_missed():
+    breaker = CircuitBreaker("slow", latency_slo=1.0, min_calls=4, slow_call_rate_threshold=0.5)
+    for latency in (0.3, 2.5, 0.4, 3.0):
+        breaker.record_success(latency)
+
+    assert breaker.state == OPEN
+    assert "slower than" in breaker.last_trip_reason
+
+
+def test_hedged_call_returns_first_successful_result():
+    def slow_primary():
+        time.sleep(0.5)
+        return "primary"
+
+    start = time.perf_counter()
+    assert hedged_call(slow_primary, lambda: "hedge", hedge_after=0.05) == "hedge"
+    assert time.perf_counter() - start < 0.4
+
+    assert hedged_call(lambda: "primary", lambda: "hedge", hedge_after=0.5) == "primary"
+
+
+def test_open_circuit_skips_llm_for_sms():
+    service = LLMService()
+    service.response_cache.enabled = False
+    service.llm_breaker = CircuitBreaker("sms", failure_threshold=1)
+    calls = []
+
+    def failing_create(**kwargs):
+        calls.append(kwargs)
+        raise TimeoutError("provider timed out")
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=failing_create)))
+
+    message = "what are your hours on sunday?"
+    assert service.generate_response_sync(message, phone_number="+15555550101") == get_keyword_fallback(message)
+    assert len(calls) == 1
+    assert service.llm_breaker.state == OPEN
+
+    assert service.generate_response_sync(message, phone_number="+15555550101") == get_keyword_fallback(message)
+    assert len(calls) == 1
+
+
+def test_failed_prompt_build_settles_the_trial_call():
+    clock = FakeClock()
+    service = LLMService()
+    service.response_cache.enabled = False
+    service.llm_breaker = CircuitBreaker("sms", failure_threshold=1, recovery_timeout=30, time_func=clock)
+    service.llm_breaker.record_failure()
+    clock.now = 31
+
+    def failing_build(*args):
+        raise RuntimeError("knowledge base unavailable")
+
+    service._build_prompt = failing_build
+    message = "what are your hours on sunday?"
+    assert service.generate_response_sync(message, phone_number="+15555550101") == get_keyword_fallback(message)
+    # The trial was recorded as failed, so the breaker is open again rather than stuck half-open
+    assert service.llm_breaker.state == OPEN
+    clock.now = 62
+    assert service.llm_breaker.allow_request()
+
+
+def test_async_generate_response_runs_off_the_event_loop():
+    service = LLMService()
+    service.response_cache.enabled = False
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Yes!"))])
+    )))
+    threads = []
+    process_message = service.conversation_manager.process_message
+
+    def recording_process_message(*args):
+        threads.append(threading.current_thread())
+        return process_message(*args)
+
+    service.conversation_manager.process_message = recording_process_message
+
+    async def respond():
+        return await service.generate_response("do you sell gift cards?", phone_number="+15555550104"), \
+            threading.current_thread()
+
+    reply, loop_thread = asyncio.run(respond())
+    assert reply == "Yes!"
+    assert threads and loop_thread not in threads
+
+
+def test_intent_analysis_calls_the_llm_off_the_event_loop():
+    service = LLMService()
+    threads = []
+
+    def create(**kwargs):
+        threads.append(threading.current_thread())
+        content = '{"intent": "inquiry", "confidence": 0.8, "entities": {}, "requires_human": false}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    async def analyze():
+        return await service._analyze_intent_with_llm("do you sell gift cards?"), threading.current_thread()
+
+    result, loop_thread = asyncio.run(analyze())
+    assert result["intent"] == "inquiry" and result["source"] == "llm"
+    assert threads and loop_thread not in threads
+
+
+def test_open_circuit_skips_llm_for_voice():
+    service = make_voice_service(FakeStreamingCompletions(first_token_delay=5), streaming=True)
+    service.llm_breaker = CircuitBreaker("voice")
+    service.llm_breaker.record_failure()
+    service.llm_breaker._trip("test")
+
+    start = time.perf_counter()
+    twiml = service.create_processing_response("CA-open", "how much is a haircut?")
+    assert time.perf_counter() - start < 0.5
+    assert "Haircuts start at $25" in twiml
+    assert "<Gather" in twiml
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
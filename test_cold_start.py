@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Cold start tests: importing the app must stay cheap, and heavy clients must
+only load when a service is first used or warmed
+
+COLD_START_BUDGET_MS overrides the allowed import time on top of FastAPI's own.
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.startup_profile import (
+    APP_MODULE,
+    HEAVY_MODULES,
+    cold_start_report,
+    measure_import,
+    parse_importtime,
+)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "300"))
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     encodings.idna\n"
+        "import time:      1500 |       1620 |   python_sms_responder.models\n"
+        "import time:      4000 |       5620 | python_sms_responder.main\n"
+    )
+    records = parse_importtime(output)
+    assert [record.module for record in records] == [
+        "encodings.idna", "python_sms_responder.models", "python_sms_responder.main"
+    ]
+    assert [record.depth for record in records] == [2, 1, 0]
+    assert records[-1].cumulative_us == 5620
+
+
+def test_heavy_clients_are_not_imported_with_the_app():
+    loaded = set(measure_import(APP_MODULE, repeats=1, cwd=ROOT)["modules"])
+    assert not [name for name in HEAVY_MODULES if name in loaded]
+    assert "dotenv" not in loaded
+
+
+def test_cold_start_within_budget():
+    report = cold_start_report(repeats=5, cwd=ROOT)
+    assert report["overhead_seconds"] * 1000 <= COLD_START_BUDGET_MS, report
+
+
+def test_services_load_on_first_use():
+    script = (
+        "import json, sys\n"
+        "from python_sms_responder import main\n"
+        "before = 'openai' in sys.modules\n"
+        "main.get_voice_service()\n"
+        "print(json.dumps({'before': before, 'after': 'openai' in sys.modules, 'timings': main.startup_timings}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT, timeout=120)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["before"] is False
+    assert report["after"] is True
+    assert "Module import" in report["timings"]
+    assert "Voice Service" in report["timings"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_parse_importtime,
+        test_heavy_clients_are_not_imported_with_the_app,
+        test_cold_start_within_budget,
+        test_services_load_on_first_use,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
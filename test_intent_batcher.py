@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for micro-batched intent analysis
+"""
+
+import os
+import re
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.intent_batcher import IntentBatcher
+from python_sms_responder.llm_service import LLMService
+
+
+def test_batches_flush_on_size_and_timer():
+    batches = []
+
+    async def classify_batch(messages):
+        batches.append(list(messages))
+        return [{"intent": message.upper()} for message in messages]
+
+    async def run():
+        batcher = IntentBatcher(classify_batch, max_batch_size=3, max_wait_ms=20)
+        results = await batcher.classify_many(["a", "b", "c", "d"])
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert [result["intent"] for result in results] == ["A", "B", "C", "D"]
+    assert batches == [["a", "b", "c"], ["d"]]
+    stats = batcher.get_stats()
+    assert stats["size_flushes"] == 1
+    assert stats["timer_flushes"] == 1
+
+
+def test_batch_errors_reach_every_caller():
+    async def classify_batch(messages):
+        raise RuntimeError("provider down")
+
+    async def run():
+        batcher = IntentBatcher(classify_batch, max_batch_size=10, max_wait_ms=5)
+        return await asyncio.gather(batcher.classify("a"), batcher.classify("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_llm_service_sends_one_request_per_batch():
+    service = LLMService()
+    service.intent_classifier = None
+    requests = []
+
+    def create(messages, **kwargs):
+        prompt = messages[-1]["content"]
+        count = len(re.findall(r"^\d+\. \"", prompt, re.MULTILINE))
+        requests.append(count)
+        items = [{"id": i, "intent": "inquiry", "confidence": 0.8, "entities": {}, "requires_human": False}
+                 for i in range(1, count + 1)]
+        # Drop the last item to check that missing results come back as unknown
+        content = json.dumps(items[:-1])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    results = asyncio.run(service.analyze_intents(["is the sale on?", "do you do nails", "ok"]))
+    assert requests == [3]
+    assert [result["intent"] for result in results] == ["inquiry", "inquiry", "unknown"]
+    assert results[0]["source"] == "llm_batch"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the local intent classifier
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.intent_classifier import IntentClassifier, load_examples, SEED_TRAINING_DATA, create_intent_classifier
+from python_sms_responder.llm_integration import LLMIntegration
+from python_sms_responder.llm_service import LLMService
+from benchmark_intent_classifier import bench_local
+
+NEGATED_OR_MIXED = [
+    "Do not cancel my appointment",
+    "no need to reschedule, friday still works",
+    "I need to cancel my haircut and book a color instead",
+]
+
+
+def test_seed_model_classifies_routine_messages():
+    classifier = create_intent_classifier()
+    assert classifier.predict("what time do you open on sunday?")["intent"] == "hours"
+    assert classifier.predict("how much is a balayage")["intent"] == "pricing"
+    assert classifier.predict("STOP")["intent"] == "opt_out"
+    assert classifier.predict("I need to cancel tomorrow")["intent"] == "cancellation"
+
+
+def test_artifact_round_trip_keeps_version_and_predictions():
+    classifier = IntentClassifier().fit(load_examples([SEED_TRAINING_DATA]), epochs=10)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intent.npz")
+        classifier.save(path, model_version="2025.1")
+        loaded = IntentClassifier.load(path)
+
+    assert loaded.version == "2025.1"
+    assert loaded.labels == classifier.labels
+    message = "can I move my appointment to friday"
+    assert loaded.predict(message)["intent"] == classifier.predict(message)["intent"]
+
+
+def test_analyze_intent_skips_llm_when_confident():
+    service = LLMService()
+    service.intent_batching = False
+    calls = []
+    service.client = None  # Any LLM call would fail
+
+    async def fake_llm(message):
+        calls.append(message)
+        return {"intent": "inquiry", "confidence": 0.5, "entities": {}, "requires_human": False, "source": "llm"}
+
+    service._analyze_intent_with_llm = fake_llm
+
+    local = asyncio.run(service.analyze_intent("yes confirm"))
+    assert local["source"] == "local"
+    assert local["intent"] == "confirmation"
+    assert calls == []
+
+    service.intent_confidence_threshold = 1.01
+    remote = asyncio.run(service.analyze_intent("yes confirm"))
+    assert remote["source"] == "llm"
+    assert calls == ["yes confirm"]
+
+
+def test_negated_and_mixed_messages_are_not_answered_locally():
+    service = LLMService()
+    for message in NEGATED_OR_MIXED:
+        assert service.classify_intent_locally(message) is None, message
+    assert service.classify_intent_locally("Please cancel my appointment tomorrow")["intent"] == "cancellation"
+
+
+def test_automation_needs_the_keywords_and_the_local_model_to_agree():
+    integration = LLMIntegration.__new__(LLMIntegration)
+    integration.intent_classifier = create_intent_classifier()
+    integration.intent_confidence_threshold = 0.7
+
+    assert integration.is_automation_message("cancel")
+    assert integration.is_automation_message("Cancel my appointment please")
+    for message in NEGATED_OR_MIXED + ["No, don't cancel, I'll be there", "No, I'd like to book a facial"]:
+        assert not integration.is_automation_message(message), message
+    # A confident label alone no longer routes to the automations
+    assert not integration.is_automation_message("I need to cancel tomorrow")
+
+
+def test_no_wrong_local_answers_on_the_labelled_sample():
+    here = os.path.dirname(os.path.abspath(__file__))
+    sample = load_examples([os.path.join(here, "intent_messages_sample.jsonl")])
+    result = bench_local(create_intent_classifier(), sample, LLMService().intent_confidence_threshold)
+    assert result["wrong"] == []
+    assert result["coverage"] > 0.4
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the local SMS message store
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder import message_store as message_store_module
+from python_sms_responder.message_store import INBOUND, OUTBOUND, MessageStore, from_twilio_message
+from python_sms_responder.llm_service import LLMService
+
+
+def test_history_is_newest_first_per_number():
+    store = MessageStore(":memory:")
+    store.record("+15555550100", INBOUND, "Hi", sid="SM1", created_at=100)
+    store.record("+15555550100", OUTBOUND, "Hello! How can I help?", sid="SM2", created_at=101)
+    store.record("+15555550199", INBOUND, "Other customer", sid="SM3", created_at=102)
+    store.record("+15555550100", INBOUND, "Book a haircut", sid="SM4", created_at=103)
+
+    history = store.history("+15555550100")
+    assert [message["sid"] for message in history] == ["SM4", "SM2", "SM1"]
+    assert history[0]["direction"] == INBOUND
+    assert history[0]["date_sent"] == datetime.fromtimestamp(103, tz=timezone.utc)
+
+    assert [m["sid"] for m in store.history("+15555550100", limit=2)] == ["SM4", "SM2"]
+    assert [m["sid"] for m in store.history("+15555550100", before=103)] == ["SM2", "SM1"]
+    assert [m["sid"] for m in store.history("+15555550100", direction=OUTBOUND)] == ["SM2"]
+
+
+def test_record_is_idempotent_per_sid():
+    store = MessageStore(":memory:")
+    assert store.record("+15555550100", INBOUND, "Hi", sid="SM1") is True
+    assert store.record("+15555550100", INBOUND, "Hi", sid="SM1") is False
+    # Messages without a SID are always appended
+    assert store.record("+15555550100", OUTBOUND, "Reply") is True
+    assert store.record("+15555550100", OUTBOUND, "Reply") is True
+    assert store.get_stats()["messages"] == 3
+
+
+def test_record_many_counts_only_new_messages():
+    store = MessageStore(":memory:")
+    batch = [
+        {"sid": f"SM{i}", "phone_number": "+15555550100", "direction": INBOUND, "body": f"m{i}", "created_at": i}
+        for i in range(50)
+    ]
+    assert store.record_many(batch) == 50
+    assert store.record_many(batch[40:] + [
+        {"sid": "SM50", "phone_number": "+15555550100", "direction": OUTBOUND, "body": "new", "created_at": 50}
+    ]) == 1
+    assert store.get_stats()["messages"] == 51
+
+
+def test_from_twilio_message_uses_customer_number():
+    sent = datetime(2025, 3, 1, 15, 30, tzinfo=timezone.utc)
+    inbound = SimpleNamespace(
+        sid="SM1", direction="inbound", from_="+15555550100", to="+15555550000",
+        body="Hi", status="received", date_sent=sent, date_created=sent
+    )
+    outbound = SimpleNamespace(
+        sid="SM2", direction="outbound-reply", from_="+15555550000", to="+15555550100",
+        body="Hello", status="delivered", date_sent=None, date_created=sent
+    )
+
+    assert from_twilio_message(inbound)["phone_number"] == "+15555550100"
+    assert from_twilio_message(inbound)["direction"] == INBOUND
+    record = from_twilio_message(outbound)
+    assert record["phone_number"] == "+15555550100"
+    assert record["direction"] == OUTBOUND
+    assert record["created_at"] == sent.timestamp()
+
+
+def test_history_lookup_is_fast():
+    store = MessageStore(":memory:")
+    store.record_many(
+        {"phone_number": f"+1555555{i % 1000:04d}", "direction": INBOUND, "body": "hello", "created_at": i}
+        for i in range(20000)
+    )
+
+    start = time.perf_counter()
+    for i in range(500):
+        store.history(f"+1555555{i:04d}", limit=10)
+    per_lookup = (time.perf_counter() - start) / 500
+
+    # Indexed lookups take tens of microseconds; allow plenty of headroom for slow CI
+    assert per_lookup < 0.005
+
+
+def test_llm_prompt_includes_recent_messages():
+    store = MessageStore(":memory:")
+    store.record("+15555550100", INBOUND, "Do you do balayage?", created_at=100)
+    store.record("+15555550100", OUTBOUND, "Yes! Balayage starts at $150.", created_at=101)
+    store.record("+15555550100", INBOUND, "Can I book it Friday?", created_at=102)
+
+    previous = message_store_module._store
+    message_store_module._store = store
+    try:
+        service = LLMService()
+        prompt = service._build_prompt("Can I book it Friday?", phone_number="+15555550100")
+    finally:
+        message_store_module._store = previous
+
+    assert "Recent Messages:" in prompt
+    assert prompt.index("Client: Do you do balayage?") < prompt.index("Salon: Yes! Balayage starts at $150.")
+    # The message being answered is not repeated as history
+    assert "Client: Can I book it Friday?" not in prompt
+
+
+def test_history_endpoint_needs_admin_token_and_clamps_limit():
+    from fastapi.testclient import TestClient
+    from python_sms_responder import main
+
+    store = MessageStore(":memory:")
+    for i in range(3):
+        store.record("+15555550100", INBOUND, f"message {i}", created_at=100 + i)
+
+    previous_store, previous_token = message_store_module._store, os.environ.pop("ADMIN_API_TOKEN", None)
+    message_store_module._store = store
+    try:
+        client = TestClient(main.app)
+        url = "/sms/history/+15555550100"
+        # Off unless a token is configured
+        assert client.get(url).status_code == 404
+
+        os.environ["ADMIN_API_TOKEN"] = "s3cret"
+        assert client.get(url).status_code == 401
+        assert client.get(url, headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+        response = client.get(url, params={"limit": -1}, headers={"Authorization": "Bearer s3cret"})
+        assert response.status_code == 200
+        assert [message["body"] for message in response.json()["messages"]] == ["message 2"]
+    finally:
+        message_store_module._store = previous_store
+        os.environ.pop("ADMIN_API_TOKEN", None)
+        if previous_token is not None:
+            os.environ["ADMIN_API_TOKEN"] = previous_token
+
+
+if __name__ == "__main__":
+    tests = [
+        test_history_is_newest_first_per_number,
+        test_record_is_idempotent_per_sid,
+        test_record_many_counts_only_new_messages,
+        test_from_twilio_message_uses_customer_number,
+        test_history_lookup_is_fast,
+        test_llm_prompt_includes_recent_messages,
+        test_history_endpoint_needs_admin_token_and_clamps_limit,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
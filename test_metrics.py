@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics: counters and histograms, the text format,
+per-route request timing, and merging snapshots across workers
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.metrics import (
+    Counter, Histogram, MetricsMiddleware, Registry, HTTP_REQUEST_SECONDS, HTTP_SERVER_ERRORS,
+    merge_snapshots, read_snapshots, render_metrics, render_snapshot, timed, write_snapshot,
+)
+
+
+def test_histogram_exposition():
+    registry = Registry()
+    histogram = Histogram("query_seconds", "Query time", ["operation"], buckets=(0.1, 1.0), registry=registry)
+    child = histogram.labels("lookup")
+    for value in (0.05, 0.5, 0.5, 3.0):
+        child.observe(value)
+
+    text = registry.render()
+    assert "# TYPE query_seconds histogram" in text
+    assert 'query_seconds_bucket{operation="lookup",le="0.1"} 1' in text
+    assert 'query_seconds_bucket{operation="lookup",le="1"} 3' in text
+    assert 'query_seconds_bucket{operation="lookup",le="+Inf"} 4' in text
+    assert 'query_seconds_sum{operation="lookup"} 4.05' in text
+    assert 'query_seconds_count{operation="lookup"} 4' in text
+
+
+def test_counter_exposition_and_label_escaping():
+    registry = Registry()
+    counter = Counter("errors", "Errors", ["service"], registry=registry)
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+
+    text = registry.render()
+    assert "# TYPE errors_total counter" in text
+    assert 'errors_total{service="a\\"b"} 3' in text
+    assert counter.labels('a"b') is counter.labels('a"b')
+
+
+def test_labels_checked():
+    registry = Registry()
+    counter = Counter("calls", "Calls", ["service", "operation"], registry=registry)
+    try:
+        counter.labels("twilio")
+        assert False, "missing label accepted"
+    except ValueError:
+        pass
+    try:
+        Counter("calls", "Again", registry=registry)
+        assert False, "duplicate metric accepted"
+    except ValueError:
+        pass
+
+
+def test_threads_lose_no_updates():
+    registry = Registry()
+    counter = Counter("events", "Events", registry=registry).labels()
+    histogram = Histogram("latency", "Latency", registry=registry).labels()
+
+    def work():
+        for _ in range(20000):
+            counter.inc()
+            histogram.observe(0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == [160000]
+    assert sum(histogram.values()[:-1]) == 160000
+
+
+def test_timed_sync_and_async():
+    registry = Registry()
+    child = Histogram("call_seconds", "Calls", registry=registry).labels()
+
+    @timed(child)
+    def fails():
+        raise RuntimeError("down")
+
+    @timed(child)
+    async def succeeds():
+        await asyncio.sleep(0)
+        return "ok"
+
+    assert asyncio.run(succeeds()) == "ok"
+    assert succeeds.__name__ == "succeeds"
+    try:
+        fails()
+    except RuntimeError:
+        pass
+    # Failed calls are timed too
+    assert sum(child.values()[:-1]) == 2
+
+
+def test_middleware_labels_known_routes_and_counts_errors():
+    async def endpoint(scope, receive, send):
+        status = 500 if scope["path"] == "/health/ready" else 200
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = MetricsMiddleware(endpoint, paths=["/webhook/voice", "/health/ready"])
+    voice = sum(HTTP_REQUEST_SECONDS.labels("/webhook/voice").values()[:-1])
+    other = sum(HTTP_REQUEST_SECONDS.labels("other").values()[:-1])
+    errors = HTTP_SERVER_ERRORS.labels("/health/ready").values()[0]
+
+    async def request(path):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        await middleware({"type": "http", "path": path}, receive, send)
+
+    asyncio.run(request("/webhook/voice"))
+    asyncio.run(request("/api/appointments/123"))
+    asyncio.run(request("/health/ready"))
+
+    assert sum(HTTP_REQUEST_SECONDS.labels("/webhook/voice").values()[:-1]) == voice + 1
+    assert sum(HTTP_REQUEST_SECONDS.labels("other").values()[:-1]) == other + 1
+    assert HTTP_SERVER_ERRORS.labels("/health/ready").values()[0] == errors + 1
+
+
+def test_worker_snapshots_merge():
+    first, second = Registry(), Registry()
+    for registry, amount in ((first, 2), (second, 5)):
+        Counter("sent", "Sent", ["service"], registry=registry).labels("twilio").inc(amount)
+        Histogram("wait", "Wait", buckets=(1.0,), registry=registry).labels().observe(0.5)
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_snapshot(directory, "0", first)
+        write_snapshot(directory, "1", second)
+        others = read_snapshots(directory, exclude="0")
+        assert len(others) == 1
+
+        text = first.render(others)
+        assert 'sent_total{service="twilio"} 7' in text
+        assert 'wait_bucket{le="1"} 2' in text
+        assert "wait_count 2" in text
+
+    merged = merge_snapshots([first.snapshot(), second.snapshot()])
+    assert render_snapshot(merged) == text
+
+
+def test_merged_totals_never_go_backwards_between_workers():
+    first, second = Registry(), Registry()
+    sent = [Counter("sent", "Sent", registry=registry).labels() for registry in (first, second)]
+    sent[0].inc(100)
+    sent[1].inc(40)
+
+    def scrape(worker_index, registry):
+        os.environ["WORKER_INDEX"] = worker_index
+        text = render_metrics(registry)
+        return int(next(line for line in text.splitlines() if line.startswith("sent_total")).split()[-1])
+
+    saved = {name: os.environ.get(name) for name in ("METRICS_DIR", "WORKER_INDEX")}
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["METRICS_DIR"] = directory
+        try:
+            write_snapshot(directory, "0", first)
+            write_snapshot(directory, "1", second)
+            # Both workers count more after their periodic snapshots
+            sent[0].inc(5)
+            sent[1].inc(3)
+            totals = [scrape("0", first), scrape("1", second), scrape("0", first)]
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    # The second scrape sees worker 1's fresh snapshot, never an older one of worker 0
+    assert totals == [145, 148, 148]
+
+
+def test_metrics_endpoint():
+    from python_sms_responder import main
+
+    response = asyncio.run(main.metrics())
+    body = response.body.decode()
+    assert response.media_type.startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert "# TYPE external_call_errors_total counter" in body
+    # SMS stage label sets exist before the first webhook
+    assert 'sms_webhook_stage_duration_seconds_count{stage="llm"}' in body
+
+
+if __name__ == "__main__":
+    tests = [
+        test_histogram_exposition,
+        test_counter_exposition_and_label_escaping,
+        test_labels_checked,
+        test_threads_lose_no_updates,
+        test_timed_sync_and_async,
+        test_middleware_labels_known_routes_and_counts_errors,
+        test_worker_snapshots_merge,
+        test_merged_totals_never_go_backwards_between_workers,
+        test_metrics_endpoint,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request model routing
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.model_router import ModelRouter, RoutingRule, get_model_router
+from python_sms_responder.llm_service import LLMService
+
+
+def test_rules_match_in_order():
+    router = ModelRouter(
+        default_model="small",
+        rules=[
+            RoutingRule("complaint", "large", keywords=["refund"]),
+            RoutingRule("multi_turn_change", "large", intents=["reschedule"], min_turns=2),
+            RoutingRule("long_message", "large", min_length=50),
+        ]
+    )
+
+    assert router.route("what are your hours?", intent="hours") == ("small", "default")
+    assert router.route("I want a refund", intent="other") == ("large", "complaint")
+    assert router.route("move me to friday", intent="reschedule", turns=1) == ("small", "default")
+    assert router.route("move me to friday", intent="reschedule", turns=3) == ("large", "multi_turn_change")
+    assert router.route("x" * 60) == ("large", "long_message")
+    assert router.get_stats()["routes"] == {"default": 2, "complaint": 1, "multi_turn_change": 1, "long_message": 1}
+
+
+def test_usage_counters_track_tokens_cost_and_latency():
+    router = ModelRouter(prices={"gpt-4": {"prompt": 0.03, "completion": 0.06}})
+    router.record("gpt-4", 1.0, prompt_tokens=1000, completion_tokens=500)
+    router.record("gpt-4", 3.0, prompt_tokens=1000, completion_tokens=500)
+
+    stats = router.get_stats()["models"]["gpt-4"]
+    assert stats["calls"] == 2
+    assert stats["completion_tokens"] == 1000
+    assert abs(stats["cost_usd"] - 0.12) < 1e-9
+    assert stats["avg_latency_seconds"] == 2.0
+
+
+def test_shipped_config_routes_faqs_to_small_model():
+    router = get_model_router()
+    assert router.default_model == "gpt-3.5-turbo"
+    assert router.route("this was terrible, I want to speak to a manager")[0] == "gpt-4"
+
+
+def test_llm_service_uses_routed_model():
+    service = LLMService()
+    service.response_cache.enabled = False
+    service.model_router = ModelRouter(default_model="small", rules=[RoutingRule("complaint", "large", keywords=["refund"])])
+    models = []
+
+    def create(model, **kwargs):
+        models.append(model)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120)
+        return SimpleNamespace(model=model, usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    service.generate_response_sync("do you sell gift cards?", phone_number="+15555550102")
+    service.generate_response_sync("my color was ruined, I want a refund", phone_number="+15555550103")
+
+    assert models == ["small", "large"]
+    assert service.get_routing_stats()["models"]["large"]["prompt_tokens"] == 100
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
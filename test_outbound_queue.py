@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable outbound SMS queue
+"""
+
+import os
+import sys
+import sqlite3
+import asyncio
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.outbound_queue import OutboundQueue, OutboundWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_enqueue_is_idempotent_per_key():
+    queue = OutboundQueue(":memory:")
+    first = queue.enqueue("+15555550100", "Hi", "reply:SM1")
+    second = queue.enqueue("+15555550100", "Hi again", "reply:SM1")
+
+    assert first[1] is True
+    assert second == (first[0], False)
+    assert queue.get_metrics()["depth"] == 1
+
+
+def test_claim_keeps_per_destination_order():
+    queue = OutboundQueue(":memory:")
+    queue.enqueue("+15555550100", "first", "a")
+    queue.enqueue("+15555550100", "second", "b")
+    queue.enqueue("+15555550199", "other", "c")
+
+    claimed = queue.claim(10)
+    assert sorted(message["body"] for message in claimed) == ["first", "other"]
+    assert queue.claim(10) == []  # "second" waits for "first"
+
+    queue.mark_sent(claimed[0]["id"] if claimed[0]["body"] == "first" else claimed[1]["id"], "SM1")
+    assert [message["body"] for message in queue.claim(10)] == ["second"]
+
+
+def test_failures_back_off_then_dead_letter():
+    clock = FakeClock()
+    queue = OutboundQueue(":memory:", max_attempts=3, backoff_base=10, time_func=clock)
+    message_id, _ = queue.enqueue("+15555550100", "Hi", "a")
+
+    queue.claim(1)
+    assert queue.mark_failed(message_id, "503") == "pending"
+    assert queue.claim(1) == []  # Not due yet
+
+    clock.now += 10
+    queue.claim(1)
+    assert queue.mark_failed(message_id, "503") == "pending"
+    clock.now += 20
+    queue.claim(1)
+    assert queue.mark_failed(message_id, "21211 invalid number") == "dead"
+
+    dead = queue.dead_letters()
+    assert dead[0]["attempts"] == 3 and "21211" in dead[0]["last_error"]
+    metrics = queue.get_metrics()
+    assert metrics["depth"] == 0 and metrics["dead_letters"] == 1
+
+    assert queue.requeue_dead_letter(dead[0]["id"])
+    assert queue.get_metrics()["depth"] == 1
+
+
+def test_worker_retries_until_sent():
+    queue = OutboundQueue(":memory:", backoff_base=0.01)
+    attempts = []
+
+    async def send(to, body):
+        attempts.append(body)
+        if len(attempts) == 1:
+            return SimpleNamespace(success=False, sid=None, error="503 Service Unavailable")
+        return SimpleNamespace(success=True, sid="SM123", error=None)
+
+    async def run():
+        worker = OutboundWorker(queue, send, concurrency=4, poll_interval=0.01)
+        queue.enqueue("+15555550100", "Your appointment is confirmed", "reply:SM9")
+        worker.start()
+        for _ in range(100):
+            if queue.get_metrics()["sent"]:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(run())
+    assert attempts == ["Your appointment is confirmed"] * 2
+    metrics = queue.get_metrics()
+    assert metrics["sent"] == 1 and metrics["depth"] == 0
+
+
+def test_worker_dead_letters_sends_that_may_have_been_delivered():
+    queue = OutboundQueue(":memory:", backoff_base=0.01)
+    attempts = []
+
+    async def send(to, body):
+        attempts.append(body)
+        return SimpleNamespace(success=False, sid=None, error="ReadTimeout: read timed out", delivery_unknown=True)
+
+    async def run():
+        worker = OutboundWorker(queue, send)
+        queue.enqueue("+15555550100", "Your appointment is confirmed", "reply:SM11")
+        await worker.drain()
+
+    asyncio.run(run())
+    assert attempts == ["Your appointment is confirmed"]
+    assert queue.dead_letters()[0]["attempts"] == 1
+    assert queue.get_metrics()["depth"] == 0
+
+
+def test_leased_claims_are_only_recovered_once_expired():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outbound.db")
+        sender = OutboundQueue(path, lease=60, time_func=clock)
+        other = OutboundQueue(path, lease=60, time_func=clock)
+        message_id, _ = sender.enqueue("+15555550100", "Hi", "a")
+        assert [message["id"] for message in sender.claim(1)] == [message_id]
+
+        # A long send that keeps renewing its lease is left alone by the other process
+        for _ in range(5):
+            clock.now += 45
+            assert sender.extend_leases([message_id]) == 1
+            assert other.recover_stale() == 0
+
+        # Its owner stopped renewing (crashed), so the other process takes it back
+        clock.now += 61
+        assert other.recover_stale() == 1
+        assert [message["id"] for message in other.claim(1)] == [message_id]
+
+        # The old owner's late failure must not requeue a message someone else is sending
+        assert sender.extend_leases([message_id]) == 0
+        assert sender.mark_failed(message_id, "timed out") == "sending"
+        assert other.get_metrics()["in_flight"] == 1
+        sender.close()
+        other.close()
+
+
+def test_queue_files_from_before_leases_are_migrated():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outbound.db")
+        legacy = sqlite3.connect(path)
+        legacy.executescript(
+            "CREATE TABLE outbound_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "idempotency_key TEXT NOT NULL UNIQUE, to_number TEXT NOT NULL, body TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, claimed_at REAL, sid TEXT, last_error TEXT);"
+            "INSERT INTO outbound_messages (idempotency_key, to_number, body, status, next_attempt_at, "
+            "created_at, updated_at, claimed_at) VALUES ('a', '+15555550100', 'Hi', 'sending', 0, 0, 0, 0);"
+        )
+        legacy.commit()
+        legacy.close()
+
+        queue = OutboundQueue(path, lease=60, time_func=lambda: 100.0)
+        # The old claim has no lease; it expires lease seconds after it was made
+        assert queue.recover_stale() == 1
+        [message] = queue.claim(1)
+        assert queue.extend_leases([message["id"]]) == 1
+        queue.close()
+
+
+def test_worker_renews_leases_during_slow_sends():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outbound.db")
+        queue = OutboundQueue(path, lease=0.2)
+        other = OutboundQueue(path, lease=0.2)
+        sends = []
+        recovered = []
+
+        async def slow_send(to, body):
+            sends.append(body)
+            for _ in range(10):
+                await asyncio.sleep(0.05)
+                recovered.append(other.recover_stale())
+            return SimpleNamespace(success=True, sid="SM1", error=None)
+
+        async def run():
+            worker = OutboundWorker(queue, slow_send, poll_interval=0.01)
+            queue.enqueue("+15555550100", "Your appointment is confirmed", "reply:SM10")
+            worker.start()
+            for _ in range(200):
+                if queue.get_metrics()["sent"]:
+                    break
+                await asyncio.sleep(0.01)
+            await worker.stop()
+
+        asyncio.run(run())
+        assert sends == ["Your appointment is confirmed"]
+        assert sum(recovered) == 0
+        queue.close()
+        other.close()
+
+
+def test_webhook_keeps_sqlite_off_the_event_loop_and_answers_each_sid_once():
+    from python_sms_responder import main, message_store
+    from python_sms_responder.message_store import MessageStore
+
+    threads = []
+
+    class RecordingQueue(OutboundQueue):
+        def contains(self, idempotency_key):
+            threads.append(threading.current_thread())
+            return super().contains(idempotency_key)
+
+        def enqueue(self, to_number, body, idempotency_key):
+            threads.append(threading.current_thread())
+            return super().enqueue(to_number, body, idempotency_key)
+
+    class RecordingStore(MessageStore):
+        def record(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().record(*args, **kwargs)
+
+    async def generate_response(user_message, client_info=None, phone_number=None):
+        return "We're open 9 to 7"
+
+    sent = []
+
+    async def send_sms(to, message):
+        sent.append(message)
+        return True
+
+    # The SMS service is up but the outbound worker has not started yet
+    ready = {
+        "llm": SimpleNamespace(generate_response=generate_response),
+        "sms": SimpleNamespace(send_sms=send_sms),
+    }
+
+    async def get_async(name):
+        return ready.get(name)
+
+    async def webhook(sid):
+        return await main.handle_sms_webhook(
+            From="+15555550100", To="+15555550199", Body="When are you open?",
+            MessageSid=sid, AccountSid="AC1", NumMedia="0"
+        )
+
+    async def run():
+        responses = [await webhook("SM1"), await webhook("SM1")]
+        return responses, threading.current_thread()
+
+    queue = RecordingQueue(":memory:")
+    queue_enabled = os.environ.get("OUTBOUND_QUEUE_ENABLED")
+    original = main.services, main._outbound_queue, main._outbound_worker, message_store._store
+    main.services = SimpleNamespace(get_async=get_async)
+    main._outbound_queue, main._outbound_worker = queue, None
+    message_store._store = RecordingStore(":memory:")
+    try:
+        (first, retry), loop_thread = asyncio.run(run())
+
+        # Without the queue, the inbound SID stops a retry from being answered twice
+        main._outbound_queue = None
+        os.environ["OUTBOUND_QUEUE_ENABLED"] = "false"
+        direct = [asyncio.run(webhook("SM2")), asyncio.run(webhook("SM2"))]
+    finally:
+        if queue_enabled is None:
+            os.environ.pop("OUTBOUND_QUEUE_ENABLED", None)
+        else:
+            os.environ["OUTBOUND_QUEUE_ENABLED"] = queue_enabled
+        main.services, main._outbound_queue, main._outbound_worker, message_store._store = original
+
+    # The reply waits in the queue for the worker instead of skipping the reply key
+    assert first.message == "SMS processed and response queued"
+    assert retry.message.startswith("Duplicate webhook")
+    assert queue.get_metrics()["depth"] == 1
+    assert threads and loop_thread not in threads
+
+    assert direct[0].message == "SMS processed and response sent successfully"
+    assert direct[1].message.startswith("Duplicate webhook")
+    assert sent == ["We're open 9 to 7"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-rendered voice prompt audio cache
+"""
+
+import os
+import sys
+import tempfile
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.prompt_audio import OfflineTTSBackend, PromptAudioCache
+from python_sms_responder.twiml_templates import FIXED_PROMPTS, GREETING, TwimlRenderer
+
+ANSWER = "We're open Monday through Saturday from 9AM to 7PM."
+
+
+def make_cache(directory, backend=None, **kwargs):
+    kwargs.setdefault("background", False)
+    return PromptAudioCache(directory, backend or OfflineTTSBackend(), **kwargs)
+
+
+def test_fixed_prompts_render_once_and_survive_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = OfflineTTSBackend()
+        files = make_cache(directory, backend).precompute(FIXED_PROMPTS)
+        assert all(files.values())
+        assert backend.calls == len(FIXED_PROMPTS)
+
+        restarted_backend = OfflineTTSBackend()
+        restarted = make_cache(directory, restarted_backend)
+        assert restarted.precompute(FIXED_PROMPTS) == files
+        assert restarted_backend.calls == 0
+        assert open(restarted.path_for(files[GREETING]), "rb").read(4) == b"RIFF"
+
+
+def test_keys_depend_on_text_voice_and_backend():
+    with tempfile.TemporaryDirectory() as directory:
+        nova = make_cache(directory, voice="nova")
+        alloy = make_cache(directory, voice="alloy")
+        assert nova.key("Hello") == nova.key("Hello")
+        assert nova.key("Hello") != nova.key("Hello!")
+        assert nova.key("Hello") != alloy.key("Hello")
+        assert nova.path_for("../secrets.env") is None
+        assert nova.path_for("." + nova.key("Hello")) is None
+
+
+def test_workers_sharing_the_directory_serve_each_others_files_and_never_evict():
+    with tempfile.TemporaryDirectory() as directory:
+        first = make_cache(directory, shared=True, min_hits=1)
+        second = make_cache(directory, shared=True, min_hits=1)
+        greeting = first.precompute([GREETING])[GREETING]
+        # Rendered after the second worker listed the directory
+        assert second.path_for(greeting) == os.path.join(directory, greeting)
+
+        # Recurring answers stay <Say>, and nothing is evicted
+        first.observe(ANSWER)
+        assert first.lookup(ANSWER) is None
+        first.max_bytes = 0
+        first.precompute(["Anything else?"])
+        assert os.path.exists(os.path.join(directory, greeting))
+        assert first.get_stats()["evictions"] == 0
+        assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_answers_are_rendered_after_min_hits():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = make_cache(directory, min_hits=3)
+        for _ in range(2):
+            assert cache.lookup(ANSWER) is None
+            cache.observe(ANSWER)
+        assert cache.lookup(ANSWER) is None
+
+        cache.observe(ANSWER)
+        assert cache.lookup(ANSWER) == cache.key(ANSWER)
+        assert cache.get_stats()["renders"] == 1
+
+        # Long answers are never rendered
+        cache.observe("word " * 200)
+        cache.observe("word " * 200)
+        cache.observe("word " * 200)
+        assert cache.get_stats()["renders"] == 1
+
+
+def test_lru_eviction_keeps_pinned_and_recent_files():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = make_cache(directory, min_hits=1)
+        pinned = cache.precompute(["Hello! Welcome to our salon."])["Hello! Welcome to our salon."]
+        first = cache.render("First answer.")
+        second = cache.render("Second answer.")
+        cache.lookup("First answer.")  # now more recent than the second
+
+        cache.max_bytes = cache.get_stats()["bytes"] - 1
+        cache.render("Third answer.")
+
+        assert cache.path_for(pinned)
+        assert cache.path_for(first)
+        assert cache.path_for(second) is None
+        assert not os.path.exists(os.path.join(directory, second))
+        assert cache.get_stats()["evictions"] >= 1
+
+
+def test_renderer_plays_fixed_prompts_and_recurring_answers():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = make_cache(directory, min_hits=2)
+        renderer = TwimlRenderer("https://salon.example.com", prompt_audio=cache)
+
+        initial = renderer.initial("CA1")
+        assert "<Play>https://salon.example.com/voice/audio/" in initial
+        assert GREETING not in initial
+        assert "<Say" not in initial
+
+        first = renderer.say_and_follow_up(ANSWER, "CA1")
+        assert ANSWER in first
+        renderer.say_and_follow_up(ANSWER, "CA2")
+        third = renderer.say_and_follow_up(ANSWER, "CA3")
+        assert ANSWER not in third
+        assert f"<Play>https://salon.example.com/voice/audio/{cache.key(ANSWER)}</Play>" in third
+        assert 'action="https://salon.example.com/webhook/voice/process?call_sid=CA3"' in third
+
+
+def test_renderer_without_cache_speaks_everything():
+    renderer = TwimlRenderer("")
+    assert "<Play>" not in renderer.initial("CA1")
+    assert ANSWER in renderer.say_and_follow_up(ANSWER, "CA1")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_fixed_prompts_render_once_and_survive_restart,
+        test_keys_depend_on_text_voice_and_backend,
+        test_workers_sharing_the_directory_serve_each_others_files_and_never_evict,
+        test_answers_are_rendered_after_min_hits,
+        test_lru_eviction_keeps_pinned_and_recent_files,
+        test_renderer_plays_fixed_prompts_and_recurring_answers,
+        test_renderer_without_cache_speaks_everything,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for token-budgeted prompt assembly
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.prompt_builder import PromptBuilder, PromptSection, TokenCounter
+from python_sms_responder.llm_service import LLMService
+from python_sms_responder.models import ClientInfo
+
+
+def test_sections_fill_by_priority_within_budget():
+    counter = TokenCounter()
+    builder = PromptBuilder(token_budget=40, counter=counter)
+    slots = "\n".join(f"- 2025-03-{day:02d}: 9:00 AM, 9:30 AM, 10:00 AM" for day in range(1, 30))
+
+    prompt, usage = builder.build([
+        PromptSection("conversation", "Conversation Context:\n- Current step: greeting", priority=1),
+        PromptSection("context", f"Additional Context:\n{slots}", priority=4),
+        PromptSection("message", "User Message: do you have anything tomorrow?", priority=0, required=True),
+    ])
+
+    assert usage["total"] <= 40
+    assert usage["sections"]["message"]["status"] == "included"
+    assert usage["sections"]["context"]["status"] in ("truncated", "dropped")
+    assert prompt.index("Conversation Context") < prompt.index("User Message")
+
+
+def test_required_section_is_never_dropped():
+    builder = PromptBuilder(token_budget=10)
+    prompt, usage = builder.build([
+        PromptSection("message", "word " * 100, priority=0, required=True),
+    ])
+
+    assert prompt
+    assert usage["sections"]["message"]["status"] == "truncated"
+
+
+def test_llm_prompt_respects_budget_and_keeps_static_prefix():
+    service = LLMService()
+    service.prompt_builder.token_budget = 120
+    prefix_before = service.static_prefix.text
+
+    big_context = {"available_slots": {f"2025-03-{d:02d}": ["9:00 AM"] * 20 for d in range(1, 15)}}
+    client = ClientInfo(phone="+15555550100", name="Jane", total_appointments=4)
+    prompt = service._build_prompt("how much is balayage?", client, client.phone, big_context)
+
+    assert "User Message: how much is balayage?" in prompt
+    assert service.last_prompt_usage["total"] <= 120
+    assert service.static_prefix.text == prefix_before
+    assert "Hours:" in service.static_prefix.text
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
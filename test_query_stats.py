@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Tests for query fingerprint stats and the slow-query log
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder import query_stats
+from python_sms_responder.query_stats import InstrumentedCursor, QueryStats, fingerprint, normalize_sql
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConnection:
+    """Records every statement run on it; EXPLAIN returns a plan"""
+
+    def __init__(self, explain_error=None, autocommit=False):
+        self.statements = []
+        self.explain_error = explain_error
+        self.autocommit = autocommit
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, connection, rows=(), delay=0.0, error=None):
+        self.connection = connection
+        self.rows = list(rows)
+        self.delay = delay
+        self.error = error
+        self.rowcount = -1
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.connection.statements.append(query)
+        if query.startswith("EXPLAIN"):
+            if self.connection.explain_error:
+                raise self.connection.explain_error
+            self._result = [("Index Scan using clients_phone_idx on clients c",),
+                            ("  Index Cond: (phone = '+15551234567'::text)",)]
+            return
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self._result = self.rows
+        self.rowcount = len(self.rows)
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def close(self):
+        pass
+
+
+class LogCapture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def capture_slow_log():
+    handler = LogCapture()
+    query_stats.logger.addHandler(handler)
+    return handler
+
+
+def test_fingerprint_ignores_literals_parameters_and_whitespace():
+    first = """
+        SELECT id FROM appointments  -- upcoming only
+        WHERE client_id = 42 AND status = 'confirmed' AND id IN (1, 2, 3)
+    """
+    second = "select id from appointments where client_id = 7 and status = 'can''t' and id in (9, 10)"
+    assert fingerprint(first) == fingerprint(second)
+    assert normalize_sql(first) == (
+        "select id from appointments where client_id = ? and status = ? and id in (?+)"
+    )
+    assert normalize_sql("SELECT * FROM staff WHERE id = %s AND name = %(name)s") == (
+        "select * from staff where id = ? and name = ?"
+    )
+    # Digits in identifiers are not literals
+    assert normalize_sql("SELECT col1 FROM table2") == "select col1 from table2"
+    assert fingerprint("SELECT 1") != fingerprint("SELECT 1 FROM clients")
+
+
+def test_records_count_total_max_rows_and_errors():
+    stats = QueryStats(slow_ms=0)
+    connection = FakeConnection()
+    query = "SELECT id FROM staff WHERE active = %s"
+    for rows in ([(1,), (2,)], [(3,)]):
+        cursor = InstrumentedCursor(FakeCursor(connection, rows=rows), "real_time", stats)
+        cursor.execute(query, (True,))
+        assert cursor.fetchall() == rows
+
+    failing = InstrumentedCursor(FakeCursor(connection, error=RuntimeError("relation does not exist")),
+                                 "real_time", stats)
+    try:
+        failing.execute(query, (False,))
+        assert False, "the query error should propagate"
+    except RuntimeError:
+        pass
+
+    [top] = stats.top()
+    assert top["sql"] == "select id from staff where active = ?"
+    assert top["source"] == "real_time"
+    assert top["count"] == 3
+    assert top["rows"] == 3
+    assert top["errors"] == 1
+    assert top["max_ms"] <= top["total_ms"]
+    assert top["slow"] == 0
+
+
+def test_top_orders_by_total_time():
+    stats = QueryStats(slow_ms=0)
+    for _ in range(10):
+        stats.record("SELECT 1", "database", 0.001)
+    stats.record("SELECT * FROM appointments WHERE date >= %s", "database", 0.5)
+    assert [entry["sql"] for entry in stats.top()] == ["select * from appointments where date >= ?", "select ?"]
+    assert [entry["sql"] for entry in stats.top(order="count")][0] == "select ?"
+    assert len(stats.top(limit=1)) == 1
+
+
+def test_slow_query_logged_with_params_shape_and_plan():
+    clock = FakeClock()
+    stats = QueryStats(slow_ms=20, explain_interval=60, clock=clock)
+    handler = capture_slow_log()
+    try:
+        connection = FakeConnection()
+        query = "SELECT id, name FROM clients c WHERE c.phone = %s OR c.phone = %s"
+        params = ["+15551234567", "5551234567"]
+        cursor = InstrumentedCursor(FakeCursor(connection, rows=[(1, "Jane")], delay=0.03), "database", stats)
+        cursor.execute(query, params)
+        assert cursor.fetchone() == (1, "Jane")
+
+        [record] = handler.records
+        assert record.levelno == logging.WARNING
+        assert record.sql == "select id, name from clients c where c.phone = ? or c.phone = ?"
+        assert record.params_shape == ["str", "str"]
+        assert "+15551234567" not in record.plan and "5551234567" not in str(vars(record))
+        assert "Index Cond: (phone = ?::text)" in record.plan
+        # The EXPLAIN runs inside a savepoint on the caller's connection
+        assert connection.statements == [
+            query, "SAVEPOINT query_stats_explain", "EXPLAIN " + query, "RELEASE SAVEPOINT query_stats_explain"
+        ]
+
+        # Logged again, but not explained again within the interval
+        cursor.execute(query, params)
+        assert handler.records[1].plan is None
+        clock.now += 61
+        cursor.execute(query, params)
+        assert handler.records[2].plan is not None
+
+        [top] = stats.top()
+        assert top["slow"] == 3
+        assert top["last_plan"].startswith("Index Scan")
+    finally:
+        query_stats.logger.removeHandler(handler)
+
+
+def test_failed_explain_rolls_back_to_savepoint():
+    stats = QueryStats(slow_ms=20)
+    handler = capture_slow_log()
+    try:
+        connection = FakeConnection(explain_error=RuntimeError("syntax error"))
+        cursor = InstrumentedCursor(FakeCursor(connection, rows=[(7,)], delay=0.03), "database", stats)
+        cursor.execute("INSERT INTO appointments (client_id) VALUES (%s) RETURNING id", (3,))
+
+        assert cursor.fetchone() == (7,)
+        assert connection.statements[-1] == "ROLLBACK TO SAVEPOINT query_stats_explain"
+        assert handler.records[0].plan is None
+        assert handler.records[0].params_shape == ["int"]
+
+        # Statements EXPLAIN does not accept are logged without trying
+        connection.statements.clear()
+        cursor.execute("SAVEPOINT before_update")
+        assert connection.statements == ["SAVEPOINT before_update"]
+    finally:
+        query_stats.logger.removeHandler(handler)
+
+
+def test_database_service_queries_are_recorded():
+    from python_sms_responder.database_service import DatabaseService
+
+    class FakePool:
+        closed = False
+
+        def getconn(self):
+            return FakeConnectionWithRows()
+
+        def putconn(self, conn):
+            pass
+
+    class FakeConnectionWithRows(FakeConnection):
+        def cursor(self, **kwargs):
+            return FakeCursor(self, rows=[(1,)])
+
+    stats = QueryStats(slow_ms=0)
+    previous = query_stats._query_stats
+    query_stats._query_stats = stats
+    try:
+        service = DatabaseService()
+        service._pool = FakePool()
+        health = asyncio.run(service.check_health())
+    finally:
+        query_stats._query_stats = previous
+
+    assert health["status"] == "healthy"
+    [top] = stats.top()
+    assert (top["sql"], top["source"], top["count"], top["rows"]) == ("select ?", "database", 1, 1)
+
+
+def test_debug_queries_endpoint():
+    from fastapi import HTTPException
+    from python_sms_responder import main
+
+    stats = QueryStats(slow_ms=150)
+    stats.record("SELECT 1", "database", 0.001)
+    stats.record("SELECT id FROM staff", "real_time", 0.002)
+    previous = query_stats._query_stats
+    query_stats._query_stats = stats
+    try:
+        body = asyncio.run(main.debug_queries(limit=1))
+        assert body["slow_query_ms"] == 150
+        assert body["pid"] == os.getpid()
+        assert [entry["sql"] for entry in body["queries"]] == ["select id from staff"]
+        try:
+            asyncio.run(main.debug_queries(order="rows"))
+            assert False, "an unknown order should be rejected"
+        except HTTPException as e:
+            assert e.status_code == 400
+    finally:
+        query_stats._query_stats = previous
+
+
+def test_debug_queries_requires_the_admin_token():
+    from fastapi.testclient import TestClient
+    from python_sms_responder import main
+
+    previous_token = os.environ.pop("ADMIN_API_TOKEN", None)
+    try:
+        client = TestClient(main.app)
+        # Off unless a token is configured
+        assert client.get("/debug/queries").status_code == 404
+
+        os.environ["ADMIN_API_TOKEN"] = "s3cret"
+        assert client.get("/debug/queries").status_code == 401
+        response = client.get("/debug/queries", headers={"Authorization": "Bearer s3cret"})
+        assert response.status_code == 200
+        assert response.json()["pid"] == os.getpid()
+    finally:
+        os.environ.pop("ADMIN_API_TOKEN", None)
+        if previous_token is not None:
+            os.environ["ADMIN_API_TOKEN"] = previous_token
+
+
+if __name__ == "__main__":
+    tests = [
+        test_fingerprint_ignores_literals_parameters_and_whitespace,
+        test_records_count_total_max_rows_and_errors,
+        test_top_orders_by_total_time,
+        test_slow_query_logged_with_params_shape_and_plan,
+        test_failed_explain_rolls_back_to_savepoint,
+        test_database_service_queries_are_recorded,
+        test_debug_queries_endpoint,
+        test_debug_queries_requires_the_admin_token,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
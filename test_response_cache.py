@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM response cache
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.response_cache import ResponseCache, InMemoryCacheBackend
+from python_sms_responder.llm_service import LLMService
+from python_sms_responder.models import ClientInfo
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions and counts calls"""
+
+    def __init__(self, reply="We're open Monday-Saturday 9AM-7PM."):
+        self.reply = reply
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))],
+            usage=SimpleNamespace(total_tokens=120)
+        )
+
+
+def make_llm_service():
+    service = LLMService()
+    completions = FakeCompletions()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service.response_cache = ResponseCache(InMemoryCacheBackend(max_entries=10))
+    return service, completions
+
+
+def test_lru_eviction():
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set("a", {"response": "A"}, 60)
+    backend.set("b", {"response": "B"}, 60)
+    backend.get("a")
+    backend.set("c", {"response": "C"}, 60)
+
+    assert backend.get("b") is None
+    assert backend.get("a")["response"] == "A"
+    assert backend.get("c")["response"] == "C"
+
+
+def test_ttl_expiry():
+    now = [1000.0]
+    backend = InMemoryCacheBackend(time_func=lambda: now[0])
+    backend.set("hours", {"response": "9-7"}, 30)
+
+    now[0] += 29
+    assert backend.get("hours") is not None
+    now[0] += 2
+    assert backend.get("hours") is None
+
+
+def test_key_normalization():
+    cache = ResponseCache()
+    key_a = cache.make_key("What are your HOURS?", "gpt-4", "system")
+    key_b = cache.make_key("  what are your hours ", "gpt-4", "system")
+    key_other_model = cache.make_key("what are your hours", "gpt-3.5-turbo", "system")
+    key_other_prompt = cache.make_key("what are your hours", "gpt-4", "another system prompt")
+
+    key_history = cache.make_key("what are your hours", "gpt-4", "system", history=["- Client: Hi"])
+
+    assert key_a == key_b
+    assert key_a != key_other_model
+    assert key_a != key_other_prompt
+    assert key_a != key_history
+    assert key_history == cache.make_key("what are your hours", "gpt-4", "system", history=["- Client: Hi"])
+
+
+def test_bypass_rules():
+    cache = ResponseCache()
+    client = ClientInfo(phone="+15555550100", name="Jane")
+
+    assert cache.bypass_reason("what are your hours") is None
+    assert cache.bypass_reason("what are your hours", client_info=client) == "client_info"
+    assert cache.bypass_reason("hi", conversation_summary={"step": "time_selection"}) == "conversation_state"
+    assert cache.bypass_reason("hi", context={"client_name": "Jane"}) == "personal_context"
+    assert cache.bypass_reason("call me at 918-555-0100") == "personal_message"
+
+
+def test_llm_service_serves_repeats_from_cache():
+    service, completions = make_llm_service()
+
+    first = service.generate_response_sync("What are your hours?", phone_number="+15555550101")
+    second = service.generate_response_sync("what are your hours", phone_number="+15555550102")
+
+    assert first == second
+    assert completions.calls == 1
+
+    stats = service.get_cache_stats()["response_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["saved_tokens"] == 120
+
+
+def test_llm_service_bypasses_personalized_prompts():
+    service, completions = make_llm_service()
+    client = ClientInfo(phone="+15555550103", name="Jane", total_appointments=3)
+
+    service.generate_response_sync("What are your hours?", client_info=client, phone_number=client.phone)
+    service.generate_response_sync("What are your hours?", client_info=client, phone_number=client.phone)
+
+    assert completions.calls == 2
+    assert service.get_cache_stats()["response_cache"]["bypasses"] == 2
+
+
+def test_llm_service_keys_prompts_with_message_history_on_the_history():
+    from python_sms_responder import message_store as message_store_module
+    from python_sms_responder.message_store import INBOUND, OUTBOUND, MessageStore
+
+    store = MessageStore(":memory:")
+    store.record("+15555550104", INBOUND, "Can I book a balayage Friday?", created_at=100)
+    store.record("+15555550104", OUTBOUND, "Friday at 2 PM works!", created_at=101)
+    store.record("+15555550105", INBOUND, "Do you do beard trims?", created_at=102)
+    store.record("+15555550105", OUTBOUND, "We do, $25.", created_at=103)
+
+    previous = message_store_module._store
+    message_store_module._store = store
+    try:
+        service, completions = make_llm_service()
+        # The same text means different things in each conversation
+        service.generate_response_sync("How much is it?", phone_number="+15555550104")
+        service.generate_response_sync("How much is it?", phone_number="+15555550105")
+        # A returning customer asking again, with the same history, is served from the cache
+        service.generate_response_sync("How much is it?", phone_number="+15555550104")
+    finally:
+        message_store_module._store = previous
+
+    assert completions.calls == 2
+    stats = service.get_cache_stats()["response_cache"]
+    assert stats["bypasses"] == 0
+    assert stats["hits"] == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
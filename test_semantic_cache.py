@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the semantic FAQ cache
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.semantic_cache import HashedNgramEmbedder, SemanticFAQIndex, SemanticCache, slot_words
+from semantic_cache_tool import load_records
+
+FAQS = [
+    ("hours", "What are your hours?", "We're open Monday-Saturday 9AM-7PM and Sunday 10AM-5PM."),
+    ("haircut_price", "How much is a haircut?", "Haircuts start at $45."),
+    ("location", "Where are you located?", "We're at 123 Main Street."),
+]
+
+
+def build_index():
+    index = SemanticFAQIndex()
+    for faq_id, question, answer in FAQS:
+        index.add(question, answer, faq_id)
+    return index
+
+
+def test_embedder_is_deterministic_and_normalized():
+    embedder = HashedNgramEmbedder()
+    a = embedder.embed("What are your hours?")
+    b = embedder.embed("What are your hours?")
+
+    assert np.array_equal(a, b)
+    assert abs(float(np.linalg.norm(a)) - 1.0) < 1e-5
+
+
+def test_search_finds_paraphrase():
+    index = build_index()
+    entry, score = index.search("what are your hours today", k=1)[0]
+    assert entry["id"] == "hours"
+
+    entry, _ = index.search("how much for a haircut", k=1)[0]
+    assert entry["id"] == "haircut_price"
+
+
+def test_saved_index_is_memory_mapped():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faq")
+        build_index().save(path)
+
+        loaded = SemanticFAQIndex.load(path)
+        assert isinstance(loaded.vectors, np.memmap)
+        assert len(loaded) == len(FAQS)
+        assert loaded.search("where are you located", k=1)[0][0]["id"] == "location"
+
+
+def test_cache_threshold_and_approve():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faq")
+        cache = SemanticCache(index_path=path, threshold=0.6)
+        assert not cache.enabled
+
+        for faq_id, question, answer in FAQS:
+            cache.approve(question, answer, faq_id)
+
+        hit = cache.lookup("What are your hours??")
+        assert hit and hit["id"] == "hours"
+        assert cache.lookup("can I bring my dog to the appointment") is None
+
+        # A second worker picks up the same files
+        other_worker = SemanticCache(index_path=path, threshold=0.6)
+        assert len(other_worker.index) == len(FAQS)
+
+
+def test_close_questions_about_other_slots_miss():
+    cache = SemanticCache(threshold=0.65)
+    for faq_id, question, answer in [
+        ("saturday_hours", "What are your hours on Saturday?", "9AM-7PM on Saturday."),
+        ("haircut_price", "How much is a haircut?", "Haircuts start at $45."),
+        ("location", "Where are you located?", "123 Main Street."),
+    ]:
+        cache.index.add(question, answer, faq_id)
+
+    # Each scores above the old 0.8 default against the wrong FAQ
+    assert cache.index.search("what are your hours on sunday")[0][0]["id"] == "saturday_hours"
+    for message in ("what are your hours on sunday", "how much is a haircut and color", "how much is a kids haircut"):
+        assert cache.lookup(message) is None, message
+
+    assert cache.lookup("what are your hours on sat")["id"] == "saturday_hours"
+    assert cache.lookup("how much for a haircut?")["id"] == "haircut_price"
+    assert slot_words("How much is a kid's cut and colour?") == {"child", "haircut", "color", "+"}
+
+
+def test_default_threshold_makes_no_wrong_hits_on_the_labelled_sample():
+    here = os.path.dirname(os.path.abspath(__file__))
+    cache = SemanticCache()
+    for faq in load_records(os.path.join(here, "semantic_faq_sample.json")):
+        for question in [faq["question"], *faq.get("paraphrases", [])]:
+            cache.index.add(question, faq["answer"], faq["id"])
+
+    records = load_records(os.path.join(here, "semantic_cache_messages_sample.jsonl"))
+    hits = [(record["faq_id"], cache.lookup(record["message"])) for record in records]
+    hits = [(label, hit["id"]) for label, hit in hits if hit]
+    assert all(label == predicted for label, predicted in hits), hits
+    # Most labelled paraphrases are still served from the cache
+    assert len(hits) >= 0.6 * sum(1 for record in records if record["faq_id"])
+
+
+def test_save_versions_vectors_and_load_rejects_a_mismatched_pair():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faq")
+        index = build_index()
+        index.save(path)
+        first_vectors = json.load(open(f"{path}.json"))["vectors"]
+
+        index.add("Do you sell gift cards?", "Yes, in any amount.", "gift_cards")
+        index.save(path)
+        metadata = json.load(open(f"{path}.json"))
+        assert metadata["vectors"] != first_vectors and metadata["rows"] == len(FAQS) + 1
+        # The previous vector file stays for readers still loading it
+        assert os.path.exists(os.path.join(tmp, first_vectors))
+        assert len(SemanticFAQIndex.load(path)) == len(FAQS) + 1
+
+        # Metadata pointing at vectors with a different row count is refused
+        metadata["vectors"] = first_vectors
+        with open(f"{path}.json", "w") as f:
+            json.dump(metadata, f)
+        try:
+            SemanticFAQIndex.load(path)
+            assert False, "a mismatched index should not load"
+        except ValueError as e:
+            assert "entries" in str(e)
+
+        # The cache keeps serving the index it has rather than a broken one
+        cache = SemanticCache(index_path=path)
+        assert not cache.enabled
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Tests for the lifespan-managed service container: prewarming, background
+retries with backoff, readiness and shutdown
+"""
+
+import os
+import sys
+import json
+import asyncio
+import time
+import logging
+import threading
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.service_container import FAILED, READY, ServiceContainer, ServiceSpec
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeService:
+    def __init__(self, events, name):
+        self.events = events
+        self.name = name
+
+    def warm(self):
+        self.events.append(f"warm {self.name}")
+
+    def close(self):
+        self.events.append(f"close {self.name}")
+
+
+class FakeAsyncService:
+    def __init__(self, events, fail_warm=False):
+        self.events = events
+        self.fail_warm = fail_warm
+
+    async def warm(self):
+        if self.fail_warm:
+            raise ConnectionError("api.twilio.com unreachable")
+        self.events.append("warm http")
+
+    async def close(self):
+        self.events.append("close http")
+
+
+def flaky_factory(failures, build):
+    """Factory that raises for its first `failures` calls"""
+    calls = {"count": 0}
+
+    def create():
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise ConnectionError("database is starting up")
+        return build()
+
+    return create, calls
+
+
+def test_builds_and_warms_on_first_use():
+    events = []
+    timings = {}
+    container = ServiceContainer([ServiceSpec("db", "Database Service", lambda: FakeService(events, "db"))],
+                                 timings=timings)
+    service = container.get("db")
+    assert service is container.get("db")
+    assert events == ["warm db"]
+    assert "Database Service" in timings
+    assert container.readiness()["services"]["db"]["status"] == READY
+
+
+def test_failed_service_is_not_retried_on_every_request():
+    clock = FakeClock()
+    factory, calls = flaky_factory(2, object)
+    container = ServiceContainer([ServiceSpec("db", "Database Service", factory)],
+                                 retry_initial=1.0, retry_max=60.0, time_func=clock)
+
+    assert container.get("db") is None
+    assert container.get("db") is None
+    assert calls["count"] == 1
+    assert container.readiness()["services"]["db"]["retry_in_seconds"] == 1.0
+
+    clock.advance(1.0)
+    assert container.get("db") is None
+    assert calls["count"] == 2
+    # Backoff doubles per failure
+    assert container.readiness()["services"]["db"]["retry_in_seconds"] == 2.0
+
+    clock.advance(2.0)
+    assert container.get("db") is not None
+    assert container.readiness()["services"]["db"]["attempts"] == 3
+
+
+def test_backoff_is_capped():
+    clock = FakeClock()
+    factory, _ = flaky_factory(100, object)
+    container = ServiceContainer([ServiceSpec("db", "Database Service", factory)],
+                                 retry_initial=1.0, retry_max=5.0, time_func=clock)
+    for _ in range(6):
+        container.get("db")
+        clock.advance(60)
+    clock.advance(-60)
+    assert container.readiness()["services"]["db"]["retry_in_seconds"] == 5.0
+
+
+def test_readiness_only_waits_for_required_services():
+    factory, _ = flaky_factory(100, object)
+    container = ServiceContainer([
+        ServiceSpec("sms", "SMS Service", object),
+        ServiceSpec("db", "Database Service", factory),
+    ])
+    container.set_required(["sms"])
+    container.get("sms")
+    container.get("db")
+    readiness = container.readiness()
+    assert readiness["ready"]
+    assert readiness["services"]["db"]["status"] == FAILED
+    assert "database is starting up" in readiness["services"]["db"]["error"]
+
+    container.set_required(["sms", "db"])
+    assert not container.readiness()["ready"]
+
+
+def test_start_prewarms_and_retries_in_background():
+    events = []
+    factory, calls = flaky_factory(2, lambda: FakeService(events, "db"))
+    container = ServiceContainer([
+        ServiceSpec("sms", "SMS Service", lambda: FakeAsyncService(events)),
+        ServiceSpec("db", "Database Service", factory),
+    ], retry_initial=0.01, retry_max=0.05)
+
+    async def run():
+        await container.start()
+        assert container.readiness()["services"]["sms"]["status"] == READY
+        assert not container.readiness()["ready"]
+        # Requests do not retry while the background loop owns retries
+        assert container.get("db") is None
+        for _ in range(100):
+            if container.readiness()["ready"]:
+                break
+            await asyncio.sleep(0.01)
+        await container.shutdown()
+
+    asyncio.run(run())
+    assert calls["count"] == 3
+    assert events == ["warm http", "warm db", "close db", "close http"]
+
+
+def test_async_warm_failure_does_not_fail_the_service():
+    events = []
+    container = ServiceContainer([ServiceSpec("sms", "SMS Service", lambda: FakeAsyncService(events, fail_warm=True))])
+
+    async def run():
+        await container.start()
+        readiness = container.readiness()
+        await container.shutdown()
+        return readiness
+
+    assert asyncio.run(run())["ready"]
+
+
+def test_shutdown_closes_services_and_reports_not_ready():
+    events = []
+    container = ServiceContainer([
+        ServiceSpec("llm", "LLM Service", lambda: FakeService(events, "llm")),
+        ServiceSpec("db", "Database Service", lambda: FakeService(events, "db")),
+    ])
+
+    async def run():
+        await container.start()
+        await container.shutdown()
+
+    asyncio.run(run())
+    assert events == ["warm llm", "warm db", "close db", "close llm"]
+    assert not container.readiness()["ready"]
+    assert container.get("db") is None
+
+
+def test_ready_callback_runs_on_the_loop_after_the_attempt_that_succeeds():
+    events = []
+    factory, calls = flaky_factory(2, lambda: FakeService(events, "sms"))
+    container = ServiceContainer([ServiceSpec("sms", "SMS Service", factory)], retry_initial=0.01, retry_max=0.05)
+    ready = []
+
+    async def run():
+        container.on_ready("sms", lambda service: ready.append((service, threading.current_thread())))
+        await container.start()
+        assert ready == []
+        for _ in range(100):
+            if ready:
+                break
+            await asyncio.sleep(0.01)
+        # Registering after the service is up still gets it, on the next loop iteration
+        container.on_ready("sms", lambda service: ready.append((service, threading.current_thread())))
+        await asyncio.sleep(0)
+        await container.shutdown()
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert calls["count"] == 3
+    assert len(ready) == 2
+    assert all(service is ready[0][0] and thread is loop_thread for service, thread in ready)
+
+
+def test_outbound_worker_starts_when_sms_becomes_ready():
+    from python_sms_responder import main
+    from python_sms_responder.outbound_queue import OutboundQueue
+
+    sent = []
+
+    async def send_queued_sms(to, body):
+        sent.append(body)
+        return SimpleNamespace(success=True, sid="SM1", error=None)
+
+    # The SMS service fails at boot, e.g. Twilio unreachable, and comes up on a background retry
+    factory, calls = flaky_factory(1, lambda: SimpleNamespace(send_queued_sms=send_queued_sms))
+    container = ServiceContainer([ServiceSpec("sms", "SMS Service", factory)], retry_initial=0.01, retry_max=0.05)
+    queue = OutboundQueue(":memory:")
+    queue.enqueue("+15555550100", "Your appointment is confirmed", "reply:SM1")
+
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    original = main.services, main._outbound_queue
+    main.services, main._outbound_queue = container, queue
+
+    async def run():
+        async with main.lifespan(main.app):
+            for _ in range(200):
+                if queue.get_metrics()["sent"]:
+                    break
+                await asyncio.sleep(0.01)
+            assert main._outbound_worker is not None
+        assert main._outbound_worker is None
+
+    try:
+        asyncio.run(run())
+    finally:
+        main.services, main._outbound_queue = original
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+    assert calls["count"] == 2
+    assert sent == ["Your appointment is confirmed"]
+
+
+def test_get_async_builds_and_waits_off_the_event_loop():
+    built_in = []
+
+    def slow_factory():
+        built_in.append(threading.current_thread())
+        time.sleep(0.3)
+        return object()
+
+    container = ServiceContainer([
+        ServiceSpec("db", "Database Service", slow_factory),
+        ServiceSpec("sms", "SMS Service", slow_factory),
+    ])
+    # Another thread (e.g. the prewarm) is building the database service
+    prewarm = threading.Thread(target=container.get, args=("db",))
+    prewarm.start()
+    time.sleep(0.05)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        db = await container.get_async("db")
+        sms = await container.get_async("sms")
+        task.cancel()
+        return db, sms, ticks, threading.current_thread()
+
+    db, sms, ticks, loop_thread = asyncio.run(run())
+    prewarm.join()
+    assert db is container.get("db") and sms is not None
+    # The loop kept running while both waited
+    assert ticks >= 20
+    assert loop_thread not in built_in
+
+
+def test_liveness_and_readiness_probes():
+    from python_sms_responder import main
+
+    factory, _ = flaky_factory(100, object)
+    container = ServiceContainer([ServiceSpec("db", "Database Service", factory)])
+    original, main.services = main.services, container
+    try:
+        assert asyncio.run(main.liveness_check()) == {"status": "alive"}
+        container.get("db")
+        response = asyncio.run(main.readiness_check())
+        assert response.status_code == 503
+        assert json.loads(response.body)["services"]["db"]["status"] == FAILED
+    finally:
+        main.services = original
+
+
+if __name__ == "__main__":
+    tests = [
+        test_builds_and_warms_on_first_use,
+        test_failed_service_is_not_retried_on_every_request,
+        test_backoff_is_capped,
+        test_readiness_only_waits_for_required_services,
+        test_start_prewarms_and_retries_in_background,
+        test_async_warm_failure_does_not_fail_the_service,
+        test_shutdown_closes_services_and_reports_not_ready,
+        test_ready_callback_runs_on_the_loop_after_the_attempt_that_succeeds,
+        test_outbound_worker_starts_when_sms_becomes_ready,
+        test_get_async_builds_and_waits_off_the_event_loop,
+        test_liveness_and_readiness_probes,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
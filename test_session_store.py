@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for voice call sessions shared between workers
+"""
+
+import os
+import sys
+import tempfile
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.call_history import CallHistoryStore
+from python_sms_responder.session_store import (
+    SQLiteSessionBackend,
+    SharedCallHistoryStore,
+    create_call_history_store,
+)
+from benchmark_voice_streaming import FakeStreamingCompletions, make_voice_service
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_worker(path, clock, **kwargs):
+    return SharedCallHistoryStore(SQLiteSessionBackend(path), time_func=clock, **kwargs)
+
+
+def contents(store, call_sid, count=100):
+    return [message["content"] for message in store.recent(call_sid, count)]
+
+
+def test_call_moves_between_workers():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        worker_a, worker_b = make_worker(path, clock), make_worker(path, clock)
+
+        worker_a.append("CA1", "user", "what are your hours?")
+        worker_a.append("CA1", "assistant", "9 to 7")
+        clock.now += 5
+
+        assert contents(worker_b, "CA1") == ["what are your hours?", "9 to 7"]
+        worker_b.append("CA1", "user", "and sunday?")
+        worker_b.append("CA1", "assistant", "10 to 5")
+        clock.now += 5
+
+        # Worker A's copy is stale; the version check notices and reloads it
+        assert contents(worker_a, "CA1") == ["what are your hours?", "9 to 7", "and sunday?", "10 to 5"]
+        assert worker_a.user_turns("CA1") == 2
+        assert worker_a.stats["loads"] == 1
+
+
+def test_sessions_survive_restart():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        before = make_worker(path, clock)
+        before.append("CA1", "user", "book a haircut")
+        before.backend.close()
+
+        after = make_worker(path, clock)
+        assert "CA1" in after
+        assert contents(after, "CA1") == ["book a haircut"]
+        assert len(after) == 1
+
+
+def test_single_worker_reads_stay_local():
+    clock = FakeClock()
+    store = make_worker(":memory:", clock, capacity=4)
+    for turn in range(3):
+        store.append("CA1", "user", f"question {turn}")
+        store.append("CA1", "assistant", f"answer {turn}")
+        assert store.user_turns("CA1") == turn + 1
+        assert contents(store, "CA1", 2) == [f"question {turn}", f"answer {turn}"]
+        clock.now += 10
+
+    assert contents(store, "CA1") == ["question 1", "answer 1", "question 2", "answer 2"]
+    assert store.stats["loads"] == 0
+    metrics = store.get_metrics()
+    assert metrics["backend"] == "sqlite"
+    assert metrics["active_calls"] == 1
+    assert metrics["local_hit_rate"] == 1.0
+
+
+def test_stale_copy_is_revalidated_without_reload():
+    clock = FakeClock()
+    store = make_worker(":memory:", clock, revalidate_after=1.0)
+    store.append("CA1", "user", "hi")
+    clock.now += 0.5
+    store.user_turns("CA1")
+    assert store.stats["local_hits"] == 1
+
+    clock.now += 1
+    store.user_turns("CA1")
+    assert store.stats["revalidations"] == 1
+    assert store.stats["loads"] == 0
+
+
+def test_idle_calls_expire_everywhere():
+    clock = FakeClock()
+    expired = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        worker_a = make_worker(path, clock, idle_ttl=60, on_expire=expired.append)
+        worker_b = make_worker(path, clock, idle_ttl=60)
+        worker_a.append("CA-orphan", "user", "hello")
+        worker_a.append("CA-active", "user", "hi")
+        clock.now += 45
+        worker_b.append("CA-active", "assistant", "how can I help?")
+        clock.now += 30
+
+        assert "CA-orphan" not in worker_b
+        assert worker_a.sweep() == ["CA-active", "CA-orphan"]
+        assert expired == ["CA-active", "CA-orphan"]
+        # Worker A only dropped its idle copy of the active call; the session itself lives on
+        assert contents(worker_a, "CA-active") == ["hi", "how can I help?"]
+        assert len(worker_b) == 1
+
+
+def test_cleanup_deletes_shared_session():
+    clock = FakeClock()
+    store = make_worker(":memory:", clock)
+    store.append("CA1", "user", "bye")
+    del store["CA1"]
+    assert "CA1" not in store
+    assert store.get("CA1") is None
+    assert list(store.recent("CA1", 5)) == []
+
+
+def test_voice_service_context_follows_the_call():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        completions = FakeStreamingCompletions(first_token_delay=0, token_delay=0)
+        workers = []
+        for _ in range(2):
+            service = make_voice_service(completions, streaming=False)
+            service.conversation_history = SharedCallHistoryStore(
+                SQLiteSessionBackend(path), revalidate_after=0, on_expire=service._abandon_pending_reply
+            )
+            workers.append(service)
+
+        workers[0].create_processing_response("CA1", "what are your hours?")
+        messages = workers[1]._build_messages("CA1")
+        assert [message["role"] for message in messages] == ["system", "user", "assistant"]
+
+        workers[1].cleanup_conversation("CA1")
+        assert "CA1" not in workers[0].conversation_history
+        assert workers[0].check_health()["call_history"]["backend"] == "sqlite"
+
+
+def test_backend_selection_from_environment():
+    saved = {key: os.environ.get(key) for key in ("VOICE_SESSION_BACKEND", "VOICE_SESSION_STORE_PATH", "REDIS_URL")}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ.pop("VOICE_SESSION_BACKEND", None)
+            assert isinstance(create_call_history_store(), CallHistoryStore)
+
+            os.environ["VOICE_SESSION_BACKEND"] = "sqlite"
+            os.environ["VOICE_SESSION_STORE_PATH"] = os.path.join(directory, "sessions.db")
+            store = create_call_history_store()
+            assert isinstance(store, SharedCallHistoryStore)
+            store.backend.close()
+
+            # An unreachable Redis falls back to process memory instead of failing calls
+            os.environ["VOICE_SESSION_BACKEND"] = "redis"
+            os.environ["REDIS_URL"] = "not-a-redis-url"
+            assert isinstance(create_call_history_store(), CallHistoryStore)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+if __name__ == "__main__":
+    tests = [
+        test_call_moves_between_workers,
+        test_sessions_survive_restart,
+        test_single_worker_reads_stay_local,
+        test_stale_copy_is_revalidated_without_reload,
+        test_idle_calls_expire_everywhere,
+        test_cleanup_deletes_shared_session,
+        test_voice_service_context_follows_the_call,
+        test_backend_selection_from_environment,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
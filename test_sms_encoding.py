@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for SMS segment counting and GSM-7 compaction
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.sms_encoding import compact, count_segments, is_gsm7, transliterate
+from python_sms_responder.conversation_manager import ConversationManager
+from python_sms_responder.fallback_responses import get_keyword_fallback
+
+
+def _template_replies():
+    """Every reply the booking flow can produce for a typical conversation"""
+    manager = ConversationManager()
+    replies = []
+    for message in ["hi", "I want to book an appointment", "haircut", "tomorrow", "Jane Doe", "yes"]:
+        replies.append(manager.process_message("+15555550100", message)["response"])
+    return replies
+
+
+def test_gsm7_segment_boundaries():
+    assert count_segments("").segments == 0
+    assert count_segments("a" * 160).segments == 1
+    assert count_segments("a" * 161).segments == 2
+    assert count_segments("a" * 306).segments == 2
+    assert count_segments("a" * 307).segments == 3
+
+
+def test_extension_characters_cost_two_septets():
+    info = count_segments("{" * 80)
+    assert info.encoding == "GSM-7"
+    assert info.units == 160
+    assert info.segments == 1
+    assert count_segments("{" * 81).segments == 2
+    # 152 septets then an escape pair: the pair moves whole to the next segment
+    assert count_segments("a" * 152 + "€" + "a" * 10).segments == 2
+    assert count_segments("a" * 152 + "€" + "a" * 152).segments == 3
+
+
+def test_ucs2_segment_boundaries():
+    assert count_segments("•" * 70).segments == 1
+    assert count_segments("•" * 71).segments == 2
+    assert count_segments("•" * 134).segments == 2
+    assert count_segments("•" * 135).segments == 3
+
+
+def test_surrogate_pairs_are_not_split():
+    info = count_segments("😊" * 35)
+    assert info.encoding == "UCS-2"
+    assert info.units == 70
+    assert info.segments == 1
+    # 134 units fit two 67-unit parts only if the emoji's pair could straddle them
+    assert count_segments("a" * 66 + "😊" + "a" * 66).units == 134
+    assert count_segments("a" * 66 + "😊" + "a" * 66).segments == 3
+
+
+def test_single_bullet_forces_ucs2():
+    text = "Our services:\n• Haircut - $50"
+    assert count_segments(text).encoding == "UCS-2"
+    assert is_gsm7(transliterate(text))
+
+
+def test_transliterate_common_characters():
+    assert transliterate("“Hi” it’s 9–5…") == '"Hi" it\'s 9-5...'
+    assert transliterate("Café crêpes") == "Café crepes"
+    assert transliterate("See you soon 😊") == "See you soon "
+
+
+def test_compact_trims_to_segment_budget():
+    reply = "Thanks for reaching out! " + "We have openings all week and would love to see you. " * 10
+    compacted = compact(reply, max_segments=2)
+    info = count_segments(compacted)
+    assert info.encoding == "GSM-7"
+    assert info.segments <= 2
+    assert compacted.startswith("Thanks for reaching out!")
+    assert compacted.endswith(".") or compacted.endswith("...")
+
+
+def test_compact_leaves_short_gsm_replies_alone():
+    reply = "Hello! I'm here to help with your salon needs. Would you like to book an appointment?"
+    assert compact(reply, max_segments=1) == reply
+
+
+def test_conversation_templates_are_gsm7():
+    for reply in _template_replies():
+        info = count_segments(reply)
+        assert info.encoding == "GSM-7", reply
+        assert compact(reply) == reply.strip()
+
+
+def test_conversation_templates_segment_counts():
+    counts = [count_segments(reply).segments for reply in _template_replies()]
+    # The services list is the longest template; nothing should need more than 3 parts
+    assert max(counts) <= 3
+    assert all(count >= 1 for count in counts)
+
+
+def test_llm_style_reply_compaction_saves_segments():
+    reply = ("Hi there! 😊 We’d love to see you. Here’s what’s open:\n"
+             "• Tuesday – 10:00 AM\n• Wednesday – 2:30 PM\n• Friday – 4:00 PM\n"
+             "Just reply with the time that works best…")
+    before = count_segments(reply)
+    after = count_segments(compact(reply))
+    assert before.encoding == "UCS-2"
+    assert after.encoding == "GSM-7"
+    assert after.segments < before.segments
+
+
+def test_keyword_fallbacks_are_gsm7():
+    for message in ["book", "hours", "price", "cancel", "hello"]:
+        assert is_gsm7(get_keyword_fallback(message))
+
+
+if __name__ == "__main__":
+    tests = [
+        test_gsm7_segment_boundaries,
+        test_extension_characters_cost_two_septets,
+        test_ucs2_segment_boundaries,
+        test_surrogate_pairs_are_not_split,
+        test_single_bullet_forces_ucs2,
+        test_transliterate_common_characters,
+        test_compact_trims_to_segment_budget,
+        test_compact_leaves_short_gsm_replies_alone,
+        test_conversation_templates_are_gsm7,
+        test_conversation_templates_segment_counts,
+        test_llm_style_reply_compaction_saves_segments,
+        test_keyword_fallbacks_are_gsm7,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
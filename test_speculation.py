@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative LLM prefetch on partial speech results
+"""
+
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from python_sms_responder.speculation import SpeculativePrefetcher, same_request, transcript_words
+from python_sms_responder.streaming import StreamingReply
+from python_sms_responder.twiml_templates import TwimlRenderer
+from replay_voice_transcripts import CountingCompletions
+from benchmark_voice_streaming import make_voice_service
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def make_prefetcher(**kwargs):
+    started = []
+
+    def start_reply(call_sid, transcript):
+        reply = StreamingReply(lambda: iter([chunk(f"Answer to {transcript}.")])).start()
+        started.append((call_sid, transcript, reply))
+        return reply, None
+
+    return SpeculativePrefetcher(start_reply, **kwargs), started
+
+
+def test_same_request_ignores_case_punctuation_and_filler():
+    assert transcript_words("What time, do you OPEN?") == ["what", "time", "do", "you", "open"]
+    assert same_request(transcript_words("what time do you open"), transcript_words("What time do you open?"))
+    assert same_request(transcript_words("um where are you located"), transcript_words("Where are you located, please?"))
+    # Something added at the end is something the speculated reply does not answer
+    assert not same_request(transcript_words("how much is a color"),
+                            transcript_words("how much is a color and highlights"))
+
+
+def test_one_word_changes_are_different_requests():
+    pairs = [
+        ("I want to book a haircut at three", "I want to book a haircut at four"),
+        ("can I come in at 3:30", "can I come in at 4:30"),
+        ("a table for 2 people", "a table for 3 people"),
+        ("is Jamie working today", "is Maria working today"),
+        ("cancel my appointment tomorrow", "cancel my appointment today"),
+        ("I can make it Friday", "I can't make it Friday"),
+        ("do you take walk ins", "do you not take walk ins"),
+        ("I want a color", "I don't want a color"),
+    ]
+    for speculated, final in pairs:
+        assert not same_request(transcript_words(speculated), transcript_words(final)), (speculated, final)
+
+        prefetcher, started = make_prefetcher()
+        prefetcher.observe_partial("CA1", speculated)
+        prefetcher.observe_partial("CA1", speculated)
+        assert prefetcher.claim("CA1", final) is None
+        assert started[0][2].abandoned
+
+
+def test_speculates_only_on_stable_partials():
+    prefetcher, started = make_prefetcher()
+    assert not prefetcher.observe_partial("CA1", "what time")
+    assert not prefetcher.observe_partial("CA1", "what time")  # stable but too short
+    assert not prefetcher.observe_partial("CA1", "what time do you open")
+    assert prefetcher.observe_partial("CA1", "what time do you open")
+    assert [transcript for _, transcript, _ in started] == ["what time do you open"]
+
+    # Twilio marking the whole transcript stable is enough on its own
+    assert prefetcher.observe_partial("CA2", "is Jamie working today", stable="is Jamie working today")
+
+
+def test_matching_final_claims_the_reply():
+    prefetcher, started = make_prefetcher()
+    prefetcher.observe_partial("CA1", "where are you located")
+    prefetcher.observe_partial("CA1", "where are you located")
+
+    speculation = prefetcher.claim("CA1", "Um, where are you located?")
+    assert speculation is not None
+    assert speculation.reply is started[0][2]
+    assert prefetcher.get_stats()["reused"] == 1
+    # The utterance is over; nothing is left to claim
+    assert prefetcher.claim("CA1", "Um, where are you located?") is None
+
+
+def test_different_final_discards_the_reply():
+    prefetcher, started = make_prefetcher()
+    prefetcher.observe_partial("CA1", "I need to cancel")
+    prefetcher.observe_partial("CA1", "I need to cancel")
+
+    assert prefetcher.claim("CA1", "I need to cancel my appointment on Thursday at 3") is None
+    assert started[0][2].abandoned
+    assert prefetcher.get_stats()["discarded"] == 1
+
+
+def test_changed_transcript_supersedes_up_to_the_limit():
+    prefetcher, started = make_prefetcher(max_per_utterance=2)
+    for text in ("do you take walk ins", "do you take walk ins on Sunday afternoon", "no wait what about Monday"):
+        prefetcher.observe_partial("CA1", text)
+        prefetcher.observe_partial("CA1", text)
+
+    assert len(started) == 2
+    assert started[0][2].abandoned
+    assert not started[1][2].abandoned
+    assert prefetcher.get_stats()["superseded"] == 1
+
+
+def test_out_of_order_partials_are_ignored():
+    prefetcher, started = make_prefetcher()
+    prefetcher.observe_partial("CA1", "what time do you open", sequence=2)
+    assert not prefetcher.observe_partial("CA1", "what time do you open", sequence=1)
+    assert prefetcher.observe_partial("CA1", "what time do you open", sequence=3)
+
+
+def test_cancel_abandons_speculation():
+    prefetcher, started = make_prefetcher()
+    prefetcher.observe_partial("CA1", "book me a haircut")
+    prefetcher.observe_partial("CA1", "book me a haircut")
+    prefetcher.cancel("CA1")
+    assert started[0][2].abandoned
+    assert prefetcher.get_stats()["cancelled"] == 1
+
+
+def test_abandoned_stream_is_closed():
+    closed = threading.Event()
+    produced = []
+
+    def tokens():
+        try:
+            for index in range(100):
+                produced.append(index)
+                time.sleep(0.005)
+                yield chunk(f"word{index} ")
+        finally:
+            closed.set()
+
+    completed = []
+    reply = StreamingReply(tokens, completed.append).start()
+    time.sleep(0.03)
+    reply.abandon()
+    assert closed.wait(1)
+    assert len(produced) < 100
+    assert completed == []
+
+
+def test_completion_callback_attached_after_finish():
+    reply = StreamingReply(lambda: iter([chunk("Hello there.")])).start()
+    reply.remaining_text(1)
+    completed = []
+    reply.set_on_complete(completed.append)
+    assert completed == ["Hello there."]
+
+
+def test_voice_service_reuses_speculative_reply():
+    completions = CountingCompletions(first_token_delay=0.2, token_delay=0.005)
+    service = make_voice_service(completions, streaming=True)
+
+    service.handle_partial_result("CA1", "what are your hours", None, "0")
+    assert service.handle_partial_result("CA1", "what are your hours", None, "1")
+    # The speculative turn is not part of the history until it is claimed
+    assert "CA1" not in service.conversation_history
+
+    twiml = service.create_processing_response("CA1", "What are your hours?")
+    assert "<Say" in twiml
+    service.create_continuation_response("CA1")
+
+    assert completions.streams == 1
+    history = [(message["role"], message["content"]) for message in service.conversation_history["CA1"]]
+    assert history[0] == ("user", "What are your hours?")
+    assert history[1][0] == "assistant"
+    assert service.check_health()["speculation"]["reused"] == 1
+
+
+def test_gather_posts_partial_results_when_enabled():
+    assert 'partialResultCallback="https://salon.example.com/webhook/voice/partial"' in TwimlRenderer(
+        "https://salon.example.com", partial_results=True
+    ).follow_up("CA1")
+    assert "partialResultCallback" not in TwimlRenderer("https://salon.example.com").initial("CA1")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_same_request_ignores_case_punctuation_and_filler,
+        test_one_word_changes_are_different_requests,
+        test_speculates_only_on_stable_partials,
+        test_matching_final_claims_the_reply,
+        test_different_final_discards_the_reply,
+        test_changed_transcript_supersedes_up_to_the_limit,
+        test_out_of_order_partials_are_ignored,
+        test_cancel_abandons_speculation,
+        test_abandoned_stream_is_closed,
+        test_completion_callback_attached_after_finish,
+        test_voice_service_reuses_speculative_reply,
+        test_gather_posts_partial_results_when_enabled,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
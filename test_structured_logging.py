@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for structured logging: PII redaction, lazy formatting, per-module
+sampling, the non-blocking queue and trace context on records
+"""
+
+import io
+import os
+import sys
+import json
+import logging
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder import structured_logging, tracing
+from python_sms_responder.structured_logging import (
+    NonBlockingQueueHandler, SamplingFilter, StructuredFormatter, mask_phone, parse_sample_rates, redact_text,
+)
+from python_sms_responder.tracing import BatchSpanProcessor, Tracer
+
+
+class CountingStr:
+    """An argument that counts how often it is turned into a string"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "formatted"
+
+
+def make_record(name="python_sms_responder.main", level=logging.INFO, msg="Received SMS", args=(), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def capture(environment):
+    """configure_logging() writing to a buffer, with the given environment"""
+    names = ("LOG_FORMAT", "LOG_REDACT_PII", "LOG_SAMPLE_RATES", "LOG_QUEUE_SIZE", "LOG_LEVEL")
+    previous = {name: os.environ.get(name) for name in names}
+    for name in names:
+        os.environ.pop(name, None)
+    os.environ.update(environment)
+    stream = io.StringIO()
+    try:
+        structured_logging.configure_logging(stream)
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return stream
+
+
+def restore_root(handlers, level):
+    structured_logging.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_pii_is_redacted_in_fields_and_message_text():
+    formatter = StructuredFormatter("json")
+    record = make_record(
+        msg="Callback requested by %s at jane@example.com", args=("+1 (555) 123-4567",),
+        phone="+15551234567", body="Hi, can I book a cut Friday?", client_name="Jane Doe",
+        message_sid="SM0123456789abcdef0123456789abcdef", step="initial"
+    )
+    entry = json.loads(formatter.format(record))
+
+    assert entry["message"] == "Callback requested by ***4567 at <email>"
+    assert entry["phone"] == "***4567"
+    assert entry["body"] == "<28 chars>"
+    assert entry["client_name"] == "<name>"
+    # IDs and ordinary fields are left alone
+    assert entry["message_sid"] == "SM0123456789abcdef0123456789abcdef"
+    assert entry["step"] == "initial"
+    assert entry["level"] == "INFO" and entry["logger"] == "python_sms_responder.main"
+
+    # Messages formatted before logging (f-strings, third-party libraries) are redacted too
+    preformatted = make_record(msg="Failed to start speculative reply for +15555550123: timed out")
+    assert json.loads(formatter.format(preformatted))["message"] == (
+        "Failed to start speculative reply for ***0123: timed out"
+    )
+
+    assert mask_phone("12") == "***"
+    assert redact_text("order 1234 for 555.123.4567") == "order 1234 for ***4567"
+
+    unredacted = json.loads(StructuredFormatter("json", redact=False).format(record))
+    assert unredacted["phone"] == "+15551234567"
+
+
+def test_text_output_has_key_value_fields():
+    line = StructuredFormatter("text").format(make_record(phone="+15551234567", step="initial"))
+    assert "INFO python_sms_responder.main: Received SMS phone=***4567 step=initial" in line
+
+
+def test_sampling_keeps_warnings_and_uses_longest_prefix():
+    draws = iter([0.05, 0.5, 0.5])
+    sampler = SamplingFilter(
+        {"python_sms_responder": 0.5, "python_sms_responder.llm_service": 0.1}, random_func=lambda: next(draws)
+    )
+    before = structured_logging._SAMPLED_OUT.values()[0]
+
+    assert sampler.rate_for("python_sms_responder.llm_service") == 0.1
+    assert sampler.rate_for("python_sms_responder.main") == 0.5
+    assert sampler.rate_for("uvicorn.error") == 1.0
+
+    assert sampler.filter(make_record("python_sms_responder.llm_service"))
+    assert not sampler.filter(make_record("python_sms_responder.llm_service"))
+    assert not sampler.filter(make_record("python_sms_responder.main"))
+    assert sampler.filter(make_record("python_sms_responder.llm_service", level=logging.ERROR))
+    assert structured_logging._SAMPLED_OUT.values()[0] - before == 2
+
+    assert parse_sample_rates("a.b=0.1, c=2,bad,=0.3") == {"a.b": 0.1, "c": 1.0}
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(maxsize=2)
+    before = structured_logging._QUEUE_FULL.values()[0]
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 2
+    assert structured_logging._QUEUE_FULL.values()[0] - before == 3
+
+
+def test_queue_handler_does_not_format_and_filtered_records_are_never_formatted():
+    handler = NonBlockingQueueHandler()
+    argument = CountingStr()
+    handler.handle(make_record(msg="Prompt %s", args=(argument,)))
+    assert argument.calls == 0
+    assert handler.queue.get_nowait().getMessage() == "Prompt formatted"
+
+    logger = logging.getLogger("python_sms_responder.test_lazy")
+    logger.setLevel(logging.INFO)
+    try:
+        logger.debug("Conversation result: %s", argument)
+    finally:
+        logger.setLevel(logging.NOTSET)
+    assert argument.calls == 1
+
+
+def test_records_carry_the_current_trace():
+    previous = tracing._tracer
+    tracing._tracer = Tracer(1.0, BatchSpanProcessor([], interval=60))
+    handler = NonBlockingQueueHandler()
+    try:
+        with tracing.span("sms.webhook") as span:
+            handler.handle(make_record())
+        handler.handle(make_record())
+    finally:
+        tracing._tracer = previous
+
+    inside, outside = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert inside.trace_id == span.trace_id and inside.span_id == span.span_id
+    assert not hasattr(outside, "trace_id")
+    assert json.loads(StructuredFormatter().format(inside))["trace_id"] == span.trace_id
+
+
+def test_configure_and_shutdown_write_everything():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    try:
+        stream = capture({"LOG_FORMAT": "json", "LOG_SAMPLE_RATES": "python_sms_responder.sampled=0"})
+        logger = logging.getLogger("python_sms_responder.main")
+        try:
+            raise ValueError("bad payload")
+        except ValueError:
+            logger.exception("Error handling SMS", extra={"phone": "+15551234567"})
+        logger.info("Sent SMS", extra={"to_number": "+15559876543"})
+        logging.getLogger("python_sms_responder.sampled").info("dropped")
+        structured_logging.shutdown_logging()
+
+        # Logging after shutdown goes straight to the stream
+        logger.warning("After shutdown")
+
+        entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [entry["message"] for entry in entries] == ["Error handling SMS", "Sent SMS", "After shutdown"]
+        assert "ValueError: bad payload" in entries[0]["exception"]
+        assert entries[0]["phone"] == "***4567"
+        assert entries[1]["to_number"] == "***6543"
+    finally:
+        restore_root(handlers, level)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_pii_is_redacted_in_fields_and_message_text,
+        test_text_output_has_key_value_fields,
+        test_sampling_keeps_warnings_and_uses_longest_prefix,
+        test_full_queue_drops_instead_of_blocking,
+        test_queue_handler_does_not_format_and_filtered_records_are_never_formatted,
+        test_records_carry_the_current_trace,
+        test_configure_and_shutdown_write_everything,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Tests for request tracing: span context propagation, sampling, the JSON file
+and OTLP exporters, and the trace report
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder import tracing
+from python_sms_responder.metrics import Histogram, Registry
+from python_sms_responder.tracing import (
+    CLIENT, NOOP_SPAN, STATUS_ERROR, BatchSpanProcessor, JsonFileExporter, OTLPHttpExporter, Tracer,
+    current_span,
+)
+from trace_report import format_trace, load_traces
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+def use_tracer(sample_rate):
+    """Install a tracer exporting to a list; returns the tracer and the exporter"""
+    exporter = ListExporter()
+    tracer = Tracer(sample_rate, BatchSpanProcessor([exporter], interval=60))
+    tracing._tracer = tracer
+    return tracer, exporter
+
+
+def finish(tracer):
+    tracer.processor.flush()
+    tracing._tracer = Tracer()
+
+
+def test_spans_nest_across_await_and_threads():
+    tracer, exporter = use_tracer(1.0)
+
+    @tracing.traced("db.lookup", kind=CLIENT)
+    def lookup():
+        return current_span().span_id
+
+    async def handle():
+        with tracing.span("sms.webhook") as root:
+            await asyncio.sleep(0)
+            with tracing.span("sms.llm"):
+                pass
+            # The threadpool runs with a copy of the request's context
+            lookup_id = await asyncio.to_thread(lookup)
+            return root, lookup_id
+
+    root, lookup_id = asyncio.run(handle())
+    finish(tracer)
+
+    spans = {span.name: span for span in exporter.spans}
+    assert set(spans) == {"sms.webhook", "sms.llm", "db.lookup"}
+    assert spans["sms.webhook"].parent_id is None
+    assert spans["sms.llm"].parent_id == root.span_id
+    assert spans["db.lookup"].parent_id == root.span_id
+    assert spans["db.lookup"].span_id == lookup_id
+    assert spans["db.lookup"].kind == CLIENT
+    assert len({span.trace_id for span in exporter.spans}) == 1
+    assert current_span() is NOOP_SPAN
+
+
+def test_sampling_is_decided_per_trace():
+    tracer, exporter = use_tracer(0.5)
+
+    for _ in range(400):
+        with tracing.span("voice.incoming"):
+            with tracing.span("voice_service.create_initial_response"):
+                pass
+    finish(tracer)
+
+    roots = [span for span in exporter.spans if span.parent_id is None]
+    children = [span for span in exporter.spans if span.parent_id is not None]
+    # Whole traces are kept or dropped, never half of one
+    assert len(roots) == len(children)
+    assert 120 < len(roots) < 280
+
+
+def test_disabled_tracing_records_nothing_but_still_times_stages():
+    tracing._tracer = Tracer()
+    registry = Registry()
+    stage = Histogram("stage_seconds", "Stage", registry=registry).labels()
+
+    with tracing.span("sms.dedupe", histogram=stage) as span:
+        span.set_attribute("ignored", True)
+        assert span is NOOP_SPAN
+    assert sum(stage.values()[:-1]) == 1
+
+
+def test_exceptions_mark_span_as_error():
+    tracer, exporter = use_tracer(1.0)
+
+    @tracing.traced("llm.generate_response")
+    async def generate():
+        raise TimeoutError("no answer")
+
+    try:
+        asyncio.run(generate())
+    except TimeoutError:
+        pass
+    finish(tracer)
+
+    assert exporter.spans[0].status == STATUS_ERROR
+    assert exporter.spans[0].status_message == "TimeoutError: no answer"
+
+
+def test_full_queue_drops_spans():
+    exporter = ListExporter()
+    tracer = Tracer(1.0, BatchSpanProcessor([exporter], max_queue=3, interval=60))
+    for _ in range(5):
+        with tracer.span("sms.webhook"):
+            pass
+    tracer.processor.flush()
+    assert len(exporter.spans) == 3
+    assert tracer.processor.dropped == 2
+
+
+def test_json_exporter_and_trace_report():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "traces.jsonl")
+        tracer = Tracer(1.0, BatchSpanProcessor([JsonFileExporter(path)], interval=60))
+        with tracer.span("sms.webhook", {"messaging.message_id": "SM1"}):
+            with tracer.span("sms.client_lookup"):
+                pass
+            with tracer.span("sms.llm"):
+                pass
+        tracer.shutdown()
+
+        traces = load_traces(path)
+        assert len(traces) == 1
+        report = format_trace(next(iter(traces.values())))
+        lines = report.splitlines()
+        assert lines[1].strip().startswith("sms.webhook")
+        assert "messaging.message_id=SM1" in lines[1]
+        assert lines[2].strip().startswith("sms.client_lookup")
+        assert lines[3].strip().startswith("sms.llm")
+
+
+def test_otlp_exporter_posts_json():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    try:
+        exporter = OTLPHttpExporter(f"http://127.0.0.1:{server.server_port}", {"service.name": "sms-responder"})
+        tracer = Tracer(1.0, BatchSpanProcessor([exporter], interval=60))
+        with tracer.span("sms.webhook"):
+            with tracer.span("twilio.send_sms", {"twilio.attempts": 2}, kind=CLIENT):
+                pass
+        tracer.shutdown()
+    finally:
+        server.server_close()
+
+    path, payload = received[0]
+    assert path == "/v1/traces"
+    resource_spans = payload["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "sms-responder"}}
+    ]
+    spans = {span["name"]: span for span in resource_spans["scopeSpans"][0]["spans"]}
+    send = spans["twilio.send_sms"]
+    assert send["parentSpanId"] == spans["sms.webhook"]["spanId"]
+    assert "parentSpanId" not in spans["sms.webhook"]
+    assert len(send["traceId"]) == 32 and len(send["spanId"]) == 16
+    assert send["kind"] == CLIENT
+    assert send["attributes"] == [{"key": "twilio.attempts", "value": {"intValue": "2"}}]
+    assert int(send["endTimeUnixNano"]) >= int(send["startTimeUnixNano"])
+
+
+def test_create_tracer_from_environment():
+    names = ("TRACE_EXPORTERS", "TRACE_SAMPLE_RATE", "TRACE_FILE_PATH")
+    previous = {name: os.environ.get(name) for name in names}
+    try:
+        os.environ.pop("TRACE_EXPORTERS", None)
+        assert tracing.create_tracer().sample_rate == 0.0
+
+        os.environ.update(TRACE_EXPORTERS="json", TRACE_SAMPLE_RATE="0.25", TRACE_FILE_PATH=os.devnull)
+        tracer = tracing.create_tracer()
+        assert tracer.sample_rate == 0.25
+        assert isinstance(tracer.processor.exporters[0], JsonFileExporter)
+        tracer.shutdown()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+if __name__ == "__main__":
+    tests = [
+        test_spans_nest_across_await_and_threads,
+        test_sampling_is_decided_per_trace,
+        test_disabled_tracing_records_nothing_but_still_times_stages,
+        test_exceptions_mark_span_as_error,
+        test_full_queue_drops_spans,
+        test_json_exporter_and_trace_report,
+        test_otlp_exporter_posts_json,
+        test_create_tracer_from_environment,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the async Twilio sender
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import httpx
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.twilio_sender import AsyncTwilioSender, TokenBucket
+
+
+def make_sender(handler, **kwargs):
+    kwargs.setdefault("messages_per_second", 1000)
+    kwargs.setdefault("backoff_base", 0.001)
+    return AsyncTwilioSender("AC123", "token", "+15555550000", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def created(request):
+    return httpx.Response(201, json={"sid": "SM" + request.url.path[-5:], "status": "queued"})
+
+
+def test_send_posts_form_to_messages_api():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return created(request)
+
+    result = asyncio.run(make_sender(handler).send("+15555550100", "Hello"))
+    assert result.success and result.sid
+    assert seen[0].url.path == "/2010-04-01/Accounts/AC123/Messages.json"
+    assert b"To=%2B15555550100" in seen[0].content
+    assert seen[0].headers["Authorization"].startswith("Basic ")
+
+
+def test_retries_429_and_5xx_but_not_client_errors():
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0"}, json={"code": 20429, "message": "Too Many Requests"}),
+        httpx.Response(503, json={"message": "unavailable"}),
+    ])
+
+    def handler(request):
+        return next(responses, None) or created(request)
+
+    sender = make_sender(handler)
+    result = asyncio.run(sender.send("+15555550100", "Hello"))
+    assert result.success
+    assert result.attempts == 3
+    assert sender.stats["rate_limited"] == 1
+
+    bad = make_sender(lambda request: httpx.Response(400, json={"code": 21211, "message": "Invalid 'To' Phone Number"}))
+    result = asyncio.run(bad.send("+1555", "Hello"))
+    assert not result.success
+    assert result.attempts == 1
+    assert "21211" in result.error
+
+
+def test_retries_connect_errors_but_not_errors_after_sending():
+    failures = iter([httpx.ConnectError("connection refused"), httpx.ConnectTimeout("connect timed out")])
+
+    def flaky_connect(request):
+        error = next(failures, None)
+        if error:
+            raise error
+        return created(request)
+
+    result = asyncio.run(make_sender(flaky_connect).send("+15555550100", "Hello"))
+    assert result.success and result.attempts == 3
+
+    # The POST may have reached Twilio; sending it again could deliver it twice
+    posts = []
+
+    def read_timeout(request):
+        posts.append(request)
+        raise httpx.ReadTimeout("read timed out")
+
+    result = asyncio.run(make_sender(read_timeout).send("+15555550100", "Hello"))
+    assert not result.success
+    assert result.delivery_unknown
+    assert len(posts) == 1 and result.attempts == 1
+
+
+def test_bulk_send_streams_results_with_bounded_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return created(request)
+
+    async def run():
+        sender = make_sender(handler, max_concurrency=5)
+        return [result async for result in sender.send_bulk([f"+1555555{i:04d}" for i in range(40)], "Sale!")]
+
+    results = asyncio.run(run())
+    assert len(results) == 40
+    assert all(result.success for result in results)
+    assert peak <= 5
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.perf_counter()
+        for _ in range(11):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.19
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for precompiled voice TwiML templates
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.twiml_templates import (
+    TwimlRenderer,
+    build_follow_up,
+    build_initial,
+    build_say,
+    build_say_and_continue,
+    build_say_and_follow_up,
+)
+
+AWKWARD_TEXT = [
+    "Our hours are 9AM-7PM.",
+    'Cuts & color start at $25 <plus tax> - "ask" about deals',
+    "Line one\nline two\ttabbed",
+    "Café crème ☕ 😊",
+    "",
+]
+AWKWARD_SIDS = ["CA1234567890abcdef", 'CA"&<>', "CA\nnew"]
+
+
+def test_templates_match_the_twilio_library():
+    for base in ["", "https://salon.example.com"]:
+        renderer = TwimlRenderer(base)
+        for call_sid in AWKWARD_SIDS:
+            process_url = renderer.webhook_url("/webhook/voice/process", call_sid)
+            assert renderer.initial(call_sid) == str(
+                build_initial(process_url, renderer.webhook_url("/webhook/voice", call_sid))
+            )
+            assert renderer.follow_up(call_sid) == str(build_follow_up(process_url))
+            for text in AWKWARD_TEXT:
+                assert renderer.say(text) == str(build_say(text))
+                assert renderer.say_and_follow_up(text, call_sid) == str(build_say_and_follow_up(text, process_url))
+                assert renderer.say_and_continue(text, call_sid) == str(
+                    build_say_and_continue(text, renderer.webhook_url("/webhook/voice/continue", call_sid))
+                )
+
+
+def test_slots_use_attribute_or_text_escaping_by_position():
+    renderer = TwimlRenderer("")
+    twiml = renderer.initial('CA"x')
+    # In the Gather action attribute quotes are escaped; in the Redirect text they are not
+    assert 'action="/webhook/voice/process?call_sid=CA&quot;x"' in twiml
+    assert '<Redirect>/webhook/voice?call_sid=CA"x</Redirect>' in twiml
+    assert renderer.get_templates()["say_and_continue"].slots == ["text", "call_sid"]
+
+
+def test_webhook_base_is_read_once():
+    previous = os.environ.get("WEBHOOK_BASE_URL")
+    os.environ["WEBHOOK_BASE_URL"] = "https://first.example.com"
+    try:
+        renderer = TwimlRenderer()
+        os.environ["WEBHOOK_BASE_URL"] = "https://second.example.com"
+        assert "https://first.example.com/webhook/voice/process?call_sid=CA1" in renderer.follow_up("CA1")
+        assert "second.example.com" not in renderer.follow_up("CA1")
+    finally:
+        if previous is None:
+            os.environ.pop("WEBHOOK_BASE_URL", None)
+        else:
+            os.environ["WEBHOOK_BASE_URL"] = previous
+
+
+def test_static_fallbacks_are_prerendered():
+    renderer = TwimlRenderer("")
+    assert "Please hold while I connect you" in renderer.connecting
+    assert "having trouble processing your request" in renderer.processing_error
+
+
+if __name__ == "__main__":
+    tests = [
+        test_templates_match_the_twilio_library,
+        test_slots_use_attribute_or_text_escaping_by_position,
+        test_webhook_base_is_read_once,
+        test_static_fallbacks_are_prerendered,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed voice responses
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from python_sms_responder.streaming import SentenceSplitter
+from benchmark_voice_streaming import FakeStreamingCompletions, make_voice_service
+
+
+def test_sentence_splitter_streams_sentences():
+    splitter = SentenceSplitter()
+    sentences = []
+    for token in ["Hi", " there! ", "Dr. Smith", " is in at 9 a.m. ", "tomorrow. Color is $85.", "50 off"]:
+        sentences.extend(splitter.feed(token))
+
+    assert sentences == ["Hi there!", "Dr. Smith is in at 9 a.m. tomorrow."]
+    assert splitter.flush() == "Color is $85.50 off"
+
+
+def test_processing_response_speaks_first_sentence_then_redirects():
+    completions = FakeStreamingCompletions(first_token_delay=0.01, token_delay=0.002)
+    service = make_voice_service(completions, streaming=True)
+
+    twiml = service.create_processing_response("CA1", "what are your hours?")
+    assert "We're open Monday through Saturday" in twiml
+    assert "/webhook/voice/continue?call_sid=CA1" in twiml
+    assert "<Gather" not in twiml
+
+    continuation = service.create_continuation_response("CA1")
+    assert "Haircuts start at $45" in continuation
+    assert "<Gather" in continuation
+    assert service.conversation_history["CA1"][-1]["role"] == "assistant"
+    assert "CA1" not in service.pending_replies
+
+
+def test_processing_response_without_streaming_is_unchanged():
+    completions = FakeStreamingCompletions(first_token_delay=0, token_delay=0)
+    service = make_voice_service(completions, streaming=False)
+
+    twiml = service.create_processing_response("CA2", "what are your hours?")
+    assert "Haircuts start at $45" in twiml
+    assert "<Gather" in twiml
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
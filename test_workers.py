@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-process serving: per-worker configuration, CPU pinning,
+shared conversation state and graceful drain on SIGTERM
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+import http.client
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+
+from python_sms_responder.conversation_manager import ConversationManager, ConversationState
+from python_sms_responder.conversation_store import SQLiteConversationStore
+from python_sms_responder.workers import cpu_assignment, default_worker_count, worker_environment
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Served by the drain test's workers
+slow_app = FastAPI()
+
+
+@slow_app.get("/slow")
+async def slow():
+    import asyncio
+    await asyncio.sleep(1.5)
+    return {"finished": True}
+
+
+@slow_app.get("/health/live")
+async def live():
+    return {"status": "alive"}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_worker_environment_divides_budgets():
+    env = {"DB_POOL_MAX_TOTAL": "20", "DB_POOL_MIN": "2", "TWILIO_MPS": "3"}
+    overrides = worker_environment(4, 1, env)
+    assert overrides["WORKER_INDEX"] == "1"
+    assert overrides["WORKER_COUNT"] == "4"
+    assert overrides["DB_POOL_MAX"] == "5"
+    assert overrides["DB_POOL_MIN"] == "2"
+    assert overrides["TWILIO_MPS"] == "0.75"
+
+    # Never fewer than one connection per worker
+    assert worker_environment(8, 0, {"DB_POOL_MAX_TOTAL": "4"})["DB_POOL_MAX"] == "1"
+
+
+def test_worker_environment_moves_memory_state_to_shared_stores():
+    overrides = worker_environment(2, 0, {"VOICE_SESSION_BACKEND": "redis"})
+    assert overrides["CONVERSATION_STORE_BACKEND"] == "sqlite"
+    assert "VOICE_SESSION_BACKEND" not in overrides
+    # Streamed and speculative replies live in one worker's memory
+    assert overrides["VOICE_STREAMING_ENABLED"] == "false"
+    assert overrides["VOICE_SPECULATION_ENABLED"] == "false"
+
+    single = worker_environment(1, 0, {})
+    assert "CONVERSATION_STORE_BACKEND" not in single
+    assert "VOICE_SESSION_BACKEND" not in single
+    assert "VOICE_STREAMING_ENABLED" not in single
+
+
+def test_cpu_assignment_round_robin():
+    assert cpu_assignment(3, [0, 1]) == [{0}, {1}, {0}]
+    assert cpu_assignment(2, [4, 5, 6]) == [{4}, {5}]
+    assert cpu_assignment(2, []) == [set(), set()]
+
+
+def test_default_worker_count_from_web_concurrency():
+    previous = os.environ.get("WEB_CONCURRENCY")
+    os.environ["WEB_CONCURRENCY"] = "3"
+    try:
+        assert default_worker_count() == 3
+    finally:
+        if previous is None:
+            del os.environ["WEB_CONCURRENCY"]
+        else:
+            os.environ["WEB_CONCURRENCY"] = previous
+
+
+def test_conversation_continues_on_another_worker():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "conversations.db")
+        first, second = ConversationManager(), ConversationManager()
+        first.conversations = SQLiteConversationStore(ConversationState.from_dict, path)
+        second.conversations = SQLiteConversationStore(ConversationState.from_dict, path)
+
+        assert first.process_message("+15555550100", "I'd like to book an appointment")["step"] == "service_selection"
+        assert second.process_message("+15555550100", "a haircut please")["step"] == "time_selection"
+        assert first.get_conversation_summary("+15555550100")["selected_service"] == "haircut"
+
+        second.clear_conversation("+15555550100")
+        assert first.get_conversation_summary("+15555550100") is None
+
+
+def test_conversations_expire_when_idle():
+    clock = FakeClock()
+    store = SQLiteConversationStore(ConversationState.from_dict, ":memory:", idle_ttl=60, time_func=clock)
+    store["+15555550100"] = ConversationState("+15555550100")
+    assert "+15555550100" in store
+    clock.now += 61
+    assert "+15555550100" not in store
+    assert len(store) == 0
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port, path, timeout=10):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def test_sigterm_drains_in_flight_requests():
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--app", "test_workers:slow_app",
+         "--workers", "2", "--port", str(port), "--host", "127.0.0.1", "--drain-timeout", "10",
+         "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if _get(port, "/health/live", timeout=1)[0] == 200:
+                    break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, "workers did not start"
+            time.sleep(0.2)
+
+        result = {}
+        request = threading.Thread(target=lambda: result.update(response=_get(port, "/slow")))
+        request.start()
+        time.sleep(0.5)
+        server.send_signal(signal.SIGTERM)
+        request.join(10)
+
+        assert result["response"][0] == 200
+        assert b"finished" in result["response"][1]
+        assert server.wait(timeout=30) == 0
+        # Nothing accepts new connections once drained
+        try:
+            _get(port, "/health/live", timeout=1)
+            assert False, "server still accepting after drain"
+        except OSError:
+            pass
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_worker_environment_divides_budgets,
+        test_worker_environment_moves_memory_state_to_shared_stores,
+        test_cpu_assignment_round_robin,
+        test_default_worker_count_from_web_concurrency,
+        test_conversation_continues_on_another_worker,
+        test_conversations_expire_when_idle,
+        test_sigterm_drains_in_flight_requests,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Show where the time went in the slowest traced requests.
+
+Reads the spans written by the "json" trace exporter (TRACE_EXPORTERS=json)
+and prints the slowest traces as span trees, with each span's duration and
+its share of the whole request:
+
+    python trace_report.py                          # 5 slowest traces in traces.jsonl
+    python trace_report.py --root sms.webhook --top 10 --min-ms 2000
+    python trace_report.py --file /var/log/sms-responder/traces.jsonl --summary
+
+--summary adds total and mean time per span name across the selected traces.
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+
+def load_traces(path):
+    """Spans from a JSON lines file, grouped by trace ID"""
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                span = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash mid-write
+                continue
+            traces[span["trace_id"]].append(span)
+    return traces
+
+
+def trace_root(spans):
+    """The span with no parent in this trace, or the earliest if the root is missing"""
+    ids = {span["span_id"] for span in spans}
+    roots = [span for span in spans if not span.get("parent_id") or span["parent_id"] not in ids]
+    return min(roots, key=lambda span: span["start_time_unix_nano"])
+
+
+def format_trace(spans):
+    """Indented span tree, children in start order"""
+    root = trace_root(spans)
+    total = max(root["duration_ms"], 1e-9)
+    children = defaultdict(list)
+    for span in spans:
+        if span is not root:
+            children[span.get("parent_id")].append(span)
+
+    lines = [f"trace {root['trace_id']}  {root['duration_ms']:.1f} ms"]
+
+    def walk(span, depth):
+        status = "  ERROR " + " ".join(span.get("status_message", "").split()) if span.get("status") == 2 else ""
+        attributes = " ".join(f"{key}={value}" for key, value in span.get("attributes", {}).items())
+        lines.append(
+            f"  {'  ' * depth}{span['name']:<{max(1, 44 - 2 * depth)}} {span['duration_ms']:>9.1f} ms "
+            f"{span['duration_ms'] / total:>5.0%}  {attributes}{status}".rstrip()
+        )
+        for child in sorted(children[span["span_id"]], key=lambda item: item["start_time_unix_nano"]):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def summarize(traces):
+    """Total and mean milliseconds per span name"""
+    totals = defaultdict(lambda: [0, 0.0])
+    for spans in traces:
+        for span in spans:
+            totals[span["name"]][0] += 1
+            totals[span["name"]][1] += span["duration_ms"]
+    lines = [f"{'span':<44} {'count':>7} {'total ms':>11} {'mean ms':>9}"]
+    for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<44} {count:>7} {total:>11.1f} {total / count:>9.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slowest traces from the JSON trace exporter")
+    parser.add_argument("--file", default=os.getenv("TRACE_FILE_PATH", "traces.jsonl"))
+    parser.add_argument("--top", type=int, default=5, help="Number of traces to print")
+    parser.add_argument("--root", help="Only traces whose root span has this name, e.g. sms.webhook")
+    parser.add_argument("--min-ms", type=float, default=0.0, help="Only traces at least this slow")
+    parser.add_argument("--summary", action="store_true", help="Also print time per span name")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"No trace file at {args.file}; set TRACE_EXPORTERS=json to write one")
+        sys.exit(1)
+
+    selected = []
+    for spans in load_traces(args.file).values():
+        root = trace_root(spans)
+        if args.root and root["name"] != args.root:
+            continue
+        if root["duration_ms"] < args.min_ms:
+            continue
+        selected.append((root["duration_ms"], spans))
+    selected.sort(key=lambda item: -item[0])
+
+    print(f"{len(selected)} traces selected\n")
+    for _, spans in selected[:args.top]:
+        print(format_trace(spans))
+        print()
+    if args.summary and selected:
+        print(summarize(spans for _, spans in selected))
+
+
+if __name__ == "__main__":
+    main()